@@ -6,8 +6,10 @@ from pydantic import ValidationError
 from sqlmodel import Session, select
 from ..core import security
 from ..core.config import settings
-from ..db.session import get_session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from ..db.session import engine, get_async_session, get_session
 from ..models.user import User
+from ..core.principal import Principal, principals, without_heavy_columns
 
 reusable_oauth2 = OAuth2PasswordBearer(
     tokenUrl=f"{settings.API_V1_STR}/auth/login"
@@ -19,10 +21,8 @@ optional_oauth2 = OAuth2PasswordBearer(
     auto_error=False,
 )
 
-def get_current_user(
-    session: Annotated[Session, Depends(get_session)],
-    token: Annotated[str, Depends(reusable_oauth2)]
-) -> User:
+def _user_id_from_token(token: str):
+    """JWT → user UUID, with the 401/403s both auth dependencies share."""
     try:
         payload = jwt.decode(
             token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
@@ -42,16 +42,80 @@ def get_current_user(
 
     from uuid import UUID
     try:
-        user_id = UUID(token_data)
+        return UUID(token_data)
     except ValueError:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Invalid user identifier",
         )
 
-    user = session.get(User, user_id)
+_ARCHIVED = "Аккаунт архивирован. Свяжитесь с администратором для восстановления."
+
+
+def get_current_user(
+    session: Annotated[Session, Depends(get_session)],
+    token: Annotated[str, Depends(reusable_oauth2)]
+) -> User:
+    """The full `User`, for handlers that read or change it. The JSON blobs
+    (history, tasks, crm_data…) are deferred — they load on first access, so
+    a handler that never touches them doesn't pay for them. Routes that only
+    need to know who's calling should depend on `get_principal` instead."""
+    user_id = _user_id_from_token(token)
+    user = session.exec(
+        select(User).where(User.id == user_id).options(*without_heavy_columns())
+    ).first()
     if not user:
         raise HTTPException(status_code=404, detail=f"User not found (ID: {user_id})")
+    if user.archived_at is not None:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=_ARCHIVED)
+    return user
+
+def get_principal(
+    token: Annotated[str, Depends(reusable_oauth2)]
+) -> Principal:
+    """id / role / permissions of the caller from the per-process cache
+    (core/principal). A hit touches neither the pool nor the DB; a miss is
+    one narrow SELECT."""
+    user_id = _user_id_from_token(token)
+    principal = principals.get(user_id)
+    if principal is None:
+        with Session(engine) as session:
+            principal = principals.load(session, user_id)
+    if principal is None:
+        raise HTTPException(status_code=404, detail=f"User not found (ID: {user_id})")
+    if principal.archived:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=_ARCHIVED)
+    return principal
+
+async def get_principal_async(
+    token: Annotated[str, Depends(reusable_oauth2)]
+) -> Principal:
+    """`get_principal` for `async def` routes."""
+    from ..db.session import async_engine
+
+    user_id = _user_id_from_token(token)
+    principal = principals.get(user_id)
+    if principal is None:
+        async with AsyncSession(async_engine) as session:
+            principal = await principals.load_async(session, user_id)
+    if principal is None:
+        raise HTTPException(status_code=404, detail=f"User not found (ID: {user_id})")
+    if principal.archived:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=_ARCHIVED)
+    return principal
+
+async def get_current_user_async(
+    session: Annotated[AsyncSession, Depends(get_async_session)],
+    token: Annotated[str, Depends(reusable_oauth2)]
+) -> User:
+    """`get_current_user` for `async def` routes — same checks, AsyncSession."""
+    user_id = _user_id_from_token(token)
+    # Full row: AsyncSession can't lazy-load deferred columns.
+    user = await session.get(User, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail=f"User not found (ID: {user_id})")
+    if user.archived_at is not None:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=_ARCHIVED)
     return user
 
 def get_current_active_user(
@@ -89,6 +153,40 @@ def require_admin(
         )
     return current_user
 
+async def require_admin_async(
+    current_user: Annotated[User, Depends(get_current_user_async)],
+) -> User:
+    """require_admin для async-роутов (async def: без прыжка в threadpool)."""
+    if current_user.role not in ADMIN_ROLES:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough privileges",
+        )
+    return current_user
+
+def require_admin_principal(
+    principal: Annotated[Principal, Depends(get_principal)],
+) -> Principal:
+    """require_admin для роутов, которым сам User не нужен (только «кто» и
+    «можно ли») — обычно без похода в БД, см. core/principal."""
+    if principal.role not in ADMIN_ROLES:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough privileges",
+        )
+    return principal
+
+async def require_admin_principal_async(
+    principal: Annotated[Principal, Depends(get_principal_async)],
+) -> Principal:
+    """require_admin_principal для async-роутов."""
+    if principal.role not in ADMIN_ROLES:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough privileges",
+        )
+    return principal
+
 def require_can_book(
     current_user: Annotated[User, Depends(get_current_user)],
 ) -> User:
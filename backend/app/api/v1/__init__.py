@@ -39,6 +39,7 @@ safe_include(api_router, "app.api.v1.locations", "/locations", ["locations"])
 safe_include(api_router, "app.api.v1.specialists", "/specialists", ["specialists"])
 safe_include(api_router, "app.api.v1.specialist_schedule", "/specialists", ["specialist-schedule"])
 safe_include(api_router, "app.api.v1.notifications", "/notifications", ["notifications"])
+safe_include(api_router, "app.api.v1.events", "/events", ["events"])
 safe_include(api_router, "app.api.v1.timeline", "/timeline", ["timeline"])
 safe_include(api_router, "app.api.v1.waitlist", "/waitlist", ["waitlist"])
 safe_include(api_router, "app.api.v1.team", "/team", ["team"])
@@ -46,9 +47,11 @@ safe_include(api_router, "app.api.v1.upload", "/upload", ["upload"])
 safe_include(api_router, "app.api.v1.pricing", "/pricing", ["pricing"])
 safe_include(api_router, "app.api.v1.bonuses", "/bonuses", ["bonuses"])
 safe_include(api_router, "app.api.v1.admin_tasks", "/admin/tasks", ["admin-tasks"])
+safe_include(api_router, "app.api.v1.profiler", "/admin/profiler", ["admin-profiler"])
 safe_include(api_router, "app.api.v1.telegram", "/telegram", ["telegram"])
 safe_include(api_router, "app.api.v1.settings", "/settings", ["settings"])
 safe_include(api_router, "app.api.v1.billing", "/billing", ["billing"])
 safe_include(api_router, "app.api.v1.maintenance", "/maintenance-blocks", ["maintenance"])
 safe_include(api_router, "app.api.v1.posts", "/posts", ["posts"])
 safe_include(api_router, "app.api.v1.analytics", "/analytics", ["analytics"])
+safe_include(api_router, "app.api.v1.occupancy", "/occupancy", ["occupancy"])
@@ -11,6 +11,7 @@ from app.models.admin_task import (
     AdminTask, AdminTaskCreate, AdminTaskRead, AdminTaskUpdate,
     AdminTaskComment, AdminTaskCommentCreate, AdminTaskCommentRead,
 )
+from app.services import task_files
 
 router = APIRouter()
 
@@ -49,6 +50,7 @@ def create_task(
         created_by_name=current_user.name,
     )
     session.add(task)
+    task_files.retarget(session, None, task.attachments)
     session.commit()
     session.refresh(task)
     return task
@@ -74,11 +76,15 @@ def update_task(
     current_user: User = Depends(deps.require_admin),
 ):
     """Update task fields (partial update)."""
-    task = session.get(AdminTask, task_id)
+    update_data = data.model_dump(exclude_unset=True)
+    # Row lock when attachments change: two saves of the same task must not
+    # both diff against the same old list and double-count a file.
+    task = session.get(AdminTask, task_id, with_for_update="attachments" in update_data)
     if not task:
         raise HTTPException(404, "Task not found")
 
-    update_data = data.model_dump(exclude_unset=True)
+    if "attachments" in update_data:
+        task_files.retarget(session, task.attachments, update_data["attachments"])
     for key, value in update_data.items():
         setattr(task, key, value)
     task.updated_at = datetime.now()
@@ -95,10 +101,12 @@ def delete_task(
     session: Session = Depends(get_session),
     current_user: User = Depends(deps.require_admin),
 ):
-    task = session.get(AdminTask, task_id)
+    task = session.get(AdminTask, task_id, with_for_update=True)
     if not task:
         raise HTTPException(404, "Task not found")
 
+    task_files.retarget(session, task.attachments, None)
+
     # Delete comments too
     comments = session.exec(
         select(AdminTaskComment).where(AdminTaskComment.task_id == task_id)
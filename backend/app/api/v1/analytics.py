@@ -17,10 +17,10 @@ from app.models.resource import Resource
 from app.models.cashbox_transaction import CashboxTransaction
 from app.models.monthly_metrics import MonthlyMetrics
 from app.core.permissions import ADMIN_ROLES
+from app.services import occupancy
 
 router = APIRouter()
 
-WORKING_HOURS_PER_DAY = 13  # 09:00–22:00 — знаменатель загрузки
 CENTER_NAMES = {"unbox_one": "Unbox One", "unbox_uni": "Unbox Uni", "neo_school": "Neo School"}
 
 # Owner-аналитика — строго персональный доступ (owner попросил «только мне»
@@ -57,13 +57,19 @@ def compute_owner_analytics(session: Session, start: datetime, end: datetime, da
     ).all()
 
     rooms_by_center: dict[str, int] = {}
+    # Знаменатель загрузки — реальные окна кабинета (resource_windows), а не
+    # 13 ч/день для всех: залы Neo School открыты только по вечерам будней.
+    avail_by_center: dict[str, float] = {}
+    room_avail: dict[str, float] = {}
     room_names: dict[str, str] = {}
     room_center: dict[str, str] = {}
     for r in resources:
         room_names[r.id] = r.name
         room_center[r.id] = r.location_id
+        room_avail[r.id] = occupancy.available_hours(r.id, start.date(), days)
         if getattr(r, "is_active", True):
             rooms_by_center[r.location_id] = rooms_by_center.get(r.location_id, 0) + 1
+            avail_by_center[r.location_id] = avail_by_center.get(r.location_id, 0.0) + room_avail[r.id]
 
     centers: dict[str, dict] = {}
     per_room: dict[str, dict] = {}
@@ -78,7 +84,7 @@ def compute_owner_analytics(session: Session, start: datetime, end: datetime, da
     by_center = []
     for loc, c in centers.items():
         rooms = rooms_by_center.get(loc, 0)
-        avail = rooms * WORKING_HOURS_PER_DAY * days
+        avail = avail_by_center.get(loc, 0.0)
         by_center.append({
             "location_id": loc, "name": CENTER_NAMES.get(loc, loc),
             "revenue": round(c["revenue"], 2), "bookings": c["bookings"], "hours": round(c["hours"], 1),
@@ -90,7 +96,7 @@ def compute_owner_analytics(session: Session, start: datetime, end: datetime, da
 
     by_room = []
     for rid, rr in per_room.items():
-        avail = WORKING_HOURS_PER_DAY * days
+        avail = room_avail.get(rid) or occupancy.available_hours(rid, start.date(), days)
         by_room.append({
             "resource_id": rid, "name": room_names.get(rid, rid), "location_id": room_center.get(rid, "—"),
             "hours": round(rr["hours"], 1), "bookings": rr["bookings"], "revenue": round(rr["revenue"], 2),
@@ -4,8 +4,6 @@ from typing import Annotated, Any, Optional
 from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlmodel import Session, select
-from google.oauth2 import id_token
-from google.auth.transport import requests as google_requests
 from app.core import security
 from app.core.config import settings
 from app.core.rate_limit import limiter
@@ -153,6 +151,11 @@ def google_login(
     """
     Verify Google ID Token and login/register user
     """
+    # Imported here: google.auth + requests are startup weight every other
+    # route (and every cron script) would pay for nothing.
+    from google.oauth2 import id_token
+    from google.auth.transport import requests as google_requests
+
     try:
         id_info = id_token.verify_oauth2_token(
             login_data.token, 
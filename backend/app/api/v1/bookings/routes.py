@@ -2,21 +2,21 @@
 import logging
 from typing import Any, List, Optional
 from datetime import datetime, timedelta
-from uuid import UUID
+from uuid import UUID, uuid4
 from fastapi import APIRouter, BackgroundTasks, Body, Depends, HTTPException, Query, Request
 from app.core.rate_limit import limiter
 from sqlalchemy import or_
 from sqlmodel import select, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from pydantic import BaseModel as PydanticBaseModel
 from app.api import deps
 from app.models.booking import Booking, BookingCreate, BookingRead, BookingPublicRead
 from app.models.user import User
 from app.services.google_calendar import gcal_service
 from app.services.timeline import timeline_service
-from app.services import subscription_pool
+from app.services import gcal_writer, outbox, outbox_handlers, series_booking, series_mutation, subscription_pool, user_history
 from app.services import wallet
-from app.services.booking import check_availability, find_re_rent_conflicts
-from app.services.email import email_service
+from app.services.booking import check_availability, check_availability_many, find_re_rent_conflicts
 from app.services.telegram import telegram_service
 from app.core.permissions import ADMIN_ROLES
 
@@ -134,23 +134,8 @@ def _gcal_recreate_in_background(booking_id: str, user_name: str, old_event_id:
     """Drop the old GCal event and recreate one for the (already-updated)
     booking. Used by reschedule / extend paths so the request returns
     fast — see ``_gcal_create_in_background`` for the same rationale."""
-    from app.db.session import engine as _engine
     try:
-        with Session(_engine) as bg_session:
-            bk = bg_session.get(Booking, UUID(booking_id))
-            if not bk:
-                return
-            if old_event_id and old_resource_id:
-                try:
-                    gcal_service.delete_event(old_event_id, old_resource_id)
-                except Exception as e:
-                    logger.warning(f"[GCal recreate bg] delete old failed for {booking_id}: {e}")
-            ev = gcal_service.create_event(bk, user_name=user_name)
-            if ev:
-                bk.gcal_event_id = ev
-                bg_session.add(bk)
-                bg_session.commit()
-                logger.info(f"[GCal recreate bg] event_id={ev} for booking {booking_id}")
+        outbox_handlers.gcal_recreate(booking_id, user_name, old_event_id, old_resource_id)
     except Exception as e:
         logger.warning(f"[GCal recreate bg] Failed for {booking_id}: {e}")
 
@@ -164,7 +149,8 @@ def _gcal_delete_in_background(event_id: str, resource_id: Optional[str]) -> Non
     cancellation depends on the result, so it goes to a BackgroundTask instead.
     """
     try:
-        gcal_service.delete_event(event_id, resource_id)
+        if gcal_writer.delete_events([(event_id, resource_id)]):
+            logger.warning(f"[GCal cancel bg] delete_event failed for event={event_id}")
     except Exception as e:
         logger.warning(f"[GCal cancel bg] delete_event failed for event={event_id}: {e}")
 
@@ -183,19 +169,12 @@ def _gcal_create_in_background(booking_id: str, user_name: str) -> None:
     written to the DB but the request hung past the frontend's axios
     timeout, so she saw "Превышено время ожидания" and kept retrying
     (creating duplicate rows).
+
+    create / cancel / reschedule go through the outbox instead (``gcal.*``
+    events, retried); the remaining callers still use these helpers.
     """
-    from app.db.session import engine as _engine
     try:
-        with Session(_engine) as bg_session:
-            bk = bg_session.get(Booking, UUID(booking_id))
-            if not bk or bk.gcal_event_id:
-                return
-            ev = gcal_service.create_event(bk, user_name=user_name)
-            if ev:
-                bk.gcal_event_id = ev
-                bg_session.add(bk)
-                bg_session.commit()
-                logger.info(f"[GCal Sync bg] event_id={ev} for booking {booking_id}")
+        outbox_handlers.gcal_create(booking_id, user_name)
     except Exception as e:
         logger.warning(f"[GCal Sync bg] Failed for {booking_id}: {e}")
 
@@ -284,7 +263,6 @@ def _refund_booking_to_owner(
 
     if booking.payment_method == "subscription":
         if owner.subscription:
-            new_sub = owner.subscription.copy()
             full_hours = (
                 booking.hours_deducted
                 if booking.hours_deducted is not None
@@ -292,17 +270,11 @@ def _refund_booking_to_owner(
             )
             refund_hours = round(full_hours * refund_percent, 4)
             retained_hours = round(full_hours - refund_hours, 4)
-            rem = subscription_pool.get_float(new_sub, "remaining_hours")
-            # Mirror waive_charge in billing_defer.py: refunding hours back to
-            # the pool must also decrement used_hours, or the pool drifts
-            # (remaining + used no longer sums to the plan total).
-            used = subscription_pool.get_float(new_sub, "used_hours")
-            owner.subscription = new_sub = subscription_pool.update(
-                new_sub,
-                remaining_hours=rem + refund_hours,
-                used_hours=max(0.0, used - refund_hours),
-            )
-            session.add(owner)
+            # refund() also drops used_hours (as waive_charge does), so
+            # remaining + used keeps summing to the plan total.
+            subscription_pool.refund(session, owner, refund_hours, "booking_refund",
+                                     description="Возврат часов при отмене брони",
+                                     ref_type="booking", ref_id=str(booking.id))
             refund_meta["refunded_hours"] = refund_hours
             refund_meta["retained_hours_unbox_income"] = retained_hours
         else:
@@ -415,9 +387,9 @@ def _assert_start_not_past(booking_date: datetime, start_time: str, is_admin: bo
 # ─── GET endpoints ────────────────────────────────────────────────────────────
 
 @router.get("/me", response_model=List[BookingRead])
-def read_my_bookings(
-    session: Session = Depends(deps.get_session),
-    current_user: User = Depends(deps.get_current_user),
+async def read_my_bookings(
+    session: AsyncSession = Depends(deps.get_async_session),
+    current_user: User = Depends(deps.get_current_user_async),
     skip: int = 0,
     limit: int = 2000,
 ) -> Any:
@@ -431,22 +403,15 @@ def read_my_bookings(
     linked client name.
 
     Match on (user_uuid OR user_id-as-email OR any prior-email recorded in
-    `comment_history` for an email_change event). The narrow
+    the user's history for an email_change event). The narrow
     `user_id == email` filter we used to have hid bookings whenever the
     same human had multiple accounts (Telegram-Login synthetic email +
     real Gmail), or when the admin renamed their email — old rows still
     carried the prior email and silently disappeared from "Мои брони".
     """
-    # Mine prior emails out of the user's audit log, so a renamed account
-    # still owns its historical bookings on the user side. Cheap because
-    # `comment_history` lives on the User row and rarely exceeds dozens
-    # of entries.
-    prior_emails: set[str] = set()
-    for entry in (current_user.comment_history or []):
-        if isinstance(entry, dict) and entry.get("type") == "email_change":
-            old = (entry.get("old_email") or "").strip().lower()
-            if old:
-                prior_emails.add(old)
+    # Prior emails from the user's email_change history entries, so a
+    # renamed account still owns its historical bookings on the user side.
+    prior_emails = await user_history.prior_emails_async(session, current_user.id)
 
     email_lc = (current_user.email or "").strip().lower()
     candidate_emails = list(prior_emails | {email_lc}) if email_lc else list(prior_emails)
@@ -462,7 +427,7 @@ def read_my_bookings(
         .offset(skip)
         .limit(limit)
     )
-    bookings = session.exec(statement).all()
+    bookings = (await session.exec(statement)).all()
     return [enrich_booking_status(b) for b in bookings]
 
 
@@ -510,9 +475,9 @@ def read_bookings(
 
 @router.get("/public", response_model=List[BookingPublicRead])
 @limiter.limit("60/minute")
-def read_public_bookings(
+async def read_public_bookings(
     request: Request,
-    session: Session = Depends(deps.get_session),
+    session: AsyncSession = Depends(deps.get_async_session),
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
 ) -> Any:
@@ -550,7 +515,7 @@ def read_public_bookings(
         .limit(1000)
     )
 
-    bookings = session.exec(query).all()
+    bookings = (await session.exec(query)).all()
     return [enrich_booking_status(b) for b in bookings]
 
 
@@ -793,46 +758,41 @@ def create_booking(
                 re_rent_booking.updated_at = datetime.now()
                 session.add(re_rent_booking)
 
-                # Notify the original owner via Telegram (best-effort —
-                # never blocks the new booking creation).
-                try:
-                    if re_rent_owner and re_rent_owner.telegram_id:
-                        from app.models.resource import Resource as ResModel
-                        from app.models.location import Location as LocModel
-                        rb_res = session.get(ResModel, re_rent_booking.resource_id)
-                        rb_loc = (
-                            session.get(LocModel, rb_res.location_id)
-                            if rb_res and rb_res.location_id else None
-                        )
-                        telegram_service.send_rerent_taken(
-                            chat_id=str(re_rent_owner.telegram_id),
-                            resource_name=(rb_res.name if rb_res else re_rent_booking.resource_id),
-                            location_name=(rb_loc.name if rb_loc else None),
-                            date=re_rent_booking.date,
-                            start_time=re_rent_booking.start_time,
-                            refund_amount=refund_amount,
-                            new_balance=float(re_rent_owner.balance or 0.0),
-                            booking_id=str(re_rent_booking.id),
-                        )
-                except Exception as e:
-                    logger.warning(f"[TG re-rent owner alert] failed: {e}")
+                # Notify the original owner via Telegram — through the outbox:
+                # we're inside the slot lock here, a Telegram round-trip
+                # would hold it.
+                if re_rent_owner and re_rent_owner.telegram_id:
+                    from app.models.resource import Resource as ResModel
+                    from app.models.location import Location as LocModel
+                    rb_res = session.get(ResModel, re_rent_booking.resource_id)
+                    rb_loc = (
+                        session.get(LocModel, rb_res.location_id)
+                        if rb_res and rb_res.location_id else None
+                    )
+                    outbox.enqueue(session, "telegram.send_rerent_taken", dict(
+                        chat_id=str(re_rent_owner.telegram_id),
+                        resource_name=(rb_res.name if rb_res else re_rent_booking.resource_id),
+                        location_name=(rb_loc.name if rb_loc else None),
+                        date=re_rent_booking.date,
+                        start_time=re_rent_booking.start_time,
+                        refund_amount=refund_amount,
+                        new_balance=float(re_rent_owner.balance or 0.0),
+                        booking_id=str(re_rent_booking.id),
+                    ), key=f"tg-rerent-taken:{re_rent_booking.id}")
 
                 # GCal cleanup
                 if re_rent_booking.gcal_event_id:
-                    try:
-                        gcal_service.delete_event(
-                            re_rent_booking.gcal_event_id,
-                            re_rent_booking.resource_id,
-                        )
-                    except Exception as e:
-                        logger.warning(
-                            f"[GCal Auto-cancel re-rent] delete_event failed for "
-                            f"booking={re_rent_booking.id} event={re_rent_booking.gcal_event_id}: {e}"
-                        )
+                    outbox.enqueue(session, "gcal.delete", {
+                        "event_id": re_rent_booking.gcal_event_id,
+                        "resource_id": re_rent_booking.resource_id,
+                    }, key=f"gcal-delete:{re_rent_booking.gcal_event_id}")
                     re_rent_booking.gcal_event_id = None
 
-                # Audit log for auto-cancel with 50% refund details
+                # Audit log for auto-cancel with 50% refund details. No commit
+                # here: it used to release the slot lock before the new
+                # booking below was written.
                 timeline_service.log_event(
+                    commit=False,
                     session=session,
                     actor_id=current_user.id,
                     actor_role=current_user.role,
@@ -922,6 +882,10 @@ def create_booking(
                 _uncovered = max(0.0, _bonus_hrs - bonus_covered)
                 quote.final_price = round(float(quote.final_price or 0) * (_uncovered / _bonus_hrs), 2)
 
+        # The charges below run before the Booking row exists; its id is
+        # fixed up front so their ledger rows still point at it.
+        new_booking_id = uuid4()
+
         if booking_in.payment_method == "subscription":
             if quote.applied_rule != "SUBSCRIPTION":
                 raise HTTPException(
@@ -929,13 +893,17 @@ def create_booking(
                     detail="Insufficient subscription hours or invalid format for plan",
                 )
             if not defer_charge_single and booking_owner.subscription:
-                rem = subscription_pool.get_float(booking_owner.subscription, "remaining_hours")
-                used = subscription_pool.get_float(booking_owner.subscription, "used_hours")
-                booking_owner.subscription = subscription_pool.update(
-                    booking_owner.subscription,
-                    remaining_hours=max(0.0, rem - quote.hours_deducted),
-                    used_hours=used + quote.hours_deducted,
-                )
+                # The quote read the pool a moment ago; a parallel booking may
+                # have spent it since. The strict UPDATE is the real check.
+                if subscription_pool.deduct(
+                    session, booking_owner, quote.hours_deducted or 0, "booking_charge",
+                    strict=True, description="Списание часов за бронь",
+                    ref_type="booking", ref_id=str(new_booking_id), actor=current_user,
+                ) is None:
+                    raise HTTPException(
+                        status_code=400,
+                        detail="Insufficient subscription hours or invalid format for plan",
+                    )
         else:
             if not defer_charge_single:
                 available_funds = booking_owner.balance + booking_owner.credit_limit
@@ -949,7 +917,8 @@ def create_booking(
                         f"Пополните баланс перед бронированием.",
                     )
                 wallet.debit(session, booking_owner, quote.final_price, reason="booking_charge",
-                             description="Оплата брони с баланса (при создании)", ref_type="booking")
+                             description="Оплата брони с баланса (при создании)",
+                             ref_type="booking", ref_id=str(new_booking_id))
 
         booking_in.final_price = quote.final_price
         booking_in.base_price = quote.base_price
@@ -974,7 +943,8 @@ def create_booking(
         peak_debt = quote.subscription_peak_debt
         if not defer_charge_single and peak_debt > 0 and booking_in.payment_method == "subscription":
             wallet.debit(session, booking_owner, peak_debt, reason="booking_charge",
-                         description="Пиковая надбавка абонемента (при создании)", ref_type="booking")
+                         description="Пиковая надбавка абонемента (при создании)",
+                         ref_type="booking", ref_id=str(new_booking_id))
 
         # ── Hot Booking Approval Gate ──
         # Approval threshold depends on the WEEKDAY of the booking start:
@@ -1007,16 +977,15 @@ def create_booking(
             # Revert balance deduction that happened above
             if booking_in.payment_method != "subscription":
                 wallet.credit(session, booking_owner, quote.final_price, reason="booking_charge_revert",
-                              description="Откат списания — бронь ушла на подтверждение (hot)", ref_type="booking")
+                              description="Откат списания — бронь ушла на подтверждение (hot)",
+                              ref_type="booking", ref_id=str(new_booking_id))
             else:
                 # Undo subscription deduction
                 if booking_owner.subscription:
-                    rem = subscription_pool.get_float(booking_owner.subscription, "remaining_hours")
-                    used = subscription_pool.get_float(booking_owner.subscription, "used_hours")
-                    booking_owner.subscription = subscription_pool.update(
-                        booking_owner.subscription,
-                        remaining_hours=rem + quote.hours_deducted,
-                        used_hours=max(0.0, used - quote.hours_deducted),
+                    subscription_pool.refund(
+                        session, booking_owner, quote.hours_deducted or 0, "booking_charge_revert",
+                        description="Откат списания часов — бронь ушла на подтверждение (hot)",
+                        ref_type="booking", ref_id=str(new_booking_id),
                     )
 
             # The money was just handed back, so the row must stop claiming it
@@ -1033,6 +1002,7 @@ def create_booking(
         session.add(booking_owner)
 
         booking_data = booking_in.dict()
+        booking_data["id"] = new_booking_id
         booking_data["user_uuid"] = booking_owner.id
         booking_data["user_id"] = booking_owner.email
         if "target_user_id" in booking_data:
@@ -1044,6 +1014,13 @@ def create_booking(
         booking = Booking(**booking_data)
 
         session.add(booking)
+        # Google Calendar push — recorded in the booking's own transaction
+        # (services/outbox) and executed by the worker after commit. A slow
+        # Google API used to block this request 30+ s and trip the frontend
+        # axios timeout, making users think the booking failed and retry.
+        outbox.enqueue(session, "gcal.create", {
+            "booking_id": str(booking.id), "user_name": booking_owner.name,
+        }, key=f"gcal-create:{booking.id}")
         session.commit()
         session.refresh(booking)
 
@@ -1100,17 +1077,9 @@ def create_booking(
             except Exception as e:
                 logger.warning(f"[Peak debt notification] Error: {e}")
 
-        # Google Calendar Sync — push in a BackgroundTask so the response
-        # returns instantly. Synchronous push used to block 30+ s on a
-        # slow Google API and trip the frontend axios timeout, making
-        # users think the booking failed and retry (creating duplicates).
-        background_tasks.add_task(
-            _gcal_create_in_background,
-            str(booking.id),
-            booking_owner.name,
-        )
-
-        # ── Booking notifications (fire-and-forget) ──
+        # ── Booking notifications (outbox, committed below) ──
+        # Enqueued only now, after the consecutive-chain recompute, so the
+        # price in the message is the settled one.
         # Two paths:
         #   confirmed         → standard "Бронь подтверждена" TG + email
         #   pending_approval  → "Заявка отправлена" TG (Марина Бусина
@@ -1128,8 +1097,7 @@ def create_booking(
 
                 if booking.status == "pending_approval":
                     if booking_owner.telegram_id:
-                        background_tasks.add_task(
-                            telegram_service.send_booking_pending_approval,
+                        outbox.enqueue(session, "telegram.send_booking_pending_approval", dict(
                             chat_id=str(booking_owner.telegram_id),
                             user_name=booking_owner.name,
                             resource_name=resource_name,
@@ -1139,7 +1107,7 @@ def create_booking(
                             duration_minutes=booking.duration,
                             final_price=booking.final_price,
                             booking_id=str(booking.id),
-                        )
+                        ), key=f"tg-pending-approval:{booking.id}")
                     # In-app notification — visible in NotificationBell even
                     # for clients without a linked TG account.
                     try:
@@ -1181,22 +1149,20 @@ def create_booking(
 
                     # Telegram (primary channel for our audience)
                     if booking_owner.telegram_id:
-                        background_tasks.add_task(
-                            telegram_service.send_booking_confirmation,
+                        outbox.enqueue(session, "telegram.send_booking_confirmation", dict(
                             chat_id=str(booking_owner.telegram_id),
                             **common_ctx,
-                        )
+                        ), key=f"tg-booking-confirmed:{booking.id}")
 
                     # Email (fallback / secondary — disabled by default on prod).
                     # Drop user_name + extras (email signature doesn't accept them).
                     if booking_owner.email and not booking_owner.email.endswith("@telegram.unbox"):
-                        background_tasks.add_task(
-                            email_service.send_booking_confirmation,
+                        outbox.enqueue(session, "email.send_booking_confirmation", dict(
                             to_email=booking_owner.email,
                             to_name=booking_owner.name,
                             **{k: v for k, v in common_ctx.items()
                                if k not in ("user_name", "extras")},
-                        )
+                        ), key=f"email-booking-confirmed:{booking.id}")
             except Exception as e:
                 # Never block the booking flow on notification errors
                 logger.warning(f"[Booking notification] Non-blocking failure: {e}")
@@ -1253,12 +1219,11 @@ def create_booking(
                         {"text": "❌ Отклонить",   "callback_data": f"br:{booking.id}"},
                     ]]
                 }
-            background_tasks.add_task(
-                telegram_service.send_admin_event,
+            outbox.enqueue(session, "telegram.send_admin_event", dict(
                 event=event_type,
                 fields=fields_dict,
                 reply_markup=tg_markup,
-            )
+            ), key=f"tg-admin:{event_type}:{booking.id}")
 
             # Separate, prep-focused alert when extras are present. The
             # full booking event is still sent above; this one is purely
@@ -1266,8 +1231,7 @@ def create_booking(
             # кушетка") so admins don't have to scroll a busy chat to
             # find which bookings need set-up.
             if extras_pretty:
-                background_tasks.add_task(
-                    telegram_service.send_admin_event,
+                outbox.enqueue(session, "telegram.send_admin_event", dict(
                     event="booking_with_extras",
                     fields={
                         "Когда":      f"{date_label} · {time_label}",
@@ -1275,10 +1239,16 @@ def create_booking(
                         "Подготовить": extras_pretty,
                         "Арендатор":  booking_owner.name or booking_owner.email,
                     },
-                )
+                ), key=f"tg-admin:booking_with_extras:{booking.id}")
         except Exception as e:
             logger.warning(f"[Admin TG alert] Non-blocking failure: {e}")
 
+        try:
+            session.commit()  # the notification outbox rows
+        except Exception:
+            session.rollback()
+            logger.exception("[outbox] failed to record booking notifications")
+
         _maybe_alert_booking_overload(session, booking_owner, 1, background_tasks)
         return booking
 
@@ -1339,7 +1309,7 @@ def create_multi_slot_booking(
     """
     deps.require_can_book(current_user)
 
-    from app.services.pricing import PricingService, resolve_payment_method
+    from app.services.pricing import resolve_payment_method
     from uuid import uuid4 as gen_uuid4
 
     if not data.slots:
@@ -1383,30 +1353,28 @@ def create_multi_slot_booking(
             raise HTTPException(400, f"Invalid date format for slot: {s.date}")
         parsed_slots.append((s, d))
 
-    # Availability check for ALL slots before creating any.
-    # lock_rows=True takes a SELECT FOR UPDATE on overlapping rows so two
-    # concurrent multi-slot batches can't both pass the availability check
-    # and end up with conflicting bookings (audit found this race).
-    conflicts = []
+    # Availability check for ALL slots before creating any, under the
+    # (resource, day) advisory locks so two concurrent multi-slot batches
+    # can't both pass the check and end up with conflicting bookings (audit
+    # found this race). One occupancy read for the whole batch; slots are
+    # also checked against each other.
     _is_admin_ms = current_user.role in ADMIN_ROLES
     for s, d in parsed_slots:
         _assert_start_not_past(d, s.start_time, is_admin=_is_admin_ms)
-        available, reason = check_availability(
-            session=session,
-            resource_id=s.resource_id,
-            date=d,
-            start_time=s.start_time,
-            duration=s.duration,
-            lock_rows=True,
-            requester_user_uuid=booking_owner.id,
-        )
-        if not available:
-            conflicts.append({
-                "resource_id": s.resource_id,
-                "date": s.date,
-                "start_time": s.start_time,
-                "reason": reason,
-            })
+    occupancy, clashes = check_availability_many(
+        session,
+        [(s.resource_id, d, s.start_time, s.duration) for s, d in parsed_slots],
+        requester_user_uuid=booking_owner.id,
+    )
+    conflicts = [
+        {
+            "resource_id": parsed_slots[i][0].resource_id,
+            "date": parsed_slots[i][0].date,
+            "start_time": parsed_slots[i][0].start_time,
+            "reason": reason,
+        }
+        for i, reason in clashes
+    ]
     if conflicts:
         raise HTTPException(
             status_code=409,
@@ -1420,22 +1388,11 @@ def create_multi_slot_booking(
     group_id = str(gen_uuid4())
     created_bookings = []
     total_cost = 0.0
-    pricing_service = PricingService(session)
+    pricer = series_booking.SeriesPricer(session, booking_owner, occupancy)
 
     for s, d in parsed_slots:
-        try:
-            h, m = map(int, s.start_time.split(":"))
-            start_dt = d.replace(hour=h, minute=m, second=0, microsecond=0)
-        except Exception:
-            start_dt = d
-
-        quote = pricing_service.calculate_price(
-            user=booking_owner,
-            resource_id=s.resource_id,
-            start_time=start_dt,
-            duration_minutes=s.duration,
-            format_type=s.format,
-        )
+        start_dt = series_booking.start_dt(d, s.start_time)
+        quote = pricer.quote(s.resource_id, d, s.start_time, s.duration, s.format)
 
         # ── Deferred billing per slot ──────────────────────────────────────
         from datetime import timedelta as _td_multi
@@ -1446,6 +1403,7 @@ def create_multi_slot_booking(
         # кончиться на середине, и тогда следующие слоты честно уйдут на баланс.
         # `data.payment_method` не трогаем — он общий на весь запрос.
         slot_method = resolve_payment_method(data.payment_method, quote)
+        slot_booking_id = uuid4()  # ledger rows below point at it
 
         if slot_method == "subscription":
             if quote.applied_rule != "SUBSCRIPTION":
@@ -1454,24 +1412,15 @@ def create_multi_slot_booking(
                     f"Subscription insufficient for slot {s.date} {s.start_time}",
                 )
             if not defer_charge_multi and booking_owner.subscription:
-                new_sub = booking_owner.subscription.copy()
-                # Read BOTH keys (snake + camel) — the pool may be stored in
-                # either convention; reading only camelCase wrongly rejects
-                # or never decrements a snake_case pool. Mirror the
-                # single/recurring paths and normalize to snake on write.
-                remaining = subscription_pool.get_float(new_sub, "remaining_hours")
-                used = subscription_pool.get_float(new_sub, "used_hours")
-                hours_deducted = quote.hours_deducted or 0
-                if remaining < hours_deducted:
+                if subscription_pool.deduct(
+                    session, booking_owner, quote.hours_deducted or 0, "booking_charge",
+                    strict=True, description="Списание часов за бронь (мульти-слот)",
+                    ref_type="booking", ref_id=str(slot_booking_id), actor=current_user,
+                ) is None:
                     raise HTTPException(
                         400,
                         f"Not enough subscription hours for slot {s.date} {s.start_time}",
                     )
-                booking_owner.subscription = new_sub = subscription_pool.update(
-                    new_sub,
-                    remaining_hours=max(0.0, remaining - hours_deducted),
-                    used_hours=used + hours_deducted,
-                )
         else:  # balance
             if not defer_charge_multi:
                 available_funds = (booking_owner.balance or 0) + (booking_owner.credit_limit or 0)
@@ -1483,11 +1432,12 @@ def create_multi_slot_booking(
                     )
                 wallet.debit(session, booking_owner, quote.final_price, reason="booking_charge",
                              description=f"Оплата брони с баланса (мульти-слот {s.date} {s.start_time})",
-                             ref_type="booking")
+                             ref_type="booking", ref_id=str(slot_booking_id))
 
         total_cost += quote.final_price
 
         booking = Booking(
+            id=slot_booking_id,
             resource_id=s.resource_id,
             location_id=s.location_id,
             date=d,
@@ -1519,66 +1469,41 @@ def create_multi_slot_booking(
             created_by_id=str(current_user.id),
             created_by_name=current_user.name or "",
         )
-        session.add(booking)
+        # Later slots of the batch chain onto this one when pricing.
+        pricer.claim(booking)
         created_bookings.append(booking)
 
+    series_booking.insert(session, created_bookings)
+
+    # Excel #24 + R33 — Google Calendar for the whole batch, through the
+    # outbox in the same transaction (like the recurring series): events
+    # appear only for bookings that were actually saved, a Google outage
+    # can't roll them back, and the response doesn't wait for Google. One
+    # batched request per calendar (services/gcal_writer).
+    outbox.enqueue(session, "gcal.create_many", {
+        "booking_ids": [str(b.id) for b in created_bookings], "user_name": booking_owner.name,
+    }, key=f"gcal-create-batch:{group_id}")
     session.add(booking_owner)
     session.commit()
-    for b in created_bookings:
-        session.refresh(b)
-
-    # Excel #24 + R33 — Google Calendar sync for the whole batch.
-    # Same try/except policy as single-booking create: a GCal failure must
-    # NOT roll back the bookings — the source of truth is the DB. We log a
-    # warning per failed slot so admin can later use the resync tool.
-    gcal_synced = 0
-    gcal_failed = 0
-    for b in created_bookings:
-        try:
-            event_id = gcal_service.create_event(b, user_name=booking_owner.name)
-            if event_id:
-                b.gcal_event_id = event_id
-                session.add(b)
-                gcal_synced += 1
-            else:
-                gcal_failed += 1
-                logger.warning(
-                    f"[GCal Multi-slot] Booking {b.id} created without event_id (no error, just no id returned)"
-                )
-        except Exception as e:
-            gcal_failed += 1
-            logger.warning(f"[GCal Multi-slot] Sync failed for booking {b.id}: {e}")
-    if gcal_synced > 0:
-        session.commit()
-    logger.info(
-        f"[GCal Multi-slot] Synced {gcal_synced}/{len(created_bookings)} slots in group {group_id}"
-    )
+    series_booking.reload(session, created_bookings)
 
     # Consecutive-hours discount: multi-slot is the primary place this
     # rule actually fires, since the user typically picks 2+ adjacent
     # cells in one drag. Recompute every distinct (resource, day) the
-    # batch touched — covers chains formed inside the batch as well as
-    # chains that join existing bookings.
+    # batch touched in one pass — covers chains formed inside the batch as
+    # well as chains that join existing bookings.
     if data.payment_method == "balance":
         try:
-            from app.services.consecutive_pricing import recompute_user_chains_for_day
-            seen: set = set()
-            for b in created_bookings:
-                key = (b.resource_id, b.date.date() if hasattr(b.date, "date") else b.date)
-                if key in seen:
-                    continue
-                seen.add(key)
-                recompute_user_chains_for_day(
-                    session,
-                    booking_owner,
-                    b.resource_id,
-                    b.date,
-                    actor_id=str(current_user.id),
-                    actor_role=current_user.role,
-                    reason="create_multi_slot",
-                )
-            for b in created_bookings:
-                session.refresh(b)
+            from app.services.consecutive_pricing import recompute_user_chains
+            recompute_user_chains(
+                session,
+                booking_owner,
+                [(b.resource_id, b.date) for b in created_bookings],
+                actor_id=str(current_user.id),
+                actor_role=current_user.role,
+                reason="create_multi_slot",
+            )
+            series_booking.reload(session, created_bookings)
         except Exception:
             logger.exception("[consecutive] recompute on multi-slot failed")
 
@@ -1598,8 +1523,7 @@ def create_multi_slot_booking(
             "group_id": group_id,
             "slot_count": len(created_bookings),
             "total_cost": total_cost,
-            "gcal_synced": gcal_synced,
-            "gcal_failed": gcal_failed,
+            "gcal_queued": len(created_bookings),
         },
     )
 
@@ -1644,8 +1568,7 @@ def create_multi_slot_booking(
         "group_id": group_id,
         "bookings": [enrich_booking_status(b) for b in created_bookings],
         "total_cost": total_cost,
-        "gcal_synced": gcal_synced,
-        "gcal_failed": gcal_failed,
+        "gcal_queued": len(created_bookings),
     }
 
 
@@ -1682,7 +1605,7 @@ def create_recurring_booking(
     """
     deps.require_can_book(current_user)
 
-    from app.services.pricing import PricingService, resolve_payment_method
+    from app.services.pricing import resolve_payment_method
     from uuid import uuid4 as gen_uuid4
 
     # Determine booking owner
@@ -1745,31 +1668,29 @@ def create_recurring_booking(
 
     # Check availability — skip the first date if we found an anchor (it's
     # legitimately ours and will be adopted, not duplicated).
-    # `lock_rows=True` takes a Postgres advisory lock per (resource, day) so
-    # parallel "Повторить × N" submits can't both pass the availability
-    # check and double-create a series. Without this we accumulated 43
-    # historical collisions on prod (3× series clicks landed 3 series in
-    # the same slots on unbox_one_room_2 Saturdays).
-    conflicts = []
+    # check_availability_many takes a Postgres advisory lock per (resource,
+    # day), all of them in sorted order, so parallel "Повторить × N" submits
+    # can't both pass the availability check and double-create a series.
+    # Without this we accumulated 43 historical collisions on prod (3×
+    # series clicks landed 3 series in the same slots on unbox_one_room_2
+    # Saturdays). One occupancy read for all the dates.
     create_dates = dates[1:] if anchor_booking else dates
     _is_admin_rec = current_user.role in ADMIN_ROLES
     for d in create_dates:
         _assert_start_not_past(d, data.start_time, is_admin=_is_admin_rec)
-        available, reason = check_availability(
-            session=session,
-            resource_id=data.resource_id,
-            date=d,
-            start_time=data.start_time,
-            duration=data.duration,
-            requester_user_uuid=booking_owner.id,
-            lock_rows=True,
-        )
-        if not available:
-            conflicts.append({
-                "date": d.strftime("%Y-%m-%d"),
-                "day": d.strftime("%A"),
-                "reason": reason,
-            })
+    occupancy, clashes = check_availability_many(
+        session,
+        [(data.resource_id, d, data.start_time, data.duration) for d in create_dates],
+        requester_user_uuid=booking_owner.id,
+    )
+    conflicts = [
+        {
+            "date": create_dates[i].strftime("%Y-%m-%d"),
+            "day": create_dates[i].strftime("%A"),
+            "reason": reason,
+        }
+        for i, reason in clashes
+    ]
 
     if conflicts:
         raise HTTPException(
@@ -1822,22 +1743,15 @@ def create_recurring_booking(
         session.add(anchor_booking)
         created_bookings.append(str(anchor_booking.id))
 
-    # Iterate over only the dates we actually need to create.
+    # Iterate over only the dates we actually need to create. Everything is
+    # priced from the occupancy snapshot and written in one flush below
+    # (services/series_booking) — a year of weekly slots used to be a few
+    # hundred statements.
+    pricer = series_booking.SeriesPricer(session, booking_owner, occupancy)
+    new_bookings: List[Booking] = []
     for d in create_dates:
-        try:
-            h, m = map(int, data.start_time.split(":"))
-            start_dt = d.replace(hour=h, minute=m, second=0, microsecond=0)
-        except Exception:
-            start_dt = d
-
-        pricing_service = PricingService(session)
-        quote = pricing_service.calculate_price(
-            user=booking_owner,
-            resource_id=data.resource_id,
-            start_time=start_dt,
-            duration_minutes=data.duration,
-            format_type=data.format,
-        )
+        start_dt = series_booking.start_dt(d, data.start_time)
+        quote = pricer.quote(data.resource_id, d, data.start_time, data.duration, data.format)
 
         # ── Deferred billing for recurring series ──────────────────────────
         # Each occurrence ≥24h away is held as `pending` and charged by the
@@ -1846,13 +1760,13 @@ def create_recurring_booking(
         # before it starts. Subscription validation still happens upfront
         # to fail fast on a depleted plan.
         from datetime import timedelta as _td_recur
-        _start_tb = d.replace(hour=int(data.start_time.split(":")[0]), minute=int(data.start_time.split(":")[1]))
         _now_tb = datetime.utcnow() + _td_recur(hours=4)
-        defer_charge = (_start_tb - _now_tb).total_seconds() > 24 * 3600
+        defer_charge = (start_dt - _now_tb).total_seconds() > 24 * 3600
 
         # Ярлык — по каждому вхождению серии: часы абонемента могут кончиться
         # в середине, и остаток серии честно уйдёт на баланс.
         occ_method = resolve_payment_method(data.payment_method, quote)
+        occ_booking_id = uuid4()  # ledger rows below point at it
 
         if occ_method == "subscription":
             if quote.applied_rule != "SUBSCRIPTION":
@@ -1860,13 +1774,14 @@ def create_recurring_booking(
                     400, f"Subscription insufficient for {d.strftime('%Y-%m-%d')}"
                 )
             if not defer_charge and booking_owner.subscription:
-                rem = subscription_pool.get_float(booking_owner.subscription, "remaining_hours")
-                used = subscription_pool.get_float(booking_owner.subscription, "used_hours")
-                booking_owner.subscription = subscription_pool.update(
-                    booking_owner.subscription,
-                    remaining_hours=max(0.0, rem - quote.hours_deducted),
-                    used_hours=used + quote.hours_deducted,
-                )
+                if subscription_pool.deduct(
+                    session, booking_owner, quote.hours_deducted or 0, "booking_charge",
+                    strict=True, description="Списание часов за бронь (серия)",
+                    ref_type="booking", ref_id=str(occ_booking_id), actor=current_user,
+                ) is None:
+                    raise HTTPException(
+                        400, f"Subscription insufficient for {d.strftime('%Y-%m-%d')}"
+                    )
         else:
             if not defer_charge:
                 available_funds = booking_owner.balance + booking_owner.credit_limit
@@ -1877,11 +1792,10 @@ def create_recurring_booking(
                     )
                 wallet.debit(session, booking_owner, quote.final_price, reason="booking_charge",
                              description=f"Оплата брони с баланса (серия {d.strftime('%Y-%m-%d')})",
-                             ref_type="booking")
-
-        session.add(booking_owner)
+                             ref_type="booking", ref_id=str(occ_booking_id))
 
         booking = Booking(
+            id=occ_booking_id,
             resource_id=data.resource_id,
             location_id=data.location_id,
             date=d,
@@ -1907,130 +1821,34 @@ def create_recurring_booking(
             created_by_id=str(current_user.id),
             created_by_name=current_user.name or "",
         )
-        session.add(booking)
-        session.flush()
-
-        # GCal sync (cabinet calendar) — §5#2 (2026-07-10): вынесено из цикла
-        # в background_tasks ПОСЛЕ коммита. Раньше N синхронных вызовов Google
-        # в одном запросе (12+ для серии) блокировали и, при обрыве до коммита,
-        # оставляли «призрачные» события для уже обработанных дат (роллбэк БД их
-        # не удалял). Теперь события создаются только для реально закоммиченных
-        # броней — см. цикл планирования после session.commit() ниже.
-
-        # Auto-create the matching CRM TherapySession if the booking is
-        # linked to a client. Mirrors what the CRM chessboard does on a
-        # one-off click — without this the recurring series shows up as
-        # "Занято" tiles with no client name and no edit handle.
-        #
-        # IMPORTANT: re-use an existing session on this date if one is
-        # already there (e.g. the client has a session synced from their
-        # historical Google Calendar recurring rule, or the specialist
-        # created one manually earlier). Without the lookup we'd insert a
-        # second session at the same wall-clock time and the chessboard
-        # would render two rows — one with "+КАБ" and one with the actual
-        # cabinet, which is exactly what Maxim/Nurlana hit.
-        if crm_client_obj and crm_session_group_id:
-            from app.models.therapy_session import TherapySession as _TS
-            from app.services.crm_calendar import tbilisi_naive_to_utc_naive
-            try:
-                h, m = map(int, data.start_time.split(":"))
-                # `d` is a Tbilisi calendar date; `start_time` is a
-                # Tbilisi wall-clock. Build the Tbilisi-naive datetime
-                # then normalise to UTC-naive — that's the column
-                # convention.
-                tb_dt = d.replace(hour=h, minute=m, second=0, microsecond=0)
-                session_date = tbilisi_naive_to_utc_naive(tb_dt)
-            except Exception:
-                session_date = d
-
-            # Same-day match. We compare on UTC-naive throughout. Note
-            # that "this calendar day" means the Tbilisi calendar day
-            # the user picked, so the day-window we look at in the
-            # database must be the corresponding UTC-naive window —
-            # 4h shifted.
-            from datetime import timedelta as _td
-            tb_day_start = d.replace(hour=0, minute=0, second=0, microsecond=0)
-            day_start = tbilisi_naive_to_utc_naive(tb_day_start)
-            day_end = day_start + _td(days=1)
-            same_day_existing = session.exec(
-                select(_TS)
-                .where(_TS.client_id == str(crm_client_obj.id))
-                .where(_TS.specialist_id == str(booking_owner.id))
-                .where(_TS.date >= day_start)
-                .where(_TS.date < day_end)
-                .where(_TS.status.not_in(("CANCELLED_CLIENT", "CANCELLED_THERAPIST")))  # type: ignore
-            ).all()
-
-            # We're now consistently UTC-naive in DB. Match on the
-            # UTC-equivalent of the Tbilisi wall-clock the user picked.
-            target_h = (session_date.hour, session_date.minute)
-
-            existing = None
-            for cand in same_day_existing:
-                if (cand.date.hour, cand.date.minute) == target_h:
-                    existing = cand
-                    break
-
-            if existing:
-                # Re-use the existing row instead of duplicating. Link it
-                # to the new booking and stamp the recurring group so it
-                # behaves like the rest of the series.
-                existing.booking_id = str(booking.id)
-                existing.is_booked = True
-                if existing.recurring_group_id is None:
-                    existing.recurring_group_id = crm_session_group_id
-                existing.updated_at = datetime.now()
-                # If price was unset (legacy NULL), seed it from client
-                # so revenue reports stop counting these as "free".
-                if existing.price is None:
-                    existing.price = crm_client_obj.base_price
-                if existing.currency is None:
-                    existing.currency = crm_client_obj.currency
-                if existing.account is None:
-                    existing.account = crm_client_obj.default_account
-                session.add(existing)
-            else:
-                ts = _TS(
-                    client_id=str(crm_client_obj.id),
-                    specialist_id=str(booking_owner.id),
-                    date=session_date,
-                    duration_minutes=data.duration,
-                    status="PLANNED",
-                    price=crm_client_obj.base_price,
-                    currency=crm_client_obj.currency,
-                    account=crm_client_obj.default_account,
-                    is_booked=True,
-                    booking_id=str(booking.id),
-                    recurring_group_id=crm_session_group_id,
-                )
-                # Mirror the cabinet GCal event into the specialist's personal
-                # CRM calendar too, so a session shows up under the client's
-                # name (not just "Кабинет 8 — Микола") in their day view.
-                if crm_calendar_id:
-                    try:
-                        from app.services.crm_calendar import create_calendar_event as _crm_create_ev
-                        ts.google_event_id = _crm_create_ev(
-                            calendar_id=crm_calendar_id,
-                            client_name=crm_client_obj.name,
-                            alias_code=crm_client_obj.alias_code,
-                            session_date=session_date,
-                            duration_minutes=data.duration,
-                        )
-                    except Exception as e:
-                        logger.warning(f"CRM GCal push failed for recurring {d}: {e}")
-                session.add(ts)
-
+        pricer.claim(booking)
+        new_bookings.append(booking)
         total_cost += quote.final_price
         created_bookings.append(str(booking.id))
 
-    session.commit()
+    session.add(booking_owner)
+    series_booking.insert(session, new_bookings)
+
+    # Auto-create the matching CRM TherapySession for every booking if the
+    # series is linked to a client — mirrors what the CRM chessboard does on
+    # a one-off click; without it the series shows up as "Занято" tiles with
+    # no client name and no edit handle. Existing sessions at the same time
+    # are re-used, personal-calendar events go through the outbox.
+    if crm_client_obj and crm_session_group_id:
+        series_booking.link_crm_sessions(
+            session, booking_owner, crm_client_obj, new_bookings,
+            crm_session_group_id, crm_calendar_id,
+        )
 
-    # §5#2: кабинет-GCal создаём в фоне ПОСЛЕ коммита — только для реально
-    # сохранённых броней. Идемпотентно (_gcal_create_in_background пропускает
-    # брони с уже проставленным gcal_event_id), не блокирует ответ, не плодит
-    # призраков при обрыве.
-    for _bid in created_bookings:
-        background_tasks.add_task(_gcal_create_in_background, _bid, booking_owner.name)
+    # §5#2: кабинет-GCal — через outbox в той же транзакции, что и брони:
+    # события появятся только для реально сохранённых броней, ответ не ждёт
+    # Google. Вся серия — одно событие outbox и один batch-запрос на календарь
+    # (services/gcal_writer) вместо N последовательных insert.
+    if created_bookings:
+        outbox.enqueue(session, "gcal.create_many", {
+            "booking_ids": created_bookings, "user_name": booking_owner.name,
+        }, key=f"gcal-create-series:{recurring_group_id}")
+    session.commit()
 
     # ── Admin chat alert: new series ──
     try:
@@ -2103,12 +1921,7 @@ def get_recurring_groups(
             select(TherapistClient.id).where(TherapistClient.specialist_id == str(current_user.id))
         ).all()]
 
-        prior_emails: set[str] = set()
-        for entry in (current_user.comment_history or []):
-            if isinstance(entry, dict) and entry.get("type") == "email_change":
-                old = (entry.get("old_email") or "").strip().lower()
-                if old:
-                    prior_emails.add(old)
+        prior_emails = user_history.prior_emails(session, current_user.id)
         email_lc = (current_user.email or "").strip().lower()
         candidate_emails = list(prior_emails | {email_lc}) if email_lc else list(prior_emails)
 
@@ -2189,6 +2002,7 @@ def get_recurring_groups(
 def extend_recurring_series(
     group_id: str,
     payload: dict = Body(...),
+    dry_run: bool = Query(False, description="Preview the new dates and conflicts without saving"),
     session: Session = Depends(deps.get_session),
     current_user: User = Depends(deps.get_current_user),
 ) -> Any:
@@ -2200,6 +2014,10 @@ def extend_recurring_series(
     two booking dates' interval (same logic as `recurring-groups`),
     then walk forward N steps from the latest date and create the new
     bookings under the SAME recurring_group_id.
+
+    Planned and applied through services/series_mutation (one occupancy
+    read, one INSERT); ``dry_run`` returns the plan — new dates, conflicts,
+    the cost of the new weeks — instead of a 409 or a write.
     """
     # Расширение серии: по КОЛИЧЕСТВУ (add_occurrences) ЛИБО по ДИАПАЗОНУ
     # (until_date — добавлять сессии до указанной даты включительно).
@@ -2268,29 +2086,20 @@ def extend_recurring_series(
     template = next((b for b in reversed(existing) if b.status == "confirmed"), existing[-1])
     booking_owner = _resolve_booking_owner(session, template)
 
-    # Conflict check first — atomic create.
-    conflicts: list[dict] = []
-    for d in new_dates:
-        available, reason = check_availability(
-            session=session,
-            resource_id=template.resource_id,
-            date=d,
-            start_time=template.start_time,
-            duration=template.duration,
-            requester_user_uuid=template.user_uuid,
-        )
-        if not available:
-            conflicts.append({
-                "date": d.strftime("%Y-%m-%d"),
-                "day": d.strftime("%A"),
-                "reason": reason,
-            })
-    if conflicts:
+    # Conflict check first — atomic create. The new days stay locked until
+    # the commit below.
+    plan = series_mutation.plan_extend(session, group_id, template, new_dates)
+    if dry_run:
+        return {"ok": True, "dry_run": True, "recurring_group_id": group_id, "plan": plan.preview()}
+    if plan.conflicts:
         raise HTTPException(
             status_code=409,
             detail={
-                "message": f"Конфликт в {len(conflicts)} из {len(new_dates)} дат",
-                "conflicts": conflicts,
+                "message": f"Конфликт в {len(plan.conflicts)} из {len(new_dates)} дат",
+                "conflicts": [
+                    {"date": c.date.strftime("%Y-%m-%d"), "day": c.date.strftime("%A"), "reason": c.reason}
+                    for c in plan.conflicts
+                ],
             },
         )
 
@@ -2308,6 +2117,7 @@ def extend_recurring_series(
             # Reuse the session-group of an existing linked session if there
             # is one, else mint a fresh group id.
             from app.models.therapy_session import TherapySession as _TS0
+            from uuid import uuid4 as gen_uuid4
             _linked = session.exec(
                 select(_TS0)
                 .where(_TS0.client_id == str(ext_crm_client.id))
@@ -2319,99 +2129,15 @@ def extend_recurring_series(
         else:
             ext_crm_client = None  # other specialist's client — don't touch
 
-    # Create
-    created = 0
-    total_cost = 0.0
-    for d in new_dates:
-        new_booking = Booking(
-            resource_id=template.resource_id,
-            location_id=template.location_id,
-            date=d,
-            start_time=template.start_time,
-            duration=template.duration,
-            status="confirmed",
-            final_price=template.final_price,
-            base_price=template.base_price,
-            applied_rule=template.applied_rule,
-            discount_amount=template.discount_amount,
-            discount_percent=template.discount_percent,
-            hours_deducted=template.hours_deducted if template.payment_method == "subscription" else None,
-            payment_method=template.payment_method,
-            format=template.format,
-            extras=template.extras or [],
-            user_id=template.user_id,
-            user_uuid=template.user_uuid,
-            crm_client_id=template.crm_client_id,
-            recurring_group_id=group_id,
-        )
-        session.add(new_booking)
-        session.flush()
-        try:
-            ev = gcal_service.create_event(new_booking, user_name=booking_owner.name if booking_owner else "")
-            if ev:
-                new_booking.gcal_event_id = ev
-                session.add(new_booking)
-        except Exception as e:
-            logger.warning(f"GCal sync failed for extend {d}: {e}")
-
-        # CRM session find-or-create + link (mirrors the recurring-create path)
-        if ext_crm_client and ext_session_group_id:
-            try:
-                from app.models.therapy_session import TherapySession as _TS
-                from app.services.crm_calendar import tbilisi_naive_to_utc_naive
-                from datetime import timedelta as _td_ext
-                h, m = map(int, template.start_time.split(":"))
-                tb_dt = d.replace(hour=h, minute=m, second=0, microsecond=0)
-                session_date = tbilisi_naive_to_utc_naive(tb_dt)
-                day_start = tbilisi_naive_to_utc_naive(
-                    d.replace(hour=0, minute=0, second=0, microsecond=0))
-                day_end = day_start + _td_ext(days=1)
-                same_day = session.exec(
-                    select(_TS)
-                    .where(_TS.client_id == str(ext_crm_client.id))
-                    .where(_TS.specialist_id == str(booking_owner.id))
-                    .where(_TS.date >= day_start)
-                    .where(_TS.date < day_end)
-                    .where(_TS.status.not_in(("CANCELLED_CLIENT", "CANCELLED_THERAPIST")))  # type: ignore
-                ).all()
-                target_h = (session_date.hour, session_date.minute)
-                existing_ts = next(
-                    (c for c in same_day if (c.date.hour, c.date.minute) == target_h),
-                    None,
-                )
-                if existing_ts:
-                    existing_ts.booking_id = str(new_booking.id)
-                    existing_ts.is_booked = True
-                    if existing_ts.recurring_group_id is None:
-                        existing_ts.recurring_group_id = ext_session_group_id
-                    existing_ts.updated_at = datetime.now()
-                    session.add(existing_ts)
-                else:
-                    session.add(_TS(
-                        client_id=str(ext_crm_client.id),
-                        specialist_id=str(booking_owner.id),
-                        date=session_date,
-                        duration_minutes=template.duration,
-                        status="PLANNED",
-                        price=ext_crm_client.base_price,
-                        currency=ext_crm_client.currency,
-                        account=ext_crm_client.default_account,
-                        is_booked=True,
-                        booking_id=str(new_booking.id),
-                        recurring_group_id=ext_session_group_id,
-                    ))
-            except Exception as e:
-                logger.warning(f"[extend] CRM session link failed for {d}: {e}")
-
-        created += 1
-        total_cost += new_booking.final_price
-
+    created = series_mutation.apply_extend(
+        session, plan, template, booking_owner, ext_crm_client, ext_session_group_id,
+    )
     session.commit()
 
     return {
         "ok": True,
-        "created": created,
-        "total_cost": round(total_cost, 2),
+        "created": len(created),
+        "total_cost": round(sum(b.final_price or 0 for b in created), 2),
         "recurring_group_id": group_id,
     }
 
@@ -2425,8 +2151,8 @@ def dismiss_series_end_reminder(
     """Acknowledge the "series ending soon" reminder so we stop pinging.
 
     The series-end Telegram reminder fires at thresholds 3/2/1 future
-    bookings. The dedup marker lives in user.crm_data['series_reminders']
-    as {group_id: last_notified_count}. We mark the user's intent to let
+    bookings. The dedup marker is a SeriesReminderMark per (owner, group)
+    holding the last notified count. We mark the user's intent to let
     the series end naturally by setting the marker to 1 — the cron's
     guard `future_count >= last_threshold` then suppresses all further
     pings (any future_count ≥ 1 stops the ping).
@@ -2448,12 +2174,7 @@ def dismiss_series_end_reminder(
     if not owner:
         raise HTTPException(404, "Владелец серии не найден")
 
-    crm_data = dict(owner.crm_data or {})
-    marks = dict(crm_data.get("series_reminders") or {})
-    marks[group_id] = 1
-    crm_data["series_reminders"] = marks
-    owner.crm_data = crm_data
-    session.add(owner)
+    user_history.set_series_mark(session, owner.id, group_id, 1)
     session.commit()
     return {"ok": True, "recurring_group_id": group_id}
 
@@ -2472,6 +2193,7 @@ def cancel_recurring_bookings(
             "scope (date >= now)."
         ),
     ),
+    dry_run: bool = Query(False, description="Preview the plan (refunds, rows) without saving"),
     session: Session = Depends(deps.get_session),
     current_user: User = Depends(deps.get_current_user),
 ) -> Any:
@@ -2485,6 +2207,10 @@ def cancel_recurring_bookings(
       every earlier (still-future-of-today) sibling got cancelled too,
       which from his POV looked like "the past got deleted".
     - omitted → "every future booking" (legacy fallback for old clients).
+
+    The whole series goes through services/series_mutation: planned in
+    memory, then applied in one transaction. ``dry_run`` returns the plan
+    (what gets cancelled, refunds per occurrence and in total) instead.
     """
     if from_booking_id:
         anchor = session.get(Booking, from_booking_id)
@@ -2498,13 +2224,16 @@ def cancel_recurring_bookings(
     else:
         cutoff = datetime.now()
 
-    bookings = session.exec(
-        select(Booking).where(
-            Booking.recurring_group_id == group_id,
-            Booking.status == "confirmed",
-            Booking.date >= cutoff,
-        )
-    ).all()
+    stmt = select(Booking).where(
+        Booking.recurring_group_id == group_id,
+        Booking.status == "confirmed",
+        Booking.date >= cutoff,
+    ).order_by(Booking.date)
+    if not dry_run:
+        # Row locks against a parallel cancel of the same series refunding
+        # twice — same as single-cancel.
+        stmt = stmt.with_for_update()
+    bookings = session.exec(stmt).all()
 
     if not bookings:
         raise HTTPException(404, "No future bookings found in this group")
@@ -2539,75 +2268,14 @@ def cancel_recurring_bookings(
                     ),
                 )
 
-    from app.models.therapy_session import TherapySession as _TS
-    from app.services.consecutive_pricing import recompute_user_chains_for_day
-
-    cancelled = 0
-    # Collect (owner, resource, day) tuples to recompute consecutive chains
-    # once per group after the loop — same effect as single-cancel's per-row
-    # recompute, but de-duplicated so a series in one room/day runs it once.
-    recompute_targets: dict = {}
-    for b in bookings:
-        # Refund via shared helper (handles balance + subscription)
-        booking_owner = _resolve_booking_owner(session, b)
-        if booking_owner:
-            _refund_booking_to_owner(session, b, booking_owner)
-
-        # GCal delete
-        if b.gcal_event_id:
-            try:
-                gcal_service.delete_event(b.gcal_event_id, b.resource_id)
-            except Exception as e:
-                logger.warning(
-                    f"[GCal Series cancel] delete_event failed for "
-                    f"booking={b.id} event={b.gcal_event_id}: {e}"
-                )
-
-        b.status = "cancelled"
-        b.cancellation_reason = "Series cancelled"
-        b.cancelled_by = current_user.email
-        session.add(b)
-
-        # Detach any CRM session relying on this cabinet booking — otherwise
-        # the session keeps a stale "КАБ" badge + is_booked flag pointing at a
-        # cancelled booking, and its GCal event is never cleaned up. Mirrors
-        # the single-cancel detach.
-        linked_sessions = session.exec(
-            select(_TS).where(_TS.booking_id == str(b.id))
-        ).all()
-        for ts in linked_sessions:
-            ts.booking_id = None
-            ts.is_booked = False
-            ts.updated_at = datetime.now()
-            session.add(ts)
-
-        # Stage a consecutive-chain recompute for balance bookings (subscription
-        # bookings don't earn the consecutive-hours discount).
-        if booking_owner and b.payment_method == "balance":
-            recompute_targets[(str(booking_owner.id), b.resource_id, b.date)] = (
-                booking_owner,
-                b.resource_id,
-                b.date,
-            )
-
-        cancelled += 1
-
-    # Recompute consecutive-hours chains once per (owner, resource, day) — the
-    # cancelled occurrences may have broken chains, dropping tier discounts.
-    for owner_obj, resource_id, day in recompute_targets.values():
-        try:
-            recompute_user_chains_for_day(
-                session,
-                owner_obj,
-                resource_id,
-                day,
-                actor_id=str(current_user.id),
-                actor_role=current_user.role,
-                reason="cancel_series",
-            )
-        except Exception:
-            logger.exception("[consecutive] recompute on series-cancel failed")
+    owners = series_mutation.load_owners(session, bookings)
+    plan = series_mutation.plan_cancel(group_id, bookings, owners)
+    if dry_run:
+        return {"ok": True, "dry_run": True, "group_id": group_id, "plan": plan.preview()}
 
+    # Refunds, CRM-session detach, consecutive-chain recompute, one GCal
+    # delete batch, one waitlist event and one admin alert for the series.
+    cancelled = series_mutation.apply_cancel(session, plan, bookings, owners, current_user)
     session.commit()
 
     return {"ok": True, "cancelled": cancelled, "group_id": group_id}
@@ -2618,7 +2286,6 @@ def cancel_recurring_bookings(
 @router.delete("/{booking_id}", response_model=BookingRead)
 def cancel_booking(
     booking_id: str,
-    background_tasks: BackgroundTasks,
     session: Session = Depends(deps.get_session),
     current_user: User = Depends(deps.get_current_user),
     # Excel #66 — admin-only cancellation policy override.
@@ -2690,13 +2357,13 @@ def cancel_booking(
         )
 
     # ── Google Calendar Sync (Delete) ──
-    # Scheduled, not awaited: we hold a row lock on the booking here (see the
-    # FOR UPDATE above), and a synchronous Google round-trip would keep it —
+    # Via the outbox, not awaited: we hold a row lock on the booking here (see
+    # the FOR UPDATE above), and a synchronous Google round-trip would keep it —
     # along with a DB connection and a threadpool slot — for seconds.
     if booking.gcal_event_id:
-        background_tasks.add_task(
-            _gcal_delete_in_background, booking.gcal_event_id, booking.resource_id
-        )
+        outbox.enqueue(session, "gcal.delete", {
+            "event_id": booking.gcal_event_id, "resource_id": booking.resource_id,
+        }, key=f"gcal-delete:{booking.gcal_event_id}")
         booking.gcal_event_id = None
 
     # ── Refund to booking OWNER (not current_user!) ──
@@ -2737,37 +2404,70 @@ def cancel_booking(
         ts.updated_at = datetime.now()
         session.add(ts)
 
-    session.add(booking)
-    session.commit()
-    session.refresh(booking)
-
-    # Consecutive-hours: cancelled booking may have broken a chain.
-    # Recompute every chain the OWNER has on this (resource, day) — sub-
-    # chains around the gap will lose their tier discount and the owner's
-    # balance is debited the difference (with audit row).
-    if booking_owner and booking.payment_method == "balance":
-        try:
-            from app.services.consecutive_pricing import recompute_user_chains_for_day
-            recompute_user_chains_for_day(
-                session,
-                booking_owner,
-                booking.resource_id,
-                booking.date,
-                actor_id=str(current_user.id),
-                actor_role=current_user.role,
-                reason="cancel_booking",
-            )
-        except Exception:
-            logger.exception("[consecutive] recompute on cancel failed")
+    # ── Side effects: recorded with the cancellation, run after commit ──
+    # (services/outbox). Telegram used to be called right here, inline, and
+    # the waitlist fan-out messaged every waiting user before the response.
+    outbox.enqueue(session, "waitlist.freed_slot", {"booking_id": str(booking.id)},
+                   key=f"waitlist:cancel:{booking.id}")
 
-    # ── Waitlist: notify anyone waiting on this freed slot ──
+    resource_name = booking.resource_id
+    location_name: Optional[str] = None
     try:
-        from app.services.waitlist_notify import notify_waitlist_for_freed_slot
-        notify_waitlist_for_freed_slot(session, booking)
+        from app.models.resource import Resource as ResModel
+        from app.models.location import Location as LocModel
+        res_obj = session.get(ResModel, booking.resource_id)
+        if res_obj:
+            resource_name = res_obj.name or booking.resource_id
+        loc_obj = session.get(LocModel, (res_obj.location_id if res_obj and res_obj.location_id else booking.location_id))
+        if loc_obj:
+            location_name = loc_obj.name
     except Exception:
-        logger.exception("Failed to notify waitlist on cancellation")
+        pass
 
-    # ── Audit logging ──
+    # ── Telegram notification to the booking owner (Excel #58) ──
+    if booking_owner and booking_owner.telegram_id:
+        outbox.enqueue(session, "telegram.send_booking_cancelled", dict(
+            chat_id=str(booking_owner.telegram_id),
+            resource_name=resource_name,
+            location_name=location_name,
+            date=booking.date,
+            start_time=booking.start_time,
+            refund_percent=applied_refund,
+            reason=reason,
+            booking_id=str(booking.id),
+        ), key=f"tg-booking-cancelled:{booking.id}")
+
+    # ── Admin chat alert ──
+    date_label = booking.date.strftime("%d.%m.%Y")
+    refund_pct = int(round(applied_refund * 100))
+    # Surface WHO cancelled — admin team needs to tell apart "client
+    # cancelled" from "admin cancelled" at a glance. The 24h policy is
+    # enforced server-side (clients can't self-cancel < 24h), but the
+    # alert was previously silent on the actor, which made admins
+    # double-check every late-cancellation in the DB.
+    is_self_cancel = (
+        booking_owner is not None
+        and current_user.id == booking_owner.id
+    )
+    if is_self_cancel:
+        who = f"клиент сам ({current_user.name or current_user.email})"
+    elif current_user.role in ADMIN_ROLES:
+        who = f"админ ({current_user.name or current_user.email})"
+    else:
+        who = current_user.name or current_user.email
+    outbox.enqueue(session, "telegram.send_admin_event", dict(
+        event="booking_cancelled",
+        fields={
+            "Арендатор":   (booking_owner.name or booking_owner.email) if booking_owner else (booking.user_id or "—"),
+            "Кто отменил": who,
+            "Когда":       f"{date_label} · {booking.start_time}",
+            "Кабинет":     f"{resource_name} · {location_name or booking.location_id}",
+            "Возврат":     f"{refund_pct}%",
+            "Причина":     (reason.strip() if reason else None),
+        },
+    ), key=f"tg-admin:booking_cancelled:{booking.id}")
+
+    # ── Audit logging ── (same transaction as the cancellation)
     timeline_service.log_event(
         session=session,
         actor_id=current_user.id,
@@ -2783,77 +2483,31 @@ def cancel_booking(
             "admin_reason": reason,
             **refund_meta,
         },
+        commit=False,
     )
 
-    # ── Telegram notification to the booking owner (Excel #58) ──
-    # Non-blocking — failure here must never break the cancel flow.
-    try:
-        if booking_owner and booking_owner.telegram_id:
-            resource_name = booking.resource_id
-            location_name: Optional[str] = None
-            try:
-                from app.models.resource import Resource as ResModel
-                from app.models.location import Location as LocModel
-                res_obj = session.get(ResModel, booking.resource_id)
-                if res_obj:
-                    resource_name = res_obj.name or booking.resource_id
-                    if res_obj.location_id:
-                        loc_obj = session.get(LocModel, res_obj.location_id)
-                        if loc_obj:
-                            location_name = loc_obj.name
-            except Exception:
-                pass
-            telegram_service.send_booking_cancelled(
-                chat_id=str(booking_owner.telegram_id),
-                resource_name=resource_name,
-                location_name=location_name,
-                date=booking.date,
-                start_time=booking.start_time,
-                refund_percent=applied_refund,
-                reason=reason,
-                booking_id=str(booking.id),
-            )
-    except Exception as e:
-        logger.warning(f"[Booking cancelled] Telegram notification failed: {e}")
+    session.add(booking)
+    session.commit()
+    session.refresh(booking)
 
-    # ── Admin chat alert ──
-    try:
-        from app.models.resource import Resource as ResModel
-        from app.models.location import Location as LocModel
-        res_obj = session.get(ResModel, booking.resource_id)
-        loc_obj = session.get(LocModel, booking.location_id)
-        res_name = res_obj.name if res_obj else booking.resource_id
-        loc_name = loc_obj.name if loc_obj else booking.location_id
-        date_label = booking.date.strftime("%d.%m.%Y")
-        refund_pct = int(round(applied_refund * 100))
-        # Surface WHO cancelled — admin team needs to tell apart "client
-        # cancelled" from "admin cancelled" at a glance. The 24h policy is
-        # enforced server-side (clients can't self-cancel < 24h), but the
-        # alert was previously silent on the actor, which made admins
-        # double-check every late-cancellation in the DB.
-        is_self_cancel = (
-            booking_owner is not None
-            and current_user.id == booking_owner.id
-        )
-        if is_self_cancel:
-            who = f"клиент сам ({current_user.name or current_user.email})"
-        elif current_user.role in ADMIN_ROLES:
-            who = f"админ ({current_user.name or current_user.email})"
-        else:
-            who = current_user.name or current_user.email
-        telegram_service.send_admin_event(
-            event="booking_cancelled",
-            fields={
-                "Арендатор":   (booking_owner.name or booking_owner.email) if booking_owner else (booking.user_id or "—"),
-                "Кто отменил": who,
-                "Когда":       f"{date_label} · {booking.start_time}",
-                "Кабинет":     f"{res_name} · {loc_name}",
-                "Возврат":     f"{refund_pct}%",
-                "Причина":     (reason.strip() if reason else None),
-            },
-        )
-    except Exception as e:
-        logger.warning(f"[Admin TG alert / cancel] Non-blocking failure: {e}")
+    # Consecutive-hours: cancelled booking may have broken a chain.
+    # Recompute every chain the OWNER has on this (resource, day) — sub-
+    # chains around the gap will lose their tier discount and the owner's
+    # balance is debited the difference (with audit row).
+    if booking_owner and booking.payment_method == "balance":
+        try:
+            from app.services.consecutive_pricing import recompute_user_chains_for_day
+            recompute_user_chains_for_day(
+                session,
+                booking_owner,
+                booking.resource_id,
+                booking.date,
+                actor_id=str(current_user.id),
+                actor_role=current_user.role,
+                reason="cancel_booking",
+            )
+        except Exception:
+            logger.exception("[consecutive] recompute on cancel failed")
 
     return booking
 
@@ -2874,7 +2528,6 @@ class RescheduleRequest(PydanticBaseModel):
 def reschedule_booking(
     booking_id: str,
     data: RescheduleRequest,
-    background_tasks: BackgroundTasks,
     session: Session = Depends(deps.get_session),
     current_user: User = Depends(deps.get_current_user),
 ) -> Any:
@@ -2940,6 +2593,10 @@ def reschedule_booking(
         exclude_booking_id=str(booking.id),
         requester_user_uuid=booking.user_uuid,
         lock_rows=True,  # serialize concurrent reschedules into the same slot
+        # …and the day it leaves, in the same sorted batch: the occupancy
+        # refresh at commit locks both, and a second lock taken then would
+        # deadlock against an opposite move.
+        lock_also=[(booking.resource_id, booking.date)],
     )
     if not available:
         raise HTTPException(
@@ -3079,73 +2736,52 @@ def reschedule_booking(
     booking.duration = new_duration
     booking.updated_at = datetime.now()
 
-    # GCal recreate runs in a BackgroundTask. Same reasoning as POST
+    # GCal recreate goes through the outbox. Same reasoning as POST
     # /bookings — a slow Google response used to block the whole request
     # past axios's 30 s timeout, so the user saw "не удалось перенести"
     # while the booking had already moved server-side. We snapshot the
-    # old event ID + old resource here so the bg task can drop the old
+    # old event ID + old resource here so the worker can drop the old
     # event before creating the new one (the row's gcal_event_id is
-    # cleared in advance, the bg task will repopulate on success).
+    # cleared in advance, the worker repopulates it on success).
     old_gcal_event = booking.gcal_event_id
     if booking.gcal_event_id:
         booking.gcal_event_id = None
+        outbox.enqueue(session, "gcal.recreate", {
+            "booking_id": str(booking.id),
+            "user_name": current_user.name or "",
+            "old_event_id": old_gcal_event,
+            "old_resource_id": old_resource,
+        }, key=f"gcal-recreate:{old_gcal_event}")
 
-    session.add(booking)
-    session.commit()
-    session.refresh(booking)
-
-    # Auto-sync linked CRM session — keep its time in lock-step with the
-    # booking it's attached to. See `_sync_linked_session_to_booking`.
-    _sync_linked_session_to_booking(session, booking)
-    session.commit()
-
-    if old_gcal_event:
-        background_tasks.add_task(
-            _gcal_recreate_in_background,
-            str(booking.id),
-            current_user.name or "",
-            old_gcal_event,
-            old_resource,
-        )
-
-    # ── Waitlist: notify anyone waiting on the OLD (now freed) slot ──
     # Skip if the slot didn't really move (same day + time + resource edge case).
     slot_moved = (old_resource != new_resource) or (old_date != new_date) or (old_time != data.new_start_time)
     if slot_moved:
-        try:
-            from app.services.waitlist_notify import notify_waitlist_for_freed_slot
-            # Build a proxy booking representing the old (freed) slot
-            from copy import copy as _copy
-            freed = _copy(booking)
-            freed.resource_id = old_resource
-            freed.date = old_date
-            freed.start_time = old_time
-            notify_waitlist_for_freed_slot(session, freed)
-        except Exception:
-            logger.exception("Failed to notify waitlist on reschedule")
-
-    # ── Уведомить КЛИЕНТА о переносе (Telegram) ──
-    # owner 2026-07-17 (admin Лиза): бот молчал при переносе. Метод
-    # send_booking_rescheduled уже существовал — его просто не вызывали отсюда.
-    if slot_moved:
-        try:
-            _notify_user = booking_owner or _resolve_booking_owner(session, booking)
-            if _notify_user and _notify_user.telegram_id:
-                from app.models.resource import Resource as _ResN
-                _new_res = session.get(_ResN, new_resource)
-                background_tasks.add_task(
-                    telegram_service.send_booking_rescheduled,
-                    chat_id=str(_notify_user.telegram_id),
-                    resource_name=(_new_res.name if _new_res else new_resource),
-                    old_date=old_date,
-                    old_start_time=old_time,
-                    new_date=new_date,
-                    new_start_time=data.new_start_time,
-                    duration_minutes=booking.duration,
-                    booking_id=str(booking.id),
-                )
-        except Exception:
-            logger.warning("[reschedule notify] non-blocking failure", exc_info=True)
+        # ── Waitlist: notify anyone waiting on the OLD (now freed) slot ──
+        outbox.enqueue(session, "waitlist.freed_slot", {
+            "booking_id": str(booking.id),
+            "resource_id": old_resource,
+            "date": old_date,
+            "start_time": old_time,
+        }, key=f"waitlist:reschedule:{booking.id}:{old_resource}:{old_date.isoformat()}:{old_time}")
+
+        # ── Уведомить КЛИЕНТА о переносе (Telegram) ──
+        # owner 2026-07-17 (admin Лиза): бот молчал при переносе. Раньше здесь
+        # было два вызова (фоновый + синхронный ниже по коду) — клиент получал
+        # сообщение дважды. Один ключ идемпотентности = одно сообщение.
+        _notify_user = booking_owner or _resolve_booking_owner(session, booking)
+        if _notify_user and _notify_user.telegram_id:
+            from app.models.resource import Resource as _ResN
+            _new_res = session.get(_ResN, new_resource)
+            outbox.enqueue(session, "telegram.send_booking_rescheduled", dict(
+                chat_id=str(_notify_user.telegram_id),
+                resource_name=(_new_res.name if _new_res else new_resource),
+                old_date=old_date,
+                old_start_time=old_time,
+                new_date=new_date,
+                new_start_time=data.new_start_time,
+                duration_minutes=booking.duration,
+                booking_id=str(booking.id),
+            ), key=f"tg-rescheduled:{booking.id}:{data.new_date}:{data.new_start_time}:{new_resource}")
 
     timeline_service.log_event(
         session=session,
@@ -3167,39 +2803,21 @@ def reschedule_booking(
             "new_price": new_price if room_changed else None,
             "price_diff": price_diff if room_changed else None,
         },
+        commit=False,
     )
 
     # Reset reminder_sent_at so the T-2h reminder fires for the new slot
     # if it's still ≥2h away.
     booking.reminder_sent_at = None
+
     session.add(booking)
     session.commit()
+    session.refresh(booking)
 
-    # ── Telegram notification on reschedule (owner + admin 2026-05-29).
-    # Previously this code lived but was unreachable in the series
-    # endpoint; the single-reschedule path never had it at all.
-    try:
-        notify_owner = _resolve_booking_owner(session, booking)
-        if notify_owner and notify_owner.telegram_id:
-            resource_name = booking.resource_id
-            try:
-                res_obj = session.get(Resource, booking.resource_id)
-                if res_obj:
-                    resource_name = res_obj.name or booking.resource_id
-            except Exception:
-                pass
-            telegram_service.send_booking_rescheduled(
-                chat_id=str(notify_owner.telegram_id),
-                resource_name=resource_name,
-                old_date=old_date,
-                old_start_time=old_time,
-                new_date=booking.date,
-                new_start_time=booking.start_time,
-                duration_minutes=booking.duration,
-                booking_id=str(booking.id),
-            )
-    except Exception as e:
-        logger.warning(f"[Booking reschedule] TG notification failed: {e}")
+    # Auto-sync linked CRM session — keep its time in lock-step with the
+    # booking it's attached to. See `_sync_linked_session_to_booking`.
+    _sync_linked_session_to_booking(session, booking)
+    session.commit()
 
     if dropped_extras:
         logger.info(
@@ -3381,16 +2999,11 @@ def trim_booking(
         )
         removed_hours = round(orig_hours - new_hours, 4)
         # Refund the removed hours to the pool: bump remaining_hours, drop
-        # used_hours (floored at 0) — subscription_pool keeps both dialects.
+        # used_hours (floored at 0).
         if not pending and removed_hours > 0 and owner and owner.subscription:
-            rem = subscription_pool.get_float(owner.subscription, "remaining_hours")
-            used = subscription_pool.get_float(owner.subscription, "used_hours")
-            owner.subscription = subscription_pool.update(
-                owner.subscription,
-                remaining_hours=rem + removed_hours,
-                used_hours=max(0.0, used - removed_hours),
-            )
-            session.add(owner)
+            subscription_pool.refund(session, owner, removed_hours, "trim_refund",
+                                     description="Возврат часов за вырезанное время",
+                                     ref_type="booking", ref_id=str(booking.id), actor=current_user)
         # Peak-hour surcharge on a subscription booking is charged to BALANCE at
         # creation (final_price = subscription_peak_debt). If the trimmed slice
         # included peak hours, that money must be refunded too — hours alone
@@ -3581,7 +3194,7 @@ def trim_booking(
 def reschedule_booking_series(
     booking_id: str,
     data: RescheduleRequest,
-    background_tasks: BackgroundTasks,
+    dry_run: bool = Query(False, description="Preview which siblings move and which are skipped"),
     session: Session = Depends(deps.get_session),
     current_user: User = Depends(deps.get_current_user),
 ) -> Any:
@@ -3598,6 +3211,11 @@ def reschedule_booking_series(
     back in ``skipped`` so the admin can resolve manually. The anchor
     itself MUST succeed; if it can't be rescheduled, the whole call
     aborts before any sibling is touched.
+
+    Siblings are planned and moved through services/series_mutation: one
+    occupancy read for all of them, one commit, one GCal and one waitlist
+    outbox event. ``dry_run`` returns that plan (anchor included) without
+    moving anything.
     """
     try:
         b_uuid = UUID(booking_id)
@@ -3621,145 +3239,78 @@ def reschedule_booking_series(
     # AFTER the anchor is updated (its own date may have moved).
     old_anchor_date = booking.date
     old_anchor_resource = booking.resource_id
+    group_id = booking.recurring_group_id
+    new_resource = data.new_resource_id or old_anchor_resource
+
+    def _siblings() -> list[Booking]:
+        return session.exec(
+            select(Booking).where(
+                Booking.recurring_group_id == group_id,
+                Booking.status == "confirmed",
+                Booking.id != b_uuid,
+                Booking.date > old_anchor_date,
+            ).order_by(Booking.date)
+        ).all()
+
+    if dry_run:
+        try:
+            new_date = datetime.strptime(data.new_date, "%Y-%m-%d")
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
+        lead = series_mutation.Step(
+            action="move", date=new_date, start_time=data.new_start_time, resource_id=new_resource,
+            duration=data.new_duration or booking.duration, booking_id=str(booking.id),
+            from_start_time=booking.start_time, from_resource_id=booking.resource_id,
+        )
+        plan = series_mutation.plan_reschedule(
+            session, group_id, _siblings(), new_resource, data.new_start_time, lead=lead, is_past=_is_past,
+        )
+        session.rollback()  # release the day locks — nothing is written
+        return {"ok": True, "dry_run": True, "plan": plan.preview()}
 
     # 1) Reschedule the anchor itself by reusing the per-booking endpoint
-    #    logic. Easiest way without splitting the endpoint into a helper
-    #    today: call the underlying function directly. It commits, and
-    #    its GCal recreate already runs as a background task — same
-    #    background_tasks instance is shared with our siblings below.
-    anchor_after = reschedule_booking(  # type: ignore[misc]
+    #    logic (policy gates, repricing, its own GCal/waitlist/TG events).
+    #    It commits.
+    reschedule_booking(
         booking_id=booking_id,
         data=data,
-        background_tasks=background_tasks,
         session=session,
         current_user=current_user,
     )
 
-    # 2) Propagate to later siblings.
-    siblings = session.exec(
-        select(Booking).where(
-            Booking.recurring_group_id == booking.recurring_group_id,
-            Booking.status == "confirmed",
-            Booking.id != booking.id,
-            Booking.date > old_anchor_date,
-        )
-    ).all()
-
-    new_resource = data.new_resource_id or old_anchor_resource
-
-    propagated = 0
-    skipped: list[dict] = []
-    for sib in siblings:
-        # Skip rows already in the past — moving them isn't meaningful and
-        # the per-row 24h policy already blocks it on /reschedule anyway.
-        if _is_past(sib):
-            skipped.append({
-                "id": str(sib.id),
-                "date": sib.date.isoformat(),
-                "reason": "уже прошла",
-            })
-            continue
-
-        available, conflict = check_availability(
-            session=session,
-            resource_id=new_resource,
-            date=sib.date,
-            start_time=data.new_start_time,
-            duration=sib.duration,
-            exclude_booking_id=str(sib.id),
-            requester_user_uuid=sib.user_uuid,
-        )
-        if not available:
-            skipped.append({
-                "id": str(sib.id),
-                "date": sib.date.isoformat(),
-                "reason": str(conflict) if conflict else "слот занят",
-            })
-            continue
-
-        old_sib_resource = sib.resource_id
-        old_sib_time = sib.start_time
-        old_sib_event = sib.gcal_event_id
-        sib.start_time = data.new_start_time
-        sib.resource_id = new_resource
-        sib.updated_at = datetime.now()
-        # Defer GCal recreate to a background task — same as anchor.
-        # Clearing the column up-front avoids a pre-bg-task observer
-        # seeing a stale event id pointed at the old slot.
-        if sib.gcal_event_id:
-            sib.gcal_event_id = None
-        if old_sib_event:
-            background_tasks.add_task(
-                _gcal_recreate_in_background,
-                str(sib.id),
-                current_user.name or "",
-                old_sib_event,
-                old_sib_resource,
-            )
-
-        timeline_service.log_event(
-            session=session,
-            actor_id=current_user.id,
-            actor_role=current_user.role,
-            target_id=str(sib.id),
-            target_type="booking",
-            event_type="booking_rescheduled",
-            description=(
-                f"Series propagation: {old_sib_time} → {data.new_start_time}"
-                + (f" (room {old_sib_resource} → {new_resource})" if old_sib_resource != new_resource else "")
-            ),
-            metadata={
-                "anchor_id": str(booking.id),
-                "old_time": old_sib_time,
-                "new_time": data.new_start_time,
-                "old_resource": old_sib_resource,
-                "new_resource": new_resource,
-                "via": "reschedule-series",
+    # 2) Propagate to later siblings — planned against one occupancy read,
+    #    written in one transaction.
+    siblings = _siblings()
+    plan = series_mutation.plan_reschedule(
+        session, group_id, siblings, new_resource, data.new_start_time, is_past=_is_past,
+    )
+    moved = series_mutation.apply_reschedule(session, plan, siblings, current_user, str(booking.id))
+    # The owner already got the anchor's "перенесено" message from
+    # reschedule_booking (one idempotency key = one message); the admin chat
+    # gets one line for the whole series instead of nothing.
+    if moved:
+        outbox.enqueue(session, "telegram.send_admin_event", dict(
+            event="booking_series_rescheduled",
+            fields={
+                "Арендатор": booking.user_id or "—",
+                "Кто":       current_user.name or current_user.email,
+                "Время":     f"{data.new_start_time} · {new_resource}",
+                "Встреч":    f"{len(moved) + 1} (пропущено {len(plan.of('skip'))})",
             },
-        )
-
-        session.add(sib)
-        # Sync sibling's linked CRM session (if any) onto the new time.
-        # Helper is no-commit; we batch with the single commit below.
-        _sync_linked_session_to_booking(session, sib)
-        propagated += 1
-
+        ), key=f"tg-admin:booking_series_rescheduled:{booking.id}:{data.new_date}:{data.new_start_time}:{new_resource}")
     session.commit()
 
     # Re-fetch to get the final state of the anchor after both writes.
     session.refresh(booking)
 
-    # ── Telegram notification on series reschedule (owner 2026-05-29).
-    # Previously this code was a no-op (placed after the early `return`).
-    # Now moved BEFORE the return so it actually fires.
-    try:
-        notify_owner = _resolve_booking_owner(session, booking)
-        if notify_owner and notify_owner.telegram_id:
-            resource_name = booking.resource_id
-            try:
-                res_obj = session.get(Resource, booking.resource_id)
-                if res_obj:
-                    resource_name = res_obj.name or booking.resource_id
-            except Exception:
-                pass
-            telegram_service.send_booking_rescheduled(
-                chat_id=str(notify_owner.telegram_id),
-                resource_name=resource_name,
-                old_date=old_anchor_date,
-                old_start_time=booking.start_time,  # NB: anchor has already moved
-                new_date=booking.date,
-                new_start_time=booking.start_time,
-                duration_minutes=booking.duration,
-                booking_id=str(booking.id),
-            )
-    except Exception as e:
-        logger.warning(f"[Series reschedule] TG notification failed: {e}")
-
     return {
         "ok": True,
         "anchor": BookingRead.model_validate(booking, from_attributes=True),
-        "propagated": propagated,
-        "skipped": skipped,
+        "propagated": len(moved),
+        "skipped": [
+            {"id": st.booking_id, "date": st.date.isoformat(), "reason": st.reason}
+            for st in plan.of("skip")
+        ],
     }
 
 
@@ -3849,17 +3400,14 @@ def toggle_re_rent(
     booking.updated_at = datetime.now()
 
     session.add(booking)
-    session.commit()
-    session.refresh(booking)
-
     # If the booking just became re-rentable, the slot is effectively free
-    # for other users — notify anyone on the waitlist for this slot.
+    # for other users — notify anyone on the waitlist for this slot (after
+    # commit, through the outbox, like a cancellation).
     if not was_listed_before and booking.is_re_rent_listed:
-        try:
-            from app.services.waitlist_notify import notify_waitlist_for_freed_slot
-            notify_waitlist_for_freed_slot(session, booking)
-        except Exception:
-            logger.exception("Failed to notify waitlist on re-rent listing")
+        outbox.enqueue(session, "waitlist.freed_slot", {"booking_id": str(booking.id)},
+                       key=f"waitlist:re-rent:{booking.id}:{booking.updated_at.isoformat()}")
+    session.commit()
+    session.refresh(booking)
 
     # ── Admin chat alert (only on listing, not on un-listing) ──
     if not was_listed_before and booking.is_re_rent_listed:
@@ -3978,13 +3526,10 @@ def change_booking_format(
     settled_now = False
     if booking.payment_status == "paid":
         if (booking.payment_method or "").lower() == "subscription":
-            rem = subscription_pool.get_float(booking_owner.subscription, "remaining_hours")
-            used = subscription_pool.get_float(booking_owner.subscription, "used_hours")
-            booking_owner.subscription = subscription_pool.update(
-                booking_owner.subscription,
-                remaining_hours=max(0.0, rem - delta_hours),
-                used_hours=max(0.0, used + delta_hours),
-            )
+            # delta_hours знаковая: >0 — дописать часы, <0 — вернуть.
+            subscription_pool.apply_hours(session, booking_owner, -delta_hours, "format_change",
+                                          description="Пересчёт часов при смене формата брони",
+                                          ref_type="booking", ref_id=str(booking.id), actor=current_user)
         else:
             # delta_price знаковая: >0 — доплата, <0 — возврат.
             wallet.apply(session, booking_owner, -delta_price, reason="format_change",
@@ -4138,13 +3683,9 @@ def set_booking_price(
             old_hours = float(booking.hours_deducted or (booking.duration or 0) / 60.0)
             new_hours = old_hours * (new_price / old_price) if old_price > 0 else old_hours
             hours_delta = round(old_hours - new_hours, 4)
-            rem = subscription_pool.get_float(booking_owner.subscription, "remaining_hours")
-            used = subscription_pool.get_float(booking_owner.subscription, "used_hours")
-            booking_owner.subscription = subscription_pool.update(
-                booking_owner.subscription,
-                remaining_hours=rem + hours_delta,
-                used_hours=max(0.0, used - hours_delta),
-            )
+            subscription_pool.apply_hours(session, booking_owner, hours_delta, "price_change",
+                                          description="Ручное изменение цены брони админом",
+                                          ref_type="booking", ref_id=str(booking.id), actor=current_user)
             booking.hours_deducted = round(new_hours, 4)
         else:
             # delta знаковая: >0 — возврат клиенту, <0 — доплата.
@@ -4582,13 +4123,9 @@ def shorten_booking(
             target_user = session.exec(select(User).where(User.email == booking.user_id)).first()
         if target_user:
             if (booking.payment_method or "").lower() == "subscription" and refund_hours > 0:
-                rem = subscription_pool.get_float(target_user.subscription, "remaining_hours")
-                used = subscription_pool.get_float(target_user.subscription, "used_hours")
-                target_user.subscription = subscription_pool.update(
-                    target_user.subscription,
-                    remaining_hours=rem + refund_hours,
-                    used_hours=max(0.0, used - refund_hours),
-                )
+                subscription_pool.refund(session, target_user, refund_hours, "shorten_refund",
+                                         description="Возврат часов за сокращённое время брони",
+                                         ref_type="booking", ref_id=str(booking.id), actor=current_user)
             else:
                 wallet.credit(session, target_user, refund_price, reason="shorten_refund",
                               description="Возврат за сокращённое время брони",
@@ -4776,14 +4313,9 @@ def approve_booking(
     if b_owner:
         if booking.payment_method == "subscription":
             if b_owner.subscription:
-                rem = subscription_pool.get_float(b_owner.subscription, "remaining_hours")
-                used = subscription_pool.get_float(b_owner.subscription, "used_hours")
-                hrs = float(booking.hours_deducted or 0)
-                b_owner.subscription = subscription_pool.update(
-                    b_owner.subscription,
-                    remaining_hours=max(0.0, rem - hrs),
-                    used_hours=used + hrs,
-                )
+                subscription_pool.deduct(session, b_owner, float(booking.hours_deducted or 0), "booking_charge",
+                                         description="Списание часов при подтверждении брони (approve)",
+                                         ref_type="booking", ref_id=str(booking.id), actor=current_user)
         else:
             wallet.debit(session, b_owner, float(booking.final_price or 0), reason="booking_charge",
                          description="Списание при подтверждении брони (approve)",
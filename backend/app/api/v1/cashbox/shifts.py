@@ -2,7 +2,8 @@
 from typing import List, Optional
 from datetime import datetime, timedelta
 from fastapi import APIRouter, Depends, Query
-from sqlmodel import Session, select, func, col, desc
+from sqlalchemy import case, literal_column
+from sqlmodel import Session, select, func, desc
 from app.db.session import get_session
 from app.models.user import User
 from app.models.expense_category import ExpenseCategory
@@ -10,6 +11,7 @@ from app.models.cashbox_transaction import CashboxTransaction
 from app.models.shift_report import ShiftReport, ShiftReportCreate, ShiftReportRead
 from app.models.shift_open_log import ShiftOpenLog, ShiftOpenLogCreate, ShiftOpenLogRead
 from app.api.v1.cashbox import require_cashbox, require_reports
+from app.services import cash_totals
 
 router = APIRouter()
 
@@ -29,21 +31,49 @@ def _lifetime_cash(session: Session, branch: Optional[str]) -> float:
     Считая от лайфтайм-суммы, выравнивание самолечащееся: после записи
     корректировки итог кассы РАВЕН пересчитанным деньгам, всегда.
     Recon-проводки здесь НЕ исключаются — они часть этого итога.
+
+    Сумма не пересчитывается по всей истории: services/cash_totals ведёт
+    текущий остаток на каждую запись/правку/удаление проводки — одна
+    строка вместо SUM по таблице, которая растёт каждый месяц.
     """
-    inc_q = (
-        select(func.coalesce(func.sum(CashboxTransaction.amount), 0))
-        .where(CashboxTransaction.type == "income")
-        .where(CashboxTransaction.payment_method == "cash")
-    )
-    exp_q = (
-        select(func.coalesce(func.sum(CashboxTransaction.amount), 0))
-        .where(CashboxTransaction.type == "expense")
+    return cash_totals.balance(session, "cash", branch)
+
+
+def _last_close(session: Session, branch: Optional[str]) -> Optional[ShiftReport]:
+    """Last SAME-SCOPE close. Branch close → previous close of that same
+    branch. Global close → previous global close."""
+    last_query = select(ShiftReport).order_by(desc(ShiftReport.shift_end)).limit(1)
+    if branch:
+        last_query = last_query.where(ShiftReport.branch == branch)
+    else:
+        last_query = last_query.where(ShiftReport.branch.is_(None))  # type: ignore
+    return session.exec(last_query).first()
+
+
+def _window(session: Session, branch: Optional[str], shift_start: datetime) -> tuple[float, float, int]:
+    """(cash_in, cash_out, tx_count) since `shift_start` — одним запросом.
+
+    Справочное «движение за смену» (что админ увидит в разбивке).
+    Recon-проводки прошлого закрытия из окна исключаем: они уже зашиты в
+    starting_balance = actual прошлой смены, иначе тот же дельта
+    показывался бы фантомом на каждой следующей смене. Все условия идут в
+    порядке индекса ix_cashbox_method_branch_date_cat, так что окно —
+    короткий range-scan, сколько бы истории ни накопилось.
+    """
+    q = (
+        select(
+            func.coalesce(func.sum(case((CashboxTransaction.type == "income", CashboxTransaction.amount), else_=0)), 0),
+            func.coalesce(func.sum(case((CashboxTransaction.type == "expense", CashboxTransaction.amount), else_=0)), 0),
+            func.count(CashboxTransaction.id),  # type: ignore
+        )
         .where(CashboxTransaction.payment_method == "cash")
+        .where(CashboxTransaction.date >= shift_start)
+        .where(CashboxTransaction.category_id != RECON_CAT)
     )
     if branch:
-        inc_q = inc_q.where(CashboxTransaction.branch == branch)
-        exp_q = exp_q.where(CashboxTransaction.branch == branch)
-    return round(float(session.exec(inc_q).one()) - float(session.exec(exp_q).one()), 2)
+        q = q.where(CashboxTransaction.branch == branch)
+    cash_in, cash_out, tx_count = session.exec(q).one()
+    return float(cash_in), float(cash_out), int(tx_count)
 
 
 @router.post("/shifts/open", response_model=ShiftOpenLogRead)
@@ -89,56 +119,16 @@ def preview_close_shift(
     """
     now = datetime.now()
 
-    last_query = select(ShiftReport).order_by(desc(ShiftReport.shift_end)).limit(1)
-    if branch:
-        last_query = last_query.where(ShiftReport.branch == branch)
-    else:
-        last_query = last_query.where(ShiftReport.branch.is_(None))  # type: ignore
-    last_shift = session.exec(last_query).first()
-
+    last_shift = _last_close(session, branch)
     shift_start = last_shift.shift_end if last_shift else datetime.min
     starting_balance = float(last_shift.actual_balance) if last_shift else 0.0
 
-    # cash_in/cash_out — справочное «движение за смену» (что админ увидит в
-    # разбивке). Recon-проводки прошлого закрытия из окна исключаем: они уже
-    # зашиты в starting_balance = actual прошлой смены, иначе тот же дельта
-    # показывался бы фантомом на каждой следующей смене.
-    cash_in_q = (
-        select(func.coalesce(func.sum(CashboxTransaction.amount), 0))
-        .where(CashboxTransaction.type == "income")
-        .where(CashboxTransaction.payment_method == "cash")
-        .where(CashboxTransaction.date >= shift_start)
-        .where(CashboxTransaction.category_id != RECON_CAT)
-    )
-    cash_out_q = (
-        select(func.coalesce(func.sum(CashboxTransaction.amount), 0))
-        .where(CashboxTransaction.type == "expense")
-        .where(CashboxTransaction.payment_method == "cash")
-        .where(CashboxTransaction.date >= shift_start)
-        .where(CashboxTransaction.category_id != RECON_CAT)
-    )
-    if branch:
-        cash_in_q = cash_in_q.where(CashboxTransaction.branch == branch)
-        cash_out_q = cash_out_q.where(CashboxTransaction.branch == branch)
-
-    cash_in = float(session.exec(cash_in_q).one())
-    cash_out = float(session.exec(cash_out_q).one())
+    # tx_count — «столько ли операций я ожидал?» для админа.
+    cash_in, cash_out, tx_count = _window(session, branch, shift_start)
     # Эталон — итог кассы за всё время, а не арифметика окна (см. _lifetime_cash).
     expected = _lifetime_cash(session, branch)
     window_expected = round(starting_balance + cash_in - cash_out, 2)
 
-    # Count of transactions that make up this window — gives the admin a
-    # "did I expect this many?" sanity check. Same recon exclusion.
-    tx_count_q = (
-        select(func.count(CashboxTransaction.id))  # type: ignore
-        .where(CashboxTransaction.payment_method == "cash")
-        .where(CashboxTransaction.date >= shift_start)
-        .where(CashboxTransaction.category_id != RECON_CAT)
-    )
-    if branch:
-        tx_count_q = tx_count_q.where(CashboxTransaction.branch == branch)
-    tx_count = int(session.exec(tx_count_q).one())
-
     return {
         "starting_balance": round(starting_balance, 2),
         "cash_in": round(cash_in, 2),
@@ -271,40 +261,8 @@ def end_shift(
     now = datetime.now()
     branch = payload.branch
 
-    # Find the last SAME-SCOPE close as our starting point. Branch close →
-    # previous close of that same branch. Global close → previous global close.
-    last_query = select(ShiftReport).order_by(desc(ShiftReport.shift_end)).limit(1)
-    if branch:
-        last_query = last_query.where(ShiftReport.branch == branch)
-    else:
-        last_query = last_query.where(ShiftReport.branch.is_(None))  # type: ignore
-    last_shift = session.exec(last_query).first()
-
+    last_shift = _last_close(session, branch)
     shift_start = last_shift.shift_end if last_shift else datetime.min
-    starting_balance = float(last_shift.actual_balance) if last_shift else 0.0
-
-    # Движение за смену — справочные цифры для отчёта. Recon прошлого
-    # закрытия исключаем: он уже сидит в starting_balance.
-    cash_in_q = (
-        select(func.coalesce(func.sum(CashboxTransaction.amount), 0))
-        .where(CashboxTransaction.type == "income")
-        .where(CashboxTransaction.payment_method == "cash")
-        .where(CashboxTransaction.date >= shift_start)
-        .where(CashboxTransaction.category_id != RECON_CAT)
-    )
-    cash_out_q = (
-        select(func.coalesce(func.sum(CashboxTransaction.amount), 0))
-        .where(CashboxTransaction.type == "expense")
-        .where(CashboxTransaction.payment_method == "cash")
-        .where(CashboxTransaction.date >= shift_start)
-        .where(CashboxTransaction.category_id != RECON_CAT)
-    )
-    if branch:
-        cash_in_q = cash_in_q.where(CashboxTransaction.branch == branch)
-        cash_out_q = cash_out_q.where(CashboxTransaction.branch == branch)
-
-    cash_in = float(session.exec(cash_in_q).one())
-    cash_out = float(session.exec(cash_out_q).one())
 
     # Сверяемся с итогом кассы за всё время (см. _lifetime_cash), а не с
     # арифметикой окна — иначе расхождение переживает закрытие и всплывает
@@ -387,74 +345,61 @@ def get_analytics(
     except ValueError:
         dt_to = now
 
-    # All transactions in range
-    txs = session.exec(
-        select(CashboxTransaction)
-        .where(CashboxTransaction.date >= dt_from)
-        .where(CashboxTransaction.date <= dt_to)
-        .order_by(CashboxTransaction.date)
+    # Daily income/expense and the expense-by-category split are grouped in
+    # SQL — a month of operations used to be loaded row by row into Python.
+    # Anything that isn't income counts as expense, as before.
+    is_income = CashboxTransaction.type == "income"
+    if session.get_bind().dialect.name == "postgresql":
+        # Literal, not a bind param — otherwise SELECT and GROUP BY get two
+        # different placeholders and Postgres rejects the grouping.
+        day = func.date_trunc(literal_column("'day'"), CashboxTransaction.date)
+    else:
+        day = func.date(CashboxTransaction.date)
+    in_range = (CashboxTransaction.date >= dt_from, CashboxTransaction.date <= dt_to)
+
+    daily_rows = session.exec(
+        select(
+            day,
+            func.coalesce(func.sum(case((is_income, CashboxTransaction.amount), else_=0)), 0),
+            func.coalesce(func.sum(case((is_income, 0), else_=CashboxTransaction.amount)), 0),
+        )
+        .where(*in_range)
+        .group_by(day)
+        .order_by(day)
     ).all()
 
-    # Daily aggregation
-    daily: dict[str, dict] = {}
-    cat_totals: dict[str, float] = {}
+    daily_data = []
     total_income = 0.0
     total_expense = 0.0
-
-    for tx in txs:
-        day_key = tx.date.strftime("%Y-%m-%d") if isinstance(tx.date, datetime) else str(tx.date)
-        if day_key not in daily:
-            daily[day_key] = {"date": day_key, "income": 0.0, "expense": 0.0}
-
-        if tx.type == "income":
-            daily[day_key]["income"] += tx.amount
-            total_income += tx.amount
-        else:
-            daily[day_key]["expense"] += tx.amount
-            total_expense += tx.amount
-            cat_key = tx.category_id or "__uncategorized__"
-            cat_totals[cat_key] = cat_totals.get(cat_key, 0.0) + tx.amount
-
-    # Resolve category names
-    cat_ids = [k for k in cat_totals if k != "__uncategorized__"]
-    cat_names_map = {}
-    if cat_ids:
-        cats = session.exec(
-            select(ExpenseCategory).where(col(ExpenseCategory.id).in_(cat_ids))
-        ).all()
-        cat_names_map = {c.id: c.name for c in cats}
+    for d, inc, exp in daily_rows:
+        day_key = d.strftime("%Y-%m-%d") if isinstance(d, datetime) else str(d)[:10]
+        daily_data.append({"date": day_key, "income": round(float(inc), 2), "expense": round(float(exp), 2)})
+        total_income += float(inc)
+        total_expense += float(exp)
+
+    cat_rows = session.exec(
+        select(CashboxTransaction.category_id, ExpenseCategory.name, func.sum(CashboxTransaction.amount))
+        .outerjoin(ExpenseCategory, ExpenseCategory.id == CashboxTransaction.category_id)
+        .where(*in_range)
+        .where(~is_income)
+        .group_by(CashboxTransaction.category_id, ExpenseCategory.name)
+    ).all()
 
     category_breakdown = []
-    for cat_id, total in sorted(cat_totals.items(), key=lambda x: -x[1]):
-        name = cat_names_map.get(cat_id, "Без категории")
+    for _cat_id, name, total in sorted(cat_rows, key=lambda r: -float(r[2])):
+        total = float(total)
         pct = round(total / total_expense * 100, 1) if total_expense > 0 else 0
         category_breakdown.append({
-            "category_name": name,
+            "category_name": name or "Без категории",
             "total": round(total, 2),
             "percentage": pct,
         })
 
-    # Current cash balance
-    cash_in = session.exec(
-        select(func.coalesce(func.sum(CashboxTransaction.amount), 0))
-        .where(CashboxTransaction.type == "income")
-        .where(CashboxTransaction.payment_method == "cash")
-    ).one()
-    cash_out = session.exec(
-        select(func.coalesce(func.sum(CashboxTransaction.amount), 0))
-        .where(CashboxTransaction.type == "expense")
-        .where(CashboxTransaction.payment_method == "cash")
-    ).one()
-
-    daily_data = [daily[k] for k in sorted(daily.keys())]
-    for d in daily_data:
-        d["income"] = round(d["income"], 2)
-        d["expense"] = round(d["expense"], 2)
-
     return {
         "daily_data": daily_data,
         "category_breakdown": category_breakdown,
         "total_income": round(total_income, 2),
         "total_expense": round(total_expense, 2),
-        "current_balance": round(float(cash_in) - float(cash_out), 2),
+        # Current cash balance
+        "current_balance": _lifetime_cash(session, None),
     }
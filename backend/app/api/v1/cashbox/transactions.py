@@ -10,6 +10,7 @@ from app.models.cashbox_transaction import (
     CashboxTransaction, CashboxTransactionCreate, CashboxTransactionRead,
 )
 from app.api.v1.cashbox import require_cashbox
+from app.services import cash_totals
 
 router = APIRouter()
 
@@ -53,31 +54,15 @@ def get_balance(
     current_user: User = Depends(require_cashbox),
     branch: Optional[str] = Query(None),
 ):
-    """Балансы кассы по каждому счёту (опционально по филиалу)."""
-    methods = ["cash", "card_tbc", "card_bog"]
-    balances = {}
-    total = 0.0
-    for method in methods:
-        inc_q = (
-            select(func.coalesce(func.sum(CashboxTransaction.amount), 0))
-            .where(CashboxTransaction.type == "income")
-            .where(CashboxTransaction.payment_method == method)
-        )
-        exp_q = (
-            select(func.coalesce(func.sum(CashboxTransaction.amount), 0))
-            .where(CashboxTransaction.type == "expense")
-            .where(CashboxTransaction.payment_method == method)
-        )
-        if branch:
-            inc_q = inc_q.where(CashboxTransaction.branch == branch)
-            exp_q = exp_q.where(CashboxTransaction.branch == branch)
-        inc = session.exec(inc_q).one()
-        exp = session.exec(exp_q).one()
-        bal = round(float(inc) - float(exp), 2)
-        balances[method] = bal
-        total += bal
+    """Балансы кассы по каждому счёту (опционально по филиалу).
+
+    Текущие остатки ведёт services/cash_totals — одна выборка вместо шести
+    SUM по всей истории.
+    """
+    by_method = cash_totals.balances(session, branch)
+    balances = {m: by_method.get(m, 0.0) for m in ("cash", "card_tbc", "card_bog")}
     return {
-        "balance": round(total, 2),
+        "balance": round(sum(balances.values()), 2),
         "cash": balances["cash"],
         "card_tbc": balances["card_tbc"],
         "card_bog": balances["card_bog"],
@@ -408,22 +393,8 @@ def create_balance_correction(
     if new_balance is None:
         raise HTTPException(400, "new_balance обязателен")
 
-    # Calculate current balance for this payment method (optionally filtered by branch)
-    inc_q = select(func.coalesce(func.sum(CashboxTransaction.amount), 0)).where(
-        CashboxTransaction.type == "income",
-        CashboxTransaction.payment_method == payment_method,
-    )
-    exp_q = select(func.coalesce(func.sum(CashboxTransaction.amount), 0)).where(
-        CashboxTransaction.type == "expense",
-        CashboxTransaction.payment_method == payment_method,
-    )
-    if branch:
-        inc_q = inc_q.where(CashboxTransaction.branch == branch)
-        exp_q = exp_q.where(CashboxTransaction.branch == branch)
-
-    income = session.exec(inc_q).one()
-    expense = session.exec(exp_q).one()
-    current_balance = float(income) - float(expense)
+    # Current balance for this payment method (optionally filtered by branch)
+    current_balance = cash_totals.balance(session, payment_method, branch)
     diff = float(new_balance) - current_balance
 
     if abs(diff) < 0.01:
@@ -6,6 +6,7 @@ from fastapi import APIRouter, Depends, HTTPException, Body
 from sqlmodel import Session, select
 from app.api import deps
 from app.models.user import User
+from app.services import user_history
 
 logger = logging.getLogger(__name__)
 
@@ -52,14 +53,13 @@ def apply_for_crm_access(
     }
     current_user.crm_data = crm_data
 
-    # Record request in comment_history for timeline
-    comment_history = list(current_user.comment_history or [])
+    # Record the request on the client's timeline
     req_text = f"Подана заявка на CRM"
     if profession:
         req_text += f" (специализация: {profession})"
     if message:
         req_text += f" — {message}"
-    comment_history.append({
+    user_history.append(session, current_user.id, user_history.COMMENT, {
         "id": f"crm-request-{now.timestamp()}",
         "date": now.isoformat(),
         "adminName": current_user.name,
@@ -70,7 +70,6 @@ def apply_for_crm_access(
             "message": message or "",
         },
     })
-    current_user.comment_history = comment_history
 
     current_user.updated_at = now
     session.add(current_user)
@@ -289,9 +288,8 @@ def approve_crm_access(
         perms.append("psy_crm.access")
         target_user.permissions = perms
 
-    # Record in comment_history
-    comment_history = list(target_user.comment_history or [])
-    comment_history.append({
+    # Record on the client's timeline
+    user_history.append(session, target_user.id, user_history.COMMENT, {
         "id": f"crm-approve-{now.timestamp()}",
         "date": now.isoformat(),
         "adminName": current_user.name,
@@ -303,7 +301,6 @@ def approve_crm_access(
             "admin_id": str(current_user.id),
         },
     })
-    target_user.comment_history = comment_history
 
     target_user.updated_at = now
     session.add(target_user)
@@ -340,13 +337,12 @@ def reject_crm_access(
 
     target_user.crm_data = crm_data
 
-    # Record in comment_history
+    # Record on the client's timeline
     now = datetime.now()
-    comment_history = list(target_user.comment_history or [])
     reject_text = f"CRM запрос отклонён"
     if reason:
         reject_text += f": {reason}"
-    comment_history.append({
+    user_history.append(session, target_user.id, user_history.COMMENT, {
         "id": f"crm-reject-{now.timestamp()}",
         "date": now.isoformat(),
         "adminName": current_user.name,
@@ -357,7 +353,6 @@ def reject_crm_access(
             "reason": reason,
         },
     })
-    target_user.comment_history = comment_history
 
     target_user.updated_at = now
     session.add(target_user)
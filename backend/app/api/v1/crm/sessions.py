@@ -249,6 +249,7 @@ def update_session(
                     exclude_booking_id=str(bk.id),
                     requester_user_uuid=bk.user_uuid,
                     lock_rows=True,
+                    lock_also=[(bk.resource_id, bk.date)],  # the day it leaves
                 )
                 if not available:
                     raise HTTPException(
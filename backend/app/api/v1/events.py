@@ -0,0 +1,72 @@
+"""Server-Sent Events: live booking/notification changes (services/realtime).
+
+    GET /events/stream?token=<jwt>[&location_id=unbox_one]
+
+EventSource can't send an Authorization header, so the JWT may come as a
+query parameter; the header still works for clients that can set it.
+
+Events:
+    notification  {id, recipient_id, type, title, link}  — only your own
+    booking       {id, action, location_id, resource_id, date, start_time,
+                   duration, status[, old]}  — created/cancelled/approved/
+                   rescheduled/updated; filtered by `location_id` if given
+    resync        {} — events were lost (slow client, LISTEN reconnect):
+                   re-fetch whatever is on screen
+"""
+import asyncio
+from typing import Annotated, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+
+from app.api import deps
+from app.core.config import settings
+from app.services.realtime import accepts, format_sse, hub
+
+router = APIRouter()
+
+
+@router.get("/stream")
+async def stream(
+    request: Request,
+    header_token: Annotated[Optional[str], Depends(deps.optional_oauth2)] = None,
+    token: Optional[str] = Query(None),
+    location_id: Optional[str] = Query(None),
+):
+    token = header_token or token
+    if not token:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
+    # Not Depends(get_principal_async): the token may come from the query.
+    # On a cache miss it opens its own short session — a dependency session
+    # would hold its pooled connection for as long as the stream stays open.
+    user = await deps.get_principal_async(token)
+
+    sub = hub.subscribe(accepts(str(user.id), location_id))
+    heartbeat = settings.SSE_HEARTBEAT_SECONDS
+
+    async def events():
+        try:
+            # Reconnect delay for the browser's EventSource.
+            yield "retry: 5000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    e = await asyncio.wait_for(sub.queue.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    # Comment line: keeps nginx/mobile carriers from closing
+                    # an idle connection, and lets us notice a gone client.
+                    yield ": ping\n\n"
+                    continue
+                yield format_sse(e)
+        finally:
+            hub.unsubscribe(sub)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # nginx buffers proxied responses by default — events would
+            # arrive in 4 KB lumps instead of as they happen.
+            "X-Accel-Buffering": "no",
+        },
+    )
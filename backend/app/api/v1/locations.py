@@ -1,21 +1,30 @@
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlmodel import Session, select
-from app.db.session import get_session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.db.session import get_async_session, get_session
 from app.models.location import Location, LocationRead, LocationCreate, LocationUpdate
 from app.models.user import User
 from app.api.deps import get_current_superuser
+from app.core import http_cache
 
 router = APIRouter()
 
+_CACHE_TABLES = http_cache.track(Location.__tablename__)
+
 @router.get("/", response_model=List[LocationRead])
-def read_locations(
+async def read_locations(
+    request: Request,
     skip: int = 0,
     limit: int = 100,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
-    locations = session.exec(select(Location).offset(skip).limit(limit)).all()
-    return locations
+    async def build():
+        return (await session.exec(select(Location).offset(skip).limit(limit))).all()
+
+    return await http_cache.cached_json_async(
+        request, "locations", _CACHE_TABLES, build, model=List[LocationRead]
+    )
 
 @router.get("/{location_id}", response_model=LocationRead)
 def read_location(
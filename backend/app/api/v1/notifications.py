@@ -1,9 +1,10 @@
 from typing import Annotated, List
 from fastapi import APIRouter, Depends, Query
 from sqlmodel import Session, select, func
-from app.db.session import get_session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.db.session import get_async_session, get_session
 from app.api import deps
-from app.models.user import User
+from app.core.principal import Principal
 from app.models.notification import Notification, NotificationRead
 
 router = APIRouter()
@@ -12,7 +13,7 @@ router = APIRouter()
 @router.get("/", response_model=List[NotificationRead])
 def list_notifications(
     session: Annotated[Session, Depends(get_session)],
-    current_user: Annotated[User, Depends(deps.require_admin)],
+    current_user: Annotated[Principal, Depends(deps.require_admin_principal)],
     unread_only: bool = Query(False),
     skip: int = 0,
     limit: int = 50,
@@ -27,16 +28,16 @@ def list_notifications(
 
 
 @router.get("/unread-count")
-def unread_count(
-    session: Annotated[Session, Depends(get_session)],
-    current_user: Annotated[User, Depends(deps.require_admin)],
+async def unread_count(
+    session: Annotated[AsyncSession, Depends(get_async_session)],
+    current_user: Annotated[Principal, Depends(deps.require_admin_principal_async)],
 ):
-    count = session.exec(
+    count = (await session.exec(
         select(func.count(Notification.id)).where(
             Notification.recipient_id == str(current_user.id),
             Notification.is_read == False,
         )
-    ).one()
+    )).one()
     return {"count": count}
 
 
@@ -44,7 +45,7 @@ def unread_count(
 def mark_read(
     notification_id: str,
     session: Annotated[Session, Depends(get_session)],
-    current_user: Annotated[User, Depends(deps.require_admin)],
+    current_user: Annotated[Principal, Depends(deps.require_admin_principal)],
 ):
     n = session.get(Notification, notification_id)
     if not n or n.recipient_id != str(current_user.id):
@@ -58,7 +59,7 @@ def mark_read(
 @router.post("/read-all")
 def mark_all_read(
     session: Annotated[Session, Depends(get_session)],
-    current_user: Annotated[User, Depends(deps.require_admin)],
+    current_user: Annotated[Principal, Depends(deps.require_admin_principal)],
 ):
     notifications = session.exec(
         select(Notification).where(
@@ -0,0 +1,41 @@
+"""Occupancy heatmaps (services/occupancy) for the chessboard and reports.
+
+  GET /occupancy/heatmap?date_from=&date_to=&location_id=&days=
+      resource × half-hour and weekday × hour grids for the range; with
+      `days=true` also the per-day bitmaps the chessboard paints from.
+"""
+from datetime import date, datetime, timedelta
+from typing import Any, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlmodel import Session
+
+from app.api import deps
+from app.models.user import User
+from app.services import occupancy
+
+router = APIRouter()
+
+MAX_DAYS = 400  # год с запасом — больше не просит ни шахматка, ни отчёты
+
+
+@router.get("/heatmap")
+def occupancy_heatmap(
+    date_from: Optional[str] = Query(None, description="YYYY-MM-DD; по умолчанию сегодня"),
+    date_to: Optional[str] = Query(None, description="YYYY-MM-DD включительно; по умолчанию +6 дней"),
+    location_id: Optional[str] = Query(None),
+    days: bool = Query(False, description="Добавить побитовые маски по дням (для шахматки)"),
+    session: Session = Depends(deps.get_session),
+    current_user: User = Depends(deps.require_admin),
+) -> Any:
+    try:
+        d0 = date.fromisoformat(date_from[:10]) if date_from else datetime.now().date()
+        d1 = date.fromisoformat(date_to[:10]) if date_to else d0 + timedelta(days=6)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Даты в формате YYYY-MM-DD")
+    if d1 < d0:
+        d0, d1 = d1, d0
+    span = (d1 - d0).days + 1
+    if span > MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Не больше {MAX_DAYS} дней за запрос")
+    return occupancy.heatmap(session, d0, span, location_id=location_id, include_days=days)
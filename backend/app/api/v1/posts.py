@@ -9,17 +9,22 @@ from datetime import datetime
 from uuid import UUID
 import re
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlmodel import Session, select
 
 from app.db.session import get_session
 from app.models.post import Post, PostRead, PostCreate, PostUpdate
 from app.models.specialist import Specialist
-from app.models.user import User
-from app.api.deps import require_admin
+from app.api.deps import require_admin_principal
+from app.core.principal import Principal
+from app import seo
+from app.core import http_cache
 
 router = APIRouter()
 
+# Feed cards carry the author's name/photo from specialists.
+_CACHE_TABLES = http_cache.track(Post.__tablename__, Specialist.__tablename__)
+
 # ── slug helpers ─────────────────────────────────────────────────────────────
 # Транслит кириллицы для человекочитаемых URL. Без внешних зависимостей.
 _TRANSLIT = {
@@ -76,6 +81,7 @@ def _to_read(session: Session, post: Post) -> PostRead:
 @router.get("/", response_model=List[PostRead])
 def list_posts(
     *,
+    request: Request,
     session: Session = Depends(get_session),
     type: Optional[str] = Query(None, description="news | article"),
     limit: int = Query(50, le=100),
@@ -86,8 +92,11 @@ def list_posts(
     if type:
         q = q.where(Post.type == type)
     q = q.order_by(Post.published_at.desc()).offset(offset).limit(limit)  # type: ignore
-    posts = session.exec(q).all()
-    return [_to_read(session, p) for p in posts]
+
+    def build():
+        return [_to_read(session, p) for p in session.exec(q).all()]
+
+    return http_cache.cached_json(request, "posts", _CACHE_TABLES, build, model=List[PostRead])
 
 
 @router.get("/admin", response_model=List[PostRead])
@@ -95,7 +104,7 @@ def list_posts_admin(
     *,
     session: Session = Depends(get_session),
     type: Optional[str] = Query(None),
-    _admin: User = Depends(require_admin),
+    _admin: Principal = Depends(require_admin_principal),
 ):
     """Все посты включая черновики (для редактора)."""
     q = select(Post)
@@ -124,7 +133,7 @@ def create_post(
     *,
     session: Session = Depends(get_session),
     data: PostCreate,
-    _admin: User = Depends(require_admin),
+    _admin: Principal = Depends(require_admin_principal),
 ):
     base_slug = _slugify(data.slug) if data.slug else _slugify(data.title)
     slug = _unique_slug(session, base_slug)
@@ -142,6 +151,7 @@ def create_post(
     session.add(post)
     session.commit()
     session.refresh(post)
+    seo.invalidate(post.slug)
     return _to_read(session, post)
 
 
@@ -151,7 +161,7 @@ def update_post(
     session: Session = Depends(get_session),
     post_id: UUID,
     data: PostUpdate,
-    _admin: User = Depends(require_admin),
+    _admin: Principal = Depends(require_admin_principal),
 ):
     post = session.get(Post, post_id)
     if not post:
@@ -172,6 +182,7 @@ def update_post(
     if effective_type != "article":
         patch["author_specialist_id"] = None
 
+    old_slug = post.slug
     for k, v in patch.items():
         setattr(post, k, v)
     post.updated_at = datetime.utcnow()
@@ -179,6 +190,8 @@ def update_post(
     session.add(post)
     session.commit()
     session.refresh(post)
+    seo.invalidate(old_slug)
+    seo.invalidate(post.slug)
     return _to_read(session, post)
 
 
@@ -187,11 +200,13 @@ def delete_post(
     *,
     session: Session = Depends(get_session),
     post_id: UUID,
-    _admin: User = Depends(require_admin),
+    _admin: Principal = Depends(require_admin_principal),
 ):
     post = session.get(Post, post_id)
     if not post:
         raise HTTPException(404, "Пост не найден")
+    slug = post.slug
     session.delete(post)
     session.commit()
+    seo.invalidate(slug)
     return {"ok": True}
@@ -48,7 +48,8 @@ def get_pricing_quote(
 
 # ── Недельный перерасчёт скидки (owner 2026-06-29) ───────────────────────────
 from datetime import date as _date  # noqa: E402
-from app.api.deps import require_admin  # noqa: E402
+from app.api.deps import require_admin_principal  # noqa: E402
+from app.core.principal import Principal  # noqa: E402
 from app.services.weekly_rebate import run_weekly_rebates, last_completed_week_start  # noqa: E402
 
 
@@ -63,7 +64,7 @@ def run_weekly_rebate(
     *,
     payload: WeeklyRebateRequest,
     session: Session = Depends(get_session),
-    _admin: User = Depends(require_admin),
+    _admin: Principal = Depends(require_admin_principal),
 ):
     """Начислить недельные кредиты за неделю. dry_run=True (по умолчанию) —
     только посчитать суммы, ничего не записывать. Только админ."""
@@ -0,0 +1,44 @@
+"""
+Sampling-profiler captures (see core/profiler) — owner only.
+
+Captures carry SQL statements of real requests, so this is not for every
+admin. Everything lives in process memory: a restart empties the buffer.
+"""
+from typing import Any
+
+from fastapi import APIRouter, Depends, HTTPException
+
+from app.api import deps
+from app.core.profiler import profiler
+from app.models.user import User
+
+router = APIRouter()
+
+
+def _require_owner(current_user: User = Depends(deps.get_current_user)) -> User:
+    if current_user.role != "owner":
+        raise HTTPException(status_code=403, detail="Только для владельца")
+    return current_user
+
+
+@router.get("/captures")
+def read_captures(_: User = Depends(_require_owner)) -> Any:
+    """Last N slow-request captures, newest first.
+
+    `flamegraph` is in collapsed-stack format (one "frame;frame;frame count"
+    line per stack) — save it to a file and open in speedscope.app or feed it
+    to flamegraph.pl. `slow_sql[].plan` appears once the background EXPLAIN
+    has run, usually within a second of the request finishing.
+    """
+    return {
+        "enabled": profiler.enabled,
+        "slow_request_ms": profiler.slow_request_ms,
+        "slow_sql_ms": profiler.slow_sql_ms,
+        "captures": profiler.captures(),
+    }
+
+
+@router.delete("/captures")
+def clear_captures(_: User = Depends(_require_owner)) -> Any:
+    profiler.clear()
+    return {"ok": True}
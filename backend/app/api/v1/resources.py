@@ -1,27 +1,36 @@
 from typing import List, Any
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlmodel import Session, select
 from sqlalchemy.orm.attributes import flag_modified
-from app.db.session import get_session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.db.session import get_async_session, get_session
 from app.models.resource import Resource, ResourceCreate, ResourceRead, ResourceUpdate
 from app.models.user import User
 from app.api.deps import get_current_user, get_current_superuser
+from app.core import http_cache
 
 router = APIRouter()
 
 ALLOWED_ROLES = ["owner", "senior_admin", "admin"]
 
+_CACHE_TABLES = http_cache.track(Resource.__tablename__)
+
 
 @router.get("/", response_model=List[ResourceRead])
-def read_resources(
+async def read_resources(
+    request: Request,
     skip: int = 0,
     limit: int = 100,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
-    resources = session.exec(
-        select(Resource).order_by(Resource.sort_order, Resource.name).offset(skip).limit(limit)
-    ).all()
-    return resources
+    async def build():
+        return (await session.exec(
+            select(Resource).order_by(Resource.sort_order, Resource.name).offset(skip).limit(limit)
+        )).all()
+
+    return await http_cache.cached_json_async(
+        request, "resources", _CACHE_TABLES, build, model=List[ResourceRead]
+    )
 
 
 @router.get("/{resource_id}", response_model=ResourceRead)
@@ -8,16 +8,20 @@ the front can store whatever shape it wants without backend churn.
 from datetime import datetime
 from typing import Any, Dict
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlmodel import Session, select
 
 from app.api import deps
 from app.db.session import get_session
 from app.models.app_setting import AppSetting
 from app.models.user import User
+from app.core.principal import Principal
+from app.core import http_cache
 
 router = APIRouter()
 
+_CACHE_TABLES = http_cache.track(AppSetting.__tablename__)
+
 
 # Defaults served when the table is empty (first deploy / fresh env).
 # Same numbers as the frontend fallback in src/utils/currency.ts, so
@@ -49,10 +53,14 @@ def get_exchange_rates(session: Session) -> Dict[str, float]:
 
 @router.get("/exchange_rates")
 def read_exchange_rates(
+    request: Request,
     session: Session = Depends(get_session),
-    _: User = Depends(deps.get_current_user),  # auth only, no role check
+    _: Principal = Depends(deps.get_principal),  # auth only, no role check
 ) -> Dict[str, float]:
-    return get_exchange_rates(session)
+    # Auth still costs the user lookup; the rates themselves come from cache.
+    return http_cache.cached_json(
+        request, "exchange_rates", _CACHE_TABLES, lambda: get_exchange_rates(session), private=True
+    )
 
 
 @router.put("/exchange_rates")
@@ -1,19 +1,35 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from typing import List, Optional
 from uuid import UUID
 from pydantic import BaseModel, Field as PField
 
-from app.db.session import get_session
+from app.db.session import get_async_session, get_session
 from app.models.specialist import Specialist, SpecialistRead, SpecialistCreate, SpecialistUpdate
-from app.api.deps import require_admin, require_specialist, get_current_user
+from app.api.deps import require_admin_principal, require_specialist, get_current_user
+from app.core.principal import Principal
 from app.models.user import User
 from app.services.telegram import telegram_service
+from app.core import http_cache
 
 router = APIRouter()
 
+# Not tracking `user` for the owner-first ordering: that table is written on
+# every balance change, and who the owner is changes about never — the
+# cache TTL covers it.
+_CACHE_TABLES = http_cache.track(Specialist.__tablename__)
+
+
+_OWNER_IDS = select(User.id).where(User.role == "owner")
+
 
 def _order_specialists(session: Session, specialists: list) -> List[SpecialistRead]:
+    owner_ids = {str(uid) for uid in session.exec(_OWNER_IDS).all()}
+    return _sort_specialists(specialists, owner_ids)
+
+
+def _sort_specialists(specialists: list, owner_ids: set[str]) -> List[SpecialistRead]:
     """Catalogue ordering rule (2026-05-22):
       1. Owner's card always first.
       2. Then complete cards (photo + bio filled) by sort_order.
@@ -21,12 +37,6 @@ def _order_specialists(session: Session, specialists: list) -> List[SpecialistRe
          sink to the bottom of the list.
     Returns SpecialistRead objects with `is_owner` populated.
     """
-    owner_ids = {
-        str(u.id) for u in session.exec(
-            select(User).where(User.role == "owner")
-        ).all()
-    }
-
     def is_owner(s) -> bool:
         return bool(s.user_id) and str(s.user_id) in owner_ids
 
@@ -47,9 +57,10 @@ def _order_specialists(session: Session, specialists: list) -> List[SpecialistRe
 
 
 @router.get("/", response_model=List[SpecialistRead])
-def get_specialists(
+async def get_specialists(
     *,
-    session: Session = Depends(get_session),
+    request: Request,
+    session: AsyncSession = Depends(get_async_session),
     format: Optional[str] = Query(None, description="Filter by format e.g., ONLINE"),
     specialization: Optional[str] = Query(None, description="Filter by specialization"),
     max_price: Optional[int] = Query(None, description="Maximum base price in GEL"),
@@ -70,29 +81,35 @@ def get_specialists(
         .order_by(Specialist.sort_order)
     )
 
-    # Execute and filter in python for JSON array fields since SQLite JSON filtering can be tricky
-    specialists = session.exec(statement).all()
+    async def build():
+        # Execute and filter in python for JSON array fields since SQLite JSON filtering can be tricky
+        specialists = (await session.exec(statement)).all()
+
+        if format:
+            specialists = [s for s in specialists if format in s.formats]
 
-    if format:
-        specialists = [s for s in specialists if format in s.formats]
+        if specialization:
+            specialists = [s for s in specialists if specialization in s.specializations]
 
-    if specialization:
-        specialists = [s for s in specialists if specialization in s.specializations]
+        if max_price is not None:
+            specialists = [s for s in specialists if s.base_price_gel <= max_price]
 
-    if max_price is not None:
-        specialists = [s for s in specialists if s.base_price_gel <= max_price]
+        if category:
+            specialists = [s for s in specialists if s.category == category]
 
-    if category:
-        specialists = [s for s in specialists if s.category == category]
+        owner_ids = {str(uid) for uid in (await session.exec(_OWNER_IDS)).all()}
+        return _sort_specialists(specialists, owner_ids)
 
-    return _order_specialists(session, specialists)
+    return await http_cache.cached_json_async(
+        request, "specialists", _CACHE_TABLES, build, model=List[SpecialistRead]
+    )
 
 
 @router.get("/admin/all", response_model=List[SpecialistRead])
 def get_all_specialists_admin(
     *,
     session: Session = Depends(get_session),
-    _admin: User = Depends(require_admin)
+    _admin: Principal = Depends(require_admin_principal)
 ):
     """Admin: get all specialists including unverified."""
     return _order_specialists(session, list(session.exec(select(Specialist)).all()))
@@ -108,7 +125,7 @@ def update_specialist_admin(
     specialist_id: UUID,
     specialist_in: SpecialistUpdate,
     session: Session = Depends(get_session),
-    _admin: User = Depends(require_admin)
+    _admin: Principal = Depends(require_admin_principal)
 ):
     """Admin: update specialist fields including category and is_verified."""
     specialist = session.get(Specialist, specialist_id)
@@ -156,7 +173,7 @@ def reorder_specialists(
     *,
     data: ReorderRequest,
     session: Session = Depends(get_session),
-    _admin: User = Depends(require_admin)
+    _admin: Principal = Depends(require_admin_principal)
 ):
     """Admin: bulk update sort_order for specialists.
 
@@ -188,7 +205,7 @@ def delete_specialist(
     *,
     specialist_id: UUID,
     session: Session = Depends(get_session),
-    _admin: User = Depends(require_admin)
+    _admin: Principal = Depends(require_admin_principal)
 ):
     """Admin: permanently delete a specialist profile."""
     specialist = session.get(Specialist, specialist_id)
@@ -339,7 +356,7 @@ def approve_specialist_application(
     *,
     specialist_id: UUID,
     session: Session = Depends(get_session),
-    _admin: User = Depends(require_admin),
+    _admin: Principal = Depends(require_admin_principal),
 ):
     """Admin: approve a pending application — flip is_verified=True so the
     profile shows up publicly. Status moves to "approved" for audit; future
@@ -360,7 +377,7 @@ def reject_specialist_application(
     *,
     specialist_id: UUID,
     session: Session = Depends(get_session),
-    _admin: User = Depends(require_admin),
+    _admin: Principal = Depends(require_admin_principal),
 ):
     """Admin: reject application. We keep the row (is_verified stays False,
     status="rejected") so the user sees the decision in their profile and
@@ -1,25 +1,30 @@
 """
 Team Members API — публичный GET, CRUD только для admin+.
 """
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlmodel import Session, select
 
 from app.db.session import get_session
 from app.api.deps import require_admin
 from app.models.team_member import TeamMember, TeamMemberCreate, TeamMemberRead, TeamMemberUpdate
+from app.core import http_cache
 
 router = APIRouter()
 
+_CACHE_TABLES = http_cache.track(TeamMember.__tablename__)
+
 
 @router.get("", response_model=list[TeamMemberRead])
-def list_team(session: Session = Depends(get_session)):
+def list_team(request: Request, session: Session = Depends(get_session)):
     """Публичный эндпоинт — все активные члены команды, отсортированные по sort_order."""
-    members = session.exec(
-        select(TeamMember)
-        .where(TeamMember.is_active == True)
-        .order_by(TeamMember.sort_order)
-    ).all()
-    return members
+    def build():
+        return session.exec(
+            select(TeamMember)
+            .where(TeamMember.is_active == True)
+            .order_by(TeamMember.sort_order)
+        ).all()
+
+    return http_cache.cached_json(request, "team", _CACHE_TABLES, build, model=list[TeamMemberRead])
 
 
 @router.get("/all", response_model=list[TeamMemberRead])
@@ -34,6 +34,7 @@ Security:
 """
 import logging
 import secrets
+import time
 from datetime import date, datetime, timedelta, timezone
 from html import escape
 from typing import Any, Optional
@@ -52,7 +53,7 @@ from app.models.resource import Resource
 from app.models.user import User
 from app.models.waitlist import Waitlist
 from app.services.telegram import telegram_service
-from app.services import subscription_pool
+from app.services import subscription_pool, user_history
 
 logger = logging.getLogger(__name__)
 
@@ -211,9 +212,9 @@ def send_reminders_endpoint(
     # ── Series-end reminders ──────────────────────────────────────────
     # When a user's recurring series has only 3, 2, or 1 future bookings
     # left, ping them once per threshold so they can decide whether to
-    # extend. Dedup is stored in user.crm_data['series_reminders'] as
-    # `{group_id: max_threshold_notified}` — we re-notify only if the
-    # current future_count is *lower* than the stored threshold.
+    # extend. Dedup is a SeriesReminderMark per (owner, group) holding the
+    # last threshold notified — we re-notify only if the current
+    # future_count is *lower* than the stored threshold.
     from collections import defaultdict
     series_groups: dict[str, list[Booking]] = defaultdict(list)
     series_bookings = session.exec(
@@ -240,9 +241,7 @@ def send_reminders_endpoint(
         if not owner or not owner.telegram_id:
             continue
         # Dedup
-        crm_data = owner.crm_data or {}
-        marks = dict(crm_data.get("series_reminders") or {})
-        last_threshold = marks.get(group_id)
+        last_threshold = user_history.series_mark(session, owner.id, group_id)
         # Send only if we haven't notified at this threshold before. We
         # ratchet down: 3 → 2 → 1, and never re-fire for a higher count.
         if last_threshold is not None and future_count >= last_threshold:
@@ -279,11 +278,7 @@ def send_reminders_endpoint(
         )
         ok = telegram_service.send_message(str(owner.telegram_id), text)
         if ok:
-            marks[group_id] = future_count
-            new_crm_data = dict(crm_data)
-            new_crm_data["series_reminders"] = marks
-            owner.crm_data = new_crm_data
-            session.add(owner)
+            user_history.set_series_mark(session, owner.id, group_id, future_count)
             series_sent += 1
 
     if series_sent:
@@ -306,12 +301,16 @@ def send_reminders_endpoint(
 #   • bookings: created / cancelled / by branch
 #   • cashbox : income / expense / balances by payment method
 # Same secret as /send-reminders so ops can cron it without new keys.
+# The numbers come from aggregate queries — see services/daily_summary.
 
 @router.post("/daily-summary")
 def daily_summary_endpoint(
     secret: Optional[str] = None,
+    dry_run: bool = False,
     session: Session = Depends(get_session),
 ) -> dict[str, Any]:
+    """`dry_run=true` builds the message without sending it and returns the
+    text plus a per-stage timing breakdown (ms)."""
     # Only a dedicated TELEGRAM_REMINDER_SECRET is accepted — no bot-token
     # fallback. Fail closed if it's unset.
     # TODO: move the secret to an Authorization header (kept as `?secret=`
@@ -322,140 +321,22 @@ def daily_summary_endpoint(
     if secret != expected:
         raise HTTPException(status_code=401, detail="Invalid secret")
 
-    from datetime import datetime as _dt, timedelta as _td, timezone as _tz
-    from app.models.cashbox_transaction import CashboxTransaction
-
-    # "Yesterday" is the full Tbilisi (UTC+4) calendar day ending at the most
-    # recent midnight Tbilisi time. Convert that window back to naive UTC to
-    # match what the DB stores.
-    TBS = _td(hours=4)
-    now_utc = _dt.utcnow()
-    now_tbs = now_utc + TBS
-    today_tbs_midnight_utc = (now_tbs.replace(hour=0, minute=0, second=0, microsecond=0) - TBS)
-    yesterday_start = today_tbs_midnight_utc - _td(days=1)
-    yesterday_end = today_tbs_midnight_utc
-    date_label = (yesterday_start + TBS).strftime("%d.%m.%Y")
-
-    # ── Bookings summary ──
-    bookings = session.exec(
-        select(Booking).where(
-            Booking.created_at >= yesterday_start,
-            Booking.created_at < yesterday_end,
-        )
-    ).all()
-    total_bookings = len(bookings)
-    cancelled = [b for b in bookings if b.status == "cancelled"]
-
-    # Locations resolved once
-    loc_names: dict = {}
-    for loc in session.exec(select(Location)).all():
-        loc_names[loc.id] = loc.name
+    from app.services import daily_summary
 
-    by_loc: dict = {}
-    by_loc_revenue: dict = {}
-    total_hours_booked = 0.0  # sum of duration of every active booking created yesterday
-    for b in bookings:
-        if b.status == "cancelled":
-            continue
-        name = loc_names.get(b.location_id, b.location_id or "—")
-        by_loc[name] = by_loc.get(name, 0) + 1
-        by_loc_revenue[name] = by_loc_revenue.get(name, 0.0) + float(b.final_price or 0)
-        total_hours_booked += float(b.duration or 0) / 60.0
-
-    # ── Cashbox summary ──
-    txs = session.exec(
-        select(CashboxTransaction).where(
-            CashboxTransaction.date >= yesterday_start,
-            CashboxTransaction.date < yesterday_end,
-        )
-    ).all()
-    income_by_method: dict = {}
-    expense_by_method: dict = {}
-    income_by_branch: dict = {}
-    for t in txs:
-        amt = float(t.amount or 0)
-        method = t.payment_method or "—"
-        if t.type == "income":
-            income_by_method[method] = income_by_method.get(method, 0.0) + amt
-            br = t.branch or "—"
-            income_by_branch[br] = income_by_branch.get(br, 0.0) + amt
-        elif t.type == "expense":
-            expense_by_method[method] = expense_by_method.get(method, 0.0) + amt
-
-    total_income = sum(income_by_method.values())
-    total_expense = sum(expense_by_method.values())
-
-    # Running balance by method — all-time sum (income − expense) up to end of
-    # yesterday. Gives the "состояние на утро" number admins actually care about.
-    all_tx = session.exec(
-        select(CashboxTransaction).where(CashboxTransaction.date < yesterday_end)
-    ).all()
-    balance_by_method: dict = {}
-    for t in all_tx:
-        method = t.payment_method or "—"
-        amt = float(t.amount or 0)
-        if t.type == "income":
-            balance_by_method[method] = balance_by_method.get(method, 0.0) + amt
-        elif t.type == "expense":
-            balance_by_method[method] = balance_by_method.get(method, 0.0) - amt
-
-    # ── Compose message ──
-    method_label = {
-        "cash": "наличные",
-        "card_tbc": "TBC",
-        "card_bog": "BOG",
-        "bonus": "бонусы",
-        "balance": "баланс клиента",
-    }
-
-    def _fmt_money_dict(d: dict) -> str:
-        if not d:
-            return "—"
-        parts = [f"{method_label.get(k, k)}: <b>{v:g}</b> ₾" for k, v in sorted(d.items(), key=lambda x: -x[1])]
-        return " · ".join(parts)
-
-    def _fmt_count_dict(d: dict) -> str:
-        if not d:
-            return "—"
-        return " · ".join(f"{k}: <b>{v}</b>" for k, v in sorted(d.items(), key=lambda x: -x[1]))
-
-    lines = [
-        f"📊 <b>Сводка за {date_label}</b>",
-        "",
-        "<b>Бронирования</b>",
-        f"• Всего создано: <b>{total_bookings}</b> (из них отмен: <b>{len(cancelled)}</b>)",
-        f"• Часов брони: <b>{total_hours_booked:g}</b> ч",
-    ]
-    if by_loc:
-        lines.append(f"• По филиалам: {_fmt_count_dict(by_loc)}")
-    if by_loc_revenue:
-        loc_rev = " · ".join(f"{k}: <b>{v:g}</b> ₾" for k, v in sorted(by_loc_revenue.items(), key=lambda x: -x[1]))
-        lines.append(f"• Выручка (по броням): {loc_rev}")
-
-    lines.append("")
-    lines.append("<b>Касса</b>")
-    lines.append(f"• Приход: <b>{total_income:g}</b> ₾ — {_fmt_money_dict(income_by_method)}")
-    lines.append(f"• Расход: <b>{total_expense:g}</b> ₾ — {_fmt_money_dict(expense_by_method)}")
-    if income_by_branch:
-        br_line = " · ".join(f"{k}: <b>{v:g}</b> ₾" for k, v in sorted(income_by_branch.items(), key=lambda x: -x[1]))
-        lines.append(f"• Приход по филиалам: {br_line}")
-
-    lines.append("")
-    lines.append("<b>Остатки на утро</b>")
-    lines.append(f"• {_fmt_money_dict({k: round(v, 2) for k, v in balance_by_method.items()})}")
+    summary = daily_summary.build(session)
+    result: dict[str, Any] = {"date": summary.date_label, **summary.stats}
+    if dry_run:
+        return {**result, "sent": False, "dry_run": True,
+                "text": summary.text, "timings_ms": summary.timings_ms}
 
     # Daily summary goes to the OWNER chat (Микола) instead of the busy
     # admin group. Falls back to admin chat if owner chat isn't set, so
     # legacy installs still work.
-    sent = telegram_service.send_owner_summary("\n".join(lines))
-    return {
-        "sent": sent,
-        "date": date_label,
-        "bookings": total_bookings,
-        "cancelled": len(cancelled),
-        "income": total_income,
-        "expense": total_expense,
-    }
+    t = time.perf_counter()
+    sent = telegram_service.send_owner_summary(summary.text)
+    summary.timings_ms["send"] = round((time.perf_counter() - t) * 1000, 2)
+    logger.info("[daily-summary] %s sent=%s timings=%s", summary.date_label, sent, summary.timings_ms)
+    return {**result, "sent": sent}
 
 
 # ── weekly-cashback: УДАЛЁН (2026-07-14) ──────────────────────────────────────
@@ -787,47 +668,11 @@ def _handle_start(session: Session, chat_id: int, text: str, username: Optional[
 
 
 def _merge_into(session: Session, *, absorb: User, keep: User) -> None:
-    """Move every FK from `absorb` onto `keep`, sum balances, delete `absorb`.
-    Trimmed version of /users/merge — no audit trail, for auto-merge only.
-    Runs inside the caller's transaction; the caller commits."""
-    from sqlalchemy import text as _text
-
-    params_uuid = {"s": absorb.id, "t": keep.id}
-    params_sstr = {"s_str": str(absorb.id), "t_str": str(keep.id)}
-    params_email = {"s_email": absorb.email, "t_email": keep.email}
-
-    for sql, p in [
-        ('UPDATE booking SET user_uuid = :t WHERE user_uuid = :s', params_uuid),
-        ('UPDATE booking SET user_id = :t_email WHERE user_id = :s_email', params_email),
-        ('UPDATE booking SET cancelled_by = :t_email WHERE cancelled_by = :s_email', params_email),
-        ('UPDATE waitlist SET user_uuid = :t WHERE user_uuid = :s', params_uuid),
-        ('UPDATE waitlist SET user_id = :t_email WHERE user_id = :s_email', params_email),
-        ('UPDATE cashbox_transactions SET client_id = :t_email WHERE client_id = :s_email', params_email),
-        ('UPDATE cashbox_transactions SET client_id = :t_str WHERE client_id = :s_str', params_sstr),
-        ('UPDATE cashbox_transactions SET credited_user_id = :t_str WHERE credited_user_id = :s_str', params_sstr),
-        ('UPDATE notifications SET recipient_id = :t_str WHERE recipient_id = :s_str', params_sstr),
-    ]:
-        session.execute(_text(sql), p)
-
-    # Carry over scalar fields where the keeper is empty
-    for attr in ("name", "phone", "avatar_url", "google_id"):
-        if not getattr(keep, attr, None) and getattr(absorb, attr, None):
-            setattr(keep, attr, getattr(absorb, attr))
-    if abs(float(absorb.balance or 0)) >= 0.01:
-        from app.services import wallet as _wallet
-        _wallet.apply(session, keep, float(absorb.balance or 0), reason="merge",
-                      description=f"Слияние баланса из {absorb.email}",
-                      ref_type="user", ref_id=str(absorb.id))
-    keep.credit_limit = max(float(keep.credit_limit or 0), float(absorb.credit_limit or 0))
-    if not keep.subscription and absorb.subscription:
-        keep.subscription = absorb.subscription
-
-    # Drop telegram_id + poison-email the absorbee, then delete.
-    absorb.telegram_id = None
-    absorb.email = f"merged-into-{keep.id}-{absorb.id}@deleted.unbox"
-    session.add(absorb)
-    session.flush()
-    session.delete(absorb)
+    """Auto-merge of a stale Telegram account into the one being linked —
+    services/user_merge without an audit entry. Runs inside the caller's
+    transaction; the caller commits."""
+    from app.services import user_merge
+    user_merge.merge(session, keep, [absorb])
 
 
 def _handle_bookings(session: Session, chat_id: int, user: Optional[User]) -> dict:
@@ -1887,14 +1732,9 @@ def _handle_hot_booking_callback(
         if owner:
             if (booking.payment_method or "").lower() == "subscription":
                 if owner.subscription:
-                    rem = subscription_pool.get_float(owner.subscription, "remaining_hours")
-                    used = subscription_pool.get_float(owner.subscription, "used_hours")
-                    hrs = float(booking.hours_deducted or 0)
-                    owner.subscription = subscription_pool.update(
-                        owner.subscription,
-                        remaining_hours=max(0.0, rem - hrs),
-                        used_hours=used + hrs,
-                    )
+                    subscription_pool.deduct(session, owner, float(booking.hours_deducted or 0),
+                                             "booking_charge", description="Бронь через Telegram-бот",
+                                             ref_type="booking", ref_id=str(booking.id))
                 session.add(owner)
             else:
                 from app.services import wallet as _wallet
@@ -1,9 +1,14 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
+import hashlib
 import os
-import uuid
-from typing import Dict
+import tempfile
+from typing import Any, Callable, Dict, Optional
+from sqlmodel import Session
 from app.api.deps import get_current_user
+from app.core.config import settings
+from app.db.session import get_session
 from app.models.user import User
+from app.services import images, task_files
 
 router = APIRouter()
 
@@ -12,37 +17,69 @@ UPLOAD_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "..", "uploads"
 # /app/api/v1/../../.. -> /backend/uploads
 
 IMAGE_MAX_BYTES = 2 * 1024 * 1024  # 2 MB — keeps avatars/cabinet photos light
+_CHUNK = 64 * 1024
+
+
+def _too_big(size: int) -> HTTPException:
+    return HTTPException(
+        status_code=400,
+        detail=f"Файл слишком большой ({size // 1024} KB). Максимум 2 МБ — сожмите изображение.",
+    )
+
+
+async def _spool(file: UploadFile, max_bytes: int, too_big: Callable[[int], HTTPException]) -> tuple[str, str, int]:
+    """Stream the upload to a temp file under UPLOAD_DIR in chunks, hashing
+    on the way → (tmp_path, sha256, size).
+
+    `await file.read()` used to pull the whole body into one bytes object
+    (20 MB per task-file upload, several at once on a 458 MB droplet). Here
+    at most one chunk is in memory, and we stop reading as soon as the
+    limit is passed. The temp file lives on the same filesystem as the
+    final location, so callers can os.replace() it into place atomically.
+    """
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=UPLOAD_DIR, suffix=task_files.TMP_SUFFIX)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while chunk := await file.read(_CHUNK):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise too_big(size)
+                digest.update(chunk)
+                out.write(chunk)
+    except HTTPException:
+        os.unlink(tmp_path)
+        raise
+    except Exception as e:
+        os.unlink(tmp_path)
+        raise HTTPException(status_code=500, detail=f"Could not save file: {str(e)}")
+    return tmp_path, digest.hexdigest(), size
 
 
-@router.post("/", response_model=Dict[str, str])
+@router.post("/", response_model=Dict[str, Any])
 async def upload_file(
     file: UploadFile = File(...),
     current_user: User = Depends(get_current_user),
 ):
+    """Image upload → content-addressed original + WebP/AVIF variants.
+
+    Returns the manifest from services/images: `url` (the original, as
+    before — existing callers only read that), `width`/`height`,
+    `variants` and ready-made `srcset` strings per format.
+    """
     if not file.content_type or not file.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="Only image files are allowed")
 
     # Server-side size guard — defence-in-depth in case the frontend check is
-    # bypassed. 2 MB is plenty for a profile/cabinet photo; anything larger
-    # is almost certainly an unoptimised original. Reject with a clear msg.
-    contents = await file.read()
-    if len(contents) > IMAGE_MAX_BYTES:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Файл слишком большой ({len(contents) // 1024} KB). Максимум 2 МБ — сожмите изображение.",
-        )
-
-    file_ext = os.path.splitext(file.filename or "")[1]
-    filename = f"{uuid.uuid4()}{file_ext}"
-    file_path = os.path.join(UPLOAD_DIR, filename)
+    # bypassed. 2 MB is plenty for a profile/cabinet photo.
+    tmp_path, digest, _ = await _spool(file, IMAGE_MAX_BYTES, _too_big)
 
     try:
-        with open(file_path, "wb") as buffer:
-            buffer.write(contents)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Could not save file: {str(e)}")
-
-    return {"url": f"/uploads/{filename}"}
+        return await images.process_upload(UPLOAD_DIR, tmp_path, digest)
+    except images.ImageRejected as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 MAX_FILE_SIZE = 20 * 1024 * 1024  # 20 MB
@@ -56,39 +93,60 @@ TASK_FILE_ALLOWED_EXTS = {
 }
 
 
+def _task_file_too_big(size: int) -> HTTPException:
+    return HTTPException(status_code=400, detail="File too large (max 20MB)")
+
+
 @router.post("/task-file", response_model=Dict[str, str])
 async def upload_task_file(
     file: UploadFile = File(...),
     current_user: User = Depends(get_current_user),
 ):
-    """Upload a document/image for task attachments (max 20MB, inert types only)."""
-    # Read and check size
-    contents = await file.read()
-    if len(contents) > MAX_FILE_SIZE:
-        raise HTTPException(status_code=400, detail="File too large (max 20MB)")
+    """Upload a document/image for task attachments (max 20MB, inert types only).
 
+    Stored once per content hash (services/task_files) — uploading the same
+    PDF again returns the same URL. AdminTask create/update/delete keep the
+    per-file reference counts; unreferenced files are removed by
+    /upload/task-files/cleanup.
+    """
     file_ext = (os.path.splitext(file.filename)[1] if file.filename else "").lower()
     # Stored-XSS guard: only allow inert extensions (blocks .html/.svg/.js/etc).
+    # Checked before reading a byte of the body.
     if file_ext not in TASK_FILE_ALLOWED_EXTS:
         raise HTTPException(
             status_code=400,
             detail="Недопустимый тип файла. Разрешены: PDF, изображения, документы (doc/xls), txt/csv.",
         )
-    unique_name = f"{uuid.uuid4()}{file_ext}"
-
-    # Store in uploads/tasks/ subfolder
-    tasks_dir = os.path.join(UPLOAD_DIR, "tasks")
-    os.makedirs(tasks_dir, exist_ok=True)
-    file_path = os.path.join(tasks_dir, unique_name)
 
+    tmp_path, digest, size = await _spool(file, MAX_FILE_SIZE, _task_file_too_big)
     try:
-        with open(file_path, "wb") as buffer:
-            buffer.write(contents)
+        url = task_files.store(UPLOAD_DIR, tmp_path, digest, file_ext)
     except Exception as e:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
         raise HTTPException(status_code=500, detail=f"Could not save file: {str(e)}")
 
     return {
-        "url": f"/uploads/tasks/{unique_name}",
-        "name": file.filename or unique_name,
-        "size": str(len(contents)),
+        "url": url,
+        "name": file.filename or os.path.basename(url),
+        "size": str(size),
+        "sha256": digest,
     }
+
+
+@router.post("/task-files/cleanup")
+def cleanup_task_files(
+    secret: Optional[str] = None,
+    session: Session = Depends(get_session),
+) -> Dict[str, Any]:
+    """Cron: delete task files no AdminTask (or specialist application)
+    references, once older than TASK_FILE_ORPHAN_GRACE_HOURS.
+
+    Same `?secret=` gate as /billing/charge-due — owner-only cron trigger.
+    """
+    expected = getattr(settings, "TELEGRAM_REMINDER_SECRET", None)
+    if not expected:
+        raise HTTPException(status_code=503, detail="Cron secret not configured")
+    if secret != expected:
+        raise HTTPException(status_code=401, detail="Invalid secret")
+    return task_files.sweep_orphans(session, UPLOAD_DIR, settings.TASK_FILE_ORPHAN_GRACE_HOURS)
@@ -7,8 +7,10 @@ from sqlmodel import Session, select
 from pydantic import BaseModel
 from app.api import deps
 from app.db.session import get_session
-from app.models.user import User, UserRead, UserUpdateAdmin
-from app.services import subscription_pool
+from app.models.user import User, UserDetailRead, UserRead, UserUpdateAdmin
+from app.models.user_history import UserHistoryPage
+from app.services import subscription_pool, user_history, user_identity, user_merge
+from app.services.notification_service import recipient_index
 
 router = APIRouter()
 
@@ -29,6 +31,11 @@ def _resolve_user(session: Session, user_id: str) -> User:
     return user
 
 
+def _detail(session: Session, user: User) -> UserDetailRead:
+    """UserRead + the newest history — what the client card renders."""
+    return UserDetailRead.model_validate(user, update=user_history.latest(session, user.id))
+
+
 # ── List users ────────────────────────────────────────────────────────────────
 
 @router.get("/", response_model=List[UserRead])
@@ -53,6 +60,164 @@ def read_users(
     return users
 
 
+# ── Duplicate candidates ─────────────────────────────────────────────────────
+# Pairs sharing a normalized email / phone / Telegram / Google / name
+# (services/user_identity), with a confidence and a ready /merge payload.
+# Declared before /{user_id} so "duplicates" isn't taken for an id.
+
+@router.get("/duplicates")
+def read_duplicate_candidates(
+    session: Session = Depends(get_session),
+    min_score: float = Query(0.5, ge=0, le=1),
+    limit: int = Query(200, ge=1, le=1000),
+    user_id: Optional[str] = Query(None, description="Only pairs involving this user (UUID or email)"),
+    current_user: User = Depends(deps.require_admin),
+) -> Any:
+    uid = _resolve_user(session, user_id).id if user_id else None
+    return user_identity.candidates(session, min_score=min_score, limit=limit, user_id=uid)
+
+
+# ── One user + history ───────────────────────────────────────────────────────
+# The list above no longer carries comment/discount/task history (it was
+# kilobytes per user × thousands of users on every admin page load). The
+# client card asks for it here.
+
+@router.get("/{user_id}", response_model=UserDetailRead)
+def read_user(
+    user_id: str,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(deps.require_admin),
+) -> Any:
+    return _detail(session, _resolve_user(session, user_id))
+
+
+@router.get("/{user_id}/history", response_model=UserHistoryPage)
+def read_user_history(
+    user_id: str,
+    kind: str = Query(user_history.COMMENT, description="comment | discount | admin_task"),
+    before: Optional[int] = Query(None, description="next_before from the previous page"),
+    limit: int = Query(50, ge=1, le=500),
+    session: Session = Depends(get_session),
+    current_user: User = Depends(deps.require_admin),
+) -> Any:
+    """Older history, newest first, one page at a time."""
+    if kind not in user_history.FIELDS:
+        raise HTTPException(400, f"Unknown history kind: {kind}")
+    user = _resolve_user(session, user_id)
+    return user_history.page(session, user.id, kind, before=before, limit=limit)
+
+
+class _CommentRequest(BaseModel):
+    text: str
+
+
+@router.post("/{user_id}/comments", response_model=UserDetailRead)
+def add_user_comment(
+    user_id: str,
+    payload: _CommentRequest,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(deps.require_admin),
+) -> Any:
+    """Append an admin note to the client's timeline."""
+    text = (payload.text or "").strip()
+    if not text:
+        raise HTTPException(400, "Комментарий пустой")
+    user = _resolve_user(session, user_id)
+    now = datetime.now()
+    user_history.append(session, user.id, user_history.COMMENT, {
+        "id": f"note-{int(now.timestamp() * 1000)}",
+        "text": text,
+        "date": now.isoformat(),
+        "adminName": current_user.name,
+    })
+    session.commit()
+    return _detail(session, user)
+
+
+@router.patch("/{user_id}/comments/{comment_id}", response_model=UserDetailRead)
+def edit_user_comment(
+    user_id: str,
+    comment_id: str,
+    payload: _CommentRequest,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(deps.require_admin),
+) -> Any:
+    text = (payload.text or "").strip()
+    if not text:
+        raise HTTPException(400, "Комментарий пустой")
+    user = _resolve_user(session, user_id)
+    if user_history.update_entry(session, user.id, user_history.COMMENT, comment_id, {"text": text}) is None:
+        raise HTTPException(404, "Комментарий не найден")
+    session.commit()
+    return _detail(session, user)
+
+
+@router.delete("/{user_id}/comments/{comment_id}", response_model=UserDetailRead)
+def delete_user_comment(
+    user_id: str,
+    comment_id: str,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(deps.require_admin),
+) -> Any:
+    user = _resolve_user(session, user_id)
+    if not user_history.remove(session, user.id, user_history.COMMENT, comment_id):
+        raise HTTPException(404, "Комментарий не найден")
+    session.commit()
+    return _detail(session, user)
+
+
+# ── Admin tasks on a client ──────────────────────────────────────────────────
+# One task per call — the old whole-array PATCH rewrote (and, from a card
+# that never loaded the history, deleted) every other task of the client.
+
+@router.post("/{user_id}/tasks", response_model=UserDetailRead)
+def add_user_task(
+    user_id: str,
+    task: dict = Body(...),
+    session: Session = Depends(get_session),
+    current_user: User = Depends(deps.require_admin),
+) -> Any:
+    user = _resolve_user(session, user_id)
+    now = datetime.now()
+    data = {**task}
+    data.setdefault("id", f"task-{int(now.timestamp() * 1000)}")
+    data.setdefault("created_at", now.isoformat())
+    if user_history.find(session, user.id, user_history.ADMIN_TASK, str(data["id"])) is not None:
+        raise HTTPException(409, "Задача с таким id уже есть")
+    user_history.append(session, user.id, user_history.ADMIN_TASK, data)
+    session.commit()
+    return _detail(session, user)
+
+
+@router.patch("/{user_id}/tasks/{task_id}", response_model=UserDetailRead)
+def update_user_task(
+    user_id: str,
+    task_id: str,
+    changes: dict = Body(...),
+    session: Session = Depends(get_session),
+    current_user: User = Depends(deps.require_admin),
+) -> Any:
+    user = _resolve_user(session, user_id)
+    if user_history.update_entry(session, user.id, user_history.ADMIN_TASK, task_id, changes) is None:
+        raise HTTPException(404, "Задача не найдена")
+    session.commit()
+    return _detail(session, user)
+
+
+@router.delete("/{user_id}/tasks/{task_id}", response_model=UserDetailRead)
+def delete_user_task(
+    user_id: str,
+    task_id: str,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(deps.require_admin),
+) -> Any:
+    user = _resolve_user(session, user_id)
+    if not user_history.remove(session, user.id, user_history.ADMIN_TASK, task_id):
+        raise HTTPException(404, "Задача не найдена")
+    session.commit()
+    return _detail(session, user)
+
+
 # ── Archive / Unarchive (Soft delete) — Excel #11 ─────────────────────────────
 
 class ArchiveRequest(BaseModel):
@@ -121,7 +286,7 @@ def unarchive_user(
 
 # ── Update user (Admin) ──────────────────────────────────────────────────────
 
-@router.patch("/{user_id}", response_model=UserRead)
+@router.patch("/{user_id}", response_model=UserDetailRead)
 def update_user(
     *,
     user_id: str,
@@ -165,6 +330,18 @@ def update_user(
                 raise HTTPException(status_code=400, detail="Cannot demote the last Owner")
 
     user_data = user_in.dict(exclude_unset=True)
+    cursor = user_data.pop("history_cursor", None) or {}
+    for kind, field in user_history.FIELDS.items():
+        if field in user_data:
+            entries = user_data.pop(field)
+            if entries is None:
+                continue
+            # The array is only what the card showed; without its window a
+            # client that never loaded the history would wipe it.
+            window = cursor.get(kind)
+            if not window or len(window) != 2:
+                raise HTTPException(409, "История клиента не загружена — обновите карточку")
+            user_history.replace(session, user.id, kind, entries, window)
     for key, value in user_data.items():
         setattr(user, key, value)
 
@@ -193,7 +370,7 @@ def update_user(
             metadata={"old_role": current_role_db, "new_role": user_in.role},
         )
 
-    return user
+    return _detail(session, user)
 
 
 # ── Subscription freeze ──────────────────────────────────────────────────────
@@ -273,7 +450,7 @@ def toggle_subscription_freeze(
 
 # ── Personal discount ────────────────────────────────────────────────────────
 
-@router.post("/{user_id}/discount", response_model=UserRead)
+@router.post("/{user_id}/discount", response_model=UserDetailRead)
 def update_personal_discount(
     *,
     user_id: str,
@@ -318,11 +495,8 @@ def update_personal_discount(
         "adminName": current_user.name,
     }
 
-    current_history = list(user.discount_history) if user.discount_history else []
-    current_history.insert(0, log_entry)
-
+    user_history.append(session, user.id, user_history.DISCOUNT, log_entry)
     user.personal_discount_percent = percent
-    user.discount_history = current_history
 
     # Auto-switch pricing system
     if percent > 0:
@@ -330,10 +504,6 @@ def update_personal_discount(
     else:
         user.pricing_system = "standard"
 
-    from sqlalchemy.orm.attributes import flag_modified
-
-    flag_modified(user, "discount_history")
-
     session.add(user)
     session.commit()
     session.refresh(user)
@@ -352,7 +522,7 @@ def update_personal_discount(
         metadata={"old_percent": old_percent, "new_percent": percent, "reason": reason},
     )
 
-    return user
+    return _detail(session, user)
 
 
 # ── Balance correction ──────────────────────────────────────────────────────
@@ -497,7 +667,7 @@ def change_user_password(
 
 # ── Permissions management ───────────────────────────────────────────────────
 
-@router.patch("/{user_id}/permissions", response_model=UserRead)
+@router.patch("/{user_id}/permissions", response_model=UserDetailRead)
 def update_permissions(
     user_id: str,
     permissions: List[str] = Body(..., embed=True),
@@ -531,22 +701,24 @@ def update_permissions(
     user.updated_at = datetime.now()
     session.add(user)
 
-    comment_history = list(user.comment_history or [])
-    comment_history.append({
+    user_history.append(session, user.id, user_history.COMMENT, {
         "date": datetime.now().isoformat(),
         "adminName": current_user.name,
         "text": f"Обновлены права доступа: {', '.join(final_permissions) if final_permissions else 'все сброшены'}",
         "type": "permissions_update",
     })
-    user.comment_history = comment_history
     session.commit()
+    # Who gets permission-targeted notifications just changed. The User
+    # mapper hook in notification_service catches this too (and role
+    # changes elsewhere); explicit here because this is THE place for it.
+    recipient_index.invalidate()
     session.refresh(user)
-    return user
+    return _detail(session, user)
 
 
 # ── Subscription top-up ──────────────────────────────────────────────────────
 
-@router.post("/{user_id}/subscription/topup", response_model=UserRead)
+@router.post("/{user_id}/subscription/topup", response_model=UserDetailRead)
 def topup_subscription(
     user_id: str,
     payload: dict = Body(...),
@@ -573,23 +745,20 @@ def topup_subscription(
     if hours <= 0:
         raise HTTPException(400, "Hours must be positive")
 
-    # Write both dialects: this used to be camelCase-only, so billing_defer
-    # (snake-only) saw remaining_hours=0, fell back to cash and charged the
-    # client's balance for hours they had just paid for. See subscription_pool.
-    current_hours = subscription_pool.get_float(user.subscription, "remaining_hours")
-    total_hours = subscription_pool.get_float(user.subscription, "total_hours")
-    user.subscription = subscription_pool.update(
-        user.subscription,
-        remaining_hours=round(current_hours + hours, 2),
-        total_hours=round(total_hours + hours, 2),
-    )
+    # One UPDATE on the pool row (remaining and total += hours), mirrored
+    # back into both JSON dialects — see subscription_pool. A client with no
+    # pool yet gets one from these hours (the row follows on flush).
+    if user.subscription:
+        subscription_pool.topup(session, user, hours, description=f"Пополнение абонемента: {amount} · {payment_method}",
+                                ref_type="user", ref_id=str(user.id), actor=current_user)
+    else:
+        user.subscription = subscription_pool.update(None, remaining_hours=hours, total_hours=hours)
 
-    comment_history = list(user.comment_history or [])
     log_text = (
         f"Пополнение абонемента: +{hours}ч · {amount} · {payment_method} · счёт: {account}"
         + (f" · {note}" if note else "")
     )
-    comment_history.append({
+    user_history.append(session, user.id, user_history.COMMENT, {
         "date": datetime.now().isoformat(),
         "adminName": current_user.name,
         "text": log_text,
@@ -601,7 +770,6 @@ def topup_subscription(
             "account": account,
         },
     })
-    user.comment_history = comment_history
     user.updated_at = datetime.now()
     session.add(user)
 
@@ -627,7 +795,7 @@ def topup_subscription(
 
     session.commit()
     session.refresh(user)
-    return user
+    return _detail(session, user)
 
 
 # ── Change email (senior_admin / owner only) ─────────────────────────────────
@@ -643,7 +811,7 @@ class _ChangeEmailRequest(_Pyd):
     new_email: str
 
 
-@router.post("/{user_id}/change-email", response_model=UserRead)
+@router.post("/{user_id}/change-email", response_model=UserDetailRead)
 def change_user_email(
     *,
     user_id: str,
@@ -710,8 +878,7 @@ def change_user_email(
     user.updated_at = datetime.now()
     session.add(user)
 
-    comment_history = (user.comment_history or []).copy()
-    comment_history.append({
+    user_history.append(session, user.id, user_history.COMMENT, {
         "text": f"Email изменён: {old_email} → {new_email}",
         "author_id": str(current_user.id),
         "author_name": current_user.name or current_user.email,
@@ -721,11 +888,10 @@ def change_user_email(
         "new_email": new_email,
         "cascade": updates,
     })
-    user.comment_history = comment_history
 
     session.commit()
     session.refresh(user)
-    return user
+    return _detail(session, user)
 
 
 # ── Merge two user accounts ──────────────────────────────────────────────────
@@ -735,174 +901,53 @@ def change_user_email(
 # the user owns onto the keeper and deletes the duplicate.
 
 class _MergeUsersRequest(_Pyd):
-    """source: account to absorb (will be deleted).
+    """source / sources: account(s) to absorb (will be deleted).
        target: account to keep (gets all data)."""
-    source: str  # email or UUID of the account being absorbed
+    source: Optional[str] = None  # email or UUID of the account being absorbed
+    sources: List[str] = []  # several duplicates in one go
     target: str  # email or UUID of the account being kept
 
 
-@router.post("/merge", response_model=UserRead)
-def merge_users(
-    *,
-    session: Session = Depends(get_session),
-    payload: _MergeUsersRequest,
-    current_user: User = Depends(deps.require_admin),
-) -> Any:
+def _merge_request(session: Session, payload: _MergeUsersRequest, current_user: User):
     if current_user.role not in ("senior_admin", "owner"):
         raise HTTPException(403, "Только старший администратор или владелец")
-
-    src = _resolve_user(session, payload.source)
+    refs = list(payload.sources) + ([payload.source] if payload.source else [])
+    if not refs:
+        raise HTTPException(400, "Укажите source или sources")
     tgt = _resolve_user(session, payload.target)
-    if src.id == tgt.id:
+    dups = [_resolve_user(session, r) for r in refs]
+    if any(d.id == tgt.id for d in dups):
         raise HTTPException(400, "Нельзя слить аккаунт сам с собой")
+    return tgt, dups
 
-    from sqlalchemy import text
-    user_table = '"user"' if session.bind.dialect.name == 'postgresql' else 'user'
 
-    moved: dict[str, int] = {}
-
-    def _bulk(sql: str, label: str, params: dict) -> None:
-        res = session.execute(text(sql), params)
-        moved[label] = int(getattr(res, "rowcount", 0) or 0)
-
-    # 1) Re-point all referencing rows from src → tgt.
-    # Bookings (uuid + email)
-    _bulk(
-        'UPDATE booking SET user_uuid = :t WHERE user_uuid = :s',
-        "booking.user_uuid", {"s": src.id, "t": tgt.id},
-    )
-    _bulk(
-        'UPDATE booking SET user_id = :t_email WHERE user_id = :s_email',
-        "booking.user_id", {"s_email": src.email, "t_email": tgt.email},
-    )
-    _bulk(
-        'UPDATE booking SET cancelled_by = :t_email WHERE cancelled_by = :s_email',
-        "booking.cancelled_by", {"s_email": src.email, "t_email": tgt.email},
-    )
-    # Waitlist
-    _bulk(
-        'UPDATE waitlist SET user_uuid = :t WHERE user_uuid = :s',
-        "waitlist.user_uuid", {"s": src.id, "t": tgt.id},
-    )
-    _bulk(
-        'UPDATE waitlist SET user_id = :t_email WHERE user_id = :s_email',
-        "waitlist.user_id", {"s_email": src.email, "t_email": tgt.email},
-    )
-    # Cashbox: client_id (email or UUID) + credited_user_id (UUID)
-    _bulk(
-        'UPDATE cashbox_transactions SET client_id = :t_email WHERE client_id = :s_email',
-        "cashbox_transactions.client_id(email)",
-        {"s_email": src.email, "t_email": tgt.email},
-    )
-    _bulk(
-        'UPDATE cashbox_transactions SET client_id = :t_uuid WHERE client_id = :s_uuid',
-        "cashbox_transactions.client_id(uuid)",
-        {"s_uuid": str(src.id), "t_uuid": str(tgt.id)},
-    )
-    _bulk(
-        'UPDATE cashbox_transactions SET credited_user_id = :t WHERE credited_user_id = :s',
-        "cashbox_transactions.credited_user_id",
-        {"s": str(src.id), "t": str(tgt.id)},
-    )
-    # Notifications
-    _bulk(
-        'UPDATE notifications SET recipient_id = :t WHERE recipient_id = :s',
-        "notifications.recipient_id", {"s": str(src.id), "t": str(tgt.id)},
-    )
-    # Psy-CRM data (therapist_* tables use specialist_id == user.id).
-    # Without these, a merge leaves clients/sessions/payments/notes
-    # orphaned under the absorbed UUID and they vanish from CRM. Was
-    # exactly the trap that bit koren.nikolas when his Telegram got
-    # mis-bound to a sibling account.
-    _bulk(
-        'UPDATE therapist_clients SET specialist_id = :t WHERE specialist_id = :s',
-        "therapist_clients.specialist_id", {"s": str(src.id), "t": str(tgt.id)},
-    )
-    _bulk(
-        'UPDATE therapy_sessions SET specialist_id = :t WHERE specialist_id = :s',
-        "therapy_sessions.specialist_id", {"s": str(src.id), "t": str(tgt.id)},
-    )
-    _bulk(
-        'UPDATE therapist_payments SET specialist_id = :t WHERE specialist_id = :s',
-        "therapist_payments.specialist_id", {"s": str(src.id), "t": str(tgt.id)},
-    )
-    _bulk(
-        'UPDATE therapist_notes SET specialist_id = :t WHERE specialist_id = :s',
-        "therapist_notes.specialist_id", {"s": str(src.id), "t": str(tgt.id)},
-    )
-    # User self-refs (responsible / attracted admin links by email)
-    _bulk(
-        f'UPDATE {user_table} SET responsible_admin_id = :t_email WHERE responsible_admin_id = :s_email',
-        "user.responsible_admin_id", {"s_email": src.email, "t_email": tgt.email},
-    )
-    _bulk(
-        f'UPDATE {user_table} SET attracted_by_admin_id = :t_email WHERE attracted_by_admin_id = :s_email',
-        "user.attracted_by_admin_id", {"s_email": src.email, "t_email": tgt.email},
-    )
+@router.post("/merge/preview")
+def preview_merge_users(
+    *,
+    session: Session = Depends(get_session),
+    payload: _MergeUsersRequest,
+    current_user: User = Depends(deps.require_admin),
+) -> Any:
+    """Dry run of /merge: how many rows of each table would move. Writes nothing."""
+    tgt, dups = _merge_request(session, payload, current_user)
+    return user_merge.merge(session, tgt, dups, actor=current_user, dry_run=True)
 
-    # 2) Carry over scalar/JSON fields where the target is empty.
-    if not tgt.telegram_id and src.telegram_id:
-        tgt.telegram_id = src.telegram_id
-    if not tgt.google_id and src.google_id:
-        tgt.google_id = src.google_id
-    if not tgt.phone and src.phone:
-        tgt.phone = src.phone
-    if not tgt.avatar_url and src.avatar_url:
-        tgt.avatar_url = src.avatar_url
-    if not tgt.name and src.name:
-        tgt.name = src.name
-    # Sum balances; src can be negative (debt) — we honour that.
-    from app.services import wallet as _wallet
-    if abs(float(src.balance or 0)) >= 0.01:
-        _wallet.apply(session, tgt, float(src.balance or 0), reason="merge",
-                      description=f"Слияние баланса из {src.email}", actor=current_user)
-    # Take the higher credit limit / personal discount
-    tgt.credit_limit = max(float(tgt.credit_limit or 0), float(src.credit_limit or 0))
-    tgt.personal_discount_percent = max(
-        int(tgt.personal_discount_percent or 0),
-        int(src.personal_discount_percent or 0),
-    )
-    # Subscription: keep target's, fall back to src's
-    if not tgt.subscription and src.subscription:
-        tgt.subscription = src.subscription
-    # Append history lists
-    if src.comment_history:
-        tgt.comment_history = (tgt.comment_history or []) + list(src.comment_history)
-    if src.admin_tasks:
-        tgt.admin_tasks = (tgt.admin_tasks or []) + list(src.admin_tasks)
-    if getattr(src, "discount_history", None):
-        tgt.discount_history = (tgt.discount_history or []) + list(src.discount_history)
-    # Tags union
-    if src.tags:
-        tgt.tags = sorted(set((tgt.tags or []) + list(src.tags)))
-
-    # 3) Drop telegram_id from src first (avoids any unique-collision
-    # downstream if we ever add a unique constraint).
-    src.telegram_id = None
-    src.email = f"merged-into-{tgt.id}-{src.id}@deleted.unbox"  # unique placeholder
-    session.add(src)
-
-    # 4) Audit on the keeper.
-    audit = (tgt.comment_history or []).copy()
-    audit.append({
-        "text": f"Слияние аккаунта {src.email if not src.email.startswith('merged-into-') else '(deleted source)'} → {tgt.email}",
-        "author_id": str(current_user.id),
-        "author_name": current_user.name or current_user.email,
-        "created_at": datetime.now().isoformat(),
-        "type": "user_merge",
-        "absorbed_id": str(src.id),
-        "moved": moved,
-    })
-    tgt.comment_history = audit
-    tgt.updated_at = datetime.now()
-    session.add(tgt)
-    session.flush()
 
-    # 5) Delete the absorbed user.
-    session.delete(src)
+@router.post("/merge", response_model=UserDetailRead)
+def merge_users(
+    *,
+    session: Session = Depends(get_session),
+    payload: _MergeUsersRequest,
+    current_user: User = Depends(deps.require_admin),
+) -> Any:
+    """Every reference to the sources (bookings, waitlist, cashbox, CRM,
+    notifications, …) moves to the target in one transaction — see
+    services/user_merge; balances are summed, the sources deleted."""
+    tgt, dups = _merge_request(session, payload, current_user)
+    user_merge.merge(session, tgt, dups, actor=current_user)
     session.commit()
     session.refresh(tgt)
-    return tgt
+    return _detail(session, tgt)
 
 
 # ── Restore orphaned Psy-CRM data ────────────────────────────────────────────
@@ -972,8 +1017,7 @@ def restore_orphaned_crm(
     )
 
     # Audit the operation on the recipient.
-    audit = (tgt.comment_history or []).copy()
-    audit.append({
+    user_history.append(session, tgt.id, user_history.COMMENT, {
         "text": f"Восстановление CRM: перенесены записи от specialist_id={src_id}",
         "author_id": str(current_user.id),
         "author_name": current_user.name or current_user.email,
@@ -982,7 +1026,6 @@ def restore_orphaned_crm(
         "source_specialist_id": src_id,
         "moved": moved,
     })
-    tgt.comment_history = audit
     tgt.updated_at = datetime.now()
     session.add(tgt)
     session.commit()
@@ -5,19 +5,24 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlmodel import Session, select, func
 from app.api import deps
 from app.db.session import get_session
-from app.models.user import User, UserRead, UserUpdate
+from app.models.user import User, UserMeRead, UserRead, UserUpdate
 from app.models.booking import Booking
+from app.services import user_history
 from app.services.pricing import PricingService
 
 router = APIRouter()
 
 
-@router.get("/me", response_model=UserRead)
+@router.get("/me", response_model=UserMeRead)
 def read_user_me(
+    session: Session = Depends(get_session),
     current_user: User = Depends(deps.get_current_user),
 ) -> Any:
     """Get current user."""
-    return current_user
+    return UserMeRead.model_validate(
+        current_user,
+        update={"previous_emails": sorted(user_history.prior_emails(session, current_user.id))},
+    )
 
 
 @router.get("/me/discount-progress")
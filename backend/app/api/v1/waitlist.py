@@ -1,11 +1,13 @@
 import logging
 from datetime import datetime, timedelta
 from typing import Any, List
+from uuid import UUID
 from fastapi import APIRouter, Depends, HTTPException
 from sqlmodel import select, Session
 from app.api import deps
 from app.models.waitlist import Waitlist, WaitlistCreate, WaitlistRead
 from app.models.user import User
+from app.core.principal import Principal
 from app.models.resource import Resource
 from app.models.location import Location
 from app.core.permissions import ADMIN_ROLES
@@ -52,6 +54,14 @@ def _expire_past_for_user(session: Session, user_uuid) -> int:
     return len(past)
 
 
+def _get_entry(session: Session, entry_id: str):
+    # The id column is a UUID — a raw string only binds on Postgres.
+    try:
+        return session.get(Waitlist, UUID(entry_id))
+    except ValueError:
+        return None
+
+
 @router.get("/my", response_model=List[WaitlistRead])
 def read_my_waitlist(
     session: Session = Depends(deps.get_session),
@@ -150,7 +160,7 @@ def create_waitlist_entry(
 @router.get("/admin/all", response_model=List[WaitlistRead])
 def read_all_waitlist_admin(
     session: Session = Depends(deps.get_session),
-    _admin: User = Depends(deps.require_admin),
+    _admin: Principal = Depends(deps.require_admin_principal),
     skip: int = 0,
     limit: int = 500,
 ) -> Any:
@@ -174,7 +184,7 @@ def read_all_waitlist_admin(
 def notify_waitlist_entry(
     entry_id: str,
     session: Session = Depends(deps.get_session),
-    _admin: User = Depends(deps.require_admin),
+    _admin: Principal = Depends(deps.require_admin_principal),
 ) -> Any:
     """Admin: вручную пингануть клиента из листа ожидания о его слоте.
     Раньше кнопка «уведомить» была заглушкой. Шлёт то же TG-сообщение
@@ -182,7 +192,7 @@ def notify_waitlist_entry(
     НЕ помечается выполненной — админ просто напоминает; удалить запись
     можно отдельно."""
     from app.services.waitlist_notify import _resolve_user
-    entry = session.get(Waitlist, entry_id)
+    entry = _get_entry(session, entry_id)
     if not entry:
         raise HTTPException(status_code=404, detail="Запись не найдена")
     user = _resolve_user(session, entry)
@@ -215,7 +225,7 @@ def delete_waitlist_entry(
     """
     Delete from waitlist (Cancel).
     """
-    entry = session.get(Waitlist, entry_id)
+    entry = _get_entry(session, entry_id)
     if not entry:
         raise HTTPException(status_code=404, detail="Entry not found")
         
@@ -115,6 +115,67 @@ class Settings(BaseSettings):
     # шифрование молча выключалось бы, а заметки писались открытым текстом.
     NOTES_ENCRYPTION_KEY: Optional[str] = None
 
+    # Per-request SQL accounting (core/query_stats). Always on — it's a counter
+    # bump per statement. A request over any threshold logs a warning naming
+    # the route; 0 disables that particular check. SQL_REPEAT_WARN_THRESHOLD is
+    # the N+1 detector: the same statement run that many times with different
+    # parameters inside one request.
+    SQL_QUERY_WARN_THRESHOLD: int = 50
+    SQL_TIME_WARN_MS: float = 500.0
+    SQL_REPEAT_WARN_THRESHOLD: int = 10
+    # X-DB-Queries / X-DB-Time-Ms response headers. None = only outside
+    # production; set explicitly to force them on/off.
+    SQL_STATS_HEADERS: Optional[bool] = None
+
+    # Sampling profiler (core/profiler) — off by default. When on, requests
+    # slower than PROFILER_SLOW_REQUEST_MS (or running any statement slower
+    # than PROFILER_SLOW_SQL_MS) are kept with flame-graph stacks and EXPLAIN
+    # plans; the last PROFILER_MAX_CAPTURES are at GET /admin/profiler/captures.
+    PROFILER_ENABLED: bool = False
+    PROFILER_INTERVAL_MS: int = 10
+    PROFILER_SLOW_REQUEST_MS: float = 1000.0
+    PROFILER_SLOW_SQL_MS: float = 100.0
+    PROFILER_MAX_CAPTURES: int = 20
+
+    # Transactional outbox (services/outbox): GCal/Telegram/email/waitlist
+    # side effects of booking mutations. The worker thread is woken on every
+    # commit that enqueued something and polls every OUTBOX_POLL_SECONDS for
+    # retries. Turn it off on a replica that must not talk to Google/Telegram —
+    # rows stay pending for the process that does run it.
+    OUTBOX_WORKER_ENABLED: bool = True
+    OUTBOX_POLL_SECONDS: float = 5.0
+
+    # Live push (GET /events/stream, services/realtime). On Postgres every
+    # process LISTENs for booking/notification changes; the heartbeat is an
+    # SSE comment that keeps proxies from dropping an idle stream.
+    SSE_HEARTBEAT_SECONDS: float = 15.0
+
+    # Catalogue response cache (core/http_cache). Entries are invalidated by
+    # table-version bumps on commit; the TTL only bounds how long a write the
+    # app never saw (raw SQL, a script) can stay invisible.
+    HTTP_CACHE_TTL_SECONDS: float = 300.0
+
+    # Image uploads (services/images): resize/encode threads, and whether to
+    # also write AVIF next to WebP (~30% smaller, several times slower to
+    # encode — on the 1-vCPU droplet that's the knob if uploads feel slow).
+    IMAGE_WORKERS: int = 2
+    IMAGE_AVIF: bool = True
+
+    # Task attachments (services/task_files): an uploaded file nobody attaches
+    # — or whose last task dropped it — is deleted by the cleanup cron only
+    # after this long, so a half-filled task form doesn't lose its upload.
+    TASK_FILE_ORPHAN_GRACE_HOURS: float = 24.0
+
+    # Google Calendar writes (services/gcal_writer): how many batch requests
+    # (one calendar, ≤50 operations each) run in parallel. Google throttles
+    # per calendar anyway; more threads than rooms buys nothing.
+    GCAL_WORKERS: int = 4
+
+    # Auth principal cache (core/principal): how long a worker trusts its copy
+    # of a user's role/permissions/archived flag when the change came from
+    # another process. Changes made through this process evict immediately.
+    AUTH_PRINCIPAL_TTL_SECONDS: float = 30.0
+
     model_config = SettingsConfigDict(env_file=str(ENV_FILE), case_sensitive=True, extra='ignore')
 
 settings = Settings()
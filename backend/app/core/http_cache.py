@@ -0,0 +1,231 @@
+"""ETag / Cache-Control for the public catalogue endpoints.
+
+/resources, /locations, /specialists, /team, /posts and the exchange rates
+are read on every SPA page load and change a few times a week. Each read
+used to be a threadpool hop, a pooled connection and a query (or three,
+for specialists and posts) to produce the same bytes as last time.
+
+Each cached endpoint declares the tables it reads. Every table has a
+per-process version counter, bumped after any commit that wrote to it —
+ORM flushes and `session.exec(update(...))` alike (Session events,
+installed from db/session.py). A response is kept together with the
+versions it was built from; while they are unchanged the endpoint returns
+the stored body without touching the database, and a client sending the
+matching `If-None-Match` gets a bodiless 304.
+
+The ETag is a hash of the body, not of the versions, so every uvicorn
+worker hands out the same tag for the same content and nginx/browser
+revalidation works whichever process answers.
+
+Across processes: a commit touching a tracked table also sends
+`pg_notify` (Postgres only); services/realtime LISTENs and bumps the same
+counters here. Writes that never go through a Session of a process that
+loaded the API (raw SQL, a one-off script) aren't announced — entries
+therefore also expire after HTTP_CACHE_TTL_SECONDS as a backstop.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Iterable, Optional
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session as _SASession
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Same channel as services/realtime, which owns the LISTEN side.
+NOTIFY_CHANNEL = "unbox_events"
+_MAX_ENTRIES = 512
+_DIRTY = "http_cache_tables"
+
+_lock = threading.Lock()
+_versions: dict[str, int] = {}
+_tracked: set[str] = set()
+_entries: "OrderedDict[tuple, tuple[tuple, float, bytes, str]]" = OrderedDict()
+_adapters: dict[Any, TypeAdapter] = {}
+
+
+def track(*tables: str) -> tuple[str, ...]:
+    """Declare tables some cached endpoint depends on. Writes to untracked
+    tables (bookings, cashbox…) cost nothing here."""
+    _tracked.update(tables)
+    return tables
+
+
+def bump(tables: Iterable[str]) -> None:
+    with _lock:
+        for t in tables:
+            if t in _tracked:
+                _versions[t] = _versions.get(t, 0) + 1
+
+
+def versions(tables: Iterable[str]) -> tuple:
+    return tuple(_versions.get(t, 0) for t in tables)
+
+
+def clear() -> None:
+    with _lock:
+        _entries.clear()
+
+
+# ── write side: which tables did this transaction touch ──────────────────────
+
+def _table_of(obj) -> Optional[str]:
+    table = getattr(obj, "__table__", None)
+    return table.name if table is not None else None
+
+
+def _mark(session, names) -> None:
+    names = {n for n in names if n in _tracked}
+    if names:
+        session.info.setdefault(_DIRTY, set()).update(names)
+
+
+def _after_flush(session, flush_context) -> None:
+    touched = [_table_of(o) for o in session.new]
+    touched += [_table_of(o) for o in session.deleted]
+    touched += [_table_of(o) for o in session.dirty if session.is_modified(o, include_collections=False)]
+    _mark(session, touched)
+
+
+def _do_orm_execute(state) -> None:
+    # Bulk DML (`session.exec(update(Specialist)...)`) bypasses the flush.
+    if state.is_insert or state.is_update or state.is_delete:
+        table = getattr(state.statement, "table", None)
+        if table is not None:
+            _mark(state.session, [table.name])
+
+
+def _after_commit(session) -> None:
+    tables = session.info.pop(_DIRTY, None)
+    if not tables:
+        return
+    bump(tables)
+    try:
+        bind = session.get_bind()
+        if bind.dialect.name != "postgresql":
+            return
+        payload = json.dumps({"channel": "tables", "data": {"tables": sorted(tables)}})
+        # The commit is done; a short autocommit statement of our own.
+        with bind.connect() as conn:
+            conn.execute(text("SELECT pg_notify(:ch, :p)"), {"ch": NOTIFY_CHANNEL, "p": payload})
+            conn.commit()
+    except Exception as e:
+        logger.warning("[http_cache] version NOTIFY failed: %r", e)
+
+
+def _after_rollback(session) -> None:
+    session.info.pop(_DIRTY, None)
+
+
+def install() -> None:
+    """Register the Session listeners (idempotent)."""
+    for name, fn in (
+        ("after_flush", _after_flush),
+        ("do_orm_execute", _do_orm_execute),
+        ("after_commit", _after_commit),
+        ("after_rollback", _after_rollback),
+    ):
+        if not event.contains(_SASession, name, fn):
+            event.listen(_SASession, name, fn)
+
+
+# ── read side ────────────────────────────────────────────────────────────────
+
+def _adapter(model) -> TypeAdapter:
+    adapter = _adapters.get(model)
+    if adapter is None:
+        adapter = _adapters[model] = TypeAdapter(model)
+    return adapter
+
+
+def _serialize(data: Any, model) -> bytes:
+    if model is None:
+        return json.dumps(data, separators=(",", ":"), default=str).encode()
+    adapter = _adapter(model)
+    return adapter.dump_json(adapter.validate_python(data, from_attributes=True), by_alias=True)
+
+
+def _cache_key(request: Request, name: str) -> tuple:
+    return (name, str(request.url.query))
+
+
+def _lookup(key: tuple, vkey: tuple) -> Optional[tuple[bytes, str]]:
+    with _lock:
+        hit = _entries.get(key)
+        if hit is None or hit[0] != vkey or time.monotonic() - hit[1] > settings.HTTP_CACHE_TTL_SECONDS:
+            return None
+        _entries.move_to_end(key)
+        return hit[2], hit[3]
+
+
+def _store(key: tuple, vkey: tuple, body: bytes) -> tuple[bytes, str]:
+    etag = f'"{hashlib.sha1(body).hexdigest()}"'
+    with _lock:
+        _entries[key] = (vkey, time.monotonic(), body, etag)
+        while len(_entries) > _MAX_ENTRIES:
+            _entries.popitem(last=False)
+    return body, etag
+
+
+def _respond(request: Request, body: bytes, etag: str, private: bool) -> Response:
+    # Anonymous catalogue reads: nginx/browsers may keep a copy for a few
+    # seconds and then serve it stale while revalidating in the background.
+    # Authenticated ones always revalidate — an admin who just renamed a room
+    # must see it on the next fetch — but that revalidation is a 304 with no
+    # DB work.
+    if private or request.headers.get("authorization"):
+        cache_control = "private, no-cache"
+    else:
+        cache_control = "public, max-age=10, stale-while-revalidate=60"
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Authorization"}
+    inm = request.headers.get("if-none-match")
+    if inm and ("*" in inm or etag in {t.strip().removeprefix("W/") for t in inm.split(",")}):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+def cached_json(
+    request: Request,
+    name: str,
+    tables: tuple[str, ...],
+    build: Callable[[], Any],
+    *,
+    model: Any = None,
+    private: bool = False,
+) -> Response:
+    """Serve `build()` (serialised through `model`, like response_model)
+    from the cache while `tables` are unchanged. For sync routes."""
+    key, vkey = _cache_key(request, name), versions(tables)
+    hit = _lookup(key, vkey)
+    if hit is None:
+        # vkey was read before build(): a write landing mid-build bumps past
+        # it, so at worst the next request rebuilds once more.
+        hit = _store(key, vkey, _serialize(build(), model))
+    return _respond(request, *hit, private)
+
+
+async def cached_json_async(
+    request: Request,
+    name: str,
+    tables: tuple[str, ...],
+    build: Callable[[], Awaitable[Any]],
+    *,
+    model: Any = None,
+    private: bool = False,
+) -> Response:
+    """`cached_json` for `async def` routes — `build` is awaited."""
+    key, vkey = _cache_key(request, name), versions(tables)
+    hit = _lookup(key, vkey)
+    if hit is None:
+        hit = _store(key, vkey, _serialize(await build(), model))
+    return _respond(request, *hit, private)
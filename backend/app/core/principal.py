@@ -0,0 +1,173 @@
+"""Who is calling: a slim, cached view of the authenticated user.
+
+Every authenticated request used to `session.get(User, id)` — the whole row,
+including the JSON blobs (`crm_data`, `subscription`, `additional_contacts`;
+the history arrays have since moved to services/user_history). Most routes
+only look at id / role / permissions.
+
+Two layers (see api/deps):
+
+* `Principal` — id, email, name, role, permissions, archived flag. Read with
+  one narrow SELECT and kept in a per-process cache for
+  AUTH_PRINCIPAL_TTL_SECONDS. Gate-style dependencies (`get_principal`,
+  `require_admin_principal`) are served from it; a hit needs no DB session
+  at all.
+* `get_current_user` still returns a real `User` for handlers that change
+  it, but with the blobs deferred (`HEAVY_COLUMNS`): they load on first
+  access, in the same session, only for the handlers that touch them.
+
+Invalidation follows services/notification_service: a committed ORM update
+or delete of a User evicts that id, a bulk `update(User)` clears the cache,
+and the TTL bounds how long another process's change (role revoked,
+account archived) can go unseen.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+from uuid import UUID
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session as _SASession, defer
+from sqlmodel import select
+
+from app.core.config import settings
+from app.models.user import User
+
+_MAX_ENTRIES = 4096
+_DIRTY = "principal_dirty"
+_ALL = "*"
+
+# Per-user JSON blobs, deferred wherever only the identity is needed.
+HEAVY_COLUMNS = (
+    User.crm_data,
+    User.subscription,
+    User.additional_contacts,
+)
+
+
+def without_heavy_columns():
+    """Loader options for `select(User)` that leave the blobs unloaded."""
+    return [defer(c) for c in HEAVY_COLUMNS]
+
+
+@dataclass(frozen=True)
+class Principal:
+    id: UUID
+    email: str
+    name: str
+    role: str
+    permissions: tuple[str, ...]
+    archived: bool
+
+
+_COLUMNS = (User.id, User.email, User.name, User.role, User.permissions, User.archived_at)
+
+
+def _principal(row) -> Principal:
+    uid, email, name, role, permissions, archived_at = row
+    return Principal(uid, email, name or "", role or "", tuple(permissions or ()), archived_at is not None)
+
+
+class PrincipalCache:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._entries: "OrderedDict[UUID, tuple[Principal, float]]" = OrderedDict()
+
+    def get(self, user_id: UUID) -> Optional[Principal]:
+        with self._lock:
+            hit = self._entries.get(user_id)
+            if hit is None:
+                return None
+            if time.monotonic() - hit[1] > settings.AUTH_PRINCIPAL_TTL_SECONDS:
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return hit[0]
+
+    def generation(self) -> int:
+        return self._generation
+
+    def put(self, principal: Principal, generation: int) -> None:
+        with self._lock:
+            # An eviction landed while the row was being read — it may
+            # predate the change, don't keep it.
+            if generation != self._generation:
+                return
+            self._entries[principal.id] = (principal, time.monotonic())
+            self._entries.move_to_end(principal.id)
+            while len(self._entries) > _MAX_ENTRIES:
+                self._entries.popitem(last=False)
+
+    def evict(self, ids) -> None:
+        with self._lock:
+            self._generation += 1
+            if _ALL in ids:
+                self._entries.clear()
+                return
+            for uid in ids:
+                self._entries.pop(uid, None)
+
+    def load(self, session, user_id: UUID) -> Optional[Principal]:
+        hit = self.get(user_id)
+        if hit is not None:
+            return hit
+        generation = self._generation
+        row = session.exec(select(*_COLUMNS).where(User.id == user_id)).first()
+        if row is None:
+            return None
+        principal = _principal(row)
+        self.put(principal, generation)
+        return principal
+
+    async def load_async(self, session, user_id: UUID) -> Optional[Principal]:
+        hit = self.get(user_id)
+        if hit is not None:
+            return hit
+        generation = self._generation
+        row = (await session.exec(select(*_COLUMNS).where(User.id == user_id))).first()
+        if row is None:
+            return None
+        principal = _principal(row)
+        self.put(principal, generation)
+        return principal
+
+
+principals = PrincipalCache()
+
+
+# ── invalidation ─────────────────────────────────────────────────────────────
+
+def _mark(session, ids) -> None:
+    if session is not None:
+        session.info.setdefault(_DIRTY, set()).update(ids)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _user_changed(mapper, connection, target) -> None:
+    _mark(_SASession.object_session(target), [target.id])
+
+
+@event.listens_for(_SASession, "do_orm_execute")
+def _bulk_user_write(state) -> None:
+    if state.is_update or state.is_delete:
+        table = getattr(state.statement, "table", None)
+        if table is not None and table.name == User.__tablename__:
+            _mark(state.session, [_ALL])
+
+
+@event.listens_for(_SASession, "after_commit")
+def _evict_after_commit(session) -> None:
+    ids = session.info.pop(_DIRTY, None)
+    if ids:
+        principals.evict(ids)
+
+
+@event.listens_for(_SASession, "after_rollback")
+def _drop_dirty(session) -> None:
+    session.info.pop(_DIRTY, None)
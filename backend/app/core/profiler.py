@@ -0,0 +1,279 @@
+"""Opt-in sampling profiler for slow requests and slow SQL (PROFILER_ENABLED).
+
+create_booking alone is ~650 lines of pricing, ledger, GCal, Telegram and
+timeline side effects; under load nobody can say where its time goes. This
+answers that without a deploy-time tool:
+
+  * a daemon timer thread snapshots `sys._current_frames()` every
+    PROFILER_INTERVAL_MS while at least one request is in flight;
+  * each sample is folded into "collapsed stack" counts (`a;b;c 42`) — the
+    input format of flamegraph.pl / speedscope / inferno;
+  * SQL statements slower than PROFILER_SLOW_SQL_MS are kept with their
+    parameters and EXPLAINed afterwards, off the request path;
+  * requests slower than PROFILER_SLOW_REQUEST_MS are pushed into a ring buffer
+    of the last PROFILER_MAX_CAPTURES captures, readable via
+    GET /admin/profiler/captures (owner only).
+
+Thread attribution: sync endpoints run in threadpool workers, and another
+thread's ContextVars can't be read from the sampler. A worker is bound to a
+request the first time it executes SQL for it (the engine listener runs in the
+request's copied context). Our own background threads (`unbox-*`: the outbox
+worker, the GCal and image pools, EXPLAIN) never serve a request and are not
+sampled. Samples from other unbound threads that are inside app code (a worker
+before its first query, the event loop — realtime LISTEN, async routes) go to
+every active capture, and each capture that gets one is flagged `concurrent`,
+as is every capture overlapping another request, so a mixed profile is never
+mistaken for a clean one.
+
+Off by default: the sampler costs a few % CPU while requests are running.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger("unbox.profiler")
+
+_APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_MAX_STACK_DEPTH = 64
+_MAX_SLOW_SQL_PER_CAPTURE = 20
+# Thread names of our own workers (outbox, gcal/image pools, explain, the
+# sampler itself) — never a request's work.
+_BACKGROUND_PREFIX = "unbox-"
+
+_current: ContextVar[Optional["Capture"]] = ContextVar("unbox_profiler_capture", default=None)
+
+
+@dataclass
+class Capture:
+    """Everything recorded for one request."""
+
+    label: str
+    started_at: datetime = field(default_factory=datetime.now)
+    duration_ms: float = 0.0
+    samples: Counter = field(default_factory=Counter)
+    sample_count: int = 0
+    slow_sql: list = field(default_factory=list)
+    concurrent: bool = False
+    threads: set = field(default_factory=set, repr=False)
+    slow_sql_ms: float = field(default=100.0, repr=False)
+    _t0: float = field(default_factory=time.perf_counter, repr=False)
+    _token: object = field(default=None, repr=False)
+
+    def to_dict(self) -> dict:
+        return {
+            "label": self.label,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(self.duration_ms, 1),
+            "sample_count": self.sample_count,
+            "concurrent": self.concurrent,
+            # Collapsed stacks, hottest first — paste into speedscope as-is.
+            "flamegraph": [f"{stack} {n}" for stack, n in self.samples.most_common()],
+            "slow_sql": [
+                {k: v for k, v in q.items() if k != "parameters"} for q in self.slow_sql
+            ],
+        }
+
+
+class SamplingProfiler:
+    def __init__(self) -> None:
+        self.enabled = False
+        self.interval_s = 0.01
+        self.slow_request_ms = 1000.0
+        self.slow_sql_ms = 100.0
+        self._captures: deque = deque(maxlen=20)
+        self._active: list[Capture] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._engine: Optional[Engine] = None
+        self._explainer: Optional[ThreadPoolExecutor] = None
+
+    # ── lifecycle ─────────────────────────────────────────────────────────
+    def configure(
+        self,
+        engine: Engine,
+        *,
+        interval_ms: int,
+        slow_request_ms: float,
+        slow_sql_ms: float,
+        max_captures: int,
+    ) -> None:
+        self.interval_s = max(1, interval_ms) / 1000.0
+        self.slow_request_ms = slow_request_ms
+        self.slow_sql_ms = slow_sql_ms
+        self._captures = deque(self._captures, maxlen=max(1, max_captures))
+        self._engine = engine
+        self.watch(engine)
+        self.enabled = True
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._run, name="unbox-profiler", daemon=True,
+            )
+            self._thread.start()
+
+    def watch(self, engine: Engine) -> None:
+        """Record slow statements from another engine too (the async one).
+        EXPLAIN still runs on the configured sync engine — same database."""
+        if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+            event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+    # ── per request ───────────────────────────────────────────────────────
+    def start(self, label: str) -> Optional[Capture]:
+        if not self.enabled:
+            return None
+        capture = Capture(label=label, slow_sql_ms=self.slow_sql_ms)
+        capture.threads.add(threading.get_ident())
+        with self._lock:
+            self._active.append(capture)
+            if len(self._active) > 1:
+                for c in self._active:
+                    c.concurrent = True
+        capture._token = _current.set(capture)
+        self._wake.set()
+        return capture
+
+    def stop(self, capture: Optional[Capture], label: Optional[str] = None) -> None:
+        if capture is None:
+            return
+        capture.duration_ms = (time.perf_counter() - capture._t0) * 1000.0
+        try:
+            _current.reset(capture._token)
+        except ValueError:
+            pass  # stopped from a different context — the var dies with it anyway
+        if label:
+            capture.label = label
+        with self._lock:
+            if capture in self._active:
+                self._active.remove(capture)
+        if capture.duration_ms < self.slow_request_ms and not capture.slow_sql:
+            return
+        with self._lock:
+            self._captures.append(capture)
+        if capture.slow_sql:
+            self._explain_later(capture)
+
+    def captures(self) -> list[dict]:
+        with self._lock:
+            snapshot = list(self._captures)
+        return [c.to_dict() for c in reversed(snapshot)]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._captures.clear()
+
+    # ── sampling ──────────────────────────────────────────────────────────
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while True:
+            if not self._active:
+                self._wake.clear()
+                if not self._active:  # re-check: start() may have raced the clear
+                    self._wake.wait()
+            time.sleep(self.interval_s)
+            with self._lock:
+                active = list(self._active)
+            if not active:
+                continue
+            background = {t.ident for t in threading.enumerate() if t.name.startswith(_BACKGROUND_PREFIX)}
+            for tid, frame in sys._current_frames().items():
+                if tid == own or tid in background:
+                    continue
+                stack = _collapse(frame)
+                if stack is None:
+                    continue  # idle worker / event loop waiting on I/O
+                owners = [c for c in active if tid in c.threads]
+                if not owners:
+                    # Can't tell whose work this is: count it, but say so.
+                    owners = active
+                    for c in owners:
+                        c.concurrent = True
+                for c in owners:
+                    c.samples[stack] += 1
+                    c.sample_count += 1
+
+    # ── slow SQL ──────────────────────────────────────────────────────────
+    def _explain_later(self, capture: Capture) -> None:
+        if self._explainer is None:
+            self._explainer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="unbox-explain")
+        self._explainer.submit(self._explain, capture)
+
+    def _explain(self, capture: Capture) -> None:
+        if self._engine is None:
+            return
+        prefix = "EXPLAIN " if self._engine.dialect.name == "postgresql" else "EXPLAIN QUERY PLAN "
+        for i, q in enumerate(list(capture.slow_sql)):
+            # Replace the entry rather than mutate it: captures() may be
+            # serialising this capture from a request thread right now.
+            done = {k: v for k, v in q.items() if k != "parameters"}
+            if q["statement"].lstrip().upper().startswith(("SELECT", "WITH")):
+                try:
+                    with self._engine.connect() as conn:
+                        rows = conn.exec_driver_sql(prefix + q["statement"], q.get("parameters") or ()).fetchall()
+                    done["plan"] = "\n".join(" ".join(str(col) for col in row) for row in rows)
+                except Exception as e:
+                    done["plan_error"] = str(e)[:300]
+            # Writes are skipped: plain EXPLAIN is harmless, but they're not what we tune here.
+            capture.slow_sql[i] = done
+
+
+def _collapse(frame) -> Optional[str]:
+    """Collapsed "outer;...;inner" stack, or None when no app frame is on it."""
+    parts = []
+    in_app = False
+    depth = 0
+    while frame is not None and depth < _MAX_STACK_DEPTH:
+        code = frame.f_code
+        filename = code.co_filename
+        if filename.startswith(_APP_ROOT):
+            in_app = True
+            filename = os.path.relpath(filename, os.path.dirname(_APP_ROOT))
+        else:
+            filename = os.path.basename(filename)
+        parts.append(f"{code.co_name} ({filename}:{frame.f_lineno})")
+        frame = frame.f_back
+        depth += 1
+    if not in_app:
+        return None
+    return ";".join(reversed(parts))
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    capture = _current.get()
+    if capture is None:
+        return
+    capture.threads.add(threading.get_ident())
+    conn.info.setdefault("unbox_profiler_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    capture = _current.get()
+    if capture is None:
+        return
+    starts = conn.info.get("unbox_profiler_start")
+    if not starts:
+        return
+    elapsed_ms = (time.perf_counter() - starts.pop()) * 1000.0
+    if elapsed_ms < capture.slow_sql_ms or len(capture.slow_sql) >= _MAX_SLOW_SQL_PER_CAPTURE:
+        return
+    capture.slow_sql.append({
+        "statement": statement,
+        "elapsed_ms": round(elapsed_ms, 1),
+        "parameters": None if executemany else parameters,
+    })
+
+
+profiler = SamplingProfiler()
@@ -0,0 +1,162 @@
+"""Per-request SQL accounting: query count, DB time and N+1 detection.
+
+Hooked into SQLAlchemy engine events (`install(engine)` in db/session.py), so
+every statement — ORM, `session.exec`, raw `text()` — is seen regardless of
+which helper issued it. Accounting only happens inside a `track()` block; the
+HTTP middleware in main.py opens one per request, scripts and cron jobs never
+do, so for them the listeners are a single ContextVar lookup per statement.
+
+Why a ContextVar and not a thread-local: almost every endpoint is a plain
+`def` that FastAPI runs in the threadpool. anyio copies the request's context
+into the worker thread, and since the copied var still points at the same
+`QueryStats` object, statements executed there land in the request's counter.
+
+N+1 detection: SQLAlchemy renders the same statement text for the same query
+shape and ships the values separately as bound parameters. So "the same text
+executed many times with different parameters" is exactly the loop-over-rows
+pattern (`session.get(User, b.user_uuid)` per booking, etc.).
+"""
+from __future__ import annotations
+
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger("unbox.sql")
+
+# Cap on distinct parameter fingerprints remembered per statement — enough to
+# tell "37 lookups with 37 ids" from "the same query 37 times", without a
+# runaway request (a 5000-row export) holding every parameter tuple in memory.
+_MAX_PARAM_FINGERPRINTS = 1000
+
+_current: ContextVar[Optional["QueryStats"]] = ContextVar("unbox_query_stats", default=None)
+
+
+@dataclass
+class QueryStats:
+    """Counters for one unit of work (a request, a test block, a script run)."""
+
+    label: str = ""
+    count: int = 0
+    total_ms: float = 0.0
+    statements: Counter = field(default_factory=Counter)
+    _param_fingerprints: dict = field(default_factory=dict, repr=False)
+
+    def record(self, statement: str, parameters, elapsed_ms: float) -> None:
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.statements[statement] += 1
+        seen = self._param_fingerprints.setdefault(statement, set())
+        if len(seen) < _MAX_PARAM_FINGERPRINTS:
+            try:
+                seen.add(hash(repr(parameters)))
+            except Exception:
+                pass
+
+    def repeated(self, threshold: int) -> list[tuple[str, int, int]]:
+        """Statements executed at least `threshold` times with DIFFERENT
+        parameters: (statement, executions, distinct parameter sets), worst
+        first. Same-parameter repeats (re-reading one row) are not N+1."""
+        out = []
+        for stmt, n in self.statements.most_common():
+            if n < threshold:
+                break
+            distinct = len(self._param_fingerprints.get(stmt, ()))
+            if distinct > 1:
+                out.append((stmt, n, distinct))
+        return out
+
+
+def current() -> Optional[QueryStats]:
+    """Stats of the enclosing `track()` block, or None outside of one."""
+    return _current.get()
+
+
+@contextmanager
+def track(label: str = "") -> Iterator[QueryStats]:
+    """Count every statement executed in this context (and in threadpool
+    workers spawned from it) into a fresh `QueryStats`."""
+    stats = QueryStats(label=label)
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("unbox_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is None:
+        return
+    starts = conn.info.get("unbox_query_start")
+    if not starts:
+        return
+    elapsed_ms = (time.perf_counter() - starts.pop()) * 1000.0
+    stats.record(statement, parameters, elapsed_ms)
+
+
+def route_label(request) -> str:
+    """"GET /api/v1/bookings/{booking_id}" for a handled request, so warnings
+    group per endpoint instead of per booking id.
+
+    Built from the matched route in scope["route"]. FastAPI keeps included
+    routers nested, so that route only knows its own relative template; the
+    prefix in front of it is the part of the path its regex doesn't cover.
+    A request no route matched keeps its raw path."""
+    path = request.url.path
+    route = request.scope.get("route")
+    template = getattr(route, "path_format", None)
+    regex = getattr(route, "path_regex", None)
+    if template and regex:
+        params = request.path_params or {}
+        convertors = getattr(route, "param_convertors", {})
+        for i, ch in enumerate(path):
+            if ch != "/":
+                continue
+            m = regex.match(path[i:])
+            # A {name:path} parameter could swallow part of the prefix — the
+            # right split is the one that yields the request's own params.
+            if m and all(
+                name not in params or (convertors[name].convert(value) if name in convertors else value) == params[name]
+                for name, value in m.groupdict().items()
+            ):
+                return f"{request.method} {path[:i]}{template}"
+    return f"{request.method} {path}"
+
+
+def install(engine: Engine) -> None:
+    """Attach the accounting listeners to `engine`. Idempotent."""
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def report(stats: QueryStats, *, max_queries: int, max_ms: float, repeat_threshold: int) -> None:
+    """Log a warning naming the route when `stats` crossed any threshold."""
+    problems = []
+    if max_queries and stats.count > max_queries:
+        problems.append(f"{stats.count} queries (limit {max_queries})")
+    if max_ms and stats.total_ms > max_ms:
+        problems.append(f"{stats.total_ms:.0f} ms in DB (limit {max_ms:.0f})")
+    repeats = stats.repeated(repeat_threshold) if repeat_threshold else []
+    if repeats:
+        problems.append(f"{len(repeats)} N+1 suspect(s)")
+    if not problems:
+        return
+    lines = [f"[sql] {stats.label}: " + ", ".join(problems)]
+    for stmt, n, distinct in repeats[:3]:
+        lines.append(f"    ×{n} ({distinct} param sets): {' '.join(stmt.split())[:300]}")
+    logger.warning("\n".join(lines))
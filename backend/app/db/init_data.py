@@ -7,6 +7,9 @@ from app.models.balance_ledger import BalanceLedger  # noqa: F401
 from app.core.config import settings
 from app.core.security import get_password_hash
 from app.db.session import engine
+# seed() производных таблиц; их ORM-события регистрирует app.models.
+# Лечение (rebuild) — только вручную: scripts/rebuild_derived.py.
+from app.services import cash_totals, occupancy, user_identity
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -265,6 +268,19 @@ def migrate_add_columns():
         except Exception:
             conn.rollback()
 
+    # booking.gcal_sync_failed — persisted by services/gcal_writer. Every
+    # Booking SELECT names the column, so it must exist before the first
+    # request; create_tables.py carries it too for manual runs.
+    with engine.connect() as conn:
+        try:
+            if dialect == 'postgresql':
+                conn.execute(text("ALTER TABLE booking ADD COLUMN IF NOT EXISTS gcal_sync_failed BOOLEAN DEFAULT FALSE"))
+            else:
+                conn.execute(text("ALTER TABLE booking ADD COLUMN gcal_sync_failed BOOLEAN DEFAULT 0"))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+
     # ── Hot-path indexes (2026-07-13 audit) ───────────────────────────────
     # `booking` carried indexes only on user_id / created_at / payment_status /
     # reminder_sent_at / created_by_id, while ~69 queries filter on date,
@@ -290,14 +306,23 @@ def migrate_add_columns():
             "CREATE INDEX IF NOT EXISTS ix_booking_location_date ON booking (location_id, date)",
             # Audit feed: ORDER BY timestamp DESC LIMIT 50 over the whole table.
             "CREATE INDEX IF NOT EXISTS ix_timelineevent_timestamp ON timelineevent (timestamp DESC)",
-            # Cashbox balance aggregates group by payment_method over all history.
-            "CREATE INDEX IF NOT EXISTS ix_cashbox_payment_method ON cashbox_transactions (payment_method)",
+            # Shift window (preview/close): cash rows of one branch since the
+            # last close, recon rows excluded — every predicate in index order.
+            # Replaces ix_cashbox_payment_method (its prefix); lifetime balances
+            # now come from cashbox_balances (services/cash_totals).
+            "CREATE INDEX IF NOT EXISTS ix_cashbox_method_branch_date_cat "
+            "ON cashbox_transactions (payment_method, branch, date, category_id)",
+            "DROP INDEX IF EXISTS ix_cashbox_payment_method",
             # Weekly volume credit: one row per (user, week) — the anti-double-credit
             # journal the model docstring always claimed to be. Until now it was
             # enforced only by a SELECT-before-INSERT, which two parallel runs
             # (cron + the admin button, or two tabs) both pass.
             "CREATE UNIQUE INDEX IF NOT EXISTS uq_weekly_rebate_user_week "
             "ON weekly_rebates (user_id, week_start)",
+            # Outbox worker poll: due pending rows only — done rows pile up
+            # and must not make the claim query slower over time.
+            "CREATE INDEX IF NOT EXISTS ix_outbox_due ON outbox_events (next_attempt_at) "
+            "WHERE status = 'pending'",
             # One payment per CRM session. quick-pay now takes a row lock, but the
             # DB is the only thing that can't be raced: a partial unique index
             # (session_id IS NOT NULL) still allows the many ad-hoc payments that
@@ -312,7 +337,7 @@ def migrate_add_columns():
                     conn.commit()
                 except Exception as e:
                     conn.rollback()
-                    logger.warning("Index migration skipped (%s): %s", stmt.split()[5], e)
+                    logger.warning("Index migration skipped (%s): %s", " ".join(stmt.split()[:6]), e)
 
     # Seed the cash-reconciliation category. When a shift closes with a
     # non-zero discrepancy, end_shift writes a balancing CashboxTransaction
@@ -351,6 +376,131 @@ def migrate_add_columns():
                 conn.rollback()
 
 
+# ── User history: JSON arrays → user_history rows ────────────────────────────
+# comment_history / admin_tasks / discount_history used to be JSON arrays on
+# the User row, and series-end reminder marks a dict inside crm_data (see
+# services/user_history). Every boot moves whatever is still there into rows
+# and NULLs the old columns in the same transaction: a user is moved exactly
+# once, and an interrupted run just resumes. The columns themselves stay
+# (nullable, unused) until every environment has booted this.
+
+_LEGACY_HISTORY = (
+    ("comment_history", "comment", False),
+    ("admin_tasks", "admin_task", False),
+    # Stored newest first; inserted oldest first so seq stays chronological.
+    ("discount_history", "discount", True),
+)
+
+
+def _legacy_list(value) -> list:
+    import json
+
+    if isinstance(value, (str, bytes)):  # SQLite hands JSON back as text
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return []
+    return [e for e in value if isinstance(e, dict)] if isinstance(value, list) else []
+
+
+def migrate_user_history(batch: int = 200) -> int:
+    """Move legacy User history blobs into user_history. Idempotent; returns
+    the number of entries moved."""
+    from uuid import UUID
+    from sqlalchemy import String, cast, inspect as sa_inspect, text
+    from app.services import user_history
+
+    moved = 0
+    present = {c["name"] for c in sa_inspect(engine).get_columns("user")}
+    legacy = [spec for spec in _LEGACY_HISTORY if spec[0] in present]
+    if legacy:
+        user_table = '"user"' if engine.dialect.name == 'postgresql' else 'user'
+        cols = [c for c, _, _ in legacy]
+        pick = text(
+            f"SELECT id, {', '.join(cols)} FROM {user_table} "
+            f"WHERE {' OR '.join(f'{c} IS NOT NULL' for c in cols)} LIMIT :n"
+        )
+        clear = text(f"UPDATE {user_table} SET {', '.join(f'{c} = NULL' for c in cols)} WHERE id = :id")
+        try:
+            while True:
+                with Session(engine) as ses:
+                    rows = ses.execute(pick, {"n": batch}).all()
+                    if not rows:
+                        break
+                    for row in rows:
+                        uid = UUID(str(row[0]))
+                        for (_, kind, newest_first), raw in zip(legacy, row[1:]):
+                            entries = _legacy_list(raw)
+                            for entry in (reversed(entries) if newest_first else entries):
+                                user_history.append(ses, uid, kind, entry)
+                                moved += 1
+                        ses.execute(clear, {"id": row[0]})
+                    ses.commit()
+        except Exception as e:
+            logger.warning("User history migration stopped after %d entries: %s", moved, e)
+            return moved
+
+    # crm_data["series_reminders"] = {group_id: threshold} → SeriesReminderMark
+    try:
+        with Session(engine) as ses:
+            owners = ses.exec(
+                select(User).where(cast(User.crm_data, String).like('%series_reminders%'))
+            ).all()
+            for u in owners:
+                crm_data = dict(u.crm_data or {})
+                marks = crm_data.pop("series_reminders", None)
+                if marks is None:
+                    continue
+                for group_id, threshold in dict(marks or {}).items():
+                    try:
+                        user_history.set_series_mark(ses, u.id, str(group_id), int(threshold))
+                    except (TypeError, ValueError):
+                        continue
+                u.crm_data = crm_data
+                ses.add(u)
+            ses.commit()
+    except Exception as e:
+        logger.warning("Series reminder marks migration skipped: %s", e)
+
+    if moved:
+        logger.info("User history: moved %d legacy entries into user_history", moved)
+    return moved
+
+
+def migrate_subscription_pools(batch: int = 500) -> int:
+    """Create subscription_pools rows for pools that still exist only in the
+    User.subscription JSON. Idempotent; returns the number of rows created."""
+    from sqlalchemy import String, cast
+    from app.models.subscription_pool import SubscriptionPool
+    from app.services import subscription_pool
+
+    created, last = 0, None
+    try:
+        while True:
+            with Session(engine) as ses:
+                stmt = select(User).where(
+                    User.subscription.is_not(None),  # type: ignore[union-attr]
+                    cast(User.subscription, String).not_in(("null", "{}")),
+                    User.id.not_in(select(SubscriptionPool.user_id)),  # type: ignore[union-attr]
+                )
+                if last is not None:
+                    stmt = stmt.where(User.id > last)
+                users = ses.exec(stmt.order_by(User.id).limit(batch)).all()
+                if not users:
+                    break
+                for u in users:
+                    if subscription_pool.sync_row(ses, u, reason="opening") is not None:
+                        created += 1
+                last = users[-1].id
+                ses.commit()
+    except Exception as e:
+        logger.warning("Subscription pool backfill stopped after %d rows: %s", created, e)
+        return created
+    if created:
+        logger.info("Subscription pools: created %d rows from User.subscription", created)
+    return created
+
+
 # ── One-time Psy-CRM data rescues ────────────────────────────────────────────
 # When a user's Telegram/Google binding drifts onto a sibling account and is
 # then corrected by hand, the `therapist_*` rows keep the *old* user_id as
@@ -524,6 +674,11 @@ def auto_backfill_gcal_alias_codes():
 
 def init_data():
     migrate_add_columns()
+    migrate_user_history()
+    migrate_subscription_pools()
+    cash_totals.seed(engine)
+    occupancy.seed(engine)
+    user_identity.seed(engine)
     rescue_orphaned_crm()
     auto_backfill_gcal_alias_codes()
     with Session(engine) as session:
@@ -1,6 +1,11 @@
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
 from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.core.config import settings
+from app.core import http_cache, query_stats
 
 sqlite_file_name = "database.db"
 sqlite_url = f"sqlite:///{sqlite_file_name}"
@@ -48,9 +53,56 @@ engine = create_engine(
     **pool_kwargs,
 )
 
+# Per-request query count / DB time / N+1 detection (see core/query_stats).
+# No-op outside a tracked request, so scripts importing the engine pay nothing.
+query_stats.install(engine)
+
+
+def _async_url(url: str) -> str:
+    """Same database, async driver: asyncpg for Postgres, aiosqlite for the
+    dev SQLite file. asyncpg doesn't understand libpq's `sslmode`; its
+    equivalent is `ssl`, which takes the same values."""
+    u = make_url(url)
+    if u.get_backend_name() == "sqlite":
+        return u.set(drivername="sqlite+aiosqlite").render_as_string(hide_password=False)
+    query = dict(u.query)
+    if "sslmode" in query:
+        query["ssl"] = query.pop("sslmode")
+    return u.set(drivername="postgresql+asyncpg", query=query).render_as_string(hide_password=False)
+
+
+# Async engine for the `async def` read endpoints (get_async_session). Those
+# don't occupy a threadpool thread while waiting on the DB, so the hot public
+# reads no longer compete with the sync routes for the 40 workers. Sync and
+# async routes live side by side; a route moves over once it's ported.
+# Pool: 20+10 sync + 10+10 async = 50, half of Postgres' 100 connections.
+# SQLite gets NullPool — the connection is a thread in aiosqlite and mustn't
+# outlive the event loop it was opened on (TestClient spins one up per test).
+async_engine = create_async_engine(
+    _async_url(connection_url),
+    echo=False,
+    pool_pre_ping=True,
+    **({"poolclass": NullPool} if is_sqlite else {
+        "pool_size": 10,
+        "max_overflow": 10,
+        "pool_timeout": 10,
+        "pool_recycle": 300,
+    }),
+)
+query_stats.install(async_engine.sync_engine)
+
+# Table-version bumps for the catalogue response cache (see core/http_cache).
+http_cache.install()
+
 def init_db():
     SQLModel.metadata.create_all(engine)
 
 def get_session():
     with Session(engine) as session:
         yield session
+
+async def get_async_session():
+    # expire_on_commit=False: touching an expired attribute would need an
+    # implicit refresh, which async sessions can't do (MissingGreenlet).
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
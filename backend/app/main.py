@@ -1,16 +1,19 @@
 import logging
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Response
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from slowapi.errors import RateLimitExceeded
 from slowapi import _rate_limit_exceeded_handler
 from sqlalchemy import text
 from sqlmodel import Session
-from .db.session import init_db, engine
+from .db.session import init_db, engine, async_engine, connection_url
 from .db.init_data import init_data
 from .core.config import settings
+from .core import query_stats
+from .core.profiler import profiler
 from .core.rate_limit import limiter
 from .api.v1 import api_router
+from .services import outbox, realtime
 
 logger = logging.getLogger(__name__)
 
@@ -37,7 +40,13 @@ if _sentry_dsn:
 async def lifespan(app: FastAPI):
     init_db()
     init_data()
+    if settings.OUTBOX_WORKER_ENABLED:
+        outbox.worker.start(settings.OUTBOX_POLL_SECONDS)
+    await realtime.hub.start(realtime.listen_dsn(connection_url))
     yield
+    await realtime.hub.stop()
+    outbox.worker.stop()
+    await async_engine.dispose()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -71,6 +80,52 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-request SQL accounting (core/query_stats): count + DB time, warning with
+# the route template when a request crosses a threshold or loops a query (N+1).
+_SQL_STATS_HEADERS = (
+    settings.SQL_STATS_HEADERS
+    if settings.SQL_STATS_HEADERS is not None
+    else settings.ENVIRONMENT != "production"
+)
+
+
+@app.middleware("http")
+async def sql_query_accounting(request: Request, call_next):
+    with query_stats.track(f"{request.method} {request.url.path}") as stats:
+        response = await call_next(request)
+    stats.label = query_stats.route_label(request)
+    query_stats.report(
+        stats,
+        max_queries=settings.SQL_QUERY_WARN_THRESHOLD,
+        max_ms=settings.SQL_TIME_WARN_MS,
+        repeat_threshold=settings.SQL_REPEAT_WARN_THRESHOLD,
+    )
+    if _SQL_STATS_HEADERS:
+        response.headers["X-DB-Queries"] = str(stats.count)
+        response.headers["X-DB-Time-Ms"] = f"{stats.total_ms:.1f}"
+    return response
+
+
+# Opt-in sampling profiler (core/profiler). Registered only when enabled, so
+# the default deploy doesn't even pay for the middleware hop.
+if settings.PROFILER_ENABLED:
+    profiler.configure(
+        engine,
+        interval_ms=settings.PROFILER_INTERVAL_MS,
+        slow_request_ms=settings.PROFILER_SLOW_REQUEST_MS,
+        slow_sql_ms=settings.PROFILER_SLOW_SQL_MS,
+        max_captures=settings.PROFILER_MAX_CAPTURES,
+    )
+    profiler.watch(async_engine.sync_engine)
+
+    @app.middleware("http")
+    async def sampling_profiler(request: Request, call_next):
+        capture = profiler.start(f"{request.method} {request.url.path}")
+        try:
+            return await call_next(request)
+        finally:
+            profiler.stop(capture, query_stats.route_label(request))
+
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
 # Per-post SEO (root-level /news/{slug}, /articles/{slug}) — nginx проксирует
@@ -36,3 +36,32 @@ from .notification import Notification, NotificationCreate, NotificationRead
 
 # App-wide settings (exchange rates, etc.)
 from .app_setting import AppSetting
+
+# Transactional outbox (booking side effects)
+from .outbox import OutboxEvent
+
+# Content-addressed task attachments (refcounted)
+from .task_file import TaskFile
+
+# Running cashbox totals (maintained by services/cash_totals)
+from .cashbox_balance import CashboxBalance
+
+# Per-user history rows (services/user_history)
+from .user_history import UserHistoryEntry, SeriesReminderMark
+
+# Subscription hour pools + hours ledger (services/subscription_pool)
+from .subscription_pool import SubscriptionPool, SubscriptionHoursLedger
+
+# Per (cabinet, day) half-hour occupancy bitmaps (services/occupancy)
+from .occupancy import ResourceDayOccupancy
+
+# Normalized identity keys for duplicate detection (services/user_identity)
+from .user_identity import UserIdentity
+
+# ORM listeners that keep derived tables in step with the models above live
+# in services/. Importing them here registers them in every process that
+# touches a model — API, cron, one-off scripts — not only in the ones that
+# happen to import the service.
+from app.services import cash_totals as _cash_totals  # noqa: E402,F401
+from app.services import occupancy as _occupancy  # noqa: E402,F401
+from app.services import user_identity as _user_identity  # noqa: E402,F401
@@ -4,6 +4,7 @@ from uuid import uuid4
 from datetime import datetime
 from sqlmodel import SQLModel, Field, JSON
 from sqlalchemy import Column
+from app.models.user import user_ref
 
 
 class AdminTaskBase(SQLModel):
@@ -11,7 +12,7 @@ class AdminTaskBase(SQLModel):
     description: str = Field(default="")
     status: str = Field(default="TODO", index=True)  # TODO, IN_PROGRESS, DONE
     priority: str = Field(default="MEDIUM")  # LOW, MEDIUM, HIGH
-    assignee_id: Optional[str] = Field(default=None, index=True)
+    assignee_id: Optional[str] = Field(default=None, index=True, sa_column_kwargs=user_ref("id"))
     assignee_name: Optional[str] = Field(default=None)
     participants: List[dict] = Field(default_factory=list, sa_column=Column(JSON))  # [{id, name}]
     deadline: Optional[datetime] = Field(default=None)
@@ -4,10 +4,11 @@ from uuid import UUID, uuid4
 from datetime import datetime
 from sqlmodel import Field, SQLModel, JSON
 from sqlalchemy import Column
+from app.models.user import user_ref
 
 
 class BonusBase(SQLModel):
-    user_id: str = Field(index=True)                     # target user UUID
+    user_id: str = Field(index=True, sa_column_kwargs=user_ref("id"))  # target user UUID
     type: str = Field(default="free_hour")               # free_hour | discount | ...
     description: str = Field(default="")                  # e.g. "Новогодний бонус"
     quantity: float = Field(default=1.0)                  # hours or amount
@@ -3,6 +3,7 @@ from uuid import UUID, uuid4
 from sqlmodel import Field, SQLModel, JSON
 from sqlalchemy import Column
 from datetime import datetime
+from app.models.user import user_ref
 
 class BookingBase(SQLModel):
     resource_id: str
@@ -29,7 +30,7 @@ class BookingBase(SQLModel):
     
     # Cancellation Details
     cancellation_reason: Optional[str] = None
-    cancelled_by: Optional[str] = None
+    cancelled_by: Optional[str] = Field(default=None, sa_column_kwargs=user_ref("email"))
     
     # Re-Rent Logic
     is_re_rent_listed: bool = Field(default=False)
@@ -40,6 +41,9 @@ class BookingBase(SQLModel):
     # Google Calendar Sync
     gcal_event_id: Optional[str] = None
     gcal_calendar_id: Optional[str] = None
+    # Last push to Google gave up (services/gcal_writer). Cleared as soon as
+    # a retry — the outbox's or a manual resync — gets an event id back.
+    gcal_sync_failed: bool = Field(default=False)
 
     # Recurring booking group
     recurring_group_id: Optional[str] = None
@@ -63,7 +67,7 @@ class BookingBase(SQLModel):
 
 class Booking(BookingBase, table=True):
     id: UUID = Field(default_factory=uuid4, primary_key=True)
-    user_id: str = Field(index=True) # Linking to User.email for now (legacy compatibility), or User.id?
+    user_id: str = Field(index=True, sa_column_kwargs=user_ref("email")) # Linking to User.email for now (legacy compatibility), or User.id?
     # NOTE: Optimally should link to User.id (UUID), but frontend uses email as ID often.
     # Let's start with User.id (UUID) relation, but keep email if needed? 
     # Decision: Link to User.id (UUID). Frontend migration will need to handle this lookup.
@@ -81,7 +85,7 @@ class Booking(BookingBase, table=True):
     # Кто оформил бронь (для owner-аналитики «по админам»). Пишется при
     # создании = current_user. Клиент сам себе → это клиент; админ за клиента
     # → это админ. Заполняется только вперёд (2026-07-11). NULL у старых.
-    created_by_id: Optional[str] = Field(default=None, index=True)
+    created_by_id: Optional[str] = Field(default=None, index=True, sa_column_kwargs=user_ref("id"))
     created_by_name: Optional[str] = Field(default=None)
 
 class BookingCreate(BookingBase):
@@ -96,7 +100,6 @@ class BookingRead(BookingBase):
     user_uuid: Optional[UUID]
     user_id: str # Return email for frontend compatibility
     created_at: datetime
-    gcal_sync_failed: bool = False
     recurring_group_id: Optional[str] = None
 
 
@@ -0,0 +1,21 @@
+"""
+CashboxBalance — running income − expense per (payment_method, branch).
+
+Maintained by services/cash_totals on every CashboxTransaction insert,
+update and delete (same transaction). "How much cash is in the till" is
+then one indexed row read instead of a SUM over the whole history.
+"""
+from typing import Optional
+from datetime import datetime
+from sqlmodel import SQLModel, Field
+
+
+class CashboxBalance(SQLModel, table=True):
+    __tablename__ = "cashbox_balances"
+
+    # "<payment_method>|<branch>" ("" for no branch) — one row per pair.
+    key: str = Field(primary_key=True)
+    payment_method: str = Field(index=True)
+    branch: Optional[str] = Field(default=None)
+    total: float = Field(default=0.0)
+    updated_at: datetime = Field(default_factory=datetime.now)
@@ -5,6 +5,7 @@ from typing import Optional
 from uuid import uuid4
 from datetime import datetime
 from sqlmodel import SQLModel, Field
+from app.models.user import user_ref
 
 
 class CashboxTransactionBase(SQLModel):
@@ -16,7 +17,7 @@ class CashboxTransactionBase(SQLModel):
     description: Optional[str] = Field(default=None)
     branch: Optional[str] = Field(default=None)
     date: datetime = Field(index=True)
-    client_id: Optional[str] = Field(default=None, index=True)  # CRM client link
+    client_id: Optional[str] = Field(default=None, index=True, sa_column_kwargs=user_ref("id", "email"))  # CRM client link
     client_name: Optional[str] = Field(default=None)  # denormalized for display
 
 
@@ -30,7 +31,7 @@ class CashboxTransaction(CashboxTransactionBase, table=True):
     created_at: datetime = Field(default_factory=datetime.now)
     # If set, this transaction credited the given user's balance at creation.
     # Used by delete/update to reverse the credit automatically on rollback.
-    credited_user_id: Optional[str] = Field(default=None, index=True)
+    credited_user_id: Optional[str] = Field(default=None, index=True, sa_column_kwargs=user_ref("id"))
 
 
 class CashboxTransactionCreate(SQLModel):
@@ -5,6 +5,7 @@ from typing import Optional
 from uuid import uuid4
 from datetime import datetime
 from sqlmodel import SQLModel, Field
+from app.models.user import user_ref
 
 
 class NotificationBase(SQLModel):
@@ -20,7 +21,7 @@ class Notification(NotificationBase, table=True):
     __tablename__ = "notifications"
 
     id: str = Field(default_factory=lambda: str(uuid4()), primary_key=True)
-    recipient_id: str = Field(index=True)
+    recipient_id: str = Field(index=True, sa_column_kwargs=user_ref("id"))
     is_read: bool = Field(default=False, index=True)
     created_at: datetime = Field(default_factory=datetime.now, index=True)
 
@@ -0,0 +1,23 @@
+"""
+ResourceDayOccupancy — which half-hours of one cabinet's day are booked.
+
+One row per (resource, calendar day) that has at least one confirmed
+booking. `slots` is a 48-bit mask: bit i set = [i·30min, (i+1)·30min) is
+covered by a confirmed booking. Maintained by services/occupancy in the
+same transaction as the booking change; a day without a row is free.
+"""
+from datetime import date, datetime
+
+from sqlalchemy import BigInteger, Column, Index
+from sqlmodel import Field, SQLModel
+
+
+class ResourceDayOccupancy(SQLModel, table=True):
+    __tablename__ = "resource_day_occupancy"
+    # Heatmaps read "every cabinet, date range" — day first.
+    __table_args__ = (Index("ix_resource_day_occupancy_day", "day", "resource_id"),)
+
+    resource_id: str = Field(primary_key=True)
+    day: date = Field(primary_key=True)
+    slots: int = Field(default=0, sa_column=Column(BigInteger, nullable=False, default=0))
+    updated_at: datetime = Field(default_factory=datetime.now)
@@ -0,0 +1,31 @@
+"""
+OutboxEvent — side effect (GCal, Telegram, email, waitlist) recorded in the
+same transaction as the booking change that caused it, executed after
+commit by services/outbox.
+"""
+from typing import Optional
+from uuid import uuid4
+from datetime import datetime
+from sqlmodel import SQLModel, Field, JSON
+from sqlalchemy import Column
+
+
+class OutboxEvent(SQLModel, table=True):
+    __tablename__ = "outbox_events"
+
+    id: str = Field(default_factory=lambda: str(uuid4()), primary_key=True)
+    # Handler name, e.g. "gcal.create", "telegram.send_booking_cancelled".
+    kind: str = Field(index=True)
+    payload: dict = Field(default_factory=dict, sa_column=Column(JSON))
+    # Same key enqueued twice (double-click, retried request, two code paths
+    # announcing the same thing) → one row, one execution.
+    idempotency_key: str = Field(unique=True, index=True)
+    # pending → processing → done | failed (after max_attempts)
+    status: str = Field(default="pending", index=True)
+    attempts: int = Field(default=0)
+    max_attempts: int = Field(default=8)
+    next_attempt_at: datetime = Field(default_factory=datetime.now, index=True)
+    claimed_at: Optional[datetime] = None
+    last_error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.now)
+    processed_at: Optional[datetime] = None
@@ -0,0 +1,63 @@
+"""
+Subscription hour pools as rows (services/subscription_pool).
+
+The pool used to live only in the `User.subscription` JSON blob: every
+deduction read it, subtracted in Python and wrote the whole blob back. Two
+bookings for the same client committing at once could both read 3h, both
+write 1h, and one of them was free. Expiry needed a scan of every user.
+
+Now the hours are columns on one row per client, and a deduction is a single
+`UPDATE … SET remaining_hours = remaining_hours - x WHERE remaining_hours >= x`
+— the row lock makes it atomic, and zero rows updated means "not enough".
+Every movement is also written to `subscription_hours_ledger`, like
+BalanceLedger does for money.
+
+The JSON blob stays as a mirror for the frontend and for pricing reads
+(`subscription_pool.get/get_float`); the service keeps both in step.
+"""
+from typing import Optional
+from uuid import UUID, uuid4
+from datetime import datetime
+
+from sqlalchemy import Column, Index
+from sqlmodel import Field, JSON, SQLModel
+
+
+class SubscriptionPool(SQLModel, table=True):
+    __tablename__ = "subscription_pools"
+    # expire_subscriptions: "active, not flexible, expiry_date < now".
+    __table_args__ = (Index("ix_subscription_pools_status_expiry", "status", "expiry_date"),)
+
+    user_id: UUID = Field(primary_key=True)
+    plan_id: Optional[str] = Field(default=None)
+    total_hours: float = Field(default=0.0)
+    remaining_hours: float = Field(default=0.0)
+    used_hours: float = Field(default=0.0)
+    bonus_hours: float = Field(default=0.0)
+    is_frozen: bool = Field(default=False)
+    frozen_until: Optional[datetime] = Field(default=None)
+    expiry_date: Optional[datetime] = Field(default=None)
+    flexible: bool = Field(default=False)
+    # active | frozen | completed — the same stamp as subscription["status"].
+    status: str = Field(default="active")
+    included_formats: Optional[list] = Field(default=None, sa_column=Column(JSON))
+    discount_percent: Optional[float] = Field(default=None)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class SubscriptionHoursLedger(SQLModel, table=True):
+    """Every change of remaining_hours: how much, what was left, why, who."""
+    __tablename__ = "subscription_hours_ledger"  # type: ignore
+
+    id: UUID = Field(default_factory=uuid4, primary_key=True)
+    user_id: str = Field(index=True)                 # User.id (UUID as str)
+    delta: float                                     # +возврат/пополнение / −списание
+    remaining_after: float                           # остаток сразу после операции
+    # booking_charge | booking_refund | topup | settle | sync | ...
+    reason: str = Field(index=True)
+    description: str = Field(default="")
+    ref_type: Optional[str] = Field(default=None)    # booking | user | ...
+    ref_id: Optional[str] = Field(default=None, index=True)
+    actor_id: Optional[str] = Field(default=None)
+    actor_name: Optional[str] = Field(default=None)
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
@@ -0,0 +1,24 @@
+"""
+TaskFile — one stored task attachment blob, addressed by its SHA-256.
+
+The bytes live at uploads/tasks/<h[:2]>/<h><ext>; this row only counts how
+many AdminTasks list the file in `attachments` (services/task_files keeps
+the count in step with every create/update/delete of a task). A file whose
+count is zero — or which never got a row because nobody attached it — is
+swept after a grace period.
+"""
+from datetime import datetime
+from sqlmodel import SQLModel, Field
+
+
+class TaskFile(SQLModel, table=True):
+    __tablename__ = "task_files"
+
+    sha256: str = Field(primary_key=True, max_length=64)
+    ext: str = Field(default="")
+    size: int = Field(default=0)
+    ref_count: int = Field(default=0)
+    created_at: datetime = Field(default_factory=datetime.now)
+    # Last ref_count change — the sweep leaves a just-released file alone for
+    # the grace period too (undo, task re-created from a copied URL).
+    updated_at: datetime = Field(default_factory=datetime.now)
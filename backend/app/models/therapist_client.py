@@ -7,6 +7,7 @@ from uuid import uuid4
 from datetime import datetime
 from sqlmodel import SQLModel, Field
 from sqlalchemy import Column, JSON
+from app.models.user import user_ref
 
 
 class TherapistClientBase(SQLModel):
@@ -29,7 +30,7 @@ class TherapistClient(TherapistClientBase, table=True):
     __tablename__ = "therapist_clients"
 
     id: str = Field(default_factory=lambda: str(uuid4()), primary_key=True)
-    specialist_id: str = Field(index=True)  # User UUID as string (no FK due to SQLite UUID limitation)
+    specialist_id: str = Field(index=True, sa_column_kwargs=user_ref("id"))  # User UUID as string (no FK due to SQLite UUID limitation)
     created_at: datetime = Field(default_factory=datetime.now, index=True)
     updated_at: datetime = Field(default_factory=datetime.now)
 
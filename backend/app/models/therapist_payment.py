@@ -5,6 +5,7 @@ from typing import Optional
 from uuid import uuid4
 from datetime import datetime
 from sqlmodel import SQLModel, Field
+from app.models.user import user_ref
 
 
 class TherapistPaymentBase(SQLModel):
@@ -20,7 +21,7 @@ class TherapistPayment(TherapistPaymentBase, table=True):
     __tablename__ = "therapist_payments"
 
     id: str = Field(default_factory=lambda: str(uuid4()), primary_key=True)
-    specialist_id: str = Field(index=True)  # User UUID as string (no FK due to SQLite UUID limitation)
+    specialist_id: str = Field(index=True, sa_column_kwargs=user_ref("id"))  # User UUID as string (no FK due to SQLite UUID limitation)
     created_at: datetime = Field(default_factory=datetime.now, index=True)
 
 
@@ -9,6 +9,7 @@ from sqlalchemy import Column
 from sqlmodel import SQLModel, Field
 
 from app.services.note_crypto import EncryptedText
+from app.models.user import user_ref
 
 
 class TherapySessionBase(SQLModel):
@@ -41,7 +42,7 @@ class TherapySession(TherapySessionBase, table=True):
     )
 
     id: str = Field(default_factory=lambda: str(uuid4()), primary_key=True)
-    specialist_id: str = Field(index=True)  # User UUID as string (no FK due to SQLite UUID limitation)
+    specialist_id: str = Field(index=True, sa_column_kwargs=user_ref("id"))  # User UUID as string (no FK due to SQLite UUID limitation)
     created_at: datetime = Field(default_factory=datetime.now, index=True)
     updated_at: datetime = Field(default_factory=datetime.now)
 
@@ -2,12 +2,13 @@ from datetime import datetime
 from typing import Optional, Dict
 from sqlmodel import SQLModel, Field, JSON
 from uuid import UUID, uuid4
+from app.models.user import user_ref
 
 class TimelineEventBase(SQLModel):
     event_type: str  # e.g., "role_change", "discount_applied", "booking_cancelled"
-    actor_id: UUID = Field(index=True)
+    actor_id: UUID = Field(index=True, sa_column_kwargs=user_ref("id"))
     actor_req_role: str # Role of the actor at the time
-    target_id: Optional[str] = Field(default=None, index=True) # ID of user/booking affected
+    target_id: Optional[str] = Field(default=None, index=True, sa_column_kwargs=user_ref("id")) # ID of user/booking affected
     target_type: str # "user", "booking"
     description: str
     metadata_dump: Dict = Field(default={}, sa_type=JSON) # Stores before/after values
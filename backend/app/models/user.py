@@ -1,4 +1,4 @@
-from typing import Optional, List
+from typing import Dict, Optional, List
 from uuid import UUID, uuid4
 from sqlmodel import Field, SQLModel, JSON, Relationship
 from sqlalchemy import Column
@@ -8,6 +8,15 @@ from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from .specialist import Specialist
 
+
+def user_ref(*kinds: str) -> dict:
+    """`sa_column_kwargs` for a soft reference to a user — a column with no
+    FK that holds User.id (as text, "id") and/or User.email ("email").
+    services/user_merge finds every such column through this marker (real
+    FKs to user.id it finds on its own), so a new one only needs tagging."""
+    return {"info": {"user_ref": kinds}}
+
+
 class UserBase(SQLModel):
     email: str = Field(unique=True, index=True)
     name: str = Field(index=True)
@@ -19,9 +28,8 @@ class UserBase(SQLModel):
     # JSON Fields for complex data structures
     subscription: Optional[dict] = Field(default=None, sa_column=Column(JSON))
     tags: List[str] = Field(default_factory=list, sa_column=Column(JSON))
-    admin_tasks: List[dict] = Field(default_factory=list, sa_column=Column(JSON)) # Frontend: adminTasks
-    comment_history: List[dict] = Field(default_factory=list, sa_column=Column(JSON)) # Frontend: commentHistory
-    discount_history: List[dict] = Field(default_factory=list, sa_column=Column(JSON)) # Frontend: discountHistory
+    # adminTasks / commentHistory / discountHistory live in user_history
+    # (services/user_history) — see UserDetailRead.
     additional_contacts: List[dict] = Field(default_factory=list, sa_column=Column(JSON)) # Frontend: additionalContacts — [{type, value}]
     crm_data: Optional[dict] = Field(default_factory=dict, sa_column=Column(JSON))
 
@@ -36,8 +44,8 @@ class UserBase(SQLModel):
 
     # Pipeline / CRM assignment (admin panel)
     manual_status: Optional[str] = Field(default=None)          # new|active|sleeping|vip|partner|bad_client
-    responsible_admin_id: Optional[str] = Field(default=None)   # UUID of responsible admin
-    attracted_by_admin_id: Optional[str] = Field(default=None)  # UUID of admin who attracted the client
+    responsible_admin_id: Optional[str] = Field(default=None, sa_column_kwargs=user_ref("id", "email"))   # UUID of responsible admin
+    attracted_by_admin_id: Optional[str] = Field(default=None, sa_column_kwargs=user_ref("id", "email"))  # UUID of admin who attracted the client
 
     # OAuth
     google_id: Optional[str] = Field(default=None, index=True)
@@ -69,9 +77,29 @@ class UserCreate(UserBase):
     password: str
 
 class UserRead(UserBase):
+    """List/row shape — no history; that's UserDetailRead or the paged
+    GET /users/{id}/history."""
     id: UUID
     created_at: datetime
-    
+
+
+class UserDetailRead(UserRead):
+    """One client's card: UserRead + the newest entries of each history
+    (services/user_history.latest)."""
+    admin_tasks: List[dict] = []
+    comment_history: List[dict] = []
+    discount_history: List[dict] = []
+    # {kind: [oldest seq, newest seq]} of the entries above — echoed by a
+    # legacy whole-array PATCH so it can't touch rows the card never had.
+    history_cursor: Dict[str, List[int]] = {}
+
+
+class UserMeRead(UserRead):
+    # Emails this account had before an admin renamed it — "my bookings"
+    # matches legacy rows still filed under them.
+    previous_emails: List[str] = []
+
+
 class UserUpdate(SQLModel):
     name: Optional[str] = None
     phone: Optional[str] = None
@@ -98,8 +126,12 @@ class UserUpdateAdmin(UserUpdate):
     credit_limit: Optional[float] = None
     tags: Optional[List[str]] = None
     crm_data: Optional[dict] = None
+    # Whole-array writes from the old client; applied as a diff by
+    # services/user_history.replace, only with the card's history_cursor.
+    # New code uses /users/{id}/tasks and /comments instead.
     admin_tasks: Optional[List[dict]] = None
     comment_history: Optional[List[dict]] = None
+    history_cursor: Optional[Dict[str, List[int]]] = None
     additional_contacts: Optional[List[dict]] = None
     manual_status: Optional[str] = None
     responsible_admin_id: Optional[str] = None
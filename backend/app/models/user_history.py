@@ -0,0 +1,48 @@
+"""
+Per-user history, one row per entry (services/user_history).
+
+These used to be JSON arrays on the User row (`comment_history`,
+`discount_history`, `admin_tasks`) plus `crm_data["series_reminders"]`.
+Every append copied and rewrote the whole array, and every user list
+shipped them for up to 5000 users. Now an append is one INSERT, and a read
+is an index range on (user_id, kind, seq).
+"""
+from typing import Optional
+from uuid import UUID
+from datetime import datetime
+from sqlmodel import SQLModel, Field, JSON
+from sqlalchemy import Column, Index
+
+
+class UserHistoryEntry(SQLModel, table=True):
+    __tablename__ = "user_history"
+    __table_args__ = (Index("ix_user_history_user_kind_seq", "user_id", "kind", "seq"),)
+
+    # Autoincrement: append order, and the keyset cursor for paging.
+    seq: Optional[int] = Field(default=None, primary_key=True)
+    user_id: UUID
+    # comment | discount | admin_task
+    kind: str
+    # data["type"] for comments (email_change, permissions_update, …), so
+    # "every email this user has had" doesn't read the whole history.
+    entry_type: Optional[str] = Field(default=None)
+    created_at: datetime = Field(default_factory=datetime.now)
+    # The entry exactly as the frontend knows it (id, date, adminName, text, …).
+    data: dict = Field(default_factory=dict, sa_column=Column(JSON))
+
+
+class SeriesReminderMark(SQLModel, table=True):
+    """Lowest "N sessions left" threshold already sent for a recurring series
+    (telegram send-reminders); 1 also means "the owner dismissed it"."""
+    __tablename__ = "series_reminder_marks"
+
+    user_id: UUID = Field(primary_key=True)
+    recurring_group_id: str = Field(primary_key=True)
+    threshold: int
+    updated_at: datetime = Field(default_factory=datetime.now)
+
+
+class UserHistoryPage(SQLModel):
+    items: list[dict]
+    # Pass as ?before= for the next (older) page; None — that was the last.
+    next_before: Optional[int] = None
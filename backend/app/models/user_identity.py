@@ -0,0 +1,27 @@
+"""
+UserIdentity — normalized identity keys of a user, for duplicate detection.
+
+One row per (user, kind, value): kind is "email", "phone", "telegram",
+"google" or "name"; value is already normalized (services/user_identity).
+Two users sharing a (kind, value) are a duplicate candidate. Maintained by
+services/user_identity in the same transaction as the user change.
+
+No FK to user.id on purpose: the rows go away in the same commit as the
+user, and user_merge must not re-point them (they are recomputed instead).
+"""
+from datetime import datetime
+from uuid import UUID
+
+from sqlalchemy import Index
+from sqlmodel import Field, SQLModel
+
+
+class UserIdentity(SQLModel, table=True):
+    __tablename__ = "user_identity"
+    # Candidate pairs join on (kind, value) — that's the blocking key.
+    __table_args__ = (Index("ix_user_identity_key", "kind", "value"),)
+
+    user_id: UUID = Field(primary_key=True)
+    kind: str = Field(primary_key=True)
+    value: str = Field(primary_key=True)
+    updated_at: datetime = Field(default_factory=datetime.now)
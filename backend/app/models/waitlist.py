@@ -2,6 +2,7 @@ from typing import Optional
 from uuid import UUID, uuid4
 from sqlmodel import Field, SQLModel
 from datetime import datetime
+from app.models.user import user_ref
 
 class WaitlistBase(SQLModel):
     resource_id: str
@@ -12,7 +13,7 @@ class WaitlistBase(SQLModel):
 
 class Waitlist(WaitlistBase, table=True):
     id: UUID = Field(default_factory=uuid4, primary_key=True)
-    user_id: str = Field(index=True) # Linking to User.email (legacy)
+    user_id: str = Field(index=True, sa_column_kwargs=user_ref("email")) # Linking to User.email (legacy)
     user_uuid: Optional[UUID] = Field(default=None, foreign_key="user.id")
     
     created_at: datetime = Field(default_factory=datetime.now)
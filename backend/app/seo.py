@@ -10,12 +10,18 @@ Owner 2026-06-29: контент-страницы — SPA, при шеринге
 страницу), боты-краулеры читают правильные мета. nginx проксирует только
 паттерн /(news|articles)/<slug> на бэк (см. deploy).
 """
+import hashlib
 import os
 import re
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
 from html import escape
+from typing import Optional
 
-from fastapi import APIRouter, Depends
-from fastapi.responses import HTMLResponse
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import HTMLResponse, Response
 from sqlmodel import Session, select
 
 from app.db.session import get_session
@@ -28,49 +34,93 @@ router = APIRouter()
 DIST_INDEX = os.environ.get("UNBOX_DIST_INDEX", "/var/www/unbox/dist/index.html")
 SITE = "https://unbox.com.ge"
 
-
-def _read_index() -> str:
+# Ссылку на пост в Telegram-канале открывают сотни клиентов + превью-боты за
+# минуту. Раньше каждый хит перечитывал index.html с диска, гонял ~10 regex
+# и тянул пост целиком. Теперь: шаблон разбирается один раз на mtime файла,
+# готовая страница кешируется по (пост, updated_at, mtime), а на хит уходит
+# один лёгкий SELECT (id, updated_at) — он же делает кеш корректным при
+# нескольких uvicorn-воркерах: правка поста меняет updated_at, и ключ
+# промахивается в любом процессе, даже не получившем invalidate().
+_MAX_PAGES = 256
+# Браузер/бот может держать страницу минуту, дальше — условный запрос (304).
+_CACHE_CONTROL = "public, max-age=60"
+
+# Слоты шаблона: (имя слота, атрибут, ключ) для <meta {attr}="{key}" content="…">.
+# Регэкспы те же, что раньше подменяли значения на каждом хите.
+_META_SLOTS = [
+    ("description", "name", "description"),
+    ("og_type", "property", "og:type"),
+    ("og_title", "property", "og:title"),
+    ("og_description", "property", "og:description"),
+    ("og_image", "property", "og:image"),
+    ("og_url", "property", "og:url"),
+    ("tw_title", "name", "twitter:title"),
+    ("tw_description", "name", "twitter:description"),
+    ("tw_image", "name", "twitter:image"),
+]
+_SLOT_PATTERNS = [("title", re.compile(r"(<title>)[^<]*(</title>)"))] + [
+    (name, re.compile(rf'(<meta\s+{attr}="{re.escape(key)}"\s+content=")[^"]*(")'))
+    for name, attr, key in _META_SLOTS
+]
+
+_lock = threading.Lock()
+_template: Optional[tuple[float, str, list]] = None   # (mtime, raw html, parts)
+_pages: "OrderedDict[tuple, tuple[bytes, str, datetime]]" = OrderedDict()
+
+
+def _index_mtime() -> Optional[float]:
+    try:
+        return os.stat(DIST_INDEX).st_mtime
+    except OSError:
+        return None
+
+
+def _parse(html: str) -> list:
+    """index.html → чередование литералов и имён слотов. Рендер — join.
+    Слот, которого нет в шаблоне, просто не подставляется (как и раньше)."""
+    spans = []
+    for name, pattern in _SLOT_PATTERNS:
+        m = pattern.search(html)
+        if m:
+            spans.append((m.end(1), m.start(2), name))
+    spans.sort()
+    parts, pos = [], 0
+    for start, end, name in spans:
+        parts.append(html[pos:start])
+        parts.append((name,))
+        pos = end
+    parts.append(html[pos:])
+    return parts
+
+
+def _load_template(mtime: Optional[float]) -> tuple[str, list]:
+    global _template
+    if mtime is None:
+        return "", []
+    tpl = _template
+    if tpl is not None and tpl[0] == mtime:
+        return tpl[1], tpl[2]
     try:
         with open(DIST_INDEX, encoding="utf-8") as f:
-            return f.read()
+            html = f.read()
     except Exception:
-        return ""
+        return "", []
+    parts = _parse(html)
+    with _lock:
+        _template = (mtime, html, parts)
+        # Новая сборка фронта — старые страницы ссылаются на старые бандлы.
+        _pages.clear()
+    return html, parts
+
+
+def _render(parts: list, values: dict) -> str:
+    return "".join(
+        p if isinstance(p, str) else escape(values[p[0]], quote=True)
+        for p in parts
+    )
 
 
-def _set_meta(html: str, attr: str, key: str, val: str) -> str:
-    """Подменить content у <meta {attr}="{key}" content="…">."""
-    pattern = re.compile(
-        rf'(<meta\s+{attr}="{re.escape(key)}"\s+content=")[^"]*(")'
-    )
-    if pattern.search(html):
-        return pattern.sub(lambda m: m.group(1) + escape(val, quote=True) + m.group(2), html, count=1)
-    return html
-
-
-def _inject(html: str, *, title: str, desc: str, image: str, url: str) -> str:
-    if not html:
-        return html
-    html = re.sub(r"<title>[^<]*</title>", f"<title>{escape(title)}</title>", html, count=1)
-    html = _set_meta(html, "name", "description", desc)
-    html = _set_meta(html, "property", "og:type", "article")
-    html = _set_meta(html, "property", "og:title", title)
-    html = _set_meta(html, "property", "og:description", desc)
-    html = _set_meta(html, "property", "og:image", image)
-    html = _set_meta(html, "property", "og:url", url)
-    html = _set_meta(html, "name", "twitter:title", title)
-    html = _set_meta(html, "name", "twitter:description", desc)
-    html = _set_meta(html, "name", "twitter:image", image)
-    return html
-
-
-def _serve_post(kind: str, slug: str, session: Session) -> HTMLResponse:
-    html = _read_index()
-    post = session.exec(
-        select(Post).where(Post.slug == slug, Post.is_published == True)  # noqa: E712
-    ).first()
-    # Пост не найден/черновик — отдаём index.html как есть (SPA покажет 404).
-    if not post or not html:
-        return HTMLResponse(html or "<!doctype html><title>Unbox</title>")
+def _values(kind: str, slug: str, post: Post) -> dict:
     title = f"{post.title} — Unbox"
     desc = (post.excerpt or post.title or "")[:200]
     image = post.cover_image_url or f"{SITE}/og-cover.jpg"
@@ -78,14 +128,93 @@ def _serve_post(kind: str, slug: str, session: Session) -> HTMLResponse:
         image = SITE + image
     seg = "news" if kind == "news" else "articles"
     url = f"{SITE}/{seg}/{slug}"
-    return HTMLResponse(_inject(html, title=title, desc=desc, image=image, url=url))
+    return {
+        "title": title, "description": desc, "og_type": "article",
+        "og_title": title, "og_description": desc, "og_image": image, "og_url": url,
+        "tw_title": title, "tw_description": desc, "tw_image": image,
+    }
+
+
+def invalidate(slug: Optional[str] = None) -> None:
+    """Выкинуть закешированные страницы поста (или все). Зовётся из
+    api/v1/posts на create/update/delete — чтобы память не держала мёртвые
+    версии; корректность обеспечивает ключ с updated_at."""
+    with _lock:
+        if slug is None:
+            _pages.clear()
+            return
+        for key in [k for k in _pages if k[1] == slug]:
+            del _pages[key]
+
+
+def _http_date(dt: datetime) -> str:
+    return format_datetime(dt.replace(microsecond=0), usegmt=True)
+
+
+def _not_modified(request: Request, etag: str, last_modified: datetime) -> bool:
+    inm = request.headers.get("if-none-match")
+    if inm is not None:
+        # If-None-Match главнее If-Modified-Since (RFC 9110 §13.2.2).
+        tags = {t.strip().removeprefix("W/") for t in inm.split(",")}
+        return "*" in tags or etag in tags
+    ims = request.headers.get("if-modified-since")
+    if ims:
+        try:
+            return last_modified.replace(microsecond=0) <= parsedate_to_datetime(ims)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _respond(request: Request, body: bytes, etag: str, last_modified: datetime) -> Response:
+    headers = {
+        "ETag": etag,
+        "Last-Modified": _http_date(last_modified),
+        "Cache-Control": _CACHE_CONTROL,
+    }
+    if _not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    return HTMLResponse(body, headers=headers)
+
+
+def _entry(body: str, last_modified: datetime) -> tuple[bytes, str, datetime]:
+    data = body.encode("utf-8")
+    return data, f'"{hashlib.sha1(data).hexdigest()}"', last_modified
+
+
+def _serve_post(kind: str, slug: str, session: Session, request: Request) -> Response:
+    mtime = _index_mtime()
+    html, parts = _load_template(mtime)
+    row = session.exec(
+        select(Post.id, Post.updated_at).where(Post.slug == slug, Post.is_published == True)  # noqa: E712
+    ).first()
+    # Пост не найден/черновик — отдаём index.html как есть (SPA покажет 404).
+    if not row or not html:
+        return HTMLResponse(html or "<!doctype html><title>Unbox</title>")
+
+    post_id, updated_at = row
+    key = (kind, slug, post_id, updated_at, mtime)
+    with _lock:
+        cached = _pages.get(key)
+        if cached is not None:
+            _pages.move_to_end(key)
+    if cached is None:
+        post = session.get(Post, post_id)
+        index_changed = datetime.fromtimestamp(mtime, tz=timezone.utc)
+        post_changed = (updated_at or post.created_at).replace(tzinfo=timezone.utc)
+        cached = _entry(_render(parts, _values(kind, slug, post)), max(index_changed, post_changed))
+        with _lock:
+            _pages[key] = cached
+            while len(_pages) > _MAX_PAGES:
+                _pages.popitem(last=False)
+    return _respond(request, *cached)
 
 
 @router.get("/news/{slug}", response_class=HTMLResponse, include_in_schema=False)
-def news_seo(slug: str, session: Session = Depends(get_session)):
-    return _serve_post("news", slug, session)
+def news_seo(slug: str, request: Request, session: Session = Depends(get_session)):
+    return _serve_post("news", slug, session, request)
 
 
 @router.get("/articles/{slug}", response_class=HTMLResponse, include_in_schema=False)
-def articles_seo(slug: str, session: Session = Depends(get_session)):
-    return _serve_post("article", slug, session)
+def articles_seo(slug: str, request: Request, session: Session = Depends(get_session)):
+    return _serve_post("article", slug, session, request)
@@ -145,15 +145,15 @@ def settle_pending_charge(session: Session, b: Booking) -> Tuple[bool, str]:
         # and reading snake-only here made those hours invisible — the booking
         # then fell through to the cash fallback below and charged the client's
         # balance for hours they had already paid for.
-        rem = subscription_pool.get_float(user.subscription, "remaining_hours")
-        used = subscription_pool.get_float(user.subscription, "used_hours")
         hrs = float(b.hours_deducted or (b.duration or 0) / 60.0)
-        if rem >= hrs > 0:
-            user.subscription = subscription_pool.update(
-                user.subscription,
-                remaining_hours=max(0.0, rem - hrs),
-                used_hours=used + hrs,
-            )
+        # Strict: the pool row is charged only if it still covers the hours
+        # (one UPDATE … WHERE remaining_hours >= hrs), so two settles racing
+        # on the same client can't both spend the same remainder.
+        if hrs > 0 and subscription_pool.deduct(
+            session, user, hrs, "settle", strict=True,
+            description="Списание часов по отложенной брони (T-24h)",
+            ref_type="booking", ref_id=str(b.id),
+        ) is not None:
             snapshot = hrs
         else:
             # Subscription can't cover (expired / depleted) — fall back to
@@ -189,7 +189,7 @@ def settle_pending_charge(session: Session, b: Booking) -> Tuple[bool, str]:
             b.hours_deducted = 0
             logger.info(
                 "[billing] booking %s sub-fallback to balance: had %.2fh, needed %.2fh, charged %.2f₾ (cash-recomputed)",
-                b.id, rem, hrs, cash_amount,
+                b.id, subscription_pool.get_float(user.subscription, "remaining_hours"), hrs, cash_amount,
             )
     elif method == "bonus":
         # Бесплатные часы уже списаны при СОЗДАНИИ брони (bonus_service.
@@ -280,13 +280,9 @@ def waive_charge(session: Session, b: Booking, *, reason: str, by_user: User) ->
     # → возврат ДЕНЕГ, иначе вернули бы фантомные часы в пул + не отдали деньги.
     hours_actually_used = float(b.hours_deducted or 0)
     if method == "subscription" and hours_actually_used > 0:
-        rem = subscription_pool.get_float(user.subscription, "remaining_hours")
-        used = subscription_pool.get_float(user.subscription, "used_hours")
-        user.subscription = subscription_pool.update(
-            user.subscription,
-            remaining_hours=rem + hours_actually_used,
-            used_hours=max(0.0, used - hours_actually_used),
-        )
+        subscription_pool.refund(session, user, hours_actually_used, "booking_refund",
+                                 description="снятие штрафа (waive) — возврат часов",
+                                 ref_type="booking", ref_id=str(b.id), actor=by_user)
     else:
         wallet.credit(session, user, amount, reason="booking_refund",
                       description="снятие штрафа (waive) — возврат на баланс",
@@ -1,9 +1,10 @@
 import hashlib
-from typing import List
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 from uuid import UUID as _UUID
 from sqlmodel import Session, select
 from sqlalchemy import text
-from datetime import datetime, timedelta
+from sqlalchemy.orm import Session as _SASession
+from datetime import date as _date, datetime, time as _time, timedelta
 from app.models.booking import Booking
 
 
@@ -30,11 +31,36 @@ def _acquire_slot_lock(session: Session, resource_id: str, date: datetime) -> No
     dialect = session.bind.dialect.name if session.bind else ""
     if dialect != "postgresql":
         return
+    session.execute(text("SELECT pg_advisory_xact_lock(:k)"), {"k": _slot_lock_key(resource_id, date)})
+
+
+def _slot_lock_key(resource_id: str, date) -> int:
     key = f"{resource_id}:{date.strftime('%Y-%m-%d')}"
     # 64-bit signed int from SHA-256 prefix — stable hash across processes
     digest = hashlib.sha256(key.encode()).digest()
-    as_int = int.from_bytes(digest[:8], "big", signed=True)
-    session.execute(text("SELECT pg_advisory_xact_lock(:k)"), {"k": as_int})
+    return int.from_bytes(digest[:8], "big", signed=True)
+
+
+def acquire_slot_locks(session, days: Iterable[Tuple[str, datetime]]) -> None:
+    """`_acquire_slot_lock` for a whole series: every (resource, day) lock in
+    one statement, taken in ascending key order. Two series that share days
+    then always queue on the same first lock instead of each holding half of
+    the other's days (deadlock). No-op off Postgres, like the single lock.
+    `session` may also be a Connection (services/occupancy at commit)."""
+    bind = session.bind if isinstance(session, _SASession) else session
+    dialect = bind.dialect.name if bind is not None else ""
+    if dialect != "postgresql":
+        return
+    keys = sorted({_slot_lock_key(rid, d) for rid, d in days})
+    if not keys:
+        return
+    session.execute(
+        text(
+            "SELECT count(pg_advisory_xact_lock(k)) FROM "
+            "(SELECT k FROM unnest(CAST(:keys AS bigint[])) AS k ORDER BY k) AS ordered"
+        ),
+        {"keys": keys},
+    )
 
 
 def check_availability(
@@ -46,6 +72,7 @@ def check_availability(
     exclude_booking_id: str = None,
     lock_rows: bool = False,
     requester_user_uuid=None,
+    lock_also: Iterable[Tuple[str, datetime]] = (),
 ) -> tuple[bool, str | None]:
     """
     Check if a slot is available.
@@ -56,6 +83,11 @@ def check_availability(
     the read, so two parallel booking creations on the same slot serialise.
     This fixes the phantom-row race where SELECT FOR UPDATE alone would let both
     transactions see an empty slot and both insert.
+
+    lock_also: more (resource_id, date) days to lock in the same sorted
+    batch — for a move, the day the booking leaves. services/occupancy locks
+    both the old and the new day at commit; taking only the new one here
+    would have two opposite moves each hold one and wait for the other.
     """
     # Resource-level access-window check (e.g. Neo School weekdays 18–22).
     # The frontend greys out forbidden slots, but the backend is the
@@ -75,7 +107,7 @@ def check_availability(
     # Take the day-scope advisory lock FIRST — before any reads.
     # This is what actually prevents the race (SELECT FOR UPDATE alone cannot).
     if lock_rows:
-        _acquire_slot_lock(session, resource_id, date)
+        acquire_slot_locks(session, [(resource_id, date), *lock_also])
 
     day_start = date.replace(hour=0, minute=0, second=0, microsecond=0)
     day_end = day_start + timedelta(days=1)
@@ -102,9 +134,21 @@ def check_availability(
 
     day_bookings = session.exec(statement).all()
 
+    reason = slot_conflict(day_bookings, start_time, duration, requester_user_uuid)
+    return reason is None, reason
+
+
+def slot_conflict(
+    day_bookings: Sequence[Booking],
+    start_time: str,
+    duration: int,
+    requester_user_uuid=None,
+) -> Optional[str]:
+    """Why `start_time`+`duration` can't go on a day that already holds
+    `day_bookings` (same resource), or None if it fits."""
     new_start = time_to_minutes(start_time)
     if new_start < 0:
-        return False, f"Некорректный формат времени: {start_time}"
+        return f"Некорректный формат времени: {start_time}"
     new_end = new_start + duration
 
     for b in day_bookings:
@@ -126,12 +170,94 @@ def check_availability(
                 and str(b.user_uuid) == str(requester_user_uuid)
             )
             if is_own:
-                msg = f"У вас уже есть бронь в это время ({b.start_time}–{end_str})"
-            else:
-                msg = f"Слот занят ({b.start_time}–{end_str})"
-            return False, msg
+                return f"У вас уже есть бронь в это время ({b.start_time}–{end_str})"
+            return f"Слот занят ({b.start_time}–{end_str})"
+
+    return None
 
-    return True, None
+
+def load_occupancy(
+    session: Session, days: Iterable[Tuple[str, datetime]]
+) -> Dict[Tuple[str, _date], List[Booking]]:
+    """Confirmed bookings of every (resource, calendar day) in `days`, read
+    with one SELECT. Keyed by (resource_id, date); a day with nothing on it
+    maps to an empty list, so callers can append to it."""
+    keys = {(rid, d.date() if isinstance(d, datetime) else d) for rid, d in days}
+    if not keys:
+        return {}
+    first = min(d for _, d in keys)
+    last = max(d for _, d in keys)
+    rows = session.exec(
+        select(Booking).where(
+            Booking.resource_id.in_({rid for rid, _ in keys}),  # type: ignore[union-attr]
+            Booking.status == "confirmed",
+            Booking.date >= datetime.combine(first, _time.min),
+            Booking.date < datetime.combine(last + timedelta(days=1), _time.min),
+        )
+    ).all()
+    occupancy: Dict[Tuple[str, _date], List[Booking]] = {k: [] for k in keys}
+    for b in rows:
+        day = occupancy.get((b.resource_id, b.date.date()))
+        if day is not None:
+            day.append(b)
+    return occupancy
+
+
+def check_availability_many(
+    session: Session,
+    slots: Sequence[Tuple[str, datetime, str, int]],
+    requester_user_uuid=None,
+    exclude_ids: Iterable = (),
+    lock_also: Iterable[Tuple[str, datetime]] = (),
+) -> Tuple[Dict[Tuple[str, _date], List[Booking]], List[Tuple[int, str]]]:
+    """`check_availability(lock_rows=True)` for a whole series of
+    (resource_id, date, start_time, duration) slots: all day locks up front
+    (acquire_slot_locks), one occupancy read, then every slot checked in
+    memory — against the DB and against the earlier slots of the same batch.
+
+    `exclude_ids` — bookings that are being moved by the same operation
+    (a series reschedule): their current slots don't block anything.
+    `lock_also` — the days they leave, locked in the same sorted batch
+    (see check_availability).
+
+    Returns the occupancy snapshot (for pricing) and [(slot index, reason)]
+    for the slots that don't fit.
+    """
+    from types import SimpleNamespace
+    from app.services.resource_windows import is_within_window
+
+    conflicts: List[Tuple[int, str]] = []
+    for i, (rid, d, start_time, duration) in enumerate(slots):
+        if time_to_minutes(start_time) < 0:
+            conflicts.append((i, f"Некорректный формат времени: {start_time}"))
+            continue
+        within, win_reason = is_within_window(rid, d.weekday(), start_time, duration)
+        if not within:
+            conflicts.append((i, win_reason))
+
+    days = [(rid, d) for rid, d, _, _ in slots]
+    acquire_slot_locks(session, [*days, *lock_also])
+    occupancy = load_occupancy(session, days)
+    skip = {str(i) for i in exclude_ids}
+    if skip:
+        for key, rows in occupancy.items():
+            occupancy[key] = [b for b in rows if str(b.id) not in skip]
+
+    rejected = {i for i, _ in conflicts}
+    taken: Dict[Tuple[str, _date], list] = {}
+    for i, (rid, d, start_time, duration) in enumerate(slots):
+        if i in rejected:
+            continue
+        key = (rid, d.date())
+        reason = slot_conflict(occupancy[key] + taken.get(key, []), start_time, duration, requester_user_uuid)
+        if reason:
+            conflicts.append((i, reason))
+            continue
+        taken.setdefault(key, []).append(
+            SimpleNamespace(start_time=start_time, duration=duration, user_uuid=requester_user_uuid)
+        )
+    conflicts.sort()
+    return occupancy, conflicts
 
 
 def find_re_rent_conflicts(
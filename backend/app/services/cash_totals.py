@@ -0,0 +1,179 @@
+"""Running cashbox balances — the checkpoint behind shift closes.
+
+Closing a shift compares the counted cash with "cash in the till for all
+time" (see cashbox/shifts._lifetime_cash for why lifetime and not the
+shift window). That used to be a SUM over every cash row ever written,
+twice per preview and close. It got slower every month, and the evening
+close is exactly when the table is busiest.
+
+A checkpoint only written at close (last counted balance + movement since)
+can't be the answer: backdated entries, and edits or deletes of rows from
+already-closed shifts, would be invisible to it. Those are exactly the
+cases that produced phantom discrepancies before. So the checkpoint is
+kept current instead. CashboxBalance holds income − expense per
+(payment_method, branch). Mapper events on CashboxTransaction adjust it
+with a relative UPDATE on the flushing connection, so the adjustment sits
+in the same transaction as the row change and rolls back with it.
+
+`seed` (startup, from init_data) fills the table only when it is empty.
+`rebuild` (scripts/rebuild_derived.py) heals anything written behind the
+ORM's back — the raw-SQL merges in users/admin only touch client ids, never
+amounts. It locks the balance rows before it sums, so it can run next to
+live traffic.
+"""
+from __future__ import annotations
+
+import logging
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import case, event, func, insert, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.attributes import get_history
+from sqlmodel import Session, select
+
+from app.models.cashbox_balance import CashboxBalance
+from app.models.cashbox_transaction import CashboxTransaction
+
+logger = logging.getLogger(__name__)
+
+_table = CashboxBalance.__table__
+_FIELDS = ("type", "amount", "payment_method", "branch")
+
+# rebuild's upsert on key — the two backends we run on.
+_DIALECT_INSERT = {"postgresql": pg_insert, "sqlite": sqlite_insert}
+
+
+def _key(method: str, branch: Optional[str]) -> str:
+    return f"{method}|{branch or ''}"
+
+
+def _signed(tx_type: Optional[str], amount) -> float:
+    # Same rule as the old lifetime SUMs: income adds, expense subtracts,
+    # anything else ("adjustment" audit rows from users/admin) is neutral.
+    if tx_type == "income":
+        return float(amount or 0)
+    if tx_type == "expense":
+        return -float(amount or 0)
+    return 0.0
+
+
+def _apply(connection, deltas: dict[tuple[str, Optional[str]], float]) -> None:
+    now = datetime.now()
+    for (method, branch), delta in deltas.items():
+        if abs(delta) < 1e-9:
+            continue
+        key = _key(method, branch)
+        stmt = update(_table).where(_table.c.key == key).values(total=_table.c.total + delta, updated_at=now)
+        if connection.execute(stmt).rowcount:
+            continue
+        # First row ever for this (method, branch) pair.
+        try:
+            with connection.begin_nested():
+                connection.execute(insert(_table).values(
+                    key=key, payment_method=method, branch=branch or None, total=delta, updated_at=now))
+        except IntegrityError:
+            connection.execute(stmt)
+
+
+def _old(target, field: str):
+    hist = get_history(target, field)
+    return hist.deleted[0] if hist.deleted else getattr(target, field)
+
+
+def _keep_old_value(target, value, oldvalue, initiator) -> None:
+    pass
+
+
+# active_history: assigning to an expired attribute (object from an earlier
+# commit) loads the previous value first, so after_update always knows what
+# it's replacing.
+for _field in _FIELDS:
+    event.listen(getattr(CashboxTransaction, _field), "set", _keep_old_value,
+                 active_history=True)
+
+
+@event.listens_for(CashboxTransaction, "after_insert")
+def _after_insert(mapper, connection, target) -> None:
+    _apply(connection, {(target.payment_method, target.branch): _signed(target.type, target.amount)})
+
+
+@event.listens_for(CashboxTransaction, "after_delete")
+def _after_delete(mapper, connection, target) -> None:
+    _apply(connection, {(target.payment_method, target.branch): -_signed(target.type, target.amount)})
+
+
+@event.listens_for(CashboxTransaction, "after_update")
+def _after_update(mapper, connection, target) -> None:
+    old = {f: _old(target, f) for f in _FIELDS}
+    deltas: dict[tuple[str, Optional[str]], float] = {}
+    old_key = (old["payment_method"], old["branch"] or None)
+    new_key = (target.payment_method, target.branch or None)
+    deltas[old_key] = deltas.get(old_key, 0.0) - _signed(old["type"], old["amount"])
+    deltas[new_key] = deltas.get(new_key, 0.0) + _signed(target.type, target.amount)
+    _apply(connection, deltas)
+
+
+def balance(session: Session, method: str = "cash", branch: Optional[str] = None) -> float:
+    """income − expense for `method`, for one branch or (branch=None) all."""
+    q = select(func.coalesce(func.sum(CashboxBalance.total), 0)).where(CashboxBalance.payment_method == method)
+    if branch:
+        q = q.where(CashboxBalance.branch == branch)
+    return round(float(session.exec(q).one()), 2)
+
+
+def balances(session: Session, branch: Optional[str] = None) -> dict[str, float]:
+    """{payment_method: income − expense} in one query."""
+    q = select(CashboxBalance.payment_method, func.sum(CashboxBalance.total)).group_by(CashboxBalance.payment_method)
+    if branch:
+        q = q.where(CashboxBalance.branch == branch)
+    return {m: round(float(t or 0), 2) for m, t in session.exec(q).all()}
+
+
+def seed(engine) -> None:
+    """Fill an empty table from the transactions (startup); a filled one is
+    left alone."""
+    with Session(engine) as s:
+        if s.exec(select(CashboxBalance.key).limit(1)).first() is not None:
+            return
+    rebuild(engine)
+
+
+def rebuild(engine) -> None:
+    """Recompute every balance from the transactions (scripts/rebuild_derived).
+
+    The balance rows are locked (FOR UPDATE) before the SUM: a transaction
+    that already moved a balance has committed by then and is in the sum,
+    one that hasn't waits and adds its delta on top of the rebuilt total.
+    Totals are upserted; a pair with no transactions left goes to zero."""
+    signed = case(
+        (CashboxTransaction.type == "income", CashboxTransaction.amount),
+        (CashboxTransaction.type == "expense", -CashboxTransaction.amount),
+        else_=0,
+    )
+    with Session(engine) as s:
+        locked = s.exec(
+            select(CashboxBalance.key, CashboxBalance.payment_method, CashboxBalance.branch).with_for_update()
+        ).all()
+        rows = s.exec(
+            select(CashboxTransaction.payment_method, CashboxTransaction.branch, func.sum(signed))
+            .group_by(CashboxTransaction.payment_method, CashboxTransaction.branch)
+        ).all()
+        totals: dict[str, tuple[str, Optional[str], float]] = {k: (m, b, 0.0) for k, m, b in locked}
+        for method, branch, total in rows:
+            k = _key(method, branch)
+            prev = totals.get(k, (method, branch or None, 0.0))[2]
+            totals[k] = (method, branch or None, prev + float(total or 0))
+        if totals:
+            conn = s.connection()
+            now = datetime.now()
+            stmt = _DIALECT_INSERT[conn.dialect.name](_table)
+            conn.execute(stmt.on_conflict_do_update(
+                index_elements=[_table.c.key],
+                set_={"total": stmt.excluded.total, "updated_at": stmt.excluded.updated_at},
+            ), [dict(key=k, payment_method=m, branch=b, total=t, updated_at=now)
+                for k, (m, b, t) in totals.items()])
+        s.commit()
+    logger.info("[cash_totals] rebuilt %d cashbox balances", len(totals))
@@ -19,19 +19,25 @@ Domain rule (per Микола, 2026-05-04):
   reverted on the surviving hour automatically.
 
 Always idempotent — running ``recompute_user_chains_for_day`` twice
-with no booking changes between runs yields zero delta. Failures
+with no booking changes between runs yields zero delta.
+
+Callers that touch several (resource, day) pairs at once (multi-slot
+create, series cancel) pass them all to ``recompute_user_chains``: the
+days are loaded with one query and settled with one ledger row, instead of
+a full reload-and-settle per pair. Failures
 inside this module are caught at the caller layer (routes) so a
 booking mutation is never blocked by a recompute glitch.
 """
 from __future__ import annotations
 
 import logging
-from datetime import datetime
-from typing import List, Optional
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
 
 from sqlmodel import Session, select
 
 from app.models.booking import Booking
+from app.models.resource import Resource
 from app.models.user import User
 from app.services.pricing import PricingService
 from app.services.timeline import timeline_service
@@ -48,37 +54,15 @@ def _booking_end_min(b: Booking) -> int:
     return _time_to_min(b.start_time) + int(b.duration or 0)
 
 
-def find_consecutive_chains_for_user_day(
-    session: Session,
-    user_uuid,
-    resource_id: str,
-    date: datetime,
-) -> List[List[Booking]]:
-    """Group every confirmed balance-paid booking the user holds on
-    (resource_id, calendar day of `date`) into consecutive 0-gap chains.
-    Returns chains sorted earliest-first; each chain is sorted by
-    start_time. A solo booking (no neighbours) is its own chain of 1.
-    """
-    day_start = date.replace(hour=0, minute=0, second=0, microsecond=0)
-    day_end = day_start.replace(hour=23, minute=59, second=59, microsecond=999_999)
-
-    rows = session.exec(
-        select(Booking).where(
-            Booking.user_uuid == user_uuid,
-            Booking.resource_id == resource_id,
-            Booking.date >= day_start,
-            Booking.date <= day_end,
-            Booking.status == "confirmed",
-            Booking.payment_method == "balance",
-        )
-    ).all()
-
-    if not rows:
-        return []
-
+def build_chains(rows: Iterable[Booking]) -> List[List[Booking]]:
+    """Group bookings of ONE (resource, day) into consecutive 0-gap chains,
+    earliest first; each chain sorted by start_time. A solo booking (no
+    neighbours) is its own chain of 1."""
     # Sort by start minute (handles "9:00" vs "10:00" correctly even
     # if start_time stays string-only)
-    rows.sort(key=lambda b: _time_to_min(b.start_time))
+    rows = sorted(rows, key=lambda b: _time_to_min(b.start_time))
+    if not rows:
+        return []
 
     chains: List[List[Booking]] = []
     current: List[Booking] = [rows[0]]
@@ -92,33 +76,72 @@ def find_consecutive_chains_for_user_day(
     return chains
 
 
+def _day(value) -> date:
+    return value.date() if isinstance(value, datetime) else value
+
+
+def load_user_days(
+    session: Session,
+    user_uuid,
+    targets: Iterable[Tuple[str, datetime]],
+) -> Dict[Tuple[str, date], List[Booking]]:
+    """Every confirmed balance-paid booking the user holds on each
+    (resource_id, calendar day) of `targets` — one SELECT for all of them."""
+    keys = {(rid, _day(d)) for rid, d in targets}
+    if not keys:
+        return {}
+    first = min(d for _, d in keys)
+    last = max(d for _, d in keys)
+    rows = session.exec(
+        select(Booking).where(
+            Booking.user_uuid == user_uuid,
+            Booking.resource_id.in_({rid for rid, _ in keys}),  # type: ignore[union-attr]
+            Booking.date >= datetime.combine(first, time.min),
+            Booking.date < datetime.combine(last + timedelta(days=1), time.min),
+            Booking.status == "confirmed",
+            Booking.payment_method == "balance",
+        )
+    ).all()
+    days: Dict[Tuple[str, date], List[Booking]] = {k: [] for k in keys}
+    for b in rows:
+        bucket = days.get((b.resource_id, _day(b.date)))
+        if bucket is not None:
+            bucket.append(b)
+    return days
+
+
+def find_consecutive_chains_for_user_day(
+    session: Session,
+    user_uuid,
+    resource_id: str,
+    date: datetime,
+) -> List[List[Booking]]:
+    """Group every confirmed balance-paid booking the user holds on
+    (resource_id, calendar day of `date`) into consecutive 0-gap chains.
+    Returns chains sorted earliest-first; each chain is sorted by
+    start_time. A solo booking (no neighbours) is its own chain of 1.
+    """
+    days = load_user_days(session, user_uuid, [(resource_id, date)])
+    return build_chains(days[(resource_id, _day(date))])
+
+
 def _chain_total_hours(chain: List[Booking]) -> float:
     return sum(int(b.duration or 0) for b in chain) / 60.0
 
 
-def recompute_chain_and_settle(
-    session: Session,
+def _reprice_chain(
+    pricing: PricingService,
     user: User,
     chain: List[Booking],
+    resource: Optional[Resource] = None,
 ) -> dict:
-    """Recompute every booking in the chain at the chain-total tier and
-    settle the price delta on user.balance. Positive delta = client
-    owes more (debit balance), negative = refund. Returns a structured
-    log used by ``recompute_user_chains_for_day`` for the timeline row.
-
-    Only bookings whose money has ALREADY moved (``payment_status`` neither
-    ``pending`` nor ``waived``) settle against the balance. A pending booking
-    has not been charged yet — the T-24h cron will charge whatever final_price
-    says by then — so touching the balance for it invented money in both
-    directions: two future bookings forming a 2h chain credited the client the
-    10% "discount" on a charge that never happened, and cancelling one of them
-    debited a difference that was never taken.
-    """
+    """Re-quote every member of the chain at the chain-total tier and stamp
+    the new prices on the rows. Returns the per-chain log; ``total_delta`` is
+    what the balance still has to settle (see recompute_chain_and_settle)."""
     if not chain:
         return {"chain_size": 0, "chain_hours": 0.0, "total_delta": 0.0, "per_booking": []}
 
     total_hours = _chain_total_hours(chain)
-    pricing = PricingService(session)
     total_delta = 0.0
     per_booking: List[dict] = []
 
@@ -136,6 +159,7 @@ def recompute_chain_and_settle(
             duration_minutes=int(b.duration or 0),
             format_type=b.format,
             consecutive_total_hours=total_hours,
+            resource=resource,
         )
 
         old_final = float(b.final_price or 0.0)
@@ -173,8 +197,17 @@ def recompute_chain_and_settle(
             b.charge_amount = round(charged + delta, 2)
             total_delta += delta
 
-        session.add(b)
+        pricing.session.add(b)
+
+    return {
+        "chain_size": len(chain),
+        "chain_hours": round(total_hours, 2),
+        "total_delta": round(total_delta, 2),
+        "per_booking": per_booking,
+    }
 
+
+def _settle(session: Session, user: User, total_delta: float) -> None:
     if abs(total_delta) >= 0.01:
         # Positive delta = price went UP (e.g. chain shrank, lost discount) →
         # client owes more, so debit balance. Negative = refund.
@@ -183,43 +216,70 @@ def recompute_chain_and_settle(
                      description="Пересчёт по правилу «часы подряд»",
                      ref_type="user", ref_id=str(user.id))
 
-    return {
-        "chain_size": len(chain),
-        "chain_hours": round(total_hours, 2),
-        "total_delta": round(total_delta, 2),
-        "per_booking": per_booking,
-    }
 
+def recompute_chain_and_settle(
+    session: Session,
+    user: User,
+    chain: List[Booking],
+) -> dict:
+    """Recompute every booking in the chain at the chain-total tier and
+    settle the price delta on user.balance. Positive delta = client
+    owes more (debit balance), negative = refund. Returns a structured
+    log used by ``recompute_user_chains`` for the timeline row.
+
+    Only bookings whose money has ALREADY moved (``payment_status`` neither
+    ``pending`` nor ``waived``) settle against the balance. A pending booking
+    has not been charged yet — the T-24h cron will charge whatever final_price
+    says by then — so touching the balance for it invented money in both
+    directions: two future bookings forming a 2h chain credited the client the
+    10% "discount" on a charge that never happened, and cancelling one of them
+    debited a difference that was never taken.
+    """
+    result = _reprice_chain(PricingService(session), user, chain)
+    _settle(session, user, result["total_delta"])
+    return result
 
-def recompute_user_chains_for_day(
+
+def recompute_user_chains(
     session: Session,
     user: User,
-    resource_id: str,
-    date: datetime,
+    targets: Iterable[Tuple[str, datetime]],
     actor_id: Optional[str] = None,
     actor_role: str = "system",
     reason: str = "consecutive_recompute",
 ) -> dict:
-    """Find every chain the user has on this resource+day, recompute &
-    settle each. One audit timeline row is written if anything changed.
+    """Recompute & settle every chain the user has on each (resource_id,
+    day) in `targets` in one pass: one SELECT for the bookings of all the
+    days, one for their cabinets, every member priced from that snapshot,
+    one balance settlement and one audit timeline row (if anything changed).
+
     Caller passes the trigger context (`reason`) so the audit row reads
     e.g. ``"create_booking"`` / ``"cancel_booking"``.
     """
-    chains = find_consecutive_chains_for_user_day(session, user.id, resource_id, date)
+    days = load_user_days(session, user.id, targets)
+    resources = {
+        r.id: r for r in session.exec(
+            select(Resource).where(Resource.id.in_({rid for rid, _ in days}))  # type: ignore[union-attr]
+        ).all()
+    } if days else {}
+    pricing = PricingService(session)
     summary = {
         "reason": reason,
-        "chains": len(chains),
+        "chains": 0,
         "total_delta": 0.0,
         "details": [],
     }
 
-    for chain in chains:
-        result = recompute_chain_and_settle(session, user, chain)
-        summary["total_delta"] += result["total_delta"]
-        if result["per_booking"]:
-            summary["details"].append(result)
+    for (resource_id, _), rows in sorted(days.items()):
+        for chain in build_chains(rows):
+            summary["chains"] += 1
+            result = _reprice_chain(pricing, user, chain, resources.get(resource_id))
+            summary["total_delta"] += result["total_delta"]
+            if result["per_booking"]:
+                summary["details"].append(result)
 
     summary["total_delta"] = round(summary["total_delta"], 2)
+    _settle(session, user, summary["total_delta"])
 
     if summary["details"]:
         try:
@@ -241,3 +301,20 @@ def recompute_user_chains_for_day(
             logger.exception("[consecutive] timeline log failed")
 
     return summary
+
+
+def recompute_user_chains_for_day(
+    session: Session,
+    user: User,
+    resource_id: str,
+    date: datetime,
+    actor_id: Optional[str] = None,
+    actor_role: str = "system",
+    reason: str = "consecutive_recompute",
+) -> dict:
+    """Find every chain the user has on this resource+day, recompute &
+    settle each (see recompute_user_chains)."""
+    return recompute_user_chains(
+        session, user, [(resource_id, date)],
+        actor_id=actor_id, actor_role=actor_role, reason=reason,
+    )
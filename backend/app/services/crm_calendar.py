@@ -9,12 +9,11 @@ CRM Google Calendar Service — синхронизация личного кал
 import os
 import json
 import re
+import threading
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
+from app.services import google_api
 
 # ─── Credentials ──────────────────────────────────────────────────────────────
 
@@ -22,19 +21,29 @@ _CRM_SA_FILE = os.environ.get(
     "CRM_GOOGLE_SERVICE_ACCOUNT_FILE",
     os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "psycrm-calendar.json")
 )
-_SCOPES = ["https://www.googleapis.com/auth/calendar"]
+_creds = None
+_creds_lock = threading.Lock()
+# One client per thread: the client's httplib2 connection isn't thread-safe,
+# and rebuilding it on every call re-read the discovery document each time.
+_local = threading.local()
 
 
 def _get_calendar_service():
-    if not os.path.exists(_CRM_SA_FILE):
-        raise RuntimeError(
-            f"CRM service account file not found: {_CRM_SA_FILE}. "
-            "Set CRM_GOOGLE_SERVICE_ACCOUNT_FILE env var."
-        )
-    creds = service_account.Credentials.from_service_account_file(
-        _CRM_SA_FILE, scopes=_SCOPES
-    )
-    return build("calendar", "v3", credentials=creds, cache_discovery=False)
+    global _creds
+    service = getattr(_local, "service", None)
+    if service is not None:
+        return service
+    if _creds is None:
+        with _creds_lock:
+            if _creds is None:
+                if not os.path.exists(_CRM_SA_FILE):
+                    raise RuntimeError(
+                        f"CRM service account file not found: {_CRM_SA_FILE}. "
+                        "Set CRM_GOOGLE_SERVICE_ACCOUNT_FILE env var."
+                    )
+                _creds = google_api.service_account_credentials(path=_CRM_SA_FILE)
+    service = _local.service = google_api.calendar_client(_creds)
+    return service
 
 
 # ─── Core helpers ─────────────────────────────────────────────────────────────
@@ -201,6 +210,8 @@ def patch_event_summary(calendar_id: str, event_id: str, new_summary: str) -> No
 
 def delete_calendar_event(calendar_id: str, event_id: str) -> None:
     """Delete a Google Calendar event (marks session as cancelled)."""
+    from googleapiclient.errors import HttpError
+
     service = _get_calendar_service()
     try:
         service.events().delete(calendarId=calendar_id, eventId=event_id).execute()
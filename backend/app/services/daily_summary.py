@@ -0,0 +1,203 @@
+"""Owner's daily Telegram summary (POST /telegram/daily-summary).
+
+The endpoint used to load yesterday's bookings, every location and then
+the ENTIRE cashbox history as ORM objects, only to add numbers up in
+Python. The last step grew with every transaction ever written, and ran
+on the cron request thread.
+
+Now it runs four aggregate queries, each bounded by an index, whatever
+the length of the history:
+
+1. bookings created yesterday, GROUP BY location and status, with the
+   location name joined in;
+2. cashbox rows dated yesterday, GROUP BY type, payment method and branch;
+3. current balances per method from the running totals
+   (services/cash_totals);
+4. movement dated after yesterday's end, GROUP BY method. Subtracting it
+   from (3) gives "balances this morning" without re-summing the past.
+
+`build()` only reads. The endpoint sends the result, or, with
+`dry_run`, returns the text and a per-stage timing breakdown.
+"""
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import case
+from sqlmodel import Session, func, select
+
+from app.models.booking import Booking
+from app.models.cashbox_transaction import CashboxTransaction
+from app.models.location import Location
+from app.services import cash_totals
+
+TBS = timedelta(hours=4)
+
+METHOD_LABEL = {
+    "cash": "наличные",
+    "card_tbc": "TBC",
+    "card_bog": "BOG",
+    "bonus": "бонусы",
+    "balance": "баланс клиента",
+}
+
+
+@dataclass
+class DailySummary:
+    date_label: str
+    text: str
+    stats: dict
+    timings_ms: dict = field(default_factory=dict)
+
+
+def yesterday_window(now_utc: Optional[datetime] = None) -> tuple[datetime, datetime]:
+    """"Yesterday" is the full Tbilisi (UTC+4) calendar day ending at the most
+    recent midnight Tbilisi time, as naive UTC to match what the DB stores."""
+    now_tbs = (now_utc or datetime.utcnow()) + TBS
+    end = now_tbs.replace(hour=0, minute=0, second=0, microsecond=0) - TBS
+    return end - timedelta(days=1), end
+
+
+def _fmt_money_dict(d: dict) -> str:
+    if not d:
+        return "—"
+    parts = [f"{METHOD_LABEL.get(k, k)}: <b>{v:g}</b> ₾" for k, v in sorted(d.items(), key=lambda x: -x[1])]
+    return " · ".join(parts)
+
+
+def _fmt_count_dict(d: dict) -> str:
+    if not d:
+        return "—"
+    return " · ".join(f"{k}: <b>{v}</b>" for k, v in sorted(d.items(), key=lambda x: -x[1]))
+
+
+def _bookings(session: Session, start: datetime, end: datetime) -> dict:
+    rows = session.exec(
+        select(
+            Booking.location_id, Location.name, Booking.status,
+            func.count(Booking.id),
+            func.coalesce(func.sum(Booking.duration), 0),
+            func.coalesce(func.sum(Booking.final_price), 0),
+        )
+        .outerjoin(Location, Location.id == Booking.location_id)
+        .where(Booking.created_at >= start, Booking.created_at < end)
+        .group_by(Booking.location_id, Location.name, Booking.status)
+    ).all()
+    total = cancelled = 0
+    minutes = 0.0
+    by_loc: dict = {}
+    by_loc_revenue: dict = {}
+    for loc_id, loc_name, status, n, dur, revenue in rows:
+        total += n
+        if status == "cancelled":
+            cancelled += n
+            continue
+        name = loc_name or loc_id or "—"
+        by_loc[name] = by_loc.get(name, 0) + n
+        by_loc_revenue[name] = by_loc_revenue.get(name, 0.0) + float(revenue)
+        minutes += float(dur)
+    return {"total": total, "cancelled": cancelled, "hours": minutes / 60.0,
+            "by_loc": by_loc, "by_loc_revenue": by_loc_revenue}
+
+
+def _cashbox(session: Session, start: datetime, end: datetime) -> dict:
+    rows = session.exec(
+        select(CashboxTransaction.type, CashboxTransaction.payment_method, CashboxTransaction.branch,
+               func.sum(CashboxTransaction.amount))
+        .where(CashboxTransaction.date >= start, CashboxTransaction.date < end)
+        .where(CashboxTransaction.type.in_(["income", "expense"]))
+        .group_by(CashboxTransaction.type, CashboxTransaction.payment_method, CashboxTransaction.branch)
+    ).all()
+    income_by_method: dict = {}
+    expense_by_method: dict = {}
+    income_by_branch: dict = {}
+    for tx_type, method, branch, amount in rows:
+        amt = float(amount or 0)
+        method = method or "—"
+        if tx_type == "income":
+            income_by_method[method] = income_by_method.get(method, 0.0) + amt
+            br = branch or "—"
+            income_by_branch[br] = income_by_branch.get(br, 0.0) + amt
+        else:
+            expense_by_method[method] = expense_by_method.get(method, 0.0) + amt
+    return {"income_by_method": income_by_method, "expense_by_method": expense_by_method,
+            "income_by_branch": income_by_branch}
+
+
+def _morning_balances(session: Session, end: datetime) -> dict:
+    """income − expense per method up to `end`: running totals minus what
+    has been dated since (today's few rows)."""
+    balances = cash_totals.balances(session)
+    signed = case(
+        (CashboxTransaction.type == "income", CashboxTransaction.amount),
+        (CashboxTransaction.type == "expense", -CashboxTransaction.amount),
+        else_=0,
+    )
+    since = session.exec(
+        select(CashboxTransaction.payment_method, func.sum(signed))
+        .where(CashboxTransaction.date >= end)
+        .group_by(CashboxTransaction.payment_method)
+    ).all()
+    for method, amount in since:
+        balances[method] = balances.get(method, 0.0) - float(amount or 0)
+    return {k: round(v, 2) for k, v in balances.items()}
+
+
+def build(session: Session, now_utc: Optional[datetime] = None) -> DailySummary:
+    start, end = yesterday_window(now_utc)
+    date_label = (start + TBS).strftime("%d.%m.%Y")
+    timings: dict = {}
+
+    t = time.perf_counter()
+    b = _bookings(session, start, end)
+    timings["bookings"] = (time.perf_counter() - t) * 1000
+    t = time.perf_counter()
+    c = _cashbox(session, start, end)
+    timings["cashbox"] = (time.perf_counter() - t) * 1000
+    t = time.perf_counter()
+    balance_by_method = _morning_balances(session, end)
+    timings["balances"] = (time.perf_counter() - t) * 1000
+
+    t = time.perf_counter()
+    total_income = sum(c["income_by_method"].values())
+    total_expense = sum(c["expense_by_method"].values())
+    lines = [
+        f"📊 <b>Сводка за {date_label}</b>",
+        "",
+        "<b>Бронирования</b>",
+        f"• Всего создано: <b>{b['total']}</b> (из них отмен: <b>{b['cancelled']}</b>)",
+        f"• Часов брони: <b>{b['hours']:g}</b> ч",
+    ]
+    if b["by_loc"]:
+        lines.append(f"• По филиалам: {_fmt_count_dict(b['by_loc'])}")
+    if b["by_loc_revenue"]:
+        loc_rev = " · ".join(f"{k}: <b>{v:g}</b> ₾" for k, v in sorted(b["by_loc_revenue"].items(), key=lambda x: -x[1]))
+        lines.append(f"• Выручка (по броням): {loc_rev}")
+
+    lines.append("")
+    lines.append("<b>Касса</b>")
+    lines.append(f"• Приход: <b>{total_income:g}</b> ₾ — {_fmt_money_dict(c['income_by_method'])}")
+    lines.append(f"• Расход: <b>{total_expense:g}</b> ₾ — {_fmt_money_dict(c['expense_by_method'])}")
+    if c["income_by_branch"]:
+        br_line = " · ".join(f"{k}: <b>{v:g}</b> ₾" for k, v in sorted(c["income_by_branch"].items(), key=lambda x: -x[1]))
+        lines.append(f"• Приход по филиалам: {br_line}")
+
+    lines.append("")
+    lines.append("<b>Остатки на утро</b>")
+    lines.append(f"• {_fmt_money_dict(balance_by_method)}")
+    timings["render"] = (time.perf_counter() - t) * 1000
+
+    return DailySummary(
+        date_label=date_label,
+        text="\n".join(lines),
+        stats={
+            "bookings": b["total"],
+            "cancelled": b["cancelled"],
+            "income": total_income,
+            "expense": total_expense,
+        },
+        timings_ms={k: round(v, 2) for k, v in timings.items()},
+    )
@@ -0,0 +1,270 @@
+"""Google Calendar writes, batched per calendar.
+
+Recurring creation and series cancel used to call
+`events().insert/delete().execute()` once per booking, one after another: a
+20-session series was 20 sequential round-trips to Google, each its own
+chance to hit the per-calendar rate limit, and a failure just left
+`gcal_event_id` empty with nothing recording that the push had failed.
+
+Here the operations are grouped by calendar and sent through Google's batch
+endpoint — up to `_BATCH_LIMIT` (Google's cap is 50) per HTTP request.
+Chunks run on a small thread pool (`settings.GCAL_WORKERS`), each thread
+with its own authorised httplib2 connection: the client's shared `Http`
+object isn't thread-safe. Inside a chunk only the operations that failed
+with a retryable error — 403 rateLimitExceeded / userRateLimitExceeded, 429,
+5xx, transport errors — are re-batched, with exponential backoff and jitter.
+Deleting an event Google no longer has (404/410) counts as done.
+
+A timeout or a 5xx doesn't say the write wasn't applied — Google may have
+created the event and lost the answer. So inserts are idempotent: the event
+id is the booking's (`event_id`, its UUID hex is valid base32hex), and an
+insert Google answers with 409 (the id exists) becomes an `update` of that
+event with `status: confirmed`. That covers both a repeat of an insert that
+did land and an id whose event a reschedule deleted (Google keeps deleted
+ids reserved; the update restores the event with the new slot).
+
+`push_bookings` stamps the outcome on the booking: `gcal_event_id` on
+success, `gcal_sync_failed` when Google still refused after the retries.
+Anything that stays failed is the caller's to retry — the outbox handlers
+(services/outbox_handlers) raise, and the outbox reschedules the event.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Iterable, Optional
+from uuid import UUID
+
+from app.core.config import settings
+from app.models.booking import Booking
+from app.services.google_calendar import gcal_service
+
+logger = logging.getLogger(__name__)
+
+_BATCH_LIMIT = 50
+_ATTEMPTS = 4
+_BACKOFF_BASE_S = 1.0
+_BACKOFF_MAX_S = 16.0
+_HTTP_TIMEOUT_S = 30
+_RATE_LIMIT_REASONS = ("ratelimitexceeded", "userratelimitexceeded")
+
+_pool: Optional[ThreadPoolExecutor] = None
+_local = threading.local()
+# Patched out by tests.
+_sleep = time.sleep
+
+
+@dataclass
+class Op:
+    """One write against one calendar. `run` fills in `event_id` (for an
+    insert without one: the new event), `done` and `error`."""
+    calendar_id: str
+    method: str  # "insert" | "update" | "delete"
+    body: Optional[dict] = None
+    event_id: Optional[str] = None
+    done: bool = False
+    error: Optional[BaseException] = None
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=settings.GCAL_WORKERS, thread_name_prefix="unbox-gcal")
+    return _pool
+
+
+def _http():
+    """Per-thread authorised Http, or None to let the client use its own
+    (no service-account credentials — i.e. a test double)."""
+    creds = gcal_service.creds
+    if creds is None:
+        return None
+    http = getattr(_local, "http", None)
+    if http is None:
+        import google_auth_httplib2
+        import httplib2
+
+        http = _local.http = google_auth_httplib2.AuthorizedHttp(
+            creds, http=httplib2.Http(timeout=_HTTP_TIMEOUT_S)
+        )
+    return http
+
+
+def _status(exc: BaseException) -> Optional[int]:
+    status = getattr(getattr(exc, "resp", None), "status", None)
+    return int(status) if status is not None else None
+
+
+def _retryable(exc: BaseException) -> bool:
+    status = _status(exc)
+    if status is None:
+        return True  # timeout, reset connection, DNS — not an answer from Google
+    if status == 429 or status >= 500:
+        return True
+    if status == 403:
+        content = getattr(exc, "content", b"") or b""
+        if isinstance(content, bytes):
+            content = content.decode("utf-8", "replace")
+        try:
+            reasons = [e.get("reason", "") for e in json.loads(content)["error"]["errors"]]
+        except (ValueError, KeyError, TypeError):
+            reasons = [content]
+        return any(r.lower() in _RATE_LIMIT_REASONS for r in reasons)
+    return False
+
+
+def _backoff(attempt: int) -> float:
+    return min(_BACKOFF_BASE_S * 2 ** (attempt - 1), _BACKOFF_MAX_S) + random.uniform(0, 0.5)
+
+
+def event_id(booking_id) -> str:
+    """Google event id of a booking's event (lowercase a–v / 0–9, 5–1024
+    chars — a UUID's hex is all of that)."""
+    return UUID(str(booking_id)).hex
+
+
+def _request(service, op: Op):
+    if op.method == "insert":
+        return service.events().insert(calendarId=op.calendar_id, body=op.body)
+    if op.method == "update":
+        return service.events().update(calendarId=op.calendar_id, eventId=op.event_id, body=op.body)
+    return service.events().delete(calendarId=op.calendar_id, eventId=op.event_id)
+
+
+def _run_chunk(service, chunk: list[Op]) -> None:
+    pending = chunk
+    for attempt in range(_ATTEMPTS):
+        if attempt:
+            _sleep(_backoff(attempt))
+        by_id = {str(i): op for i, op in enumerate(pending)}
+        retry: list[Op] = []
+
+        def callback(request_id, response, exception):
+            op = by_id[request_id]
+            if exception is None:
+                op.done, op.error = True, None
+                if op.method == "insert":
+                    op.event_id = (response or {}).get("id")
+            elif op.method == "delete" and _status(exception) in (404, 410):
+                op.done, op.error = True, None  # already gone
+            elif op.method == "insert" and op.event_id and _status(exception) == 409:
+                # Our id is taken: an earlier attempt landed, or the event
+                # was deleted. Either way, write this content onto it.
+                op.method, op.error = "update", exception
+                op.body = {**(op.body or {}), "status": "confirmed"}
+                retry.append(op)
+            else:
+                op.error = exception
+                if _retryable(exception):
+                    retry.append(op)
+
+        batch = service.new_batch_http_request(callback=callback)
+        for request_id, op in by_id.items():
+            batch.add(_request(service, op), request_id=request_id)
+        try:
+            batch.execute(http=_http())
+        except Exception as e:
+            # The batch envelope itself failed. Some of it may still have
+            # been applied (a timeout after Google got the request): sending
+            # it again is safe only because inserts carry their own id.
+            for op in pending:
+                if not op.done:
+                    op.error = e
+            retry = [op for op in pending if not op.done] if _retryable(e) else []
+        if not retry:
+            return
+        pending = retry
+        logger.info(
+            "[gcal_writer] %d/%d ops on %s… throttled/failed, retry %d",
+            len(retry), len(chunk), chunk[0].calendar_id[:20], attempt + 1,
+        )
+
+
+def run(ops: list[Op]) -> list[Op]:
+    """Execute `ops`: grouped by calendar, ≤_BATCH_LIMIT per batch request,
+    batches in parallel on the pool. Never raises for a failed operation —
+    check `op.done` / `op.error`."""
+    service = gcal_service.service
+    if not ops:
+        return ops
+    if service is None:
+        for op in ops:
+            op.error = RuntimeError("Google Calendar is not connected")
+        return ops
+    by_calendar: dict[str, list[Op]] = defaultdict(list)
+    for op in ops:
+        by_calendar[op.calendar_id].append(op)
+    chunks = [
+        group[i:i + _BATCH_LIMIT]
+        for group in by_calendar.values()
+        for i in range(0, len(group), _BATCH_LIMIT)
+    ]
+    if len(chunks) == 1:
+        _run_chunk(service, chunks[0])
+    else:
+        for future in [_executor().submit(_run_chunk, service, c) for c in chunks]:
+            future.result()
+    return ops
+
+
+# ── booking-level helpers ────────────────────────────────────────────────────
+
+def push_bookings(session, bookings: Iterable[Booking], user_name: Optional[str]) -> tuple[int, int]:
+    """Create the missing events for `bookings`. Sets `gcal_event_id` /
+    `gcal_sync_failed` and adds the rows to `session` — the caller commits.
+
+    Returns (synced, failed). Cancelled bookings, ones that already have an
+    event and rooms without a configured calendar count as neither."""
+    if gcal_service.service is None:
+        return 0, 0
+    pairs: list[tuple[Booking, Op]] = []
+    for bk in bookings:
+        if bk.gcal_event_id or bk.status == "cancelled":
+            continue
+        calendar_id = gcal_service.get_calendar_id(bk.resource_id)
+        if not calendar_id:
+            continue
+        eid = event_id(bk.id)
+        body = {**gcal_service.event_body(bk, user_name), "id": eid}
+        pairs.append((bk, Op(calendar_id, "insert", body=body, event_id=eid)))
+    run([op for _, op in pairs])
+
+    synced = failed = 0
+    for bk, op in pairs:
+        if op.done and op.event_id:
+            bk.gcal_event_id = op.event_id
+            bk.gcal_sync_failed = False
+            synced += 1
+        else:
+            bk.gcal_sync_failed = True
+            failed += 1
+            logger.warning(f"[gcal_writer] create failed for booking {bk.id}: {op.error!r}")
+        session.add(bk)
+    return synced, failed
+
+
+def delete_events(events: Iterable[tuple[str, Optional[str]]]) -> list[tuple[str, Optional[str]]]:
+    """Delete `(event_id, resource_id)` pairs. Returns the ones that could
+    not be deleted (unconfigured rooms are skipped, not failures)."""
+    if gcal_service.service is None:
+        return []
+    pairs: list[tuple[tuple[str, Optional[str]], Op]] = []
+    for event_id, resource_id in events:
+        if not event_id or not resource_id:
+            continue
+        calendar_id = gcal_service.get_calendar_id(resource_id)
+        if calendar_id:
+            pairs.append(((event_id, resource_id), Op(calendar_id, "delete", event_id=event_id)))
+    run([op for _, op in pairs])
+    failed = []
+    for pair, op in pairs:
+        if not op.done:
+            logger.warning(f"[gcal_writer] delete failed for event {pair[0]}: {op.error!r}")
+            failed.append(pair)
+    return failed
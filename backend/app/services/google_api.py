@@ -0,0 +1,55 @@
+"""Google Calendar API clients, built on first use.
+
+`googleapiclient` + `google.auth` are ~70 ms of imports, and the cabinet
+calendar service used to authenticate and `build()` its client while
+`app.main` was still importing — every restart, every cron-spawned script
+and every test process paid for it whether or not it ever talked to
+Google. The CRM calendar went the other way and rebuilt a client (re-reading
+the 130 KB discovery document from disk) on every call.
+
+Callers import this module freely: the Google libraries are imported
+inside the functions, the bundled discovery document is read once per
+process, and `calendar_client` builds from that string (the parsed form
+gets mutated by the builder, so the string is what is shared).
+"""
+from __future__ import annotations
+
+import threading
+from typing import Optional
+
+SCOPES = ["https://www.googleapis.com/auth/calendar"]
+
+_doc: Optional[str] = None
+_doc_lock = threading.Lock()
+
+
+def _discovery_doc() -> Optional[str]:
+    global _doc
+    if _doc is None:
+        with _doc_lock:
+            if _doc is None:
+                from googleapiclient.discovery_cache import get_static_doc
+
+                _doc = get_static_doc("calendar", "v3") or ""
+    return _doc or None
+
+
+def service_account_credentials(*, info: Optional[dict] = None, path: Optional[str] = None):
+    from google.oauth2 import service_account
+
+    if info is not None:
+        return service_account.Credentials.from_service_account_info(info, scopes=SCOPES)
+    return service_account.Credentials.from_service_account_file(path, scopes=SCOPES)
+
+
+def calendar_client(credentials):
+    """Calendar v3 client from the bundled discovery document — no network
+    fetch, no file cache."""
+    doc = _discovery_doc()
+    if doc:
+        from googleapiclient.discovery import build_from_document
+
+        return build_from_document(doc, credentials=credentials)
+    from googleapiclient.discovery import build
+
+    return build("calendar", "v3", credentials=credentials, cache_discovery=False)
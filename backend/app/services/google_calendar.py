@@ -1,21 +1,54 @@
 import os
 import json
 import logging
+import threading
 from typing import Optional
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
 from app.models.booking import Booking
 from app.core.config import settings
+from app.services import google_api
 
 logger = logging.getLogger(__name__)
 
-SCOPES = ['https://www.googleapis.com/auth/calendar']
+SCOPES = google_api.SCOPES
 
 class GoogleCalendarService:
+    """Cabinet calendars. The client is built on first use of `service` /
+    `creds` (services/google_api), not at import — importing this module
+    no longer touches the Google libraries or the credentials."""
+
     def __init__(self):
-        self.creds = None
-        self.service = None
-        self._authenticate()
+        self._creds = None
+        self._service = None
+        self._ready = False
+        self._lock = threading.Lock()
+
+    @property
+    def service(self):
+        if not self._ready:
+            self._connect()
+        return self._service
+
+    @service.setter
+    def service(self, value):
+        self._service, self._ready = value, True
+
+    @property
+    def creds(self):
+        if not self._ready:
+            self._connect()
+        return self._creds
+
+    @creds.setter
+    def creds(self, value):
+        self._creds = value
+
+    def _connect(self):
+        # One thread authenticates; the rest wait for its result instead of
+        # each building a client of their own.
+        with self._lock:
+            if not self._ready:
+                self._authenticate()
+                self._ready = True
 
     def _authenticate(self):
         """
@@ -30,10 +63,8 @@ class GoogleCalendarService:
             if json_content:
                 try:
                     info = json.loads(json_content)
-                    self.creds = service_account.Credentials.from_service_account_info(
-                        info, scopes=SCOPES
-                    )
-                    self.service = build('calendar', 'v3', credentials=self.creds)
+                    self._creds = google_api.service_account_credentials(info=info)
+                    self._service = google_api.calendar_client(self._creds)
                     logger.info("Google Calendar: Authenticated via GOOGLE_SERVICE_ACCOUNT_JSON env variable.")
                     return
                 except (json.JSONDecodeError, ValueError) as e:
@@ -43,10 +74,8 @@ class GoogleCalendarService:
             json_path = settings.GOOGLE_SERVICE_ACCOUNT_FILE or "credentials.json"
 
             if os.path.exists(json_path):
-                self.creds = service_account.Credentials.from_service_account_file(
-                    json_path, scopes=SCOPES
-                )
-                self.service = build('calendar', 'v3', credentials=self.creds)
+                self._creds = google_api.service_account_credentials(path=json_path)
+                self._service = google_api.calendar_client(self._creds)
                 logger.info(f"Google Calendar: Authenticated via file: {json_path}")
             else:
                 logger.warning(
@@ -111,6 +140,36 @@ class GoogleCalendarService:
         "neo_school_room_1": "Аудитория 1",
     }
 
+    def event_body(self, booking: Booking, user_name: str = None) -> dict:
+        """Event resource for `booking` — shared by create_event and the
+        batched writer (services/gcal_writer)."""
+        room_name = self.RESOURCE_NAMES.get(booking.resource_id, booking.resource_id)
+        name = user_name or ''
+        summary = f"{name} — {room_name}".strip(' —')
+
+        # Construct start/end datetime via real datetime arithmetic so that
+        # bookings crossing midnight roll over to the next day. Раньше
+        # end_h = total_minutes // 60 давал «T24:00:00» для брони 23:00+60мин
+        # → Google 400 Bad Request (час >23), и дата не переходила на след.
+        # день. Теперь timedelta корректно обрабатывает полночь.
+        from datetime import timedelta as _td
+        start_h, start_m = map(int, booking.start_time.split(':'))
+        start_obj = booking.date.replace(hour=start_h, minute=start_m, second=0, microsecond=0)
+        end_obj = start_obj + _td(minutes=booking.duration)
+
+        return {
+            'summary': summary,
+            'description': f"{room_name}, {booking.duration} мин" + (f"\nExtras: {', '.join(booking.extras)}" if booking.extras else ''),
+            'start': {
+                'dateTime': start_obj.strftime("%Y-%m-%dT%H:%M:%S"),
+                'timeZone': 'Asia/Tbilisi',
+            },
+            'end': {
+                'dateTime': end_obj.strftime("%Y-%m-%dT%H:%M:%S"),
+                'timeZone': 'Asia/Tbilisi',
+            },
+        }
+
     def create_event(self, booking: Booking, user_name: str = None) -> Optional[str]:
         """
         Create an event in Google Calendar. Returns event ID.
@@ -124,36 +183,9 @@ class GoogleCalendarService:
             logger.warning(f"Google Calendar: No Calendar ID found for resource {booking.resource_id}")
             return None
 
-        room_name = self.RESOURCE_NAMES.get(booking.resource_id, booking.resource_id)
-        name = user_name or ''
-        summary = f"{name} — {room_name}".strip(' —')
-
         try:
-            # Construct start/end datetime via real datetime arithmetic so that
-            # bookings crossing midnight roll over to the next day. Раньше
-            # end_h = total_minutes // 60 давал «T24:00:00» для брони 23:00+60мин
-            # → Google 400 Bad Request (час >23), и дата не переходила на след.
-            # день. Теперь timedelta корректно обрабатывает полночь.
-            from datetime import timedelta as _td
-            start_h, start_m = map(int, booking.start_time.split(':'))
-            start_obj = booking.date.replace(hour=start_h, minute=start_m, second=0, microsecond=0)
-            end_obj = start_obj + _td(minutes=booking.duration)
-            start_dt = start_obj.strftime("%Y-%m-%dT%H:%M:%S")
-            end_dt = end_obj.strftime("%Y-%m-%dT%H:%M:%S")
-            date_str = start_obj.strftime("%Y-%m-%d")
-
-            event = {
-                'summary': summary,
-                'description': f"{room_name}, {booking.duration} мин" + (f"\nExtras: {', '.join(booking.extras)}" if booking.extras else ''),
-                'start': {
-                    'dateTime': start_dt,
-                    'timeZone': 'Asia/Tbilisi',
-                },
-                'end': {
-                    'dateTime': end_dt,
-                    'timeZone': 'Asia/Tbilisi',
-                },
-            }
+            event = self.event_body(booking, user_name)
+            date_str = event['start']['dateTime'][:10]
 
             logger.info(f"Google Calendar: Creating event for booking {booking.id} "
                        f"on calendar {calendar_id[:20]}... "
@@ -247,8 +279,9 @@ class GoogleCalendarService:
         Check if the service is authenticated and ready.
         """
         if self.service is None:
-            self._authenticate()
+            with self._lock:
+                self._authenticate()
         return self.service is not None
 
-# Global instance
+# Global instance — cheap: nothing is built until first use
 gcal_service = GoogleCalendarService()
@@ -0,0 +1,188 @@
+"""Uploaded image → content-addressed original + resized WebP/AVIF variants.
+
+Avatars, cabinet photos and post covers used to be stored as uploaded (up to
+2 MB) and shipped at full size to every card that shows them — a 64 px
+avatar in the specialist list cost the same as the full-screen photo.
+
+Layout under /uploads/img/<h[:2]>/ for the SHA-256 `h` of the upload:
+
+    <h>.<ext>             original bytes, extension from the decoded format
+    <h>-<w>.webp          variant with long edge <= w, for every w in VARIANTS
+    <h>-<w>.avif          same, when Pillow has an AVIF encoder
+    <h>.json              manifest (returned by the upload endpoint)
+
+Names are derived from the content, so the same photo uploaded twice is
+stored once and every URL can be cached forever (nginx serves /uploads/img/
+as immutable). Every width is always written — a small original is
+re-encoded at its own size rather than upscaled — and the original's URL
+carries its size (`<h>.<ext>?w=1200&h=800`), so the frontend can build a
+srcset from that URL alone (src/utils/imageVariants.ts) with the variants'
+real widths: a portrait 640 variant is narrower than 640 px, and a small
+original has fewer distinct variants than VARIANTS.
+
+Decoding/resizing/encoding runs in a small thread pool (Pillow releases the
+GIL for the heavy parts) so the event loop keeps serving while a 12 MP photo
+is squeezed.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from app.core.config import settings
+
+# Long edge in px. thumb: avatars/list cards, medium: cards/cover previews,
+# large: full-width post covers and the profile hero.
+VARIANTS = {"thumb": 160, "medium": 640, "large": 1280}
+_WEBP_QUALITY = 80
+_AVIF_QUALITY = 55
+# 40 MP — more than any phone camera, far below a decompression bomb.
+_MAX_PIXELS = 40_000_000
+_EXT_BY_FORMAT = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp", "GIF": "gif"}
+
+_pool: Optional[ThreadPoolExecutor] = None
+
+
+class ImageRejected(ValueError):
+    """Not an image we can decode (HEIC, SVG, truncated, bomb…)."""
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=settings.IMAGE_WORKERS, thread_name_prefix="unbox-img")
+    return _pool
+
+
+def _avif_supported() -> bool:
+    from PIL import features
+
+    return settings.IMAGE_AVIF and bool(features.check("avif"))
+
+
+def _rel_dir(digest: str) -> str:
+    return os.path.join("img", digest[:2])
+
+
+def _url(rel: str) -> str:
+    return "/uploads/" + rel.replace(os.sep, "/")
+
+
+def variant_name(digest: str, width: int, fmt: str) -> str:
+    return f"{digest}-{width}.{fmt}"
+
+
+def _sized_url(url: str, width: int, height: int) -> str:
+    return f"{url.split('?', 1)[0]}?w={width}&h={height}"
+
+
+def srcset_widths(width: int, height: int) -> list[tuple[int, int]]:
+    """(variant, real width) of every distinct variant of a width × height
+    original. Variants past the original's long edge are copies of it at
+    its own size, so only the first of those is listed."""
+    long_edge = max(width, height)
+    out = []
+    for w in sorted(VARIANTS.values()):
+        out.append((w, width if long_edge <= w else round(width * w / long_edge)))
+        if long_edge <= w:
+            break
+    return out
+
+
+def _manifest(digest: str, ext: str, width: int, height: int, formats: list[str]) -> dict:
+    base = _rel_dir(digest)
+    variants = {
+        name: {fmt: _url(os.path.join(base, variant_name(digest, w, fmt))) for fmt in formats}
+        for name, w in VARIANTS.items()
+    }
+    srcset = {
+        fmt: ", ".join(
+            f"{_url(os.path.join(base, variant_name(digest, w, fmt)))} {real}w"
+            for w, real in srcset_widths(width, height)
+        )
+        for fmt in formats
+    }
+    return {
+        "url": _sized_url(_url(os.path.join(base, f"{digest}.{ext}")), width, height),
+        "hash": digest,
+        "width": width,
+        "height": height,
+        "variants": variants,
+        "srcset": srcset,
+    }
+
+
+def _process(upload_dir: str, tmp_path: str, digest: str) -> dict:
+    """Blocking part — runs on the pool."""
+    from PIL import Image, ImageOps
+
+    out_dir = os.path.join(upload_dir, _rel_dir(digest))
+    manifest_path = os.path.join(out_dir, f"{digest}.json")
+    if os.path.exists(manifest_path):
+        # Seen this exact file before — nothing to do.
+        os.unlink(tmp_path)
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        # Manifests written before the URL carried the size.
+        manifest["url"] = _sized_url(manifest["url"], manifest["width"], manifest["height"])
+        return manifest
+
+    Image.MAX_IMAGE_PIXELS = _MAX_PIXELS
+    unreadable = "Не удалось прочитать изображение. Поддерживаются JPEG, PNG, WebP, GIF."
+    try:
+        with Image.open(tmp_path) as probe:
+            probe.verify()
+        with Image.open(tmp_path) as src:
+            fmt = src.format
+            src.load()
+            # Phones store "rotate 90°" as an EXIF flag; variants get it
+            # applied (and lose the EXIF — GPS included), the original keeps
+            # its bytes.
+            img = ImageOps.exif_transpose(src)
+    except Image.DecompressionBombError:
+        raise ImageRejected("Изображение слишком большое по разрешению.")
+    except Exception:
+        raise ImageRejected(unreadable)
+    if fmt not in _EXT_BY_FORMAT:
+        raise ImageRejected(unreadable)
+
+    os.makedirs(out_dir, exist_ok=True)
+    ext = _EXT_BY_FORMAT[fmt]
+    if img.mode not in ("RGB", "RGBA"):
+        img = img.convert("RGBA" if "transparency" in img.info or img.mode in ("LA", "P") else "RGB")
+    width, height = img.size
+
+    formats = ["webp"] + (["avif"] if _avif_supported() else [])
+    for w in sorted(VARIANTS.values(), reverse=True):
+        resized = img.copy()
+        resized.thumbnail((w, w), Image.LANCZOS)
+        for f in formats:
+            dst = os.path.join(out_dir, variant_name(digest, w, f))
+            tmp = dst + ".part"
+            if f == "webp":
+                resized.save(tmp, "WEBP", quality=_WEBP_QUALITY, method=4)
+            else:
+                resized.save(tmp, "AVIF", quality=_AVIF_QUALITY)
+            os.replace(tmp, dst)
+
+    # Original last: its presence + the manifest mean "fully processed".
+    os.replace(tmp_path, os.path.join(out_dir, f"{digest}.{ext}"))
+    manifest = _manifest(digest, ext, width, height, formats)
+    with open(manifest_path + ".part", "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(manifest_path + ".part", manifest_path)
+    return manifest
+
+
+async def process_upload(upload_dir: str, tmp_path: str, digest: str) -> dict:
+    """Decode, store and resize `tmp_path` (consumed either way). Raises
+    ImageRejected for anything that isn't a decodable raster image."""
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(_executor(), _process, upload_dir, tmp_path, digest)
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
@@ -1,8 +1,126 @@
-from typing import Optional
+"""In-app notifications for admins and users.
+
+Fan-out to admins (`notify_by_permission`, `notify_admins`) used to load
+every admin row, evaluate `has_permission` in Python and add one ORM
+object per recipient. That happened on the request thread of hot events
+(CRM access request, new bookings). Now the recipients come from a
+process-wide index, and the rows go in as one multi-row INSERT.
+
+Index layout: permission (or minimum role) → tuple of admin ids. It is
+built from a single (id, role, permissions) query and dropped after any
+commit that changes an admin's role or permissions — the User mapper
+events below, plus an explicit call from users/admin.update_permissions.
+A TTL bounds how long another process's change can go unseen.
+"""
+import threading
+import time
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Callable, Optional
+from uuid import uuid4
+
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session as _SASession
+from sqlalchemy.orm.attributes import get_history
 from sqlmodel import Session, select
+
 from app.models.notification import Notification
 from app.models.user import User
 from app.core.permissions import ADMIN_ROLES, has_permission
+from app.services import realtime
+
+_ROLE_LEVEL = {"admin": 0, "senior_admin": 1, "owner": 2}
+_INDEX_TTL_SECONDS = 300.0
+_DIRTY = "recipient_index_dirty"
+
+
+class RecipientIndex:
+    """permission / min-role → admin ids, rebuilt lazily after invalidate()."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._admins: Optional[list] = None
+        self._built_at = 0.0
+        self._by_key: dict[str, tuple[str, ...]] = {}
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._admins = None
+            self._by_key.clear()
+
+    def _admin_rows(self, session: Session) -> list:
+        with self._lock:
+            if self._admins is not None and time.monotonic() - self._built_at < _INDEX_TTL_SECONDS:
+                return self._admins
+            generation = self._generation
+        rows = session.exec(
+            select(User.id, User.role, User.permissions).where(User.role.in_(list(ADMIN_ROLES)))
+        ).all()
+        admins = [SimpleNamespace(id=str(i), role=r, permissions=p or []) for i, r, p in rows]
+        with self._lock:
+            # An invalidate() landed while we were reading — don't cache a
+            # list that may predate it.
+            if generation == self._generation:
+                self._admins, self._built_at = admins, time.monotonic()
+                self._by_key.clear()
+        return admins
+
+    def _lookup(self, session: Session, key: str, accept: Callable) -> tuple[str, ...]:
+        admins = self._admin_rows(session)
+        with self._lock:
+            hit = self._by_key.get(key) if self._admins is admins else None
+        if hit is not None:
+            return hit
+        ids = tuple(a.id for a in admins if accept(a))
+        with self._lock:
+            if self._admins is admins:
+                self._by_key[key] = ids
+        return ids
+
+    def with_permission(self, session: Session, permission: str) -> tuple[str, ...]:
+        return self._lookup(session, f"perm:{permission}", lambda a: has_permission(a, permission))
+
+    def with_min_role(self, session: Session, min_role: str) -> tuple[str, ...]:
+        min_level = _ROLE_LEVEL.get(min_role, 0)
+        return self._lookup(session, f"role:{min_level}",
+                            lambda a: _ROLE_LEVEL.get(a.role, -1) >= min_level)
+
+
+recipient_index = RecipientIndex()
+
+
+# ── invalidation: any committed role/permissions change ─────────────────────
+
+def _mark(target) -> None:
+    session = _SASession.object_session(target)
+    if session is not None:
+        session.info[_DIRTY] = True
+
+
+@event.listens_for(User, "after_insert")
+@event.listens_for(User, "after_delete")
+def _user_added_or_removed(mapper, connection, target) -> None:
+    if target.role in ADMIN_ROLES:
+        _mark(target)
+
+
+@event.listens_for(User, "after_update")
+def _user_updated(mapper, connection, target) -> None:
+    if get_history(target, "role").has_changes() or get_history(target, "permissions").has_changes():
+        _mark(target)
+
+
+@event.listens_for(_SASession, "after_commit")
+def _invalidate_after_commit(session) -> None:
+    if session.info.pop(_DIRTY, False):
+        recipient_index.invalidate()
+
+
+@event.listens_for(_SASession, "after_rollback")
+def _drop_dirty(session) -> None:
+    session.info.pop(_DIRTY, None)
 
 
 class NotificationService:
@@ -27,6 +145,34 @@ class NotificationService:
         session.add(n)
         return n
 
+    @staticmethod
+    def fan_out(
+        session: Session,
+        recipient_ids,
+        type: str,
+        title: str,
+        description: str = "",
+        icon: Optional[str] = None,
+        link: Optional[str] = None,
+    ) -> list[str]:
+        """One notification per recipient in a single INSERT. Returns the new
+        ids; part of the caller's transaction (no commit)."""
+        now = datetime.now()
+        rows = [
+            {
+                "id": str(uuid4()), "recipient_id": rid, "type": type, "title": title,
+                "description": description, "icon": icon, "link": link,
+                "is_read": False, "created_at": now,
+            }
+            for rid in recipient_ids
+        ]
+        if not rows:
+            return []
+        session.exec(insert(Notification).values(rows))
+        # Bulk INSERT skips the mapper events realtime listens to.
+        realtime.announce(session, "notification", [realtime.notification_payload(r) for r in rows])
+        return [r["id"] for r in rows]
+
     @staticmethod
     def notify_by_permission(
         session: Session,
@@ -36,18 +182,9 @@ class NotificationService:
         description: str = "",
         icon: Optional[str] = None,
         link: Optional[str] = None,
-    ) -> list[Notification]:
-        admins = session.exec(
-            select(User).where(User.role.in_(list(ADMIN_ROLES)))
-        ).all()
-        created = []
-        for admin in admins:
-            if has_permission(admin, permission):
-                n = NotificationService.create(
-                    session, str(admin.id), type, title, description, icon, link
-                )
-                created.append(n)
-        return created
+    ) -> list[str]:
+        recipients = recipient_index.with_permission(session, permission)
+        return NotificationService.fan_out(session, recipients, type, title, description, icon, link)
 
     @staticmethod
     def notify_admins(
@@ -58,21 +195,9 @@ class NotificationService:
         icon: Optional[str] = None,
         link: Optional[str] = None,
         min_role: str = "admin",
-    ) -> list[Notification]:
-        role_hierarchy = {"admin": 0, "senior_admin": 1, "owner": 2}
-        min_level = role_hierarchy.get(min_role, 0)
-        admins = session.exec(
-            select(User).where(User.role.in_(list(ADMIN_ROLES)))
-        ).all()
-        created = []
-        for admin in admins:
-            level = role_hierarchy.get(admin.role, -1)
-            if level >= min_level:
-                n = NotificationService.create(
-                    session, str(admin.id), type, title, description, icon, link
-                )
-                created.append(n)
-        return created
+    ) -> list[str]:
+        recipients = recipient_index.with_min_role(session, min_role)
+        return NotificationService.fan_out(session, recipients, type, title, description, icon, link)
 
 
 notification_service = NotificationService()
@@ -0,0 +1,356 @@
+"""Cabinet occupancy as half-hour bitmaps — heatmaps without scanning bookings.
+
+The admin chessboard and the owner analytics both answered "how busy is
+this room" by pulling every booking of the range and walking it in Python,
+and the utilisation denominator was a flat 13 h/day for every room — Neo
+School halls, open only 18–22 on weekdays, came out at a third of their real
+load.
+
+Here the answer is kept ready instead. ResourceDayOccupancy holds, per
+(resource, day), a 48-bit mask of the half-hours covered by confirmed
+bookings. A half-hour touched by a booking at all counts as taken (10:15–
+11:00 sets 10:00 and 10:30), like the chessboard draws it.
+
+Keeping it current: mapper events on Booking note which (resource, day)
+pairs a flush touched — a move notes both the old and the new day — and
+before the transaction commits those days are recomputed from the bookings
+on the same connection: one SELECT, one DELETE, one upsert for the whole
+transaction, however many rows it wrote (a 52-week series is a handful of
+statements, not 52). Recomputing instead of flipping bits means overlapping
+rows or a status change can't leave a stale bit behind, and a noted day
+whose change was rolled back just gets recomputed to what it already was.
+
+Concurrency: cancels, approvals and edits don't take the booking slot
+lock, so the recompute takes it (services/booking.acquire_slot_locks, the
+same sorted advisory locks a create holds) for the days it rewrites. Two
+transactions touching one cabinet-day then recompute one after the other,
+and the second one's SELECT sees the first one's committed bookings; the
+write is an upsert on (resource_id, day) all the same. A transaction that
+already holds slot locks must hold every day it will rewrite: the locks at
+commit come after the earlier ones, not in one sorted batch with them. So
+the move paths lock the day a booking leaves together with the one it goes
+to (check_availability / check_availability_many `lock_also`), and the
+commit re-enters locks it already has.
+`seed` (startup, from init_data) fills the table only when it is empty.
+Healing anything written behind the ORM's back is `rebuild`, run on
+purpose (scripts/rebuild_derived.py): it goes through `refresh` in batches,
+so it takes the same locks and upserts like every commit does.
+
+What is "open" comes from services.resource_windows: constrained resources
+use their weekly windows, everything else the centre's working hours
+(OPEN_HOURS). Both heatmaps — resource × slot and weekday × hour — are two
+reads for any range (`heatmap`).
+"""
+from __future__ import annotations
+
+import logging
+from collections import Counter
+from datetime import date, datetime, time, timedelta
+from itertools import chain
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from sqlalchemy import delete, event, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session as _SASession
+from sqlalchemy.orm.attributes import get_history
+from sqlmodel import Session, select
+
+from app.models.booking import Booking
+from app.models.occupancy import ResourceDayOccupancy
+from app.models.resource import Resource
+from app.services.booking import acquire_slot_locks
+from app.services.resource_windows import RESOURCE_WINDOWS, _hhmm_to_minutes
+
+logger = logging.getLogger(__name__)
+
+SLOT_MINUTES = 30
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES  # 48
+# Working hours of the centres — "open" for every resource without its own
+# window in resource_windows (was WORKING_HOURS_PER_DAY = 13 in analytics).
+OPEN_HOURS = ("09:00", "22:00")
+
+_table = ResourceDayOccupancy.__table__
+_DIRTY = "occupancy_dirty_days"
+# Changing any of these moves the booking on the grid (or off it).
+_FIELDS = ("resource_id", "date", "start_time", "duration", "status")
+
+Key = Tuple[str, date]
+
+# rebuild: resource-days per transaction (and slot locks held at once).
+_REBUILD_BATCH = 200
+
+# Upsert on (resource_id, day) — the two backends we run on.
+_DIALECT_INSERT = {"postgresql": pg_insert, "sqlite": sqlite_insert}
+
+
+def range_mask(start_minute: int, end_minute: int) -> int:
+    """Bits of every half-hour that [start_minute, end_minute) touches,
+    clipped to the day."""
+    start_minute = max(0, start_minute)
+    end_minute = min(24 * 60, end_minute)
+    if end_minute <= start_minute:
+        return 0
+    first = start_minute // SLOT_MINUTES
+    last = -(-end_minute // SLOT_MINUTES)  # ceil
+    return ((1 << (last - first)) - 1) << first
+
+
+def slot_mask(start_time: str, duration: int) -> int:
+    try:
+        start = _hhmm_to_minutes(start_time)
+    except (ValueError, AttributeError):
+        return 0
+    return range_mask(start, start + int(duration or 0))
+
+
+def window_mask(resource_id: str, dow: int) -> int:
+    """Half-hours the resource can be booked on weekday `dow` (0=Mon)."""
+    windows = RESOURCE_WINDOWS.get(resource_id)
+    spans = [OPEN_HOURS] if windows is None else windows.get(dow, [])
+    mask = 0
+    for start, end in spans:
+        mask |= range_mask(_hhmm_to_minutes(start), _hhmm_to_minutes(end))
+    return mask
+
+
+def weekday_counts(start: date, days: int) -> Counter:
+    """{dow: how many times it occurs} in [start, start + days)."""
+    full, rest = divmod(days, 7)
+    counts = Counter({dow: full for dow in range(7)})
+    for i in range(rest):
+        counts[(start.weekday() + i) % 7] += 1
+    return counts
+
+
+def available_hours(resource_id: str, start: date, days: int) -> float:
+    """Bookable hours of one resource over [start, start + days)."""
+    counts = weekday_counts(start, days)
+    slots = sum(n * bin(window_mask(resource_id, dow)).count("1") for dow, n in counts.items())
+    return slots * SLOT_MINUTES / 60
+
+
+# ── keeping the bitmaps current ──────────────────────────────────────────────
+
+def _day(value) -> Optional[date]:
+    if isinstance(value, datetime):
+        return value.date()
+    return value if isinstance(value, date) else None
+
+
+def _note(target, keys: Iterable[Tuple[Optional[str], Optional[date]]]) -> None:
+    session = _SASession.object_session(target)
+    if session is None:
+        return
+    dirty = session.info.setdefault(_DIRTY, set())
+    dirty.update((rid, d) for rid, d in keys if rid and d)
+
+
+def _keep_old_value(target, value, oldvalue, initiator) -> None:
+    pass
+
+
+# active_history: an update of an object from an earlier commit still knows
+# the day it is moving away from (see cash_totals for the same trick).
+for _field in ("resource_id", "date"):
+    event.listen(getattr(Booking, _field), "set", _keep_old_value, active_history=True)
+
+
+@event.listens_for(Booking, "after_insert")
+@event.listens_for(Booking, "after_delete")
+def _booking_written(mapper, connection, target) -> None:
+    _note(target, [(target.resource_id, _day(target.date))])
+
+
+@event.listens_for(Booking, "after_update")
+def _booking_updated(mapper, connection, target) -> None:
+    if not any(get_history(target, f).has_changes() for f in _FIELDS):
+        return
+    rids = get_history(target, "resource_id").deleted or [target.resource_id]
+    days = get_history(target, "date").deleted or [target.date]
+    _note(target, [(target.resource_id, _day(target.date))]
+          + [(rid, _day(d)) for rid in rids for d in days])
+
+
+@event.listens_for(_SASession, "before_commit")
+def _refresh_before_commit(session) -> None:
+    if any(isinstance(o, Booking) for o in chain(session.new, session.dirty, session.deleted)):
+        session.flush()  # the last flush still has to note its days
+    dirty = session.info.pop(_DIRTY, None)
+    if dirty:
+        refresh(session.connection(), dirty)
+
+
+def _masks(rows, keep=None) -> Dict[Key, int]:
+    masks: Dict[Key, int] = {}
+    for rid, when, start_time, duration in rows:
+        key = (rid, _day(when))
+        if keep is not None and key not in keep:
+            continue
+        masks[key] = masks.get(key, 0) | slot_mask(start_time, duration)
+    return masks
+
+
+def _write(connection, masks: Dict[Key, int]) -> None:
+    now = datetime.now()
+    rows = [{"resource_id": rid, "day": d, "slots": m, "updated_at": now}
+            for (rid, d), m in masks.items() if m]
+    if not rows:
+        return
+    stmt = _DIALECT_INSERT[connection.dialect.name](_table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[_table.c.resource_id, _table.c.day],
+        set_={"slots": stmt.excluded.slots, "updated_at": stmt.excluded.updated_at},
+    )
+    connection.execute(stmt, rows)
+
+
+def refresh(connection, keys: Set[Key]) -> None:
+    """Recompute the bitmaps of `keys` from the confirmed bookings, under
+    the slot locks of those keys.
+
+    The SELECT reads the range of their resources and days in one go; only
+    the noted pairs are rewritten (an unlocked neighbour pair could be
+    being changed by someone else right now).
+    """
+    acquire_slot_locks(connection, keys)
+    rids = {rid for rid, _ in keys}
+    days = {d for _, d in keys}
+    rows = connection.execute(
+        select(Booking.resource_id, Booking.date, Booking.start_time, Booking.duration).where(
+            Booking.resource_id.in_(rids),  # type: ignore[union-attr]
+            Booking.status == "confirmed",
+            Booking.date >= datetime.combine(min(days), time.min),
+            Booking.date < datetime.combine(max(days) + timedelta(days=1), time.min),
+        )
+    ).all()
+    masks = _masks(rows, keep=keys)
+    connection.execute(delete(_table).where(tuple_(_table.c.resource_id, _table.c.day).in_(list(keys))))
+    _write(connection, masks)
+
+
+def seed(engine) -> None:
+    """Fill an empty table from the bookings (startup); a filled one is left
+    alone."""
+    with engine.connect() as conn:
+        if conn.execute(select(_table.c.resource_id).limit(1)).first() is not None:
+            return
+    rebuild(engine)
+
+
+def rebuild(engine) -> None:
+    """Recompute every bitmap from the bookings (scripts/rebuild_derived).
+
+    Every (resource, day) with a confirmed booking or a stored row goes
+    through `refresh`, `_REBUILD_BATCH` days per transaction in date order —
+    under their slot locks, with an upsert — so it can run next to live
+    traffic; nothing is deleted wholesale."""
+    with engine.connect() as conn:
+        booked = conn.execute(
+            select(Booking.resource_id, Booking.date).where(Booking.status == "confirmed").distinct()
+        ).all()
+        stored = conn.execute(select(_table.c.resource_id, _table.c.day)).all()
+    keys = {(rid, _day(d)) for rid, d in booked if rid and _day(d)} | {(rid, d) for rid, d in stored}
+    ordered = sorted(keys, key=lambda k: (k[1], k[0]))
+    for i in range(0, len(ordered), _REBUILD_BATCH):
+        with engine.begin() as conn:
+            refresh(conn, set(ordered[i:i + _REBUILD_BATCH]))
+    logger.info("[occupancy] rebuilt %d resource-days", len(keys))
+
+
+# ── reading ──────────────────────────────────────────────────────────────────
+
+def _bits(mask: int) -> Iterable[int]:
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def heatmap(
+    session: Session,
+    start: date,
+    days: int,
+    location_id: Optional[str] = None,
+    include_days: bool = False,
+) -> dict:
+    """Occupancy of [start, start + days) for the active resources (of one
+    location, or all): per resource × half-hour, per weekday × hour, and —
+    for the chessboard — optionally the raw per-day masks. Two reads."""
+    q = select(Resource)
+    if location_id:
+        q = q.where(Resource.location_id == location_id)
+    resources = [r for r in session.exec(q).all() if getattr(r, "is_active", True)]
+    ids = [r.id for r in resources]
+    end = start + timedelta(days=days)
+    rows = session.exec(
+        select(ResourceDayOccupancy).where(
+            ResourceDayOccupancy.resource_id.in_(ids),  # type: ignore[union-attr]
+            ResourceDayOccupancy.day >= start,
+            ResourceDayOccupancy.day < end,
+        )
+    ).all() if ids else []
+
+    counts = weekday_counts(start, days)
+    per_resource = {
+        r.id: {"booked": [0] * SLOTS_PER_DAY, "open": [0] * SLOTS_PER_DAY, "booked_slots": 0, "busy_open": 0}
+        for r in resources
+    }
+    wk_booked = [[0] * SLOTS_PER_DAY for _ in range(7)]
+    wk_open = [[0] * SLOTS_PER_DAY for _ in range(7)]
+    wk_busy = [[0] * SLOTS_PER_DAY for _ in range(7)]  # booked inside the window
+    for rid, acc in per_resource.items():
+        for dow, n in counts.items():
+            for i in _bits(window_mask(rid, dow)):
+                acc["open"][i] += n
+                wk_open[dow][i] += n
+    for row in rows:
+        acc = per_resource[row.resource_id]
+        dow = row.day.weekday()
+        for i in _bits(row.slots):
+            acc["booked"][i] += 1
+            wk_booked[dow][i] += 1
+        busy = row.slots & window_mask(row.resource_id, dow)
+        for i in _bits(busy):
+            wk_busy[dow][i] += 1
+        acc["booked_slots"] += bin(row.slots).count("1")
+        acc["busy_open"] += bin(busy).count("1")
+
+    hours = SLOT_MINUTES / 60
+
+    def pct(part: float, whole: float) -> float:
+        return round(part / whole * 100, 1) if whole else 0
+
+    out_resources = []
+    for r in resources:
+        acc = per_resource[r.id]
+        available = sum(acc["open"]) * hours
+        out_resources.append({
+            "resource_id": r.id, "name": r.name, "location_id": r.location_id,
+            "booked": acc["booked"], "open": acc["open"],
+            "booked_hours": acc["booked_slots"] * hours,
+            "available_hours": available,
+            "occupancy_pct": pct(acc["busy_open"] * hours, available),
+        })
+
+    # Half-hours → hours: the weekday grid is for the eye, not the chessboard.
+    def by_hour(grid):
+        return [[(row[2 * h] + row[2 * h + 1]) * hours for h in range(24)] for row in grid]
+
+    booked_h, open_h, busy_h = by_hour(wk_booked), by_hour(wk_open), by_hour(wk_busy)
+    result = {
+        "period": {"from": start.isoformat(), "to": (end - timedelta(days=1)).isoformat(), "days": days},
+        "slot_minutes": SLOT_MINUTES,
+        "resources": out_resources,
+        "weekday": {
+            "booked_hours": booked_h,
+            "open_hours": open_h,
+            "occupancy_pct": [[pct(b, o) for b, o in zip(brow, orow)] for brow, orow in zip(busy_h, open_h)],
+        },
+    }
+    if include_days:
+        result["days"] = [
+            {"resource_id": row.resource_id, "date": row.day.isoformat(), "slots": row.slots}
+            for row in sorted(rows, key=lambda x: (x.day, x.resource_id))
+        ]
+    return result
@@ -0,0 +1,244 @@
+"""Transactional outbox for booking side effects.
+
+A booking mutation used to do its external work inline: Google Calendar
+round-trips, Telegram sends, waitlist fan-out — some of it while holding the
+booking row lock or the advisory slot lock, all of it while holding a pooled
+connection. A slow Google or Telegram stretched every one of those windows,
+and a crash between "commit" and "notify" lost the notification for good.
+
+Now the route calls `enqueue(session, kind, payload)` before its commit: the
+side effect becomes an `outbox_events` row in the same transaction, so it
+exists iff the booking change does. After the commit the worker thread is
+woken, claims due rows, runs the registered handler outside of any request
+and records the outcome. A failing handler is retried with exponential
+backoff up to `max_attempts`, then parked as `failed` for a human to look at.
+
+Idempotency: every row carries a unique `idempotency_key`. Enqueueing the
+same key twice is a no-op, so "notify the client about this reschedule"
+fired from two code paths (or two retries of one request) goes out once.
+Handlers themselves must tolerate a second run — a worker can die after the
+side effect but before marking the row done; the row is then re-claimed
+once `_CLAIM_TIMEOUT_S` passes.
+
+Several app processes can run workers against one Postgres: rows are
+claimed with FOR UPDATE SKIP LOCKED, so each is executed by one of them.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Callable, Optional
+from uuid import UUID, uuid4
+
+from sqlalchemy import and_, event, or_, update
+from sqlalchemy.orm import Session as _SASession
+from sqlmodel import Session, select
+
+from app.models.outbox import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+HANDLERS: dict[str, Callable[[dict], Any]] = {}
+
+_BATCH = 20
+_BACKOFF_BASE_S = 5
+_BACKOFF_MAX_S = 3600
+# A row stuck in `processing` this long belongs to a dead worker.
+_CLAIM_TIMEOUT_S = 300
+_DT = "__dt__"
+
+
+def handler(kind: str):
+    """Register `fn(payload)` as the executor for `kind`."""
+    def register(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return register
+
+
+def _ensure_handlers() -> None:
+    # Lazy: outbox_handlers imports the GCal/Telegram services, which import
+    # the models, which must not import us back at module load.
+    from app.services import outbox_handlers  # noqa: F401 — registers on import
+
+
+# ── payload (de)serialisation ────────────────────────────────────────────────
+# Payloads are JSON; datetimes are tagged so handlers get datetimes back.
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {_DT: value.isoformat()}
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, dict):
+        return {k: _encode(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_encode(v) for v in value]
+    return value
+
+
+def _decode(value: Any) -> Any:
+    if isinstance(value, dict):
+        if set(value) == {_DT}:
+            return datetime.fromisoformat(value[_DT])
+        return {k: _decode(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_decode(v) for v in value]
+    return value
+
+
+# ── producer side ────────────────────────────────────────────────────────────
+
+def enqueue(
+    session: Session,
+    kind: str,
+    payload: Optional[dict] = None,
+    *,
+    key: Optional[str] = None,
+) -> None:
+    """Record a side effect in `session`'s transaction. No commit — it lands
+    (or is rolled back) together with the caller's changes."""
+    _ensure_handlers()
+    if kind not in HANDLERS:
+        raise KeyError(f"No outbox handler registered for {kind!r}")
+    key = key or f"{kind}:{uuid4()}"
+    keys = session.info.setdefault("outbox_keys", set())
+    if key in keys:
+        return
+    with session.no_autoflush:
+        exists = session.exec(
+            select(OutboxEvent.id).where(OutboxEvent.idempotency_key == key)
+        ).first()
+    if exists:
+        return
+    session.add(OutboxEvent(kind=kind, payload=_encode(payload or {}), idempotency_key=key))
+    keys.add(key)
+
+
+@event.listens_for(_SASession, "after_commit")
+def _wake_worker_after_commit(session) -> None:
+    if session.info.pop("outbox_keys", None):
+        worker.kick()
+
+
+@event.listens_for(_SASession, "after_rollback")
+def _forget_rolled_back(session) -> None:
+    session.info.pop("outbox_keys", None)
+
+
+# ── consumer side ────────────────────────────────────────────────────────────
+
+def _backoff(attempts: int) -> timedelta:
+    return timedelta(seconds=min(_BACKOFF_BASE_S * 2 ** attempts, _BACKOFF_MAX_S))
+
+
+def _claim(engine, limit: int) -> list[tuple[str, str, dict, int, int, datetime]]:
+    now = datetime.now()
+    with Session(engine) as session:
+        rows = session.exec(
+            select(OutboxEvent)
+            .where(or_(
+                and_(OutboxEvent.status == "pending", OutboxEvent.next_attempt_at <= now),
+                and_(
+                    OutboxEvent.status == "processing",
+                    OutboxEvent.claimed_at < now - timedelta(seconds=_CLAIM_TIMEOUT_S),
+                ),
+            ))
+            .order_by(OutboxEvent.next_attempt_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        ).all()
+        claimed = []
+        for row in rows:
+            row.status = "processing"
+            row.claimed_at = now
+            row.attempts += 1
+            session.add(row)
+            claimed.append((row.id, row.kind, row.payload, row.attempts, row.max_attempts, now))
+        session.commit()
+    return claimed
+
+
+def _finish(engine, event_id: str, claimed_at: datetime, **values) -> None:
+    # Guarded on claimed_at: if this run overran the claim timeout and another
+    # worker re-claimed the row, that worker's outcome wins.
+    with Session(engine) as session:
+        session.exec(
+            update(OutboxEvent)
+            .where(OutboxEvent.id == event_id, OutboxEvent.claimed_at == claimed_at)
+            .values(**values)
+        )
+        session.commit()
+
+
+def dispatch_pending(engine=None, limit: int = _BATCH) -> int:
+    """Run up to `limit` due events. Returns how many were claimed."""
+    if engine is None:
+        from app.db.session import engine
+    _ensure_handlers()
+    claimed = _claim(engine, limit)
+    for event_id, kind, payload, attempts, max_attempts, claimed_at in claimed:
+        fn = HANDLERS.get(kind)
+        try:
+            if fn is None:
+                raise KeyError(f"No outbox handler registered for {kind!r}")
+            fn(_decode(payload or {}))
+        except Exception as e:
+            failed = attempts >= max_attempts or fn is None
+            log = logger.error if failed else logger.warning
+            log("[outbox] %s %s attempt %d/%d failed: %r", kind, event_id, attempts, max_attempts, e)
+            _finish(
+                engine, event_id, claimed_at,
+                status="failed" if failed else "pending",
+                next_attempt_at=datetime.now() + _backoff(attempts),
+                last_error=repr(e)[:1000],
+            )
+        else:
+            _finish(engine, event_id, claimed_at, status="done", processed_at=datetime.now(), last_error=None)
+    return len(claimed)
+
+
+class OutboxWorker:
+    """Daemon thread draining the outbox: on every commit that enqueued
+    something (`kick`), and every `poll_s` for retries and for rows written
+    by other processes."""
+
+    def __init__(self) -> None:
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.poll_s = 5.0
+
+    def start(self, poll_s: float = 5.0) -> None:
+        self.poll_s = poll_s
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="unbox-outbox", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def kick(self) -> None:
+        self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            # Clear before draining: a kick that arrives mid-batch keeps the
+            # event set and we go round again instead of sleeping on it.
+            self._wake.clear()
+            try:
+                if dispatch_pending() >= _BATCH:
+                    continue
+            except Exception:
+                logger.exception("[outbox] dispatch loop error")
+            self._wake.wait(self.poll_s)
+
+
+worker = OutboxWorker()
@@ -0,0 +1,227 @@
+"""Executors for outbox events (see services/outbox).
+
+Each handler gets the decoded payload, opens its own DB session when it
+needs one, and raises to ask for a retry. They must be safe to run twice:
+`gcal.create[_many]` and `crm.gcal_create_sessions` skip rows that already
+have an event, deleting an
+event Google no longer has counts as done, waitlist entries flip to
+`fulfilled` as they're notified, and Telegram/email messages are keyed per
+booking change by the producer.
+"""
+import logging
+from uuid import UUID
+
+from sqlmodel import Session, select
+
+from app.db.session import engine
+from app.models.booking import Booking
+from app.services import gcal_writer
+from app.services.email import email_service
+from app.services.outbox import handler
+from app.services.telegram import telegram_service
+
+logger = logging.getLogger(__name__)
+
+
+# ── Google Calendar ──────────────────────────────────────────────────────────
+
+def gcal_create_many(booking_ids: list[str], user_name: str) -> None:
+    """Push every booking of `booking_ids` still without an event, in one
+    batched write per calendar (services/gcal_writer). Raises while any of
+    them failed, so the outbox retries — the ones already synced are
+    skipped next time."""
+    with Session(engine) as session:
+        bookings = session.exec(
+            select(Booking).where(Booking.id.in_([UUID(b) for b in booking_ids]))  # type: ignore
+        ).all()
+        synced, failed = gcal_writer.push_bookings(session, bookings, user_name)
+        session.commit()
+    if synced:
+        logger.info(f"[GCal Sync bg] {synced} event(s) created for {len(booking_ids)} booking(s)")
+    if failed:
+        raise RuntimeError(f"GCal: {failed}/{len(booking_ids)} event(s) not created")
+
+
+def gcal_create(booking_id: str, user_name: str) -> None:
+    gcal_create_many([booking_id], user_name)
+
+
+def gcal_delete_many(events: list) -> None:
+    failed = gcal_writer.delete_events((e[0], e[1]) for e in events)
+    if failed:
+        raise RuntimeError(f"GCal: {len(failed)}/{len(events)} event(s) not deleted")
+
+
+def gcal_recreate(booking_id: str, user_name: str, old_event_id, old_resource_id) -> None:
+    if old_event_id and old_resource_id:
+        if gcal_writer.delete_events([(old_event_id, old_resource_id)]):
+            logger.warning(f"[GCal recreate bg] delete old failed for {booking_id}")
+    gcal_create(booking_id, user_name)
+
+
+def gcal_recreate_many(booking_ids: list[str], user_name: str, old_events: list) -> None:
+    """`gcal_recreate` for a whole series move: old events dropped in one
+    batch, new ones created in one batch."""
+    if old_events:
+        failed = gcal_writer.delete_events((e[0], e[1]) for e in old_events)
+        if failed:
+            logger.warning(f"[GCal recreate bg] delete old failed for {len(failed)} event(s)")
+    gcal_create_many(booking_ids, user_name)
+
+
+def crm_gcal_create_sessions(calendar_id: str, session_ids: list[str]) -> None:
+    """Put CRM sessions into the specialist's personal calendar, under the
+    client's name. Sessions that already got an event are skipped; the id is
+    committed after each one, so a retry only does the rest."""
+    from app.models.therapist_client import TherapistClient
+    from app.models.therapy_session import TherapySession
+    from app.services.crm_calendar import create_calendar_event
+
+    failed = 0
+    with Session(engine) as session:
+        rows = session.exec(
+            select(TherapySession).where(TherapySession.id.in_(session_ids))  # type: ignore
+        ).all()
+        clients = {}
+        for ts in rows:
+            if ts.google_event_id:
+                continue
+            client = clients.get(ts.client_id)
+            if client is None:
+                client = clients[ts.client_id] = session.get(TherapistClient, ts.client_id)
+            if client is None:
+                continue
+            try:
+                ts.google_event_id = create_calendar_event(
+                    calendar_id=calendar_id,
+                    client_name=client.name,
+                    alias_code=client.alias_code,
+                    session_date=ts.date,
+                    duration_minutes=ts.duration_minutes,
+                )
+            except Exception as e:
+                logger.warning(f"CRM GCal push failed for session {ts.id}: {e}")
+                failed += 1
+                continue
+            session.add(ts)
+            session.commit()
+    if failed:
+        raise RuntimeError(f"CRM GCal: {failed}/{len(session_ids)} event(s) not created")
+
+
+@handler("gcal.create")
+def _on_gcal_create(p: dict) -> None:
+    gcal_create(p["booking_id"], p.get("user_name") or "")
+
+
+@handler("gcal.create_many")
+def _on_gcal_create_many(p: dict) -> None:
+    gcal_create_many(p["booking_ids"], p.get("user_name") or "")
+
+
+@handler("gcal.delete")
+def _on_gcal_delete(p: dict) -> None:
+    gcal_delete_many([(p["event_id"], p.get("resource_id"))])
+
+
+@handler("gcal.delete_many")
+def _on_gcal_delete_many(p: dict) -> None:
+    # [[event_id, resource_id], …]
+    gcal_delete_many(p["events"])
+
+
+@handler("gcal.recreate")
+def _on_gcal_recreate(p: dict) -> None:
+    gcal_recreate(p["booking_id"], p.get("user_name") or "", p.get("old_event_id"), p.get("old_resource_id"))
+
+
+@handler("gcal.recreate_many")
+def _on_gcal_recreate_many(p: dict) -> None:
+    gcal_recreate_many(p["booking_ids"], p.get("user_name") or "", p.get("old_events") or [])
+
+
+@handler("crm.gcal_create_sessions")
+def _on_crm_gcal_create_sessions(p: dict) -> None:
+    crm_gcal_create_sessions(p["calendar_id"], p["session_ids"])
+
+
+# ── Waitlist ─────────────────────────────────────────────────────────────────
+
+@handler("waitlist.freed_slot")
+def _on_waitlist_freed_slot(p: dict) -> None:
+    """Slot of `booking_id` freed up. For a reschedule the freed slot is the
+    OLD one — passed as resource_id/date/start_time overrides."""
+    _on_waitlist_freed_slots({"slots": [p]})
+
+
+@handler("waitlist.freed_slots")
+def _on_waitlist_freed_slots(p: dict) -> None:
+    """`waitlist.freed_slot` for a whole series edit — `slots` is a list of
+    its payloads, one per freed booking, read with one SELECT and matched
+    as one batch."""
+    from app.services.waitlist_notify import notify_freed_slots
+
+    fields = ("resource_id", "location_id", "date", "start_time", "duration")
+    slots = p.get("slots") or []
+    with Session(engine) as session:
+        rows = {
+            str(b.id): b for b in session.exec(
+                select(Booking).where(Booking.id.in_([UUID(s["booking_id"]) for s in slots]))  # type: ignore
+            ).all()
+        }
+        # Detached snapshots with the freed slot's fields — the booking
+        # itself may already sit somewhere else (reschedule).
+        freed = [
+            Booking(id=rows[s["booking_id"]].id, **{
+                f: s[f] if s.get(f) is not None else getattr(rows[s["booking_id"]], f) for f in fields
+            })
+            for s in slots if s["booking_id"] in rows
+        ]
+        notify_freed_slots(session, freed)
+
+
+@handler("waitlist.notify")
+def _on_waitlist_notify(p: dict) -> None:
+    """Messages for entries notify_freed_slots already marked fulfilled.
+    Best-effort, like before the queue: a failed send is logged, not
+    retried — retrying would re-ping everyone who did get it."""
+    for kw in p.get("slots") or []:
+        try:
+            telegram_service.send_slot_available(**kw)
+        except Exception as e:  # pragma: no cover — defensive
+            logger.warning("[waitlist] TG send failed: %r", e)
+    for fields in p.get("admin_alerts") or []:
+        try:
+            telegram_service.send_admin_event(event="waitlist_user_no_tg", fields=fields)
+        except Exception:
+            logger.warning("[waitlist] admin no-tg alert failed", exc_info=True)
+
+
+# ── Telegram / email ─────────────────────────────────────────────────────────
+# Payload = the keyword arguments of the service method, as the route used
+# to pass them to BackgroundTasks.add_task.
+
+_TELEGRAM_METHODS = (
+    "send_booking_confirmation",
+    "send_booking_pending_approval",
+    "send_booking_cancelled",
+    "send_booking_rescheduled",
+    "send_rerent_taken",
+    "send_admin_event",
+)
+
+
+def _telegram(method: str):
+    def run(p: dict) -> None:
+        with telegram_service.strict():
+            getattr(telegram_service, method)(**p)
+    return run
+
+
+for _method in _TELEGRAM_METHODS:
+    handler(f"telegram.{_method}")(_telegram(_method))
+
+
+@handler("email.send_booking_confirmation")
+def _on_email_booking_confirmation(p: dict) -> None:
+    email_service.send_booking_confirmation(**p)
@@ -205,6 +205,7 @@ class PricingService:
         consecutive_total_hours: Optional[float] = None,
         exclude_booking_id: Optional[str] = None,  # for recompute: skip self
         ignore_subscription: bool = False,
+        resource: Optional[Resource] = None,  # pre-loaded (chain recompute)
     ) -> PriceBreakdown:
         """`ignore_subscription=True` — посчитать цену так, будто абонемента нет.
 
@@ -216,7 +217,8 @@ class PricingService:
         """
 
         # 1. Fetch Resource
-        resource = self.session.get(Resource, resource_id)
+        if resource is None or resource.id != resource_id:
+            resource = self.session.get(Resource, resource_id)
         if not resource:
             raise ValueError("Resource not found")
 
@@ -450,7 +452,18 @@ class PricingService:
             if _ex is not None:
                 q = q.where(Booking.id != _ex)
         others = self.session.exec(q).all()
+        return self._chain_hours(others, start_time, duration_minutes)
 
+    @staticmethod
+    def block_hours_in(day_bookings, user_uuid, start_time: datetime, duration_minutes: int) -> float:
+        """`_compute_block_hours` over rows the caller already holds — the
+        confirmed bookings of that resource+day (series creation reads all
+        its days in one go, see services/booking.load_occupancy)."""
+        own = [b for b in day_bookings if b.user_uuid is not None and str(b.user_uuid) == str(user_uuid)]
+        return PricingService._chain_hours(own, start_time, duration_minutes)
+
+    @staticmethod
+    def _chain_hours(others, start_time: datetime, duration_minutes: int) -> float:
         # Convert all into (start_min, end_min) ranges.
         ranges: list[tuple[int, int]] = []
         for b in others:
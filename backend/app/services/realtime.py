@@ -0,0 +1,327 @@
+"""Live push of booking and notification changes (GET /events/stream).
+
+The admin UI used to discover changes by polling: the bell asked for
+/notifications/unread-count every 30 s, the chessboard re-fetched
+/bookings/ on every focus — each poll a threadpool slot, a pooled connection
+and a query, mostly to learn that nothing happened. Now the server says when
+something did.
+
+Producers don't call anything: ORM events on Booking and Notification
+collect a small event per changed row into the session. Where it goes next
+depends on the database:
+
+* Postgres — after each flush the batch is sent with `pg_notify` on the same
+  connection. NOTIFY is transactional: a rolled-back booking never announces
+  itself, and identical payloads in one transaction are delivered once. Every
+  app process LISTENs (`Hub._listen`), so a change made by one uvicorn worker
+  reaches the browsers connected to all of them.
+* SQLite (dev, tests) — no NOTIFY; the batch is handed to the local hub after
+  commit, which is all a single dev process needs.
+
+The hub fans events out to per-connection asyncio queues on the event loop.
+A consumer too slow to keep up gets its queue drained down to one `resync`
+event — the client re-fetches once instead of the server buffering forever.
+After a lost LISTEN connection everyone gets `resync` for the same reason.
+
+Payloads carry ids, slot coordinates and status only — nothing the public
+chessboard doesn't already show. The client re-fetches what it needs.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from sqlalchemy import event, inspect, text
+from sqlalchemy.orm import Session as _SASession
+
+from app.core import http_cache
+from app.models.booking import Booking
+from app.models.notification import Notification
+
+logger = logging.getLogger(__name__)
+
+PG_CHANNEL = "unbox_events"
+_QUEUE_SIZE = 256
+_RECONNECT_MAX_S = 30
+_PENDING = "realtime_events"
+
+
+# ── producer side: ORM events → session batch ────────────────────────────────
+
+def _day(value) -> Optional[str]:
+    return value.date().isoformat() if hasattr(value, "date") else value
+
+
+def _booking_action(target: Booking) -> str:
+    state = inspect(target)
+    status = state.attrs.status.history
+    if status.has_changes():
+        if target.status == "cancelled":
+            return "cancelled"
+        if status.deleted and status.deleted[0] == "pending_approval" and target.status == "confirmed":
+            return "approved"
+    if any(state.attrs[a].history.has_changes() for a in ("resource_id", "date", "start_time", "duration")):
+        return "rescheduled"
+    return "updated"
+
+
+def _booking_payload(target: Booking, action: str) -> dict:
+    data = {
+        "id": str(target.id),
+        "action": action,
+        "location_id": target.location_id,
+        "resource_id": target.resource_id,
+        "date": _day(target.date),
+        "start_time": target.start_time,
+        "duration": target.duration,
+        "status": target.status,
+    }
+    if action == "rescheduled":
+        # The freed slot matters to a chessboard showing the old day/room.
+        state = inspect(target)
+        old = {}
+        for attr in ("resource_id", "location_id", "date", "start_time"):
+            deleted = state.attrs[attr].history.deleted
+            if deleted:
+                old[attr] = _day(deleted[0]) if attr == "date" else deleted[0]
+        data["old"] = old
+    return data
+
+
+def _collect(target, channel: str, data: dict) -> None:
+    session = _SASession.object_session(target)
+    if session is None:
+        return
+    # Keyed per row: three flushes touching one booking announce it once.
+    session.info.setdefault(_PENDING, {})[(channel, data["id"])] = {"channel": channel, "data": data}
+
+
+@event.listens_for(Booking, "after_insert")
+def _booking_inserted(mapper, connection, target) -> None:
+    _collect(target, "booking", _booking_payload(target, "created"))
+
+
+@event.listens_for(Booking, "after_update")
+def _booking_updated(mapper, connection, target) -> None:
+    if not _SASession.object_session(target).is_modified(target, include_collections=False):
+        return
+    _collect(target, "booking", _booking_payload(target, _booking_action(target)))
+
+
+def notification_payload(n) -> dict:
+    """Works for a Notification and for the plain dicts of a bulk insert."""
+    get = n.get if isinstance(n, dict) else (lambda k: getattr(n, k))
+    return {k: get(k) for k in ("id", "recipient_id", "type", "title", "link")}
+
+
+@event.listens_for(Notification, "after_insert")
+def _notification_inserted(mapper, connection, target) -> None:
+    _collect(target, "notification", notification_payload(target))
+
+
+def _pg_send(conn, events) -> None:
+    payloads = [json.dumps(e, separators=(",", ":"), default=str) for e in events]
+    # One round trip for the whole batch (a series create is dozens of rows).
+    conn.execute(
+        text("SELECT pg_notify(:ch, p) FROM unnest(CAST(:ps AS text[])) AS p"),
+        {"ch": PG_CHANNEL, "ps": payloads},
+    )
+
+
+@event.listens_for(_SASession, "after_flush")
+def _notify_after_flush(session, flush_context) -> None:
+    pending = session.info.get(_PENDING)
+    if not pending:
+        return
+    conn = session.connection()
+    if conn.dialect.name != "postgresql":
+        return  # delivered locally in after_commit
+    session.info.pop(_PENDING)
+    _pg_send(conn, pending.values())
+
+
+def announce(session, channel: str, rows: list[dict]) -> None:
+    """Queue events for rows written with Core `insert()` — bulk statements
+    skip the mapper events above. Same delivery rules: sent with the
+    transaction, dropped on rollback."""
+    events = [{"channel": channel, "data": data} for data in rows]
+    if not events:
+        return
+    conn = session.connection()
+    if conn.dialect.name == "postgresql":
+        _pg_send(conn, events)
+        return
+    pending = session.info.setdefault(_PENDING, {})
+    for e in events:
+        pending[(channel, e["data"]["id"])] = e
+
+
+@event.listens_for(_SASession, "after_commit")
+def _publish_after_commit(session) -> None:
+    pending = session.info.pop(_PENDING, None)
+    if pending:
+        for e in pending.values():
+            hub.publish_threadsafe(e)
+
+
+@event.listens_for(_SASession, "after_rollback")
+def _drop_rolled_back(session) -> None:
+    session.info.pop(_PENDING, None)
+
+
+# ── consumer side: in-process fan-out hub ────────────────────────────────────
+
+@dataclass(eq=False)
+class Subscriber:
+    accept: Callable[[dict], bool]
+    queue: asyncio.Queue = field(default_factory=lambda: asyncio.Queue(_QUEUE_SIZE))
+
+
+def _reset(sub: Subscriber) -> None:
+    # Drain in place — the stream is already awaiting this queue's get().
+    while not sub.queue.empty():
+        sub.queue.get_nowait()
+    sub.queue.put_nowait({"channel": "resync", "data": {}})
+
+
+class Hub:
+    def __init__(self) -> None:
+        self._subs: set[Subscriber] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._listener: Optional[asyncio.Task] = None
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subs)
+
+    async def start(self, dsn: Optional[str] = None) -> None:
+        """Bind to the running loop; with a Postgres `dsn`, also LISTEN."""
+        self._loop = asyncio.get_running_loop()
+        if dsn and self._listener is None:
+            self._listener = asyncio.create_task(self._listen(dsn))
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._listener = None
+        self._loop = None
+
+    def subscribe(self, accept: Callable[[dict], bool]) -> Subscriber:
+        sub = Subscriber(accept)
+        self._subs.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscriber) -> None:
+        self._subs.discard(sub)
+
+    def publish_threadsafe(self, e: dict) -> None:
+        """From any thread (sync routes, the outbox worker). Dropped when no
+        loop is bound — scripts and cron jobs have nobody to push to."""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            loop.call_soon_threadsafe(self._fanout, e)
+        except RuntimeError:
+            pass  # loop shutting down
+
+    def _fanout(self, e: dict) -> None:
+        if e.get("channel") == "tables":
+            # Another process wrote a cached catalogue table (core/http_cache).
+            http_cache.bump((e.get("data") or {}).get("tables") or ())
+            return
+        for sub in list(self._subs):
+            try:
+                if not sub.accept(e):
+                    continue
+            except Exception:
+                logger.exception("[realtime] subscriber filter failed")
+                continue
+            try:
+                sub.queue.put_nowait(e)
+            except asyncio.QueueFull:
+                _reset(sub)
+
+    def _resync_all(self) -> None:
+        for sub in list(self._subs):
+            _reset(sub)
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        try:
+            e = json.loads(payload)
+        except ValueError:
+            logger.warning("[realtime] bad NOTIFY payload: %.200s", payload)
+            return
+        self._fanout(e)
+
+    async def _listen(self, dsn: str) -> None:
+        import asyncpg
+
+        delay = 1
+        first = True
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(dsn)
+                lost = asyncio.Event()
+                conn.add_termination_listener(lambda _c: lost.set())
+                await conn.add_listener(PG_CHANNEL, self._on_notify)
+                logger.info("[realtime] LISTEN %s", PG_CHANNEL)
+                if not first:
+                    # Whatever was NOTIFYed while we were away is gone.
+                    self._resync_all()
+                first = False
+                delay = 1
+                await lost.wait()
+                logger.warning("[realtime] LISTEN connection lost")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("[realtime] LISTEN failed: %r — retry in %ss", e, delay)
+            finally:
+                if conn is not None and not conn.is_closed():
+                    try:
+                        await conn.close()
+                    except Exception:
+                        pass
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, _RECONNECT_MAX_S)
+
+
+hub = Hub()
+
+
+def format_sse(e: dict) -> str:
+    return f"event: {e['channel']}\ndata: {json.dumps(e['data'], default=str)}\n\n"
+
+
+def listen_dsn(url: str) -> Optional[str]:
+    """asyncpg DSN for the app's database URL, None when it isn't Postgres."""
+    from sqlalchemy.engine import make_url
+
+    u = make_url(url)
+    if u.get_backend_name() != "postgresql":
+        return None
+    return u.set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+def accepts(user_id: str, location_id: Optional[str] = None) -> Callable[[dict], bool]:
+    """Filter for one connection: own notifications, booking changes (all, or
+    those touching `location_id`), resyncs."""
+    def accept(e: dict) -> bool:
+        channel, data = e.get("channel"), e.get("data") or {}
+        if channel == "notification":
+            return data.get("recipient_id") == user_id
+        if channel == "booking":
+            if not location_id:
+                return True
+            return location_id in (data.get("location_id"), (data.get("old") or {}).get("location_id"))
+        return channel == "resync"
+    return accept
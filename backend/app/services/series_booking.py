@@ -0,0 +1,173 @@
+"""Series creation (POST /bookings/recurring and /bookings/multi-slot).
+
+Both endpoints used to do every step once per occurrence: an advisory lock
+and a day SELECT in check_availability, a chain-hours SELECT inside
+PricingService, an INSERT + flush per booking and, for CRM-linked series, a
+TherapySession lookup and a synchronous Google call per date. A 52-week
+series was several hundred statements and as many round trips to Google.
+
+Here the same steps run once per series:
+
+* `services.booking.check_availability_many` — all (resource, day) locks in
+  sorted order, one occupancy read, every slot checked in memory (also
+  against the other slots of the batch);
+* `SeriesPricer` — PricingService quotes from that snapshot: cabinets read
+  in one query, chain hours taken from the occupancy instead of a SELECT;
+* `insert` — the Booking rows go out in one flush (one executemany INSERT);
+* `link_crm_sessions` — one read of the client's sessions in the series
+  window, new TherapySession rows in the same flush, and their personal
+  calendar events as one outbox event instead of inline Google calls.
+
+Money stays where it was: the routes still decide payment per occurrence
+(the subscription pool can run out half-way) and charge through wallet /
+subscription_pool, which only touch the rows that are due now.
+"""
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlmodel import Session, select
+
+from app.models.booking import Booking
+from app.models.resource import Resource
+from app.models.user import User
+from app.services import outbox
+from app.services.pricing import PriceBreakdown, PricingService
+
+
+def start_dt(day: datetime, start_time: str) -> datetime:
+    try:
+        h, m = map(int, start_time.split(":"))
+        return day.replace(hour=h, minute=m, second=0, microsecond=0)
+    except Exception:
+        return day
+
+
+class SeriesPricer:
+    """PricingService for many slots of one owner, priced from an occupancy
+    snapshot (services.booking.load_occupancy) instead of per-slot reads."""
+
+    def __init__(self, session: Session, owner: User, occupancy: Dict[Tuple[str, date], list]):
+        self.owner = owner
+        self.occupancy = occupancy
+        self.pricing = PricingService(session)
+        ids = {rid for rid, _ in occupancy}
+        self.resources = {
+            r.id: r for r in session.exec(
+                select(Resource).where(Resource.id.in_(ids))  # type: ignore[union-attr]
+            ).all()
+        } if ids else {}
+
+    def quote(self, resource_id: str, day: datetime, start_time: str, duration: int,
+              format_type: str = "individual") -> PriceBreakdown:
+        when = start_dt(day, start_time)
+        return self.pricing.calculate_price(
+            user=self.owner,
+            resource_id=resource_id,
+            start_time=when,
+            duration_minutes=duration,
+            format_type=format_type,
+            consecutive_total_hours=PricingService.block_hours_in(
+                self.occupancy.get((resource_id, day.date()), []), self.owner.id, when, duration,
+            ),
+            resource=self.resources.get(resource_id),
+        )
+
+    def claim(self, booking: Booking) -> None:
+        """The slot is taken: later slots of the batch on the same day see it
+        (the per-slot path saw it too, through autoflush)."""
+        self.occupancy.setdefault((booking.resource_id, booking.date.date()), []).append(booking)
+
+
+def insert(session: Session, bookings: List[Booking]) -> None:
+    """Write the whole series in one flush. Booking ids are client-side
+    UUIDs, so the unit of work batches them into a single executemany."""
+    session.add_all(bookings)
+    session.flush()
+
+
+def reload(session: Session, bookings: Iterable[Booking]) -> None:
+    """Refresh the series after commit with one SELECT (not one per row)."""
+    ids = [b.id for b in bookings]
+    if ids:
+        session.exec(select(Booking).where(Booking.id.in_(ids))).all()  # type: ignore[union-attr]
+
+
+def link_crm_sessions(
+    session: Session,
+    owner: User,
+    client,
+    bookings: List[Booking],
+    group_id: str,
+    calendar_id: Optional[str],
+) -> None:
+    """Give every cabinet booking of a CRM-linked series its TherapySession.
+
+    An existing session of this client at the same wall-clock time on that
+    day (synced from their Google Calendar, or made by hand earlier) is
+    re-used instead of duplicated — otherwise the chessboard shows two rows,
+    one "+КАБ" and one with the actual cabinet. Sessions are UTC-naive,
+    bookings Tbilisi dates + wall-clock (see crm_calendar).
+    """
+    from app.models.therapy_session import TherapySession
+    from app.services.crm_calendar import tbilisi_naive_to_utc_naive
+
+    if not bookings:
+        return
+    when = {b.id: tbilisi_naive_to_utc_naive(start_dt(b.date, b.start_time)) for b in bookings}
+    first = tbilisi_naive_to_utc_naive(min(b.date for b in bookings).replace(hour=0, minute=0, second=0, microsecond=0))
+    last = tbilisi_naive_to_utc_naive(max(b.date for b in bookings).replace(hour=0, minute=0, second=0, microsecond=0))
+    existing: Dict[datetime, TherapySession] = {}
+    for ts in session.exec(
+        select(TherapySession)
+        .where(TherapySession.client_id == str(client.id))
+        .where(TherapySession.specialist_id == str(owner.id))
+        .where(TherapySession.date >= first)
+        .where(TherapySession.date < last + timedelta(days=1))
+        .where(TherapySession.status.not_in(("CANCELLED_CLIENT", "CANCELLED_THERAPIST")))  # type: ignore
+    ).all():
+        existing.setdefault(ts.date.replace(second=0, microsecond=0), ts)
+
+    created: List[TherapySession] = []
+    for b in bookings:
+        ts = existing.get(when[b.id])
+        if ts is not None:
+            # Re-use: link it to the new booking and stamp the series.
+            ts.booking_id = str(b.id)
+            ts.is_booked = True
+            if ts.recurring_group_id is None:
+                ts.recurring_group_id = group_id
+            ts.updated_at = datetime.now()
+            # If price was unset (legacy NULL), seed it from client
+            # so revenue reports stop counting these as "free".
+            if ts.price is None:
+                ts.price = client.base_price
+            if ts.currency is None:
+                ts.currency = client.currency
+            if ts.account is None:
+                ts.account = client.default_account
+            session.add(ts)
+            continue
+        ts = TherapySession(
+            client_id=str(client.id),
+            specialist_id=str(owner.id),
+            date=when[b.id],
+            duration_minutes=b.duration,
+            status="PLANNED",
+            price=client.base_price,
+            currency=client.currency,
+            account=client.default_account,
+            is_booked=True,
+            booking_id=str(b.id),
+            recurring_group_id=group_id,
+        )
+        session.add(ts)
+        created.append(ts)
+
+    # Mirror the sessions into the specialist's personal CRM calendar too, so
+    # they show up under the client's name (not just "Кабинет 8 — Микола").
+    if calendar_id and created:
+        outbox.enqueue(session, "crm.gcal_create_sessions", {
+            "calendar_id": calendar_id, "session_ids": [str(ts.id) for ts in created],
+        }, key=f"crm-gcal-series:{group_id}")
@@ -0,0 +1,476 @@
+"""Series edits (cancel / extend / reschedule "this and following").
+
+The three series endpoints used to walk the group row by row: an
+availability check with its own day read per occurrence, a refund through
+`_refund_booking_to_owner` (one subscription UPDATE each), a CRM-session
+SELECT per booking, a timeline commit or a background GCal task per
+sibling. A long series held its (resource, day) locks for the whole walk,
+and a failure half-way left nothing to show the user beforehand.
+
+Now every edit is two steps:
+
+* `plan_*` reads what it needs once (check_availability_many for new
+  slots) and returns a `SeriesPlan` — one `Step` per occurrence: what
+  happens to it, the slot it ends up in, why it was skipped, and the money
+  it moves. `SeriesPlan.preview()` is what `?dry_run=true` returns.
+* `apply_*` writes the plan in the caller's transaction: attribute changes
+  flushed together, refunds summed per owner, CRM sessions touched with one
+  statement, and one outbox event per kind of side effect for the whole
+  series (GCal, waitlist, admin chat).
+
+Routes keep the auth checks, policy gates and response shapes.
+"""
+from __future__ import annotations
+
+import logging
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence
+from uuid import UUID
+
+from sqlalchemy import update as sql_update
+from sqlmodel import Session, select
+
+from app.models.booking import Booking
+from app.models.user import User
+from app.services import outbox, series_booking, subscription_pool, wallet
+from app.services.booking import check_availability_many
+from app.services.timeline import timeline_service
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Step:
+    """One occurrence of the series in a plan.
+
+    action: create | cancel | move | skip | conflict. `skip` is a sibling a
+    best-effort reschedule leaves alone; `conflict` blocks the whole edit.
+    """
+    action: str
+    date: datetime
+    start_time: str
+    resource_id: str
+    duration: int
+    booking_id: Optional[str] = None
+    from_start_time: Optional[str] = None
+    from_resource_id: Optional[str] = None
+    reason: Optional[str] = None
+    refund_amount: float = 0.0
+    refund_hours: float = 0.0
+    bonus_hours: float = 0.0
+    charge: float = 0.0
+
+
+@dataclass
+class SeriesPlan:
+    kind: str  # cancel | extend | reschedule
+    group_id: str
+    steps: List[Step] = field(default_factory=list)
+
+    def of(self, action: str) -> List[Step]:
+        return [s for s in self.steps if s.action == action]
+
+    @property
+    def conflicts(self) -> List[Step]:
+        return self.of("conflict")
+
+    def preview(self) -> dict:
+        steps = []
+        for s in self.steps:
+            row = asdict(s)
+            row["date"] = s.date.strftime("%Y-%m-%d")
+            steps.append(row)
+        return {
+            "kind": self.kind,
+            "group_id": self.group_id,
+            "counts": dict(Counter(s.action for s in self.steps)),
+            "refund_amount": round(sum(s.refund_amount for s in self.steps), 2),
+            "refund_hours": round(sum(s.refund_hours for s in self.steps), 4),
+            "bonus_hours": round(sum(s.bonus_hours for s in self.steps), 2),
+            "charge_total": round(sum(s.charge for s in self.steps), 2),
+            "steps": steps,
+        }
+
+
+def load_owners(session: Session, bookings: Iterable[Booking]) -> Dict[str, User]:
+    """`_resolve_booking_owner` for many bookings: by user_uuid, else by the
+    legacy email — two SELECTs at most. Keyed by str(booking.id)."""
+    bookings = list(bookings)
+    ids = {b.user_uuid for b in bookings if b.user_uuid}
+    by_id = {
+        u.id: u for u in session.exec(select(User).where(User.id.in_(ids))).all()  # type: ignore[union-attr]
+    } if ids else {}
+    emails = {b.user_id for b in bookings if b.user_id and by_id.get(b.user_uuid) is None}
+    by_email = {
+        u.email: u for u in session.exec(select(User).where(User.email.in_(emails))).all()  # type: ignore[union-attr]
+    } if emails else {}
+    out: Dict[str, User] = {}
+    for b in bookings:
+        owner = by_id.get(b.user_uuid) or by_email.get(b.user_id)
+        if owner is not None:
+            out[str(b.id)] = owner
+    return out
+
+
+def refund_due(booking: Booking, owner: Optional[User], refund_percent: float = 1.0) -> tuple:
+    """(money, subscription hours, bonus hours) a cancellation gives back —
+    the same rules as routes._refund_booking_to_owner, without writing."""
+    bonus = 0.0
+    if booking.payment_method == "bonus" and (booking.hours_deducted or 0) > 0:
+        bonus = round(float(booking.hours_deducted) * refund_percent, 2)
+    if owner is None:
+        return 0.0, 0.0, 0.0
+    if booking.payment_status in ("pending", "waived"):
+        return 0.0, 0.0, bonus
+    if booking.payment_method == "subscription":
+        if not owner.subscription:
+            return 0.0, 0.0, bonus
+        full = booking.hours_deducted if booking.hours_deducted is not None else booking.duration / 60
+        return 0.0, round(full * refund_percent, 4), bonus
+    amount = round((booking.final_price or 0.0) * refund_percent, 2)
+    return amount, 0.0, bonus
+
+
+def _step(b: Booking, action: str, **kw) -> Step:
+    return Step(action=action, date=b.date, start_time=b.start_time, resource_id=b.resource_id,
+                duration=b.duration, booking_id=str(b.id), **kw)
+
+
+# ── Cancel ───────────────────────────────────────────────────────────────────
+
+def plan_cancel(group_id: str, bookings: Sequence[Booking], owners: Dict[str, User]) -> SeriesPlan:
+    plan = SeriesPlan("cancel", group_id)
+    for b in bookings:
+        amount, hours, bonus = refund_due(b, owners.get(str(b.id)))
+        plan.steps.append(_step(b, "cancel", refund_amount=amount, refund_hours=hours, bonus_hours=bonus))
+    return plan
+
+
+def apply_cancel(
+    session: Session,
+    plan: SeriesPlan,
+    bookings: Sequence[Booking],
+    owners: Dict[str, User],
+    actor: User,
+) -> int:
+    """Cancel the planned bookings, refund, detach CRM sessions and queue
+    the series' side effects. No commit."""
+    from app.models.therapy_session import TherapySession
+    from app.services.bonus_service import refund_free_hours
+    from app.services.consecutive_pricing import recompute_user_chains
+
+    steps = {s.booking_id: s for s in plan.of("cancel")}
+    rows = [b for b in bookings if str(b.id) in steps]
+    if not rows:
+        return 0
+
+    # Money. Balance refunds keep one ledger row per booking (ref_id = the
+    # booking; they go out in one batched INSERT at flush). Hours and bonus
+    # hours are summed per owner — one pool UPDATE, one bonus row.
+    per_owner: Dict[UUID, list] = {}
+    for b in rows:
+        owner = owners.get(str(b.id))
+        if owner is None:
+            continue
+        per_owner.setdefault(owner.id, [owner, 0.0, 0.0, 0])
+        step = steps[str(b.id)]
+        if step.refund_amount and abs(step.refund_amount) >= 0.01:
+            wallet.credit(session, owner, step.refund_amount, reason="booking_refund",
+                          description="Возврат при отмене брони (серия)",
+                          ref_type="booking", ref_id=str(b.id))
+        per_owner[owner.id][1] += step.refund_hours
+        per_owner[owner.id][2] += step.bonus_hours
+        per_owner[owner.id][3] += 1
+    for owner, hours, bonus, n in per_owner.values():
+        if hours > 0:
+            subscription_pool.refund(session, owner, hours, "booking_refund",
+                                     description=f"Возврат часов при отмене серии ({n} брон.)",
+                                     ref_type="booking_series", ref_id=plan.group_id)
+        if bonus > 0:
+            refund_free_hours(session, owner.id, round(bonus, 2))
+
+    gcal_deletes = []
+    now = datetime.now()
+    for b in rows:
+        if b.gcal_event_id:
+            gcal_deletes.append([b.gcal_event_id, b.resource_id])
+            b.gcal_event_id = None
+        b.status = "cancelled"
+        b.cancellation_reason = "Series cancelled"
+        b.cancelled_by = actor.email
+        b.updated_at = now
+        session.add(b)
+
+    # Detach the CRM sessions relying on these cabinet bookings — otherwise
+    # they keep a stale "КАБ" badge pointing at a cancelled booking.
+    ids = [str(b.id) for b in rows]
+    session.execute(
+        sql_update(TherapySession)
+        .where(TherapySession.booking_id.in_(ids))  # type: ignore[union-attr]
+        .values(booking_id=None, is_booked=False, updated_at=now)
+        .execution_options(synchronize_session=False)
+    )
+
+    # Cancelled occurrences may have broken consecutive-hours chains: one
+    # recompute per owner over every (resource, day) they lost a balance
+    # row on (subscription bookings don't earn that discount).
+    targets: Dict[UUID, tuple] = {}
+    for b in rows:
+        owner = owners.get(str(b.id))
+        if owner is not None and b.payment_method == "balance":
+            targets.setdefault(owner.id, (owner, []))[1].append((b.resource_id, b.date))
+    for owner, days in targets.values():
+        try:
+            recompute_user_chains(session, owner, days, actor_id=str(actor.id),
+                                  actor_role=actor.role, reason="cancel_series")
+        except Exception:
+            logger.exception("[consecutive] recompute on series-cancel failed")
+
+    if gcal_deletes:
+        outbox.enqueue(session, "gcal.delete_many", {"events": gcal_deletes},
+                       key=f"gcal-delete-series:{plan.group_id}:{gcal_deletes[0][0]}")
+    outbox.enqueue(session, "waitlist.freed_slots", {"slots": [{"booking_id": i} for i in ids]},
+                   key=f"waitlist:cancel-series:{plan.group_id}:{ids[0]}")
+    preview = plan.preview()
+    first_owner = next(iter(per_owner.values()), [None])[0]
+    outbox.enqueue(session, "telegram.send_admin_event", dict(
+        event="booking_series_cancelled",
+        fields={
+            "Арендатор":   (first_owner.name or first_owner.email) if first_owner else (rows[0].user_id or "—"),
+            "Кто отменил": actor.name or actor.email,
+            "Встреч":      str(len(rows)),
+            "С / По":      f"{rows[0].date:%d.%m.%Y} → {rows[-1].date:%d.%m.%Y}",
+            "Возврат":     (f"{preview['refund_amount']:g} ₾" if preview["refund_amount"] else None),
+            "Часы":        (f"{preview['refund_hours']:g} ч" if preview["refund_hours"] else None),
+        },
+    ), key=f"tg-admin:booking_series_cancelled:{plan.group_id}:{ids[0]}")
+    timeline_service.log_event(
+        session=session,
+        actor_id=actor.id,
+        actor_role=actor.role,
+        target_id=plan.group_id,
+        target_type="booking_series",
+        event_type="booking_series_cancelled",
+        description=f"{len(rows)} bookings of the series cancelled by {actor.name}",
+        metadata=dict(
+            {k: preview[k] for k in ("counts", "refund_amount", "refund_hours", "bonus_hours")},
+            booking_ids=ids,
+        ),
+        commit=False,
+    )
+    return len(rows)
+
+
+# ── Extend ───────────────────────────────────────────────────────────────────
+
+def plan_extend(
+    session: Session, group_id: str, template: Booking, new_dates: Sequence[datetime]
+) -> SeriesPlan:
+    """New occurrences at the template's slot; locks their days and checks
+    them against one occupancy read."""
+    _, clashes = check_availability_many(
+        session,
+        [(template.resource_id, d, template.start_time, template.duration) for d in new_dates],
+        requester_user_uuid=template.user_uuid,
+    )
+    reasons = dict(clashes)
+    plan = SeriesPlan("extend", group_id)
+    for i, d in enumerate(new_dates):
+        plan.steps.append(Step(
+            action="conflict" if i in reasons else "create",
+            date=d, start_time=template.start_time, resource_id=template.resource_id,
+            duration=template.duration, reason=reasons.get(i),
+            charge=0.0 if i in reasons else (template.final_price or 0.0),
+        ))
+    return plan
+
+
+def apply_extend(
+    session: Session,
+    plan: SeriesPlan,
+    template: Booking,
+    owner: Optional[User],
+    crm_client=None,
+    crm_session_group_id: Optional[str] = None,
+) -> List[Booking]:
+    """Insert the planned occurrences as copies of `template` (one flush),
+    link CRM sessions, queue GCal once. No commit."""
+    created = [
+        Booking(
+            resource_id=template.resource_id,
+            location_id=template.location_id,
+            date=s.date,
+            start_time=template.start_time,
+            duration=template.duration,
+            status="confirmed",
+            final_price=template.final_price,
+            base_price=template.base_price,
+            applied_rule=template.applied_rule,
+            discount_amount=template.discount_amount,
+            discount_percent=template.discount_percent,
+            hours_deducted=template.hours_deducted if template.payment_method == "subscription" else None,
+            payment_method=template.payment_method,
+            format=template.format,
+            extras=template.extras or [],
+            user_id=template.user_id,
+            user_uuid=template.user_uuid,
+            crm_client_id=template.crm_client_id,
+            recurring_group_id=plan.group_id,
+        )
+        for s in plan.of("create")
+    ]
+    if not created:
+        return created
+    series_booking.insert(session, created)
+    if crm_client is not None and crm_session_group_id and owner is not None:
+        series_booking.link_crm_sessions(session, owner, crm_client, created, crm_session_group_id, None)
+    # GCal for the new weeks: one batched write after commit (outbox), not a
+    # blocking insert per date inside the request.
+    outbox.enqueue(session, "gcal.create_many", {
+        "booking_ids": [str(b.id) for b in created],
+        "user_name": owner.name if owner else "",
+    }, key=f"gcal-create-extend:{created[0].id}")
+    return created
+
+
+# ── Reschedule "this and following" ──────────────────────────────────────────
+
+def plan_reschedule(
+    session: Session,
+    group_id: str,
+    siblings: Sequence[Booking],
+    new_resource_id: str,
+    new_start_time: str,
+    *,
+    lead: Optional[Step] = None,
+    is_past=None,
+) -> SeriesPlan:
+    """Siblings keep their dates and take the new time (and room). Past
+    ones and the ones whose new slot is taken become `skip` — the move is
+    best-effort per sibling. `lead` is the anchor's own move when it hasn't
+    been applied yet (dry run): it's checked in the same batch, and if its
+    slot is taken it's a `conflict`."""
+    plan = SeriesPlan("reschedule", group_id)
+    movable: List[Booking] = []
+    for sib in siblings:
+        if is_past is not None and is_past(sib):
+            plan.steps.append(_step(sib, "skip", reason="уже прошла"))
+        else:
+            movable.append(sib)
+
+    slots = [(new_resource_id, sib.date, new_start_time, sib.duration) for sib in movable]
+    exclude = [sib.id for sib in siblings]
+    if lead is not None:
+        slots.insert(0, (lead.resource_id, lead.date, lead.start_time, lead.duration))
+        exclude.append(lead.booking_id)
+    owner_uuid = siblings[0].user_uuid if siblings else None
+    _, clashes = check_availability_many(
+        session, slots, requester_user_uuid=owner_uuid, exclude_ids=exclude,
+        lock_also=[(sib.resource_id, sib.date) for sib in movable],  # the days they leave
+    )
+    reasons = dict(clashes)
+
+    if lead is not None:
+        if 0 in reasons:
+            lead.action, lead.reason = "conflict", reasons[0]
+        plan.steps.insert(0, lead)
+        reasons = {i - 1: r for i, r in reasons.items() if i}
+    for i, sib in enumerate(movable):
+        if i in reasons:
+            plan.steps.append(_step(sib, "skip", reason=reasons[i] or "слот занят"))
+        else:
+            plan.steps.append(Step(
+                action="move", date=sib.date, start_time=new_start_time, resource_id=new_resource_id,
+                duration=sib.duration, booking_id=str(sib.id),
+                from_start_time=sib.start_time, from_resource_id=sib.resource_id,
+            ))
+    plan.steps.sort(key=lambda s: s.date)
+    return plan
+
+
+def sync_linked_sessions(session: Session, bookings: Sequence[Booking]) -> None:
+    """routes._sync_linked_session_to_booking for many bookings: one SELECT
+    of the attached CRM sessions, dates moved in memory. No commit."""
+    from app.models.therapy_session import TherapySession
+    from app.services.crm_calendar import tbilisi_naive_to_utc_naive
+
+    by_id = {str(b.id): b for b in bookings}
+    if not by_id:
+        return
+    now = datetime.now()
+    for ts in session.exec(
+        select(TherapySession).where(TherapySession.booking_id.in_(list(by_id)))  # type: ignore[union-attr]
+    ).all():
+        if ts.status in ("CANCELLED_CLIENT", "CANCELLED_THERAPIST"):
+            continue
+        b = by_id[ts.booking_id]
+        new_utc = tbilisi_naive_to_utc_naive(series_booking.start_dt(b.date, b.start_time or "0:0"))
+        if ts.date != new_utc:
+            ts.date = new_utc
+            ts.is_booked = True
+            ts.updated_at = now
+            session.add(ts)
+
+
+def apply_reschedule(
+    session: Session,
+    plan: SeriesPlan,
+    siblings: Sequence[Booking],
+    actor: User,
+    anchor_id: str,
+) -> List[Booking]:
+    """Move the planned siblings: attribute changes flushed together, CRM
+    sessions re-timed with one read, one GCal and one waitlist outbox event
+    for all of them. No commit."""
+    steps = {s.booking_id: s for s in plan.of("move")}
+    moved = [b for b in siblings if str(b.id) in steps]
+    if not moved:
+        return moved
+    now = datetime.now()
+    old_events, freed = [], []
+    for sib in moved:
+        step = steps[str(sib.id)]
+        if sib.gcal_event_id:
+            old_events.append([sib.gcal_event_id, sib.resource_id])
+            # Cleared up-front so nobody sees a stale id pointed at the old slot.
+            sib.gcal_event_id = None
+        freed.append({"booking_id": str(sib.id), "resource_id": sib.resource_id,
+                      "date": sib.date, "start_time": sib.start_time})
+        sib.start_time = step.start_time
+        sib.resource_id = step.resource_id
+        sib.updated_at = now
+        session.add(sib)
+        timeline_service.log_event(
+            session=session,
+            actor_id=actor.id,
+            actor_role=actor.role,
+            target_id=str(sib.id),
+            target_type="booking",
+            event_type="booking_rescheduled",
+            description=(
+                f"Series propagation: {step.from_start_time} → {step.start_time}"
+                + (f" (room {step.from_resource_id} → {step.resource_id})"
+                   if step.from_resource_id != step.resource_id else "")
+            ),
+            metadata={
+                "anchor_id": anchor_id,
+                "old_time": step.from_start_time,
+                "new_time": step.start_time,
+                "old_resource": step.from_resource_id,
+                "new_resource": step.resource_id,
+                "via": "reschedule-series",
+            },
+            commit=False,
+        )
+    sync_linked_sessions(session, moved)
+
+    key = f"{plan.group_id}:{anchor_id}:{moved[0].start_time}:{moved[0].resource_id}"
+    outbox.enqueue(session, "gcal.recreate_many", {
+        "booking_ids": [str(b.id) for b in moved],
+        "user_name": actor.name or "",
+        "old_events": old_events,
+    }, key=f"gcal-recreate-series:{key}")
+    outbox.enqueue(session, "waitlist.freed_slots", {"slots": freed}, key=f"waitlist:reschedule-series:{key}")
+    return moved
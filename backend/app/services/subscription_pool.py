@@ -19,11 +19,28 @@ That cost real money in both directions:
 Read with :func:`get_float` / :func:`get`, write with :func:`update`. Both keep
 the two dialects in sync, so neither side can starve the other. Legacy one-sided
 pools are read correctly and repaired on the next write — no migration needed.
+
+The hours themselves now live in a row per client (models/subscription_pool).
+Anything that moves hours goes through :func:`deduct` / :func:`refund` /
+:func:`topup`: one atomic ``UPDATE … WHERE remaining_hours >= x`` plus a
+ledger row, after which the result is mirrored back into the JSON, so
+``get``/``get_float`` (pricing, the UI) keep reading the blob as before.
+Code that still assigns ``user.subscription`` directly (admin edits, freeze,
+merges, the expiry cron) is picked up on flush by :func:`sync_row`, which
+applies the hour fields as a difference against the JSON it was read from, so
+a stale blob can't undo a deduction committed in between.
 """
 
 from datetime import datetime
 from typing import Any, Optional
 
+from sqlalchemy import case, event, inspect as sa_inspect
+from sqlalchemy.orm import Session as _SASession
+from sqlmodel import update as sql_update
+
+from app.models.subscription_pool import SubscriptionHoursLedger, SubscriptionPool
+from app.models.user import User
+
 # snake_case (backend) → camelCase (frontend). Every field either side writes.
 _ALIASES: dict[str, str] = {
     "remaining_hours": "remainingHours",
@@ -151,3 +168,234 @@ def lifecycle_status(sub: Optional[dict], now: datetime) -> str:
     if is_expired(sub, now):
         return "completed"
     return "active"
+
+
+# ── Пул как строка: атомарные списания, лента часов, зеркало в JSON ──────────
+
+_MIRRORED = "subscription_pool_mirrored"
+# Часы — float: 0.1 + 0.2 не должно давать «не хватает часов».
+_EPS = 1e-6
+
+
+def _row_status(sub: dict) -> str:
+    if get(sub, "is_frozen", False):
+        return "frozen"
+    return "completed" if get(sub, "status") == "completed" else "active"
+
+
+_HOURS = ("remaining_hours", "used_hours", "total_hours")
+
+
+def _fill(row: SubscriptionPool, sub: dict, *, hours: bool = True) -> None:
+    row.plan_id = get(sub, "plan_id")
+    if hours:
+        row.total_hours = get_float(sub, "total_hours")
+        row.remaining_hours = get_float(sub, "remaining_hours")
+        row.used_hours = get_float(sub, "used_hours")
+    row.bonus_hours = get_float(sub, "bonus_hours")
+    row.is_frozen = bool(get(sub, "is_frozen", False))
+    row.frozen_until = _parse_dt(get(sub, "frozen_until"))
+    row.expiry_date = _parse_dt(get(sub, "expiry_date"))
+    row.flexible = is_flexible(sub)
+    row.status = _row_status(sub)
+    formats = get(sub, "included_formats")
+    row.included_formats = list(formats) if isinstance(formats, (list, tuple)) else None
+    discount = get(sub, "discount_percent")
+    row.discount_percent = get_float(sub, "discount_percent") if discount not in (None, "") else None
+    row.updated_at = datetime.utcnow()
+
+
+def _ledger(
+    session,
+    user_id,
+    delta: float,
+    remaining_after: float,
+    reason: str,
+    *,
+    description: str = "",
+    ref_type: Optional[str] = None,
+    ref_id: Optional[str] = None,
+    actor: Optional[User] = None,
+    actor_id: Optional[str] = None,
+    actor_name: Optional[str] = None,
+) -> None:
+    session.add(SubscriptionHoursLedger(
+        user_id=str(user_id),
+        delta=round(float(delta), 4),
+        remaining_after=round(float(remaining_after), 4),
+        reason=reason,
+        description=description or "",
+        ref_type=ref_type,
+        ref_id=ref_id,
+        actor_id=actor_id if actor_id is not None else (str(actor.id) if actor else None),
+        actor_name=actor_name if actor_name is not None else (actor.name if actor else None),
+    ))
+
+
+def _same_plan(base: dict, sub: dict) -> bool:
+    return base.get("id") == sub.get("id") and get(base, "plan_id") == get(sub, "plan_id")
+
+
+def sync_row(
+    session, user: User, *, reason: str = "sync", base: Optional[dict] = None,
+) -> Optional[SubscriptionPool]:
+    """Привести строку пула к ``user.subscription`` (JSON → строка).
+
+    Для прямых записей в JSON (админ-правка, заморозка, слияние, крон) и для
+    бэкфилла. Изменение остатка пишется в ленту с reason ``sync``.
+
+    ``base`` — JSON, из которого вырос новый (закоммиченный или зеркало
+    последнего списания). Если он есть и план тот же, часы не копируются, а
+    переносятся разницей ``new - base`` тем же атомарным UPDATE, что и у
+    :func:`deduct`: иначе заморозка, прочитавшая клиента до чужого списания,
+    вернула бы списанные часы. Новый план (другой ``id``/``planId``) и пул
+    без строки пишутся целиком.
+    """
+    row = session.get(SubscriptionPool, user.id)
+    sub = user.subscription
+    if not sub:
+        if row is not None:
+            session.delete(row)
+        return None
+    if row is not None and base and _same_plan(base, sub):
+        _fill(row, sub, hours=False)
+        session.add(row)
+        # Даже при нулевой разнице: RETURNING отдаёт свежие часы для зеркала.
+        delta = {f: get_float(sub, f) - get_float(base, f) for f in _HOURS}
+        P = SubscriptionPool
+        hit = session.execute(
+            sql_update(P)
+            .where(P.user_id == user.id)
+            .values(**{f: getattr(P, f) + d for f, d in delta.items()})
+            .returning(P.remaining_hours, P.used_hours, P.total_hours)
+            .execution_options(synchronize_session="fetch")
+        ).one()
+        remaining, used, total = (float(v or 0) for v in hit)
+        user.subscription = update(sub, remaining_hours=remaining, used_hours=used, total_hours=total)
+        if abs(delta["remaining_hours"]) > _EPS:
+            _ledger(session, user.id, delta["remaining_hours"], remaining, reason,
+                    description="Правка пула напрямую (JSON)")
+        return row
+    before = row.remaining_hours if row is not None else 0.0
+    if row is None:
+        row = SubscriptionPool(user_id=user.id)
+    _fill(row, sub)
+    session.add(row)
+    if abs(row.remaining_hours - before) > _EPS:
+        _ledger(session, user.id, row.remaining_hours - before, row.remaining_hours, reason,
+                description="Правка пула напрямую (JSON)")
+    return row
+
+
+def _mirror(session, user: User, remaining: float, used: float, total: float) -> None:
+    user.subscription = update(
+        user.subscription, remaining_hours=remaining, used_hours=used, total_hours=total,
+    )
+    # Строка уже верная — before_flush не должен переписывать её из JSON,
+    # пока этот самый dict не заменят (заморозка после списания и т.п.).
+    session.info.setdefault(_MIRRORED, {})[user.id] = user.subscription
+    session.add(user)
+
+
+def _move(session, user: User, values: dict, cond: tuple, delta: float, reason: str, **kw) -> Optional[float]:
+    P = SubscriptionPool
+    stmt = (
+        sql_update(P)
+        .where(P.user_id == user.id, *cond)
+        .values(**values, updated_at=datetime.utcnow())
+        .returning(P.remaining_hours, P.used_hours, P.total_hours)
+        .execution_options(synchronize_session="fetch")
+    )
+    hit = session.execute(stmt).first()
+    if hit is None:
+        # Либо не хватило часов (strict), либо у клиента нет пула, либо пул
+        # ещё только в JSON (не прошёл бэкфилл) — тогда заводим строку и
+        # повторяем.
+        if session.get(P, user.id) is not None or not user.subscription:
+            return None
+        sync_row(session, user)
+        session.flush()
+        hit = session.execute(stmt).first()
+        if hit is None:
+            return None
+    remaining, used, total = (float(v or 0) for v in hit)
+    _mirror(session, user, remaining, used, total)
+    _ledger(session, user.id, delta, remaining, reason, **kw)
+    return remaining
+
+
+def deduct(session, user: User, hours: float, reason: str, *, strict: bool = False, **kw) -> Optional[float]:
+    """Списать abs(hours) часов одним UPDATE. Возвращает новый остаток.
+
+    strict=True — только если хватает (``WHERE remaining_hours >= x``); иначе
+    ничего не меняется и возвращается None. Так два одновременных списания
+    не могут оба пройти по одному и тому же остатку. strict=False — старое
+    поведение доплат/подтверждений: остаток не уходит ниже нуля.
+    """
+    x = abs(float(hours))
+    if x <= _EPS:
+        return get_float(user.subscription, "remaining_hours")
+    P = SubscriptionPool
+    values = dict(
+        remaining_hours=case((P.remaining_hours >= x, P.remaining_hours - x), else_=0.0),
+        used_hours=P.used_hours + x,
+    )
+    cond = (P.remaining_hours >= x - _EPS,) if strict else ()
+    return _move(session, user, values, cond, -x, reason, **kw)
+
+
+def refund(session, user: User, hours: float, reason: str, **kw) -> Optional[float]:
+    """Вернуть abs(hours) в пул (used_hours не уходит ниже нуля)."""
+    x = abs(float(hours))
+    if x <= _EPS:
+        return get_float(user.subscription, "remaining_hours")
+    P = SubscriptionPool
+    values = dict(
+        remaining_hours=P.remaining_hours + x,
+        used_hours=case((P.used_hours >= x, P.used_hours - x), else_=0.0),
+    )
+    return _move(session, user, values, (), x, reason, **kw)
+
+
+def apply_hours(session, user: User, delta: float, reason: str, **kw) -> Optional[float]:
+    """Знаковый вариант: delta > 0 — вернуть в пул, < 0 — списать."""
+    if delta < 0:
+        return deduct(session, user, delta, reason, **kw)
+    return refund(session, user, delta, reason, **kw)
+
+
+def topup(session, user: User, hours: float, reason: str = "topup", **kw) -> Optional[float]:
+    """Докупка часов: remaining и total растут на abs(hours)."""
+    x = abs(float(hours))
+    P = SubscriptionPool
+    values = dict(remaining_hours=P.remaining_hours + x, total_hours=P.total_hours + x)
+    return _move(session, user, values, (), x, reason, **kw)
+
+
+def _subscription_changed(user: User) -> bool:
+    return sa_inspect(user).attrs.subscription.history.has_changes()
+
+
+@event.listens_for(_SASession, "before_flush")
+def _sync_json_writes(session, flush_context, instances) -> None:
+    mirrored = session.info.pop(_MIRRORED, {})
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, User):
+            continue
+        if obj.id in mirrored and obj.__dict__.get("subscription") is mirrored[obj.id]:
+            continue
+        if obj in session.new and not obj.subscription:
+            continue
+        if _subscription_changed(obj):
+            # База для разницы часов: зеркало списания в этой сессии, иначе
+            # JSON, каким его прочитали из базы.
+            base = mirrored.get(obj.id)
+            if base is None:
+                deleted = sa_inspect(obj).attrs.subscription.history.deleted
+                base = deleted[0] if deleted else None
+            sync_row(session, obj, base=base)
+    for obj in list(session.deleted):
+        if isinstance(obj, User):
+            row = session.get(SubscriptionPool, obj.id)
+            if row is not None:
+                session.delete(row)
@@ -0,0 +1,174 @@
+"""Content-addressed storage + reference counts for task attachments.
+
+/upload/task-file used to write every upload under a fresh uuid name, and
+nothing ever deleted them: a file removed from a task — or uploaded for a
+task that was never saved — stayed on the droplet's disk forever, and the
+same PDF attached to five tasks was stored five times.
+
+Now the upload is stored once per SHA-256 at
+uploads/tasks/<h[:2]>/<h><ext>. The move into place is an atomic rename
+from a temp file in the same directory tree, so a half-written file is
+never visible under its final name. TaskFile rows count how many
+AdminTasks reference each blob. `retarget()` runs inside the task's
+create/update/delete transaction. `sweep_orphans()` (cron) deletes blobs
+nobody references once they are older than TASK_FILE_ORPHAN_GRACE_HOURS.
+
+Specialist application documents go through the same endpoint. They are
+not counted here, but the sweep treats any blob listed in
+Specialist.documents as referenced.
+Pre-existing uuid-named files are left alone.
+"""
+from __future__ import annotations
+
+import glob
+import logging
+import os
+import re
+import time
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+
+from app.models.specialist import Specialist
+from app.models.task_file import TaskFile
+
+logger = logging.getLogger(__name__)
+
+SUBDIR = "tasks"
+_URL_RE = re.compile(r"/uploads/tasks/[0-9a-f]{2}/([0-9a-f]{64})(\.[a-z0-9]+)$")
+# mkstemp leftovers of uploads that died mid-stream (see api/v1/upload).
+TMP_SUFFIX = ".upload"
+
+
+def _rel_dir(digest: str) -> str:
+    return os.path.join(SUBDIR, digest[:2])
+
+
+def store(upload_dir: str, tmp_path: str, digest: str, ext: str) -> str:
+    """Move a fully written + hashed temp file into place; returns its URL.
+
+    Same content already stored (under any of the allowed extensions) →
+    the temp file is dropped and the existing URL reused.
+    """
+    out_dir = os.path.join(upload_dir, _rel_dir(digest))
+    os.makedirs(out_dir, exist_ok=True)
+    existing = glob.glob(os.path.join(out_dir, f"{digest}.*"))
+    if existing:
+        os.unlink(tmp_path)
+        dst = existing[0]
+        # Fresh mtime = fresh grace period: it's about to be attached again.
+        os.utime(dst)
+    else:
+        dst = os.path.join(out_dir, digest + ext)
+        os.replace(tmp_path, dst)
+    return "/uploads/" + os.path.relpath(dst, upload_dir).replace(os.sep, "/")
+
+
+def digest_of(url: Optional[str]) -> Optional[str]:
+    """SHA-256 of a content-addressed task-file URL (absolute or relative);
+    None for legacy uuid uploads, links and anything else."""
+    m = _URL_RE.search(url or "")
+    return m.group(1) if m else None
+
+
+def _digests(attachments: Optional[Iterable[dict]]) -> dict[str, dict]:
+    out: dict[str, dict] = {}
+    for a in attachments or []:
+        if isinstance(a, dict):
+            d = digest_of(a.get("url"))
+            if d:
+                out.setdefault(d, a)
+    return out
+
+
+def _adjust(session: Session, digest: str, delta: int, attachment: dict) -> None:
+    now = datetime.now()
+    # Relative UPDATE — two requests touching the same blob never lose a count.
+    res = session.exec(
+        update(TaskFile)
+        .where(TaskFile.sha256 == digest)
+        .values(ref_count=TaskFile.ref_count + delta, updated_at=now)
+    )
+    if res.rowcount or delta < 0:
+        return
+    ext = _URL_RE.search(attachment.get("url", "")).group(2)
+    try:
+        size = int(attachment.get("size") or 0)
+    except (TypeError, ValueError):
+        size = 0
+    try:
+        with session.begin_nested():
+            session.add(TaskFile(sha256=digest, ext=ext, size=size, ref_count=delta, updated_at=now))
+    except IntegrityError:
+        # Lost the insert race to a parallel attach — the row exists now.
+        session.exec(
+            update(TaskFile)
+            .where(TaskFile.sha256 == digest)
+            .values(ref_count=TaskFile.ref_count + delta, updated_at=now)
+        )
+
+
+def retarget(session: Session, old: Optional[Iterable[dict]], new: Optional[Iterable[dict]]) -> None:
+    """Move one task's references from `old` attachments to `new` (either
+    may be None for create/delete). A blob attached twice to the same task
+    counts once. Does not commit — part of the caller's transaction."""
+    before, after = _digests(old), _digests(new)
+    for d in sorted(after.keys() - before.keys()):
+        _adjust(session, d, +1, after[d])
+    for d in sorted(before.keys() - after.keys()):
+        _adjust(session, d, -1, before[d])
+
+
+def _pinned_by_specialists(session: Session) -> set[str]:
+    pinned: set[str] = set()
+    for docs in session.exec(select(Specialist.documents)).all():
+        for url in docs or []:
+            d = digest_of(url)
+            if d:
+                pinned.add(d)
+    return pinned
+
+
+def sweep_orphans(session: Session, upload_dir: str, grace_hours: float) -> dict:
+    """Delete unreferenced blobs (and dead temp files) older than the grace
+    period. Safe to run repeatedly; commits."""
+    cutoff_ts = time.time() - grace_hours * 3600
+    cutoff_dt = datetime.now() - timedelta(hours=grace_hours)
+
+    stale_tmp = 0
+    for path in glob.glob(os.path.join(upload_dir, f"*{TMP_SUFFIX}")):
+        if os.path.getmtime(path) < cutoff_ts:
+            os.unlink(path)
+            stale_tmp += 1
+
+    candidates: dict[str, list[str]] = {}
+    for path in glob.glob(os.path.join(upload_dir, SUBDIR, "??", "*")):
+        m = _URL_RE.search("/uploads/" + os.path.relpath(path, upload_dir).replace(os.sep, "/"))
+        if m and os.path.getmtime(path) < cutoff_ts:
+            candidates.setdefault(m.group(1), []).append(path)
+    if not candidates:
+        return {"deleted": 0, "bytes": 0, "stale_tmp": stale_tmp}
+
+    keep = _pinned_by_specialists(session)
+    rows = session.exec(select(TaskFile).where(TaskFile.sha256.in_(list(candidates)))).all()
+    keep |= {r.sha256 for r in rows if r.ref_count > 0 or r.updated_at > cutoff_dt}
+
+    doomed = [d for d in candidates if d not in keep]
+    deleted = freed = 0
+    for d in doomed:
+        for path in candidates[d]:
+            # Re-uploaded since we listed the directory → it's live again.
+            if os.path.getmtime(path) >= cutoff_ts:
+                continue
+            freed += os.path.getsize(path)
+            os.unlink(path)
+            deleted += 1
+    if doomed:
+        session.exec(delete(TaskFile).where(TaskFile.sha256.in_(doomed), TaskFile.ref_count <= 0))
+        session.commit()
+    logger.info("[task_files] swept %d orphaned files (%d bytes), %d stale temp files",
+                deleted, freed, stale_tmp)
+    return {"deleted": deleted, "bytes": freed, "stale_tmp": stale_tmp}
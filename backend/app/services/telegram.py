@@ -9,6 +9,8 @@ the bot, sendMessage will return 403 "Forbidden: bot can't initiate conversation
 with a user". This is expected — we log and return False without raising.
 """
 import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
 from datetime import datetime, timedelta
 from html import escape
 from typing import Optional, List
@@ -32,6 +34,16 @@ BOT_BLOCKED_ERRORS = {
     "Forbidden: bot can't initiate conversation with a user",
 }
 
+# Set by the outbox worker (services/outbox_handlers): inside `strict()`
+# a network error / 429 / 5xx raises instead of returning False, so the
+# outbox can retry the message later. Everywhere else sending stays
+# fire-and-forget.
+_strict: ContextVar[bool] = ContextVar("telegram_strict", default=False)
+
+
+class TelegramTransientError(Exception):
+    """Telegram unreachable or throttling — worth retrying."""
+
 
 class TelegramService:
     """Sends booking notifications to users via Telegram Bot API.
@@ -48,6 +60,14 @@ class TelegramService:
         if not self.enabled:
             logger.info("TelegramService: disabled (TELEGRAM_BOT_TOKEN unset)")
 
+    @contextmanager
+    def strict(self):
+        token = _strict.set(True)
+        try:
+            yield
+        finally:
+            _strict.reset(token)
+
     # ─── Public API ───────────────────────────────────────────────────────────
 
     def send_booking_confirmation(
@@ -403,9 +423,13 @@ class TelegramService:
             else:
                 logger.warning("[tg:error] chat_id=%s status=%d resp=%r",
                                chat_id, r.status_code, data)
+                if _strict.get() and (r.status_code == 429 or r.status_code >= 500):
+                    raise TelegramTransientError(f"HTTP {r.status_code}: {description}")
             return False
         except requests.RequestException as e:
             logger.error("[tg:network-error] chat_id=%s err=%r", chat_id, e)
+            if _strict.get():
+                raise TelegramTransientError(repr(e)) from e
             return False
 
     # ─── Admin alerts (TELEGRAM_ADMIN_CHAT_ID group) ─────────────────────────
@@ -449,6 +473,8 @@ class TelegramService:
         "booking_pending_approval":  ("⏳", "Бронь &lt;12 ч — нужно подтвердить"),
         "booking_cancelled":         ("✖",  "Отмена брони"),
         "booking_rescheduled":       ("↻",  "Перенос брони"),
+        "booking_series_cancelled":  ("✖",  "Отмена серии броней"),
+        "booking_series_rescheduled": ("↻", "Перенос серии броней"),
         "booking_re_rent_listed":    ("🔄", "Выставлена на переаренду"),
         "booking_re_rent_taken":     ("✓",  "Переаренда состоялась"),
         "crm_access_request":        ("🔑", "Заявка на доступ к CRM"),
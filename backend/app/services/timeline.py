@@ -19,10 +19,16 @@ class TimelineService:
         target_type: str,
         event_type: str,
         description: str,
-        metadata: dict = {}
+        metadata: dict = {},
+        commit: bool = True,
     ) -> TimelineEvent:
         """
         Create a timeline entry.
+
+        commit=False only adds the row: it is written by the caller's own
+        commit, together with the change it describes (booking routes log
+        inside the transaction that also holds the slot lock and the outbox
+        rows, so an audit entry can't exist without its change or vice versa).
         """
         # Nearly every caller passes `str(user.id)` although the column is a
         # UUID. psycopg2 adapts that silently, so it went unnoticed; any other
@@ -53,8 +59,9 @@ class TimelineService:
             timestamp=datetime.now()
         )
         session.add(event)
-        session.commit()
-        session.refresh(event)
+        if commit:
+            session.commit()
+            session.refresh(event)
         return event
 
 timeline_service = TimelineService()
@@ -0,0 +1,241 @@
+"""
+User history: comments/audit notes, discount changes, per-client admin tasks
+and series-end reminder marks, stored as rows (models/user_history) instead
+of JSON arrays on the User row.
+
+Writers call `append` (one INSERT, no read of what was there before).
+Readers either page newest-first (`page`, GET /users/{id}/history) or take
+the detail-card view (`latest`, GET /users/{id}). The user list doesn't
+carry history at all any more.
+
+Single entries (admin tasks, comments) are changed by id — `find`,
+`update_entry`, `remove` — behind POST/PATCH/DELETE /users/{id}/tasks and
+/comments.
+
+`replace` is only for the legacy PATCH /users/{id} path, where an old
+client sends the whole array. Such an array is at most the card's window
+(`latest` caps it at DETAIL_LIMIT), so it only ever diffs against the rows
+the client actually had: the card carries `history_cursor` —
+{kind: [oldest seq, newest seq]} it showed — and the PATCH must echo it.
+Rows outside the window (older than the card, or written since) are never
+touched; a PATCH without a cursor is refused.
+"""
+from __future__ import annotations
+
+import json
+from collections import defaultdict
+from datetime import datetime
+from typing import Iterable, Optional, Sequence
+from uuid import UUID
+
+from sqlmodel import Session, delete, select, update
+
+from app.models.user_history import SeriesReminderMark, UserHistoryEntry, UserHistoryPage
+
+COMMENT = "comment"
+DISCOUNT = "discount"
+ADMIN_TASK = "admin_task"
+
+# kind → field name on UserDetailRead (and the old User column).
+FIELDS = {
+    COMMENT: "comment_history",
+    DISCOUNT: "discount_history",
+    ADMIN_TASK: "admin_tasks",
+}
+
+DETAIL_LIMIT = 200
+
+
+def _when(data: dict) -> datetime:
+    raw = data.get("date") or data.get("created_at") or data.get("createdAt")
+    if raw:
+        try:
+            dt = datetime.fromisoformat(str(raw).replace("Z", "+00:00"))
+            return dt.astimezone().replace(tzinfo=None) if dt.tzinfo else dt
+        except ValueError:
+            pass
+    return datetime.now()
+
+
+def append(session: Session, user_id: UUID, kind: str, data: dict) -> UserHistoryEntry:
+    """Add one entry. Doesn't commit — it goes out with the caller's change."""
+    row = UserHistoryEntry(
+        user_id=user_id,
+        kind=kind,
+        entry_type=data.get("type"),
+        created_at=_when(data),
+        data=data,
+    )
+    session.add(row)
+    return row
+
+
+def page(
+    session: Session, user_id: UUID, kind: str,
+    *, before: Optional[int] = None, limit: int = 50,
+) -> UserHistoryPage:
+    """Newest first, keyset on seq."""
+    stmt = select(UserHistoryEntry).where(
+        UserHistoryEntry.user_id == user_id, UserHistoryEntry.kind == kind,
+    )
+    if before is not None:
+        stmt = stmt.where(UserHistoryEntry.seq < before)
+    rows = session.exec(stmt.order_by(UserHistoryEntry.seq.desc()).limit(limit + 1)).all()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    return UserHistoryPage(items=[r.data for r in rows], next_before=rows[-1].seq if more else None)
+
+
+def latest(session: Session, user_id: UUID, limit: int = DETAIL_LIMIT) -> dict:
+    """The newest `limit` entries of each kind, in the order the old arrays
+    had them: comments and tasks oldest → newest, discounts newest first.
+    Plus "history_cursor": {kind: [oldest seq, newest seq]} of what was
+    returned ([0, 0] for none) — the window a legacy PATCH may rewrite."""
+    out: dict = {}
+    cursor: dict[str, list[int]] = {}
+    for kind, field in FIELDS.items():
+        rows = session.exec(
+            select(UserHistoryEntry.seq, UserHistoryEntry.data)
+            .where(UserHistoryEntry.user_id == user_id, UserHistoryEntry.kind == kind)
+            .order_by(UserHistoryEntry.seq.desc())
+            .limit(limit)
+        ).all()
+        newest_first = [data for _, data in rows]
+        out[field] = newest_first if kind == DISCOUNT else newest_first[::-1]
+        cursor[kind] = [rows[-1][0], rows[0][0]] if rows else [0, 0]
+    out["history_cursor"] = cursor
+    return out
+
+
+def find(session: Session, user_id: UUID, kind: str, entry_id: str) -> Optional[UserHistoryEntry]:
+    """The entry whose data["id"] is `entry_id`."""
+    return session.exec(
+        select(UserHistoryEntry).where(
+            UserHistoryEntry.user_id == user_id,
+            UserHistoryEntry.kind == kind,
+            UserHistoryEntry.data["id"].as_string() == entry_id,  # type: ignore[index]
+        )
+    ).first()
+
+
+def update_entry(
+    session: Session, user_id: UUID, kind: str, entry_id: str, changes: dict,
+) -> Optional[UserHistoryEntry]:
+    """Merge `changes` into one entry (its id stays). None if there's no such entry."""
+    row = find(session, user_id, kind, entry_id)
+    if row is None:
+        return None
+    row.data = {**row.data, **{k: v for k, v in changes.items() if k != "id"}}
+    row.entry_type = row.data.get("type")
+    session.add(row)
+    return row
+
+
+def remove(session: Session, user_id: UUID, kind: str, entry_id: str) -> bool:
+    row = find(session, user_id, kind, entry_id)
+    if row is None:
+        return False
+    session.delete(row)
+    return True
+
+
+def _key(data: dict) -> str:
+    # Server-written entries (permissions_update, email_change, …) carry no
+    # id; their content is their identity.
+    return str(data.get("id") or json.dumps(data, sort_keys=True, default=str))
+
+
+def replace(
+    session: Session, user_id: UUID, kind: str, entries: Iterable[dict], window: Sequence[int],
+) -> None:
+    """Make the rows of `kind` inside `window` ([oldest, newest] seq the
+    client was shown, see `latest`) equal `entries`. Matching entries (by
+    id, or by content when there is none) stay as they are, changed ones
+    are updated in place, new ones are appended, missing ones deleted.
+    Nothing outside the window is read or touched."""
+    lo, hi = window
+    rows = session.exec(
+        select(UserHistoryEntry)
+        .where(UserHistoryEntry.user_id == user_id, UserHistoryEntry.kind == kind,
+               UserHistoryEntry.seq >= lo, UserHistoryEntry.seq <= hi)
+        .order_by(UserHistoryEntry.seq)
+    ).all() if hi else []
+    by_key: dict[str, list[UserHistoryEntry]] = defaultdict(list)
+    for r in rows:
+        by_key[_key(r.data)].append(r)
+
+    kept: set[int] = set()
+    for data in entries:
+        data = dict(data)
+        match = by_key.get(_key(data))
+        if not match:
+            append(session, user_id, kind, data)
+            continue
+        row = match.pop(0)
+        kept.add(row.seq)
+        if row.data != data:
+            row.data = data
+            row.entry_type = data.get("type")
+            session.add(row)
+    for r in rows:
+        if r.seq not in kept:
+            session.delete(r)
+
+
+def _email_changes(user_id: UUID):
+    return select(UserHistoryEntry.data).where(
+        UserHistoryEntry.user_id == user_id,
+        UserHistoryEntry.kind == COMMENT,
+        UserHistoryEntry.entry_type == "email_change",
+    )
+
+
+def _old_emails(rows) -> set[str]:
+    return {
+        old for old in (((d or {}).get("old_email") or "").strip().lower() for d in rows) if old
+    }
+
+
+def prior_emails(session: Session, user_id: UUID) -> set[str]:
+    """Every email this account had before an admin renamed it."""
+    return _old_emails(session.exec(_email_changes(user_id)).all())
+
+
+async def prior_emails_async(session, user_id: UUID) -> set[str]:
+    return _old_emails((await session.exec(_email_changes(user_id))).all())
+
+
+def reparent(session: Session, src_id: UUID, tgt_id: UUID) -> int:
+    """Move all of src's history onto tgt (user merge). Returns entries moved."""
+    res = session.exec(
+        update(UserHistoryEntry).where(UserHistoryEntry.user_id == src_id).values(user_id=tgt_id)
+    )
+    # Marks are keyed (user, series): where both have one, the keeper's wins.
+    tgt_groups = select(SeriesReminderMark.recurring_group_id).where(SeriesReminderMark.user_id == tgt_id)
+    session.exec(
+        delete(SeriesReminderMark).where(
+            SeriesReminderMark.user_id == src_id,
+            SeriesReminderMark.recurring_group_id.in_(tgt_groups),  # type: ignore[union-attr]
+        )
+    )
+    session.exec(
+        update(SeriesReminderMark).where(SeriesReminderMark.user_id == src_id).values(user_id=tgt_id)
+    )
+    return int(res.rowcount or 0)
+
+
+# ── Series-end reminder marks ────────────────────────────────────────────────
+
+def series_mark(session: Session, user_id: UUID, group_id: str) -> Optional[int]:
+    mark = session.get(SeriesReminderMark, (user_id, group_id))
+    return mark.threshold if mark else None
+
+
+def set_series_mark(session: Session, user_id: UUID, group_id: str, threshold: int) -> None:
+    mark = session.get(SeriesReminderMark, (user_id, group_id))
+    if mark is None:
+        mark = SeriesReminderMark(user_id=user_id, recurring_group_id=group_id, threshold=threshold)
+    else:
+        mark.threshold = threshold
+        mark.updated_at = datetime.now()
+    session.add(mark)
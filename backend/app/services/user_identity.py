@@ -0,0 +1,312 @@
+"""Duplicate-user detection — normalized identity keys and blocking.
+
+Duplicates (a Telegram-Login placeholder `<chat_id>@telegram.unbox` next to
+the real Google account, the same person registered twice with
+`Ivan.Petrov@gmail.com` and `ivanpetrov@gmail.com`, …) were hunted by
+scripts that loaded the whole user table and compared in Python
+(find_telegram_duplicates.py and friends).
+
+Here every user's identities are kept normalized in user_identity:
+
+* email — lowercased, `+tag` dropped, Gmail dots removed; a placeholder
+  `<id>@telegram.unbox` counts as telegram `<id>` instead;
+* phone — E.164 (`normalize_phone`), also from additional_contacts;
+* telegram — telegram_id; google — google_id;
+* name — the sorted set of name tokens ("Малыш Ольга" == "ольга малыш").
+
+A (kind, value) is a blocking key: candidate pairs are users sharing one,
+found with a single self-join on the (kind, value) index instead of
+comparing every user with every other. Blocks bigger than MAX_BLOCK (a
+common first+last name) are skipped — they'd be mostly noise. Each pair
+gets a confidence from the kinds it matched on (WEIGHTS, combined as
+independent evidence) and a suggested keeper, in the shape /users/merge
+takes.
+
+Keeping it current: mapper events on User note which users changed an
+identity field; before the transaction commits their rows are recomputed
+on the same connection — one SELECT, one DELETE of the keys that are gone,
+one INSERT … ON CONFLICT DO NOTHING of the current ones per commit. Two
+transactions touching the same user therefore never race on the primary
+key: the second one waits for the first's row and then skips it.
+`seed` (startup, from init_data) fills the table only when it is empty;
+`rebuild` (scripts/rebuild_derived.py) heals anything written behind the
+ORM's back, through the same `refresh` in batches of users. Merged-out ghosts (`merged-into-…`) have no
+keys.
+"""
+from __future__ import annotations
+
+import logging
+import re
+from datetime import datetime
+from itertools import chain
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from uuid import UUID
+
+from sqlalchemy import and_, delete, event, func, or_, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session as _SASession
+from sqlalchemy.orm.attributes import get_history
+from sqlmodel import Session, select
+
+from app.models.user import User
+from app.models.user_identity import UserIdentity
+
+logger = logging.getLogger(__name__)
+
+# How much a shared key says on its own. Several keys combine as
+# independent evidence: 1 − Π(1 − w).
+WEIGHTS = {"telegram": 0.95, "google": 0.95, "email": 0.9, "phone": 0.8, "name": 0.3}
+MAX_BLOCK = 25
+PLACEHOLDER_DOMAIN = "telegram.unbox"
+_GHOST_PREFIXES = ("merged-into-", "_merged_into_")
+
+_table = UserIdentity.__table__
+_DIRTY = "user_identity_dirty"
+_FIELDS = ("email", "phone", "telegram_id", "google_id", "name", "additional_contacts")
+_COLUMNS = (User.id, User.email, User.phone, User.telegram_id, User.google_id, User.name,
+            User.additional_contacts)
+
+Key = Tuple[str, str]
+
+# rebuild: users per transaction.
+_REBUILD_BATCH = 500
+
+# INSERT … ON CONFLICT DO NOTHING — the two backends we run on.
+_DIALECT_INSERT = {"postgresql": pg_insert, "sqlite": sqlite_insert}
+
+
+# ── normalization ────────────────────────────────────────────────────────────
+
+def normalize_email(email: Optional[str]) -> Optional[str]:
+    e = (email or "").strip().lower()
+    local, at, domain = e.rpartition("@")
+    if not at or not domain:
+        return None
+    local = local.split("+", 1)[0]
+    if domain in ("gmail.com", "googlemail.com"):
+        local, domain = local.replace(".", ""), "gmail.com"
+    return f"{local}@{domain}" if local else None
+
+
+def normalize_phone(phone: Optional[str]) -> Optional[str]:
+    """E.164 ("+995555123456") or None. Numbers without a country code are
+    taken as Georgian (9 digits); a Russian trunk "8" becomes +7."""
+    raw = (phone or "").strip()
+    digits = re.sub(r"\D", "", raw)
+    if digits.startswith("00"):
+        digits = digits[2:]
+    elif not raw.startswith("+"):
+        if len(digits) == 9:
+            digits = "995" + digits
+        elif len(digits) == 11 and digits.startswith("8"):
+            digits = "7" + digits[1:]
+    if not 8 <= len(digits) <= 15:
+        return None
+    return "+" + digits
+
+
+def name_tokens(name: Optional[str]) -> Set[str]:
+    words = re.findall(r"\w+", (name or "").lower().replace("ё", "е"))
+    return {w for w in words if len(w) > 1 and not w.isdigit()}
+
+
+def identity_keys(email, phone=None, telegram_id=None, google_id=None, name=None,
+                  additional_contacts=None) -> Set[Key]:
+    """Normalized (kind, value) keys of one user."""
+    if (email or "").startswith(_GHOST_PREFIXES):
+        return set()
+    keys: Set[Key] = set()
+    e = normalize_email(email)
+    if e and e.endswith("@" + PLACEHOLDER_DOMAIN):
+        local = e.split("@", 1)[0]
+        if local.isdigit():
+            keys.add(("telegram", local))
+    elif e:
+        keys.add(("email", e))
+    if telegram_id and str(telegram_id).strip():
+        keys.add(("telegram", str(telegram_id).strip()))
+    if google_id and str(google_id).strip():
+        keys.add(("google", str(google_id).strip()))
+    phones = [phone]
+    for c in additional_contacts or []:
+        if not isinstance(c, dict):
+            continue
+        kind = str(c.get("type") or "").lower()
+        if kind == "phone":
+            phones.append(c.get("value"))
+        elif kind == "email" and (extra := normalize_email(c.get("value"))):
+            keys.add(("email", extra))
+    keys.update(("phone", p) for p in map(normalize_phone, phones) if p)
+    tokens = name_tokens(name)
+    if tokens:
+        keys.add(("name", " ".join(sorted(tokens))))
+    return keys
+
+
+# ── keeping the index current ────────────────────────────────────────────────
+
+def _note(target) -> None:
+    session = _SASession.object_session(target)
+    if session is not None:
+        session.info.setdefault(_DIRTY, set()).add(target.id)
+
+
+@event.listens_for(User, "after_insert")
+@event.listens_for(User, "after_delete")
+def _user_written(mapper, connection, target) -> None:
+    _note(target)
+
+
+@event.listens_for(User, "after_update")
+def _user_updated(mapper, connection, target) -> None:
+    if any(get_history(target, f).has_changes() for f in _FIELDS):
+        _note(target)
+
+
+@event.listens_for(_SASession, "before_commit")
+def _refresh_before_commit(session) -> None:
+    if any(isinstance(o, User) for o in chain(session.new, session.dirty, session.deleted)):
+        session.flush()  # the last flush still has to note its users
+    dirty = session.info.pop(_DIRTY, None)
+    if dirty:
+        refresh(session.connection(), dirty)
+
+
+def _rows(users) -> List[dict]:
+    now = datetime.now()
+    return [
+        {"user_id": uid, "kind": kind, "value": value, "updated_at": now}
+        for uid, *fields in users
+        for kind, value in identity_keys(*fields)
+    ]
+
+
+def refresh(connection, user_ids: Iterable[UUID]) -> None:
+    """Recompute the keys of `user_ids` (a deleted user just loses its own).
+
+    Only the keys that are gone are deleted; the current ones are inserted
+    with ON CONFLICT DO NOTHING, so unchanged rows stay and a concurrent
+    refresh of the same user can't fail on the primary key."""
+    ids = list(user_ids)
+    users = connection.execute(select(*_COLUMNS).where(User.id.in_(ids))).all()  # type: ignore[attr-defined]
+    rows = _rows(users)
+    stale = delete(_table).where(_table.c.user_id.in_(ids))
+    if rows:
+        pk = tuple_(_table.c.user_id, _table.c.kind, _table.c.value)
+        stale = stale.where(pk.not_in([(r["user_id"], r["kind"], r["value"]) for r in rows]))
+    connection.execute(stale)
+    if rows:
+        stmt = _DIALECT_INSERT[connection.dialect.name](_table).on_conflict_do_nothing(
+            index_elements=[_table.c.user_id, _table.c.kind, _table.c.value],
+        )
+        connection.execute(stmt, rows)
+
+
+def seed(engine) -> None:
+    """Fill an empty table from the users (startup); a filled one is left
+    alone."""
+    with engine.connect() as conn:
+        if conn.execute(select(_table.c.user_id).limit(1)).first() is not None:
+            return
+    rebuild(engine)
+
+
+def rebuild(engine) -> None:
+    """Recompute every user's keys (scripts/rebuild_derived).
+
+    Every user, and every user_id still holding keys, goes through
+    `refresh`, `_REBUILD_BATCH` per transaction — the same delete-what's-gone,
+    insert-or-skip as a commit, so it can run next to live traffic."""
+    with engine.connect() as conn:
+        ids = set(conn.execute(select(User.id)).scalars())
+        ids |= set(conn.execute(select(_table.c.user_id).distinct()).scalars())
+    ordered = sorted(ids, key=str)
+    for i in range(0, len(ordered), _REBUILD_BATCH):
+        with engine.begin() as conn:
+            refresh(conn, ordered[i:i + _REBUILD_BATCH])
+    logger.info("[user_identity] rebuilt the identity keys of %d users", len(ids))
+
+
+# ── candidate pairs ──────────────────────────────────────────────────────────
+
+def _score(kinds: Set[str], a: User, b: User) -> float:
+    miss = 1.0
+    for kind in kinds:
+        miss *= 1 - WEIGHTS[kind]
+    if "name" not in kinds:
+        # Partial name overlap ("Ольга" vs "Ольга Малыш") as weaker evidence.
+        ta, tb = name_tokens(a.name), name_tokens(b.name)
+        if ta and tb:
+            miss *= 1 - WEIGHTS["name"] * len(ta & tb) / len(ta | tb)
+    return round(1 - miss, 3)
+
+
+def _is_placeholder(u: User) -> bool:
+    return (u.email or "").lower().endswith("@" + PLACEHOLDER_DOMAIN)
+
+
+def _keeper(a: User, b: User) -> Tuple[User, User]:
+    """Suggested (keeper, duplicate): a real account beats a Telegram
+    placeholder, an active one an archived one, then the older one wins."""
+    rank = sorted((a, b), key=lambda u: (_is_placeholder(u), u.archived_at is not None,
+                                         u.created_at or datetime.max))
+    return rank[0], rank[1]
+
+
+def _brief(u: User) -> dict:
+    return {
+        "id": str(u.id), "email": u.email, "name": u.name, "phone": u.phone,
+        "telegram_id": u.telegram_id, "has_google": bool(u.google_id),
+        "balance": u.balance, "archived": u.archived_at is not None,
+        "created_at": u.created_at.isoformat() if u.created_at else None,
+    }
+
+
+def candidates(
+    session: Session,
+    min_score: float = 0.5,
+    limit: int = 200,
+    user_id: Optional[UUID] = None,
+) -> List[dict]:
+    """Likely-duplicate pairs, most confident first. Two reads: the
+    blocking self-join and the users it found."""
+    a, b = _table.alias("a"), _table.alias("b")
+    blocks = (
+        select(_table.c.kind, _table.c.value)
+        .group_by(_table.c.kind, _table.c.value)
+        .having(func.count() >= 2, func.count() <= MAX_BLOCK)
+        .subquery()
+    )
+    q = (
+        select(a.c.user_id, b.c.user_id, a.c.kind)
+        .join(blocks, and_(blocks.c.kind == a.c.kind, blocks.c.value == a.c.value))
+        .join(b, and_(b.c.kind == a.c.kind, b.c.value == a.c.value, a.c.user_id < b.c.user_id))
+    )
+    if user_id is not None:
+        q = q.where(or_(a.c.user_id == user_id, b.c.user_id == user_id))
+    matched: Dict[Tuple[UUID, UUID], Set[str]] = {}
+    for ua, ub, kind in session.execute(q).all():
+        matched.setdefault((ua, ub), set()).add(kind)
+    if not matched:
+        return []
+
+    ids = {uid for pair in matched for uid in pair}
+    users = {u.id: u for u in session.exec(select(User).where(User.id.in_(ids))).all()}  # type: ignore[attr-defined]
+    out = []
+    for (ua, ub), kinds in matched.items():
+        if ua not in users or ub not in users:
+            continue
+        score = _score(kinds, users[ua], users[ub])
+        if score < min_score:
+            continue
+        keeper, dup = _keeper(users[ua], users[ub])
+        out.append({
+            "score": score,
+            "matched": sorted(kinds),
+            "keeper": _brief(keeper),
+            "duplicate": _brief(dup),
+            "merge": {"target": str(keeper.id), "sources": [str(dup.id)]},
+        })
+    out.sort(key=lambda x: (-x["score"], x["keeper"]["email"] or ""))
+    return out[:limit]
@@ -0,0 +1,230 @@
+"""User merge — fold one or more duplicate accounts into a keeper.
+
+There were two hand-written copies of this: /users/merge (admin) and the
+Telegram auto-merge. Both listed the referencing tables by hand in raw
+text SQL, one UPDATE per table per pair, and drifted apart — the Telegram
+one never learned about the Psy-CRM tables, neither knew about
+booking.waived_by, specialist_appointments or bonuses. The UUID parameters
+of the raw SQL also didn't bind on SQLite, so none of it was testable.
+
+Here the list of references is read from the model metadata:
+
+* every real FK to user.id;
+* every soft reference — a column tagged with `user_ref(...)` (models/user)
+  that holds User.id as text and/or User.email.
+
+and the merge is one set-based `UPDATE … WHERE col IN (dups)` per
+(column, kind) for the whole batch of duplicates — the statement count
+depends on the schema, not on how many rows or duplicates there are.
+`dry_run=True` answers "what would move" with a single UNION ALL of counts
+and writes nothing.
+
+Deliberately not re-pointed: balance_ledger / subscription_hours_ledger
+(audit trails — the merge writes its own ledger row for the moved
+balance), weekly_rebate (per-user idempotency guard), subscription_pools
+(follows User.subscription through services/subscription_pool), cashbox
+shift admin columns (who physically took the money). user_history goes
+through `user_history.reparent`, which also resolves reminder-mark clashes.
+
+Runs inside the caller's transaction; the caller commits.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy import Column, Table, Uuid, func, literal, select, union_all, update
+from sqlmodel import Session, SQLModel
+
+# Not imported by models/__init__ — without these their tagged columns
+# would only be found once the app has imported the routers.
+import app.models.admin_task  # noqa: F401
+import app.models.bonus  # noqa: F401
+from app.models.user import User
+from app.services import user_history, wallet
+
+# Carried from a duplicate when the keeper has none.
+_FILL_IF_EMPTY = ("name", "phone", "avatar_url", "google_id", "telegram_id")
+
+
+@dataclass(frozen=True)
+class Ref:
+    """One column that points at a user, and what it stores."""
+    table: Table
+    column: Column
+    kind: str  # "uuid" — Uuid column; "id" — UUID as text; "email"
+
+    @property
+    def label(self) -> str:
+        name = f"{self.table.name}.{self.column.name}"
+        both = len(self.column.info.get("user_ref", ())) > 1
+        return f"{name}({self.kind})" if both else name
+
+    @property
+    def unique(self) -> bool:
+        return bool(self.column.unique)
+
+
+def references() -> List[Ref]:
+    """Every column that references a user, from SQLModel.metadata."""
+    refs: List[Ref] = []
+    for table in SQLModel.metadata.sorted_tables:
+        for col in table.columns:
+            if any(fk.column.table.name == User.__tablename__ for fk in col.foreign_keys):
+                refs.append(Ref(table, col, "uuid"))
+                continue
+            for kind in col.info.get("user_ref", ()):
+                if kind == "id" and isinstance(col.type, Uuid):
+                    kind = "uuid"
+                refs.append(Ref(table, col, kind))
+    return refs
+
+
+def _values(ref: Ref, keeper: User, dups: Sequence[User]):
+    if ref.kind == "uuid":
+        return keeper.id, [d.id for d in dups]
+    if ref.kind == "id":
+        return str(keeper.id), [str(d.id) for d in dups]
+    return keeper.email, [d.email for d in dups if d.email]
+
+
+def _counts(session: Session, refs: List[Ref], keeper: User, dups: Sequence[User]) -> Dict[str, int]:
+    parts = []
+    for i, ref in enumerate(refs):
+        _, old = _values(ref, keeper, dups)
+        if old:
+            parts.append(
+                select(literal(i).label("ref"), func.count().label("n"))
+                .select_from(ref.table).where(ref.column.in_(old))
+            )
+    if not parts:
+        return {}
+    rows = session.execute(union_all(*parts)).all()
+    return {refs[i].label: int(n) for i, n in rows if n}
+
+
+def _repoint_unique(session: Session, ref: Ref, keeper: User, dups: Sequence[User]) -> Dict[str, int]:
+    """A UNIQUE reference (specialists.user_id) can belong to one user only:
+    the keeper keeps its own, else takes the first duplicate's; the rest
+    are unlinked rather than failing the merge."""
+    new, old = _values(ref, keeper, dups)
+    taken = set(session.execute(select(ref.column).where(ref.column.in_(old + [new]))).scalars())
+    out: Dict[str, int] = {}
+    moving = None if new in taken else next((v for v in old if v in taken), None)
+    if moving is not None:
+        session.execute(update(ref.table).where(ref.column == moving).values({ref.column.name: new}))
+        out[ref.label] = 1
+    rest = [v for v in old if v in taken and v != moving]
+    if rest:
+        res = session.execute(update(ref.table).where(ref.column.in_(rest)).values({ref.column.name: None}))
+        out[f"{ref.label}(unlinked)"] = int(res.rowcount or 0)
+    return out
+
+
+def _carry(keeper: User, dup: User) -> None:
+    for attr in _FILL_IF_EMPTY:
+        if not getattr(keeper, attr, None) and getattr(dup, attr, None):
+            setattr(keeper, attr, getattr(dup, attr))
+    keeper.credit_limit = max(float(keeper.credit_limit or 0), float(dup.credit_limit or 0))
+    keeper.personal_discount_percent = max(
+        int(keeper.personal_discount_percent or 0), int(dup.personal_discount_percent or 0)
+    )
+    # Subscription: keep the keeper's, fall back to the duplicate's.
+    if not keeper.subscription and dup.subscription:
+        keeper.subscription = dup.subscription
+    if dup.tags:
+        keeper.tags = sorted(set((keeper.tags or []) + list(dup.tags)))
+
+
+def merge(
+    session: Session,
+    keeper: User,
+    duplicates: Sequence[User],
+    *,
+    actor: Optional[User] = None,
+    dry_run: bool = False,
+) -> dict:
+    """Move everything of `duplicates` onto `keeper` and delete them.
+
+    Returns {"keeper", "absorbed", "rows": {column: rows}, "balance",
+    "dry_run"}. With an `actor` the keeper's history gets a "user_merge"
+    comment (the admin path); the Telegram auto-merge passes none.
+    Raises ValueError for an empty batch or the keeper among duplicates.
+    """
+    dups = list({d.id: d for d in duplicates}.values())
+    if not dups:
+        raise ValueError("nothing to merge")
+    if any(d.id == keeper.id for d in dups):
+        raise ValueError("keeper is among the duplicates")
+
+    refs = references()
+    balance = round(sum(float(d.balance or 0) for d in dups), 2)
+    report = {
+        "keeper": str(keeper.id),
+        "absorbed": [{"id": str(d.id), "email": d.email} for d in dups],
+        "balance": balance,
+        "dry_run": dry_run,
+    }
+    if dry_run:
+        report["rows"] = _counts(session, refs, keeper, dups)
+        return report
+
+    emails = [d.email for d in dups]
+    rows: Dict[str, int] = {}
+    for ref in refs:
+        if ref.unique:
+            rows.update(_repoint_unique(session, ref, keeper, dups))
+            continue
+        new, old = _values(ref, keeper, dups)
+        if not old:
+            continue
+        res = session.execute(
+            update(ref.table).where(ref.column.in_(old)).values({ref.column.name: new})
+        )
+        if res.rowcount:
+            rows[ref.label] = int(res.rowcount)
+    # Relationships loaded before the UPDATEs (User.specialist_profile) would
+    # otherwise have the delete below unlink what was just moved.
+    rels = [r.key for r in sa_inspect(User).relationships]
+    for u in [keeper, *dups]:
+        session.expire(u, rels)
+
+    for dup in dups:
+        _carry(keeper, dup)
+        # Per duplicate, so each transfer is its own ledger row; a debt
+        # (negative balance) moves too.
+        if abs(float(dup.balance or 0)) >= 0.01:
+            wallet.apply(session, keeper, float(dup.balance or 0), reason="merge",
+                         description=f"Слияние баланса из {dup.email}",
+                         ref_type="user", ref_id=str(dup.id), actor=actor)
+        moved = user_history.reparent(session, dup.id, keeper.id)
+        if moved:
+            rows["user_history"] = rows.get("user_history", 0) + moved
+    report["rows"] = rows
+
+    # Free the unique email / the Telegram link before the delete.
+    for dup in dups:
+        dup.telegram_id = None
+        dup.email = f"merged-into-{keeper.id}-{dup.id}@deleted.unbox"
+        session.add(dup)
+
+    if actor is not None:
+        user_history.append(session, keeper.id, user_history.COMMENT, {
+            "text": f"Слияние аккаунтов {', '.join(emails)} → {keeper.email}",
+            "author_id": str(actor.id),
+            "author_name": actor.name or actor.email,
+            "created_at": datetime.now().isoformat(),
+            "type": "user_merge",
+            "absorbed_id": str(dups[0].id) if len(dups) == 1 else None,
+            "absorbed": report["absorbed"],
+            "moved": rows,
+        })
+    keeper.updated_at = datetime.now()
+    session.add(keeper)
+    session.flush()
+    for dup in dups:
+        session.delete(dup)
+    session.flush()
+    return report
@@ -0,0 +1,282 @@
+"""In-memory interval index of active waitlist entries per (branch, day).
+
+Every freed slot (cancel, reschedule away, re-rent listing) used to read the
+freed cabinet, every cabinet of its branch and the day's active entries,
+then walk them all. A cancelled 40-week series did that 40 times.
+
+Here each (scope, day) — scope is the branch (`location_id`), or the
+cabinet itself for a legacy cabinet without one — gets a `DayIndex`: the
+entries sorted by start with the max end of every subtree (a static
+interval tree). "Who overlaps 18:00–19:30" is then O(log n + k). Days are
+loaded lazily, all missing ones of a batch in one SELECT, and kept.
+
+Keeping it current:
+
+* commits in this process patch it: mapper events on Waitlist note what
+  was inserted, changed or deleted, bulk UPDATEs report through
+  `note_removed`, and the affected days are rebuilt in after_commit;
+* other processes' commits arrive as a bump of the `waitlist` table
+  version (core/http_cache + the realtime LISTEN); any version we didn't
+  produce ourselves drops the whole index;
+* writes behind the ORM's back (raw SQL) are covered by MAX_AGE_SECONDS.
+
+A stale entry can't cause a double notification: the matcher claims rows
+with `UPDATE … WHERE status = 'active'` and only notifies what it got back.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session as _SASession
+from sqlmodel import Session, select
+
+from app.core import http_cache
+from app.models.waitlist import Waitlist
+
+# The version bump below relies on core/http_cache's after_commit running
+# before ours; install() is idempotent and registers it first if needed.
+http_cache.install()
+
+MAX_AGE_SECONDS = 300
+MAX_DAYS = 512
+_TABLE = "waitlist"
+_CHANGES = "waitlist_index_changes"
+
+http_cache.track(_TABLE)
+
+
+def _minutes(t: str) -> int:
+    try:
+        h, m = map(int, t.split(":"))
+        return h * 60 + m
+    except Exception:
+        return -1
+
+
+@dataclass(frozen=True)
+class Entry:
+    """What matching needs of a Waitlist row — detached, immutable."""
+    id: UUID
+    resource_id: str
+    date: datetime
+    start_time: str
+    end_time: str
+    user_id: str
+    user_uuid: Optional[UUID]
+
+    @classmethod
+    def of(cls, w: Waitlist) -> "Entry":
+        return cls(w.id, w.resource_id, w.date, w.start_time, w.end_time, w.user_id, w.user_uuid)
+
+    @property
+    def span(self) -> Tuple[int, int]:
+        return _minutes(self.start_time), _minutes(self.end_time)
+
+
+class DayIndex:
+    """Static interval tree over one day's entries (implicit, array-backed:
+    the node of [lo, hi) is mid = (lo + hi) // 2)."""
+
+    __slots__ = ("entries", "_starts", "_ends", "_max_end")
+
+    def __init__(self, entries: Iterable[Entry]):
+        valid = [(e.span, e) for e in entries]
+        valid = [(s, en, e) for (s, en), e in valid if 0 <= s < en]
+        valid.sort(key=lambda x: (x[0], x[1]))
+        self.entries: List[Entry] = [e for _, _, e in valid]
+        self._starts = [s for s, _, _ in valid]
+        self._ends = [en for _, en, _ in valid]
+        self._max_end = [0] * len(valid)
+        self._build(0, len(valid))
+
+    def _build(self, lo: int, hi: int) -> int:
+        if lo >= hi:
+            return -1
+        mid = (lo + hi) // 2
+        m = max(self._ends[mid], self._build(lo, mid), self._build(mid + 1, hi))
+        self._max_end[mid] = m
+        return m
+
+    def overlapping(self, start: int, end: int) -> List[Entry]:
+        """Entries whose [start, end) intersects the given one."""
+        out: List[Entry] = []
+        stack = [(0, len(self.entries))]
+        while stack:
+            lo, hi = stack.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            if self._max_end[mid] <= start:
+                continue  # everything below ends before the freed slot starts
+            stack.append((lo, mid))
+            if self._starts[mid] < end:
+                if self._ends[mid] > start:
+                    out.append(self.entries[mid])
+                stack.append((mid + 1, hi))
+        return out
+
+
+Key = Tuple[str, date]
+
+
+class _Store:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.days: "OrderedDict[Key, Tuple[float, DayIndex]]" = OrderedDict()
+        self.scopes: Dict[str, str] = {}  # resource_id → scope, as last seen
+        self.version: Optional[int] = None
+
+    def _sync(self) -> None:
+        v = http_cache.versions((_TABLE,))[0]
+        if v != self.version:
+            self.days.clear()
+            self.version = v
+
+    def get(self, key: Key) -> Optional[DayIndex]:
+        hit = self.days.get(key)
+        if hit is None or time.monotonic() - hit[0] > MAX_AGE_SECONDS:
+            return None
+        self.days.move_to_end(key)
+        return hit[1]
+
+    def put(self, key: Key, idx: DayIndex) -> None:
+        self.days[key] = (time.monotonic(), idx)
+        while len(self.days) > MAX_DAYS:
+            self.days.popitem(last=False)
+
+
+_store = _Store()
+
+
+def scope_of(resource) -> str:
+    """The branch a cabinet's waitlist is shared across, or the cabinet
+    itself when it has no branch (never widen unsafely)."""
+    return resource.location_id or f"@{resource.id}"
+
+
+def day_indexes(session: Session, keys: Iterable[Key], resources: Iterable) -> Dict[Key, DayIndex]:
+    """DayIndex of every (scope, day) in `keys`; the missing ones are read
+    with one SELECT. `resources` — every Resource (for scope membership)."""
+    members: Dict[str, List[str]] = {}
+    for r in resources:
+        members.setdefault(scope_of(r), []).append(r.id)
+    keys = set(keys)
+    with _store.lock:
+        _store.scopes.update({rid: scope for scope, rids in members.items() for rid in rids})
+        _store._sync()
+        version = _store.version
+        found = {k: idx for k in keys if (idx := _store.get(k)) is not None}
+    missing = keys - set(found)
+    if not missing:
+        return found
+
+    rids = {rid for scope, _ in missing for rid in members.get(scope, [])}
+    days = {d for _, d in missing}
+    scopes = {rid: scope for scope, rids_ in members.items() for rid in rids_}
+    grouped: Dict[Key, List[Entry]] = {k: [] for k in missing}
+    if rids:
+        rows = session.exec(
+            select(Waitlist).where(
+                Waitlist.resource_id.in_(rids),  # type: ignore[attr-defined]
+                Waitlist.status == "active",
+                Waitlist.date >= datetime.combine(min(days), datetime.min.time()),
+                Waitlist.date < datetime.combine(max(days) + timedelta(days=1), datetime.min.time()),
+            )
+        ).all()
+        for w in rows:
+            bucket = grouped.get((scopes[w.resource_id], w.date.date()))
+            if bucket is not None:
+                bucket.append(Entry.of(w))
+    loaded = {k: DayIndex(v) for k, v in grouped.items()}
+    with _store.lock:
+        # Something committed while we were reading — don't keep what we read.
+        if _store.version == version and http_cache.versions((_TABLE,))[0] == version:
+            for k, idx in loaded.items():
+                _store.put(k, idx)
+    return {**found, **loaded}
+
+
+def clear() -> None:
+    with _store.lock:
+        _store.days.clear()
+
+
+# ── keeping it current ───────────────────────────────────────────────────────
+
+def _note(session, entry_id: UUID, entry: Optional[Entry]) -> None:
+    session.info.setdefault(_CHANGES, {})[entry_id] = entry
+
+
+def note_removed(session, ids: Iterable[UUID]) -> None:
+    """For bulk `update(Waitlist)` statements, which skip mapper events."""
+    for i in ids:
+        _note(session, i, None)
+
+
+@event.listens_for(Waitlist, "after_insert")
+@event.listens_for(Waitlist, "after_update")
+def _waitlist_written(mapper, connection, target) -> None:
+    session = _SASession.object_session(target)
+    if session is not None:
+        _note(session, target.id, Entry.of(target) if target.status == "active" else None)
+
+
+@event.listens_for(Waitlist, "after_delete")
+def _waitlist_deleted(mapper, connection, target) -> None:
+    session = _SASession.object_session(target)
+    if session is not None:
+        _note(session, target.id, None)
+
+
+def _apply(changes: Mapping[UUID, Optional[Entry]]) -> None:
+    touched: Dict[Key, DayIndex] = {}
+    dropped = set()
+    for key, (_, idx) in _store.days.items():
+        if any(e.id in changes for e in idx.entries):
+            touched[key] = idx
+    for entry in changes.values():
+        if entry is None:
+            continue
+        scope = _store.scopes.get(entry.resource_id)
+        if scope is None:
+            # Cabinet we haven't seen yet: forget the whole day instead.
+            dropped.add(entry.date.date())
+            continue
+        key = (scope, entry.date.date())
+        if key in _store.days:
+            touched[key] = _store.days[key][1]
+    for key, idx in touched.items():
+        keep = [e for e in idx.entries if e.id not in changes]
+        keep += [e for e in changes.values()
+                 if e is not None and (_store.scopes.get(e.resource_id), e.date.date()) == key]
+        _store.days[key] = (_store.days[key][0], DayIndex(keep))
+    for key in [k for k in _store.days if k[1] in dropped]:
+        del _store.days[key]
+
+
+@event.listens_for(_SASession, "after_commit")
+def _patch_after_commit(session) -> None:
+    changes = session.info.pop(_CHANGES, None)
+    if not changes:
+        return
+    with _store.lock:
+        v = http_cache.versions((_TABLE,))[0]
+        # core/http_cache bumped the version once for this commit (its
+        # listener runs first). Anything more is somebody else's write.
+        if _store.version is not None and v == _store.version + 1:
+            _apply(changes)
+        else:
+            _store.days.clear()
+        _store.version = v
+
+
+@event.listens_for(_SASession, "after_rollback")
+def _drop_rolled_back(session) -> None:
+    session.info.pop(_CHANGES, None)
@@ -1,22 +1,27 @@
 """Waitlist notifier — when a booking slot frees up, tell everyone waiting.
 
-Called from booking mutations (cancel, reschedule away, toggle re-rent).
-Each call is fire-and-forget: exceptions are logged, never propagated — a
-booking cancellation must succeed even if Telegram is down.
+Called from the outbox handlers of booking mutations (cancel, reschedule
+away, toggle re-rent, whole-series edits). Each call is fire-and-forget:
+exceptions are logged, never propagated — a booking cancellation must
+succeed even if Telegram is down.
 
 Design:
 - An entry matches a freed slot iff:
     (resource_id matches) AND (date = same calendar day) AND
     (waitlist window overlaps the freed window).
+- Candidates come from services/waitlist_index (interval tree per branch
+  and day), not from a per-call scan.
 - Matched entries are marked `fulfilled` so the same user isn't pinged twice
   if the slot gets booked-and-re-cancelled later.
 - Also writes an in-app Notification so users who haven't linked TG still see
   the alert in the web UI next time they log in.
 """
 import logging
-from datetime import datetime, timedelta
-from typing import Optional
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+from uuid import UUID
 
+from sqlalchemy import or_, update
 from sqlmodel import Session, select
 
 from app.models.booking import Booking
@@ -25,7 +30,7 @@ from app.models.notification import Notification
 from app.models.resource import Resource
 from app.models.user import User
 from app.models.waitlist import Waitlist
-from app.services.telegram import telegram_service
+from app.services import outbox, waitlist_index
 
 logger = logging.getLogger(__name__)
 
@@ -47,157 +52,176 @@ def _booking_end_time(booking: Booking) -> str:
 
 
 def notify_waitlist_for_freed_slot(session: Session, booking: Booking) -> int:
-    """Find active waitlist entries covering this slot and notify their users.
+    """One freed slot — see `notify_freed_slots`."""
+    return notify_freed_slots(session, [booking])
+
+
+def notify_freed_slots(session: Session, freed: Sequence[Booking]) -> int:
+    """Find active waitlist entries covering any of these slots and notify
+    their users. Commits. Returns the number of entries marked fulfilled.
+    Never raises.
 
     Matching is **location-scoped**: a subscription on Кабинет 5 in Unbox UNI
     fires when ANY UNI cabinet (5/6/7/8/9, capsules) frees up at the same
     time. Specialists asked for this — they don't actually care which exact
     room opens, they care about the time slot at the branch.
 
-    Each match is committed separately so a mid-loop crash can't leave a
-    user double-notified later (the commit moves the row to `fulfilled`
-    immediately after the TG/in-app side-effects succeed).
-
-    Returns the number of entries marked fulfilled. Never raises.
+    The whole batch (one cancellation, or every occurrence of a cancelled
+    series) costs the same few statements: cabinets, the waitlist days that
+    aren't in services/waitlist_index yet, users, locations, one claiming
+    UPDATE and the notifications. An entry matched by several freed slots
+    is notified once. Entries are claimed with
+    `UPDATE … WHERE status = 'active' RETURNING id` and only what came back
+    is notified, so two workers freeing the same slot can't both ping.
+    Telegram goes out through the outbox (`waitlist.notify`) after commit.
     """
     try:
-        freed_start = _time_to_minutes(booking.start_time)
-        if freed_start < 0 or not booking.duration:
-            return 0
-        freed_end = freed_start + int(booking.duration)
-
-        day_start = booking.date.replace(hour=0, minute=0, second=0, microsecond=0)
-        day_end = day_start + timedelta(days=1)
-
-        # Resolve the freed booking's location once. Waitlist entries are
-        # stored anchored to a specific resource_id — to broaden to the
-        # whole branch we collect every resource in the same location and
-        # match on that set.
-        freed_resource = session.get(Resource, booking.resource_id)
-        freed_location_id = freed_resource.location_id if freed_resource else None
-        if freed_location_id:
-            sibling_resources = session.exec(
-                select(Resource).where(Resource.location_id == freed_location_id)
-            ).all()
-            sibling_ids = [r.id for r in sibling_resources] or [booking.resource_id]
-        else:
-            # Resource has no location (legacy / orphan) — fall back to the
-            # narrower exact-resource match so we never widen unsafely.
-            sibling_ids = [booking.resource_id]
-
-        matches = session.exec(
-            select(Waitlist).where(
-                Waitlist.resource_id.in_(sibling_ids),  # type: ignore[attr-defined]
-                Waitlist.status == "active",
-                Waitlist.date >= day_start,
-                Waitlist.date < day_end,
-            )
-        ).all()
-
-        if not matches:
+        slots = []
+        for b in freed:
+            freed_start = _time_to_minutes(b.start_time)
+            if freed_start < 0 or not b.duration:
+                continue
+            slots.append((b, freed_start, freed_start + int(b.duration)))
+        if not slots:
             return 0
 
-        res_name = (freed_resource.name if freed_resource else booking.resource_id) or booking.resource_id
-        location = session.get(Location, freed_location_id) if freed_location_id else None
-        loc_name = (location.name if location else None) or None
-
-        # Overlap check: waitlist [w_start, w_end) intersects freed [freed_start, freed_end)
-        fulfilled_count = 0
-        for entry in matches:
-            w_start = _time_to_minutes(entry.start_time)
-            w_end = _time_to_minutes(entry.end_time)
-            if w_start < 0 or w_end <= w_start:
-                continue
-            if not (w_start < freed_end and w_end > freed_start):
-                continue
+        resources = {r.id: r for r in session.exec(select(Resource)).all()}
+
+        def scope(rid: str) -> str:
+            r = resources.get(rid)
+            # Unknown cabinet — exact-resource match so we never widen unsafely.
+            return waitlist_index.scope_of(r) if r else f"@{rid}"
+
+        indexes = waitlist_index.day_indexes(
+            session, {(scope(b.resource_id), b.date.date()) for b, _, _ in slots}, resources.values(),
+        )
+        # entry id → (entry, the freed booking it's told about)
+        matched: Dict[UUID, Tuple[waitlist_index.Entry, Booking]] = {}
+        for b, start, end in slots:
+            idx = indexes.get((scope(b.resource_id), b.date.date()))
+            for entry in idx.overlapping(start, end) if idx else ():
+                matched.setdefault(entry.id, (entry, b))
+        if not matched:
+            return 0
 
-            # Resolve the waitlisted user
-            user = _resolve_user(session, entry)
-            if not user:
-                # Orphan entry — clean it up so we don't retry forever
-                entry.status = "cancelled"
-                session.add(entry)
-                try:
-                    session.commit()
-                except Exception:
-                    session.rollback()
-                continue
+        users = _resolve_users(session, [e for e, _ in matched.values()])
+        orphans = [i for i, (e, _) in matched.items() if _user_for(users, e) is None]
+        claimed = _claim(session, [i for i in matched if i not in orphans], "fulfilled")
+        if orphans:
+            # Orphan entries — clean them up so we don't retry forever.
+            _claim(session, orphans, "cancelled")
+        if not claimed:
+            session.commit()
+            return 0
 
-            # 1) Telegram (best-effort)
-            tg_sent = False
-            try:
-                tg_sent = bool(telegram_service.send_slot_available(
-                    chat_id=user.telegram_id or "",
+        loc_ids = {resources[b.resource_id].location_id for _, b in matched.values()
+                   if b.resource_id in resources and resources[b.resource_id].location_id}
+        locations = {
+            loc.id: loc.name for loc in session.exec(
+                select(Location).where(Location.id.in_(loc_ids))  # type: ignore[attr-defined]
+            ).all()
+        } if loc_ids else {}
+
+        notices, alerts, notifs = [], [], []
+        for entry_id in claimed:
+            entry, b = matched[entry_id]
+            user = _user_for(users, entry)
+            res = resources.get(b.resource_id)
+            res_name = (res.name if res else b.resource_id) or b.resource_id
+            loc_name = locations.get(res.location_id) if res and res.location_id else None
+            day_label = b.date.strftime("%d.%m")
+            where_label = f"{loc_name} · {res_name}" if loc_name else res_name
+
+            # 1) Telegram (best-effort, from the outbox).
+            if user.telegram_id:
+                notices.append(dict(
+                    chat_id=user.telegram_id,
                     user_name=user.name,
                     resource_name=res_name,
                     location_name=loc_name,
-                    date=booking.date,
+                    date=b.date,
                     start_time=entry.start_time,
                     end_time=entry.end_time,
                 ))
-            except Exception as e:  # pragma: no cover — defensive
-                logger.warning("[waitlist] TG send failed: %r", e)
-
-            # 1b) If we couldn't reach the user via TG (no chat_id linked),
-            # ping the admin chat so someone can call/text them manually.
-            # Without this fallback the user's only signal is the in-app
-            # toast — easy to miss before the slot is taken again.
-            if not tg_sent and not user.telegram_id:
-                try:
-                    day_label = booking.date.strftime("%d.%m")
-                    where_label = f"{loc_name} · {res_name}" if loc_name else res_name
-                    telegram_service.send_admin_event(
-                        event="waitlist_user_no_tg",
-                        fields={
-                            "Клиент": user.email or user.name or str(user.id),
-                            "Контакт": user.phone or "—",
-                            "Слот": f"{where_label} · {day_label} {entry.start_time}–{entry.end_time}",
-                            "Действие": "Позвоните — TG не привязан, сам не узнает",
-                        },
-                    )
-                except Exception:
-                    logger.warning("[waitlist] admin no-tg alert failed", exc_info=True)
+            else:
+                # 1b) Can't reach the user via TG (no chat_id linked) — ping
+                # the admin chat so someone can call/text them manually.
+                # Without this fallback the user's only signal is the in-app
+                # toast — easy to miss before the slot is taken again.
+                alerts.append({
+                    "Клиент": user.email or user.name or str(user.id),
+                    "Контакт": user.phone or "—",
+                    "Слот": f"{where_label} · {day_label} {entry.start_time}–{entry.end_time}",
+                    "Действие": "Позвоните — TG не привязан, сам не узнает",
+                })
 
             # 2) In-app notification (always, even if TG is linked —
             #    it serves as an audit trail and reaches web-only users).
-            try:
-                day_label = booking.date.strftime("%d.%m")
-                where_label = f"{loc_name} · {res_name}" if loc_name else res_name
-                notif = Notification(
-                    type="slot_freed",
-                    title="Слот освободился!",
-                    description=(
-                        f"{where_label} · {day_label} {entry.start_time}–{entry.end_time} "
-                        "— успейте забронировать."
-                    ),
-                    recipient_id=str(user.id),
-                    icon="Bell",
-                    link="/dashboard/waitlist",
-                )
-                session.add(notif)
-            except Exception as e:
-                logger.warning("[waitlist] in-app notif failed: %r", e)
-
-            # Mark fulfilled — committed per-iteration so a crash mid-loop
-            # can't double-notify (TG already went out, but the row was
-            # not yet flipped from active).
-            entry.status = "fulfilled"
-            session.add(entry)
-            try:
-                session.commit()
-                fulfilled_count += 1
-            except Exception as e:
-                session.rollback()
-                logger.warning("[waitlist] commit failed for entry %s: %r", entry.id, e)
-
-        return fulfilled_count
+            notifs.append(Notification(
+                type="slot_freed",
+                title="Слот освободился!",
+                description=(
+                    f"{where_label} · {day_label} {entry.start_time}–{entry.end_time} "
+                    "— успейте забронировать."
+                ),
+                recipient_id=str(user.id),
+                icon="Bell",
+                link="/dashboard/waitlist",
+            ))
+
+        session.add_all(notifs)
+        outbox.enqueue(session, "waitlist.notify", {"slots": notices, "admin_alerts": alerts},
+                       key=f"waitlist-notify:{min(claimed)}")
+        session.commit()
+        return len(claimed)
 
     except Exception as e:
         # Never break the caller's booking mutation
+        session.rollback()
         logger.error("[waitlist] notify error: %r", e, exc_info=True)
         return 0
 
 
+def _claim(session: Session, ids: List[UUID], status: str) -> List[UUID]:
+    """Move still-active entries to `status`; returns the ids actually moved."""
+    if not ids:
+        return []
+    got = session.execute(
+        update(Waitlist)
+        .where(Waitlist.id.in_(ids), Waitlist.status == "active")  # type: ignore[attr-defined]
+        .values(status=status, updated_at=datetime.now())
+        .returning(Waitlist.id)
+        .execution_options(synchronize_session="fetch")
+    ).scalars().all()
+    waitlist_index.note_removed(session, ids)
+    return sorted(got, key=str)
+
+
+def _resolve_users(session: Session, entries) -> Dict[str, User]:
+    """Users of all `entries` in one SELECT, keyed by str(id) and by email."""
+    uuids = {e.user_uuid for e in entries if e.user_uuid}
+    emails = {e.user_id for e in entries if e.user_id}
+    cond = []
+    if uuids:
+        cond.append(User.id.in_(uuids))  # type: ignore[attr-defined]
+    if emails:
+        cond.append(User.email.in_(emails))  # type: ignore[attr-defined]
+    if not cond:
+        return {}
+    out: Dict[str, User] = {}
+    for u in session.exec(select(User).where(or_(*cond))).all():
+        out[str(u.id)] = u
+        if u.email:
+            out.setdefault(u.email, u)
+    return out
+
+
+def _user_for(users: Dict[str, User], entry) -> Optional[User]:
+    if entry.user_uuid and str(entry.user_uuid) in users:
+        return users[str(entry.user_uuid)]
+    return users.get(entry.user_id) if entry.user_id else None
+
+
 def _resolve_user(session: Session, entry: Waitlist) -> Optional[User]:
     if entry.user_uuid:
         u = session.get(User, entry.user_uuid)
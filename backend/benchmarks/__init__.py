@@ -0,0 +1,13 @@
+"""Reproducible benchmark harness for the booking / pricing / analytics paths.
+
+    cd backend
+    python -m benchmarks.run                       # seed a fresh SQLite db + run
+    python -m benchmarks.run --bookings 20000      # smaller dataset, quicker loop
+    python -m benchmarks.run --db postgresql://localhost/unbox_bench
+    python -m benchmarks.compare benchmarks/results/<old>.json benchmarks/results/<new>.json
+
+`seed` builds a deterministic synthetic dataset (same --seed → same rows),
+`run` times each scenario and writes a JSON file named after the current
+commit, `compare` diffs two such files and exits non-zero on a regression.
+Results and the default SQLite file are git-ignored.
+"""
@@ -0,0 +1,76 @@
+"""Diff two benchmark result files.
+
+    python -m benchmarks.compare OLD.json NEW.json [--threshold 15]
+
+Prints p50/p95 and queries-per-op side by side. Exits 1 when any scenario's
+p50 got slower by more than --threshold percent, or when it now issues more
+SQL statements per operation — the latter is deterministic, so it's flagged
+regardless of timing noise.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Optional
+
+
+def _pct(old: float, new: float) -> float:
+    return (new - old) / old * 100.0 if old else 0.0
+
+
+def compare(old: dict, new: dict, threshold: float) -> tuple[list[str], list[str]]:
+    """Returns (report lines, regressions)."""
+    lines = [
+        f"{'scenario':<20} {'p50 old':>10} {'p50 new':>10} {'Δ%':>7}"
+        f" {'p95 old':>10} {'p95 new':>10} {'q/op old':>9} {'q/op new':>9}"
+    ]
+    regressions = []
+    old_r, new_r = old.get("results", {}), new.get("results", {})
+    for name in sorted(set(old_r) | set(new_r)):
+        a, b = old_r.get(name), new_r.get(name)
+        if not a or not b:
+            lines.append(f"{name:<20} {'(only in ' + ('new' if b else 'old') + ')':>30}")
+            continue
+        delta = _pct(a["p50_ms"], b["p50_ms"])
+        lines.append(
+            f"{name:<20} {a['p50_ms']:>10.2f} {b['p50_ms']:>10.2f} {delta:>+7.1f}"
+            f" {a['p95_ms']:>10.2f} {b['p95_ms']:>10.2f}"
+            f" {a.get('queries_mean') or 0:>9.1f} {b.get('queries_mean') or 0:>9.1f}"
+        )
+        if delta > threshold:
+            regressions.append(f"{name}: p50 {a['p50_ms']:.2f} → {b['p50_ms']:.2f} ms ({delta:+.1f}%)")
+        qa, qb = a.get("queries_mean"), b.get("queries_mean")
+        if qa is not None and qb is not None and qb > qa:
+            regressions.append(f"{name}: {qa} → {qb} queries per op")
+    return lines, regressions
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=15.0,
+                        help="allowed p50 slowdown in percent (default 15)")
+    args = parser.parse_args(argv)
+
+    old = json.loads(Path(args.old).read_text())
+    new = json.loads(Path(args.new).read_text())
+    om, nm = old.get("meta", {}), new.get("meta", {})
+    print(f"old: {om.get('commit')} {om.get('subject', '')}  [{om.get('database')}]")
+    print(f"new: {nm.get('commit')} {nm.get('subject', '')}  [{nm.get('database')}]")
+    if om.get("seed_config") != nm.get("seed_config") or om.get("database") != nm.get("database"):
+        print("warning: different dataset or database — numbers are not directly comparable")
+
+    lines, regressions = compare(old, new, args.threshold)
+    print("\n".join(lines))
+    if regressions:
+        print("\nREGRESSIONS:")
+        print("\n".join(f"  {r}" for r in regressions))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,289 @@
+"""Seed (optionally) and time the hot paths; write the numbers to JSON.
+
+    python -m benchmarks.run [--db URL] [--bookings N] [--reuse] [--only NAME ...]
+
+Scenarios:
+  calculate_price      PricingService.calculate_price for a random specialist/slot
+  check_availability   services.booking.check_availability on a random future slot
+  bookings_public      GET  /bookings/public (chessboard feed, 60-day window)
+  analytics_owner      GET  /analytics/owner (current month)
+  crm_dashboard        GET  /crm/dashboard as a specialist
+  recurring_create     POST /bookings/recurring, 8 weekly occurrences
+
+Each scenario reports latency percentiles, ops/sec and SQL statements per
+operation (core/query_stats), so a regression shows up both as "slower" and
+as "does more queries". HTTP scenarios go through TestClient: the full
+middleware + dependency stack, minus the network.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Optional
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+DEFAULT_DB = f"sqlite:///{Path(__file__).resolve().parent / 'bench.db'}"
+
+SCENARIOS = (
+    "calculate_price", "check_availability", "bookings_public",
+    "analytics_owner", "crm_dashboard", "recurring_create",
+)
+
+
+def _percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[k]
+
+
+def _summarise(latencies_ms: list[float], queries: list[int], wall_s: float) -> dict:
+    lat = sorted(latencies_ms)
+    return {
+        "iterations": len(lat),
+        "ops_per_sec": round(len(lat) / wall_s, 2) if wall_s else 0.0,
+        "mean_ms": round(statistics.fmean(lat), 3),
+        "p50_ms": round(_percentile(lat, 50), 3),
+        "p95_ms": round(_percentile(lat, 95), 3),
+        "p99_ms": round(_percentile(lat, 99), 3),
+        "min_ms": round(lat[0], 3),
+        "max_ms": round(lat[-1], 3),
+        "queries_mean": round(statistics.fmean(queries), 2) if queries else None,
+        "queries_max": max(queries) if queries else None,
+    }
+
+
+def _measure(op: Callable[[int], Optional[int]], iterations: int, warmup: int) -> dict:
+    """`op(i)` runs one operation and returns its statement count (or None
+    to have it counted here via query_stats.track)."""
+    from app.core import query_stats
+
+    for i in range(warmup):
+        op(-1 - i)
+    latencies, queries = [], []
+    wall_start = time.perf_counter()
+    for i in range(iterations):
+        with query_stats.track("bench") as stats:
+            t0 = time.perf_counter()
+            n = op(i)
+            latencies.append((time.perf_counter() - t0) * 1000.0)
+        queries.append(stats.count if n is None else n)
+    return _summarise(latencies, queries, time.perf_counter() - wall_start)
+
+
+def _git_meta() -> dict:
+    def git(*args):
+        try:
+            return subprocess.run(
+                ["git", *args], cwd=BACKEND_DIR, capture_output=True, text=True, timeout=10,
+            ).stdout.strip()
+        except Exception:
+            return ""
+    return {
+        "commit": git("rev-parse", "--short", "HEAD") or "unknown",
+        "subject": git("log", "-1", "--format=%s"),
+        "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+    }
+
+
+class Bench:
+    """Holds the app/session handles shared by the scenarios."""
+
+    def __init__(self, rnd: random.Random):
+        from sqlmodel import Session, select
+        from app.db.session import engine
+        from app.models.resource import Resource
+        from app.models.user import User
+        from benchmarks.seed import ADMIN_EMAIL, OWNER_EMAIL
+
+        self.rnd = rnd
+        self.engine = engine
+        with Session(engine) as s:
+            self.resources = [(r.id, r.location_id) for r in s.exec(select(Resource)).all()]
+            self.specialists = [u.id for u in s.exec(select(User).where(User.role == "specialist")).all()]
+            self.owner_id = s.exec(select(User.id).where(User.email == OWNER_EMAIL)).one()
+            self.admin_id = s.exec(select(User.id).where(User.email == ADMIN_EMAIL)).one()
+        self.today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        self.actor = {"id": self.owner_id}
+
+    def _future_slot(self) -> tuple[str, datetime, str]:
+        res_id, _ = self.rnd.choice(self.resources)
+        day = self.today + timedelta(days=self.rnd.randint(1, 30))
+        return res_id, day, f"{self.rnd.randint(9, 20):02d}:00"
+
+    # ── service-level ──
+
+    def calculate_price(self, i: int):
+        from sqlmodel import Session
+        from app.models.user import User
+        from app.services.pricing import PricingService
+
+        res_id, day, hhmm = self._future_slot()
+        h, m = map(int, hhmm.split(":"))
+        with Session(self.engine) as s:
+            user = s.get(User, self.rnd.choice(self.specialists))
+            PricingService(s).calculate_price(
+                user, res_id, day.replace(hour=h, minute=m), self.rnd.choice([60, 90, 120]),
+            )
+
+    def check_availability(self, i: int):
+        from sqlmodel import Session
+        from app.services.booking import check_availability
+
+        res_id, day, hhmm = self._future_slot()
+        with Session(self.engine) as s:
+            check_availability(s, res_id, day, hhmm, 60)
+
+    # ── HTTP ──
+
+    def http(self, client, method: str, url: str, actor_id=None, **kw):
+        self.actor["id"] = actor_id or self.owner_id
+        resp = client.request(method, url, **kw)
+        if resp.status_code >= 400:
+            raise RuntimeError(f"{method} {url} → {resp.status_code}: {resp.text[:300]}")
+        header = resp.headers.get("X-DB-Queries")
+        return int(header) if header is not None else None
+
+    def scenario(self, name: str, client) -> Callable[[int], Optional[int]]:
+        if name == "calculate_price":
+            return self.calculate_price
+        if name == "check_availability":
+            return self.check_availability
+        if name == "bookings_public":
+            return lambda i: self.http(client, "GET", "/api/v1/bookings/public")
+        if name == "analytics_owner":
+            return lambda i: self.http(client, "GET", "/api/v1/analytics/owner")
+        if name == "crm_dashboard":
+            return lambda i: self.http(
+                client, "GET", "/api/v1/crm/dashboard", actor_id=self.rnd.choice(self.specialists),
+            )
+        if name == "recurring_create":
+            unbox = [r for r in self.resources if not r[1] == "neo_school"]
+            hours = range(8, 22)
+
+            def op(i: int):
+                # Far-future, non-overlapping (resource, hour, week) per call so
+                # every iteration creates the full series instead of 409-ing.
+                k = i + 10_000 if i < 0 else i
+                res_id, loc_id = unbox[k % len(unbox)]
+                hour = hours[(k // len(unbox)) % len(hours)]
+                week = k // (len(unbox) * len(hours))
+                first = self.today + timedelta(days=400 + week * 7 * 8)
+                return self.http(
+                    client, "POST", "/api/v1/bookings/recurring", actor_id=self.admin_id,
+                    json={
+                        "resource_id": res_id, "location_id": loc_id,
+                        "start_time": f"{hour:02d}:00", "duration": 60,
+                        "first_date": first.strftime("%Y-%m-%d"), "occurrences": 8,
+                        "target_user_id": str(self.rnd.choice(self.specialists)),
+                    },
+                )
+            return op
+        raise ValueError(f"unknown scenario {name}")
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=os.environ.get("BENCH_DATABASE_URL", DEFAULT_DB),
+                        help="SQLAlchemy URL (default: benchmarks/bench.db)")
+    parser.add_argument("--reuse", action="store_true",
+                        help="skip seeding if the database already has bookings")
+    parser.add_argument("--bookings", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--specialists", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--iterations", type=int, default=200,
+                        help="iterations per read scenario")
+    parser.add_argument("--write-iterations", type=int, default=20,
+                        help="iterations for recurring_create")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--only", nargs="*", choices=SCENARIOS, help="run a subset")
+    parser.add_argument("--out", help="output file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--verbose", action="store_true", help="keep app/SQL warnings")
+    args = parser.parse_args(argv)
+
+    # The app reads these at import time — set before anything from app/ loads.
+    os.environ["DATABASE_URL"] = args.db
+    os.environ["SQL_STATS_HEADERS"] = "true"
+    os.environ.setdefault("ENVIRONMENT", "development")
+    sys.path.insert(0, str(BACKEND_DIR))
+    if not args.verbose:
+        logging.disable(logging.WARNING)
+
+    from app.db.session import engine
+    from benchmarks.seed import SeedConfig, booking_count, seed
+
+    cfg = SeedConfig(users=args.users, specialists=args.specialists,
+                     bookings=args.bookings, seed=args.seed)
+    if args.reuse and booking_count(engine):
+        print(f"reusing {engine.url.render_as_string(hide_password=True)}")
+        counts = None
+    else:
+        print(f"seeding {engine.url.render_as_string(hide_password=True)} ...")
+        t0 = time.perf_counter()
+        counts = seed(engine, cfg)
+        print(f"  seeded in {time.perf_counter() - t0:.1f}s")
+
+    from fastapi import Depends
+    from fastapi.testclient import TestClient
+    from sqlmodel import Session
+    from app.api import deps
+    from app.core.rate_limit import limiter
+    from app.main import app
+    from app.models.user import User
+
+    bench = Bench(random.Random(args.seed))
+
+    def _bench_user(session: Session = Depends(deps.get_session)):
+        return session.get(User, bench.actor["id"])
+
+    # /bookings/public is limited to 60/min per IP — a benchmark is one IP.
+    limiter.enabled = False
+    results: dict[str, dict] = {}
+    with TestClient(app) as client:
+        app.dependency_overrides[deps.get_current_user] = _bench_user
+        try:
+            for name in args.only or SCENARIOS:
+                n = args.write_iterations if name == "recurring_create" else args.iterations
+                results[name] = _measure(bench.scenario(name, client), n, args.warmup)
+                r = results[name]
+                print(f"  {name:<20} p50 {r['p50_ms']:>9.2f} ms  p95 {r['p95_ms']:>9.2f} ms"
+                      f"  {r['ops_per_sec']:>8.1f} op/s  {r['queries_mean']} q/op")
+        finally:
+            app.dependency_overrides.clear()
+
+    git = _git_meta()
+    payload = {
+        "meta": {
+            **git,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "database": engine.dialect.name,
+            "seed_config": cfg.as_dict(),
+            "seeded": counts,
+            "iterations": args.iterations,
+            "write_iterations": args.write_iterations,
+        },
+        "results": results,
+    }
+    out = Path(args.out) if args.out else RESULTS_DIR / f"{git['commit']}{'-dirty' if git['dirty'] else ''}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(payload, indent=2, ensure_ascii=False))
+    print(f"wrote {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,261 @@
+"""Synthetic dataset for the benchmarks.
+
+Shape follows production rather than the demo seeders: all three centres
+(unbox_one, unbox_uni, neo_school), a long booking history with a thinner
+future tail, specialists running CRM practices, and a year of cashbox
+movements. Rows go in through Core `insert()` in chunks — building 100k ORM
+objects would make seeding slower than the benchmarks themselves.
+
+Everything is derived from one `random.Random(seed)`, so two runs with the
+same parameters produce the same database and their timings are comparable.
+"""
+from __future__ import annotations
+
+import random
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from sqlalchemy import func
+from sqlalchemy.engine import Engine, make_url
+from sqlmodel import Session, SQLModel, select
+
+from app.db.init_data import INITIAL_RESOURCES
+from app.models.booking import Booking
+from app.models.cashbox_transaction import CashboxTransaction
+from app.models.location import Location
+from app.models.resource import Resource
+from app.models.therapist_client import TherapistClient
+from app.models.therapy_session import TherapySession
+from app.models.user import User
+
+_CHUNK = 5000
+
+LOCATIONS = [
+    {"id": "unbox_one", "name": "Unbox One", "address": "Палиашвили 4, Батуми"},
+    {"id": "unbox_uni", "name": "Unbox Uni", "address": "Тбел Абусеридзе 38, Батуми"},
+    {"id": "neo_school", "name": "Neo School", "address": "Сулаберидзе 80, Батуми"},
+]
+
+# neo_school isn't in INITIAL_RESOURCES (it was added by hand on prod); ids
+# match services/resource_windows so the evening/weekend window is exercised.
+NEO_SCHOOL_RESOURCES = [
+    {"id": "neo_school_room_2", "name": "Зал 1", "type": "cabinet", "hourly_rate": 30,
+     "group_rate": 40, "capacity": 35, "location_id": "neo_school", "area": 50,
+     "min_booking_hours": 2, "formats": ["group"]},
+    {"id": "neo_school_room_3", "name": "Зал 2", "type": "cabinet", "hourly_rate": 30,
+     "group_rate": 40, "capacity": 35, "location_id": "neo_school", "area": 50,
+     "min_booking_hours": 2, "formats": ["group"]},
+    {"id": "neo_school_gym_1", "name": "Спортзал", "type": "cabinet", "hourly_rate": 35,
+     "group_rate": 45, "capacity": 40, "location_id": "neo_school", "area": 66,
+     "min_booking_hours": 2, "formats": ["group"]},
+]
+
+# Owner analytics is gated on a fixed email (analytics.PRIVATE_OWNER_EMAILS).
+OWNER_EMAIL = "koren.nikolas@gmail.com"
+ADMIN_EMAIL = "bench-admin@bench.local"
+
+
+@dataclass
+class SeedConfig:
+    users: int = 2000
+    specialists: int = 60
+    bookings: int = 100_000
+    clients_per_specialist: int = 25
+    sessions_per_client: int = 12
+    cashbox_days: int = 365
+    future_share: float = 0.1   # fraction of bookings after "today"
+    seed: int = 42
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+def guard_target(engine: Engine) -> None:
+    """Seeding drops every table. Only allow it on SQLite or on a Postgres
+    database whose name says it's a benchmark one."""
+    url = make_url(str(engine.url))
+    if url.get_backend_name() == "sqlite":
+        return
+    if "bench" not in (url.database or ""):
+        raise SystemExit(
+            f"Refusing to seed {url.render_as_string(hide_password=True)}: the "
+            "benchmark seed drops all tables. Use a database whose name contains "
+            "'bench' (e.g. unbox_bench)."
+        )
+
+
+def booking_count(engine: Engine) -> int:
+    with Session(engine) as session:
+        try:
+            return session.exec(select(func.count()).select_from(Booking)).one()
+        except Exception:
+            return 0
+
+
+def _insert(session: Session, table, rows: list[dict]) -> None:
+    for i in range(0, len(rows), _CHUNK):
+        session.execute(table.insert(), rows[i:i + _CHUNK])
+
+
+def _user_row(email: str, name: str, role: str, now: datetime, **extra) -> dict:
+    row = {
+        "id": uuid4(), "email": email, "name": name, "phone": None, "role": role,
+        "permissions": [], "balance": 0.0, "subscription": None, "tags": [],
+        "additional_contacts": [], "crm_data": {}, "pricing_system": "standard",
+        "personal_discount_percent": 0, "credit_limit": 0.0, "is_admin": False,
+        "hashed_password": "!bench", "created_at": now, "updated_at": now,
+    }
+    row.update(extra)
+    return row
+
+
+def seed(engine: Engine, cfg: SeedConfig, log=print) -> dict:
+    """Drop + recreate the schema and fill it. Returns row counts."""
+    guard_target(engine)
+    rnd = random.Random(cfg.seed)
+    # Fixed anchor at midnight so the "future" tail is always ahead of now.
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    SQLModel.metadata.drop_all(engine)
+    SQLModel.metadata.create_all(engine)
+
+    resources = [dict(r) for r in INITIAL_RESOURCES] + [dict(r) for r in NEO_SCHOOL_RESOURCES]
+    counts: dict[str, int] = {}
+
+    with Session(engine) as session:
+        session.add_all(Location(**loc) for loc in LOCATIONS)
+        session.add_all(Resource(**res) for res in resources)
+
+        # ── users ──
+        users = [
+            _user_row(OWNER_EMAIL, "Bench Owner", "owner", today, is_admin=True),
+            _user_row(ADMIN_EMAIL, "Bench Admin", "admin", today, is_admin=True),
+        ]
+        specialists = []
+        for i in range(cfg.specialists):
+            row = _user_row(
+                f"spec{i}@bench.local", f"Специалист {i}", "specialist", today,
+                balance=round(rnd.uniform(0, 400), 2), credit_limit=100.0,
+                permissions=["psy_crm.access", "psy_crm.clients", "psy_crm.sessions"],
+            )
+            if rnd.random() < 0.3:
+                row["subscription"] = {
+                    "plan_id": "standard_10", "plan_name": "Стандарт 10",
+                    "remaining_hours": float(rnd.randint(1, 10)), "total_hours": 10.0,
+                    "included_formats": ["individual"], "discount_percent": 10,
+                    "is_frozen": False,
+                    "activated_at": (today - timedelta(days=10)).isoformat(),
+                    "expires_at": (today + timedelta(days=20)).isoformat(),
+                }
+            specialists.append(row)
+        clients = [
+            _user_row(f"user{i}@bench.local", f"Клиент {i}", "user", today,
+                      balance=round(rnd.uniform(0, 200), 2))
+            for i in range(max(cfg.users - cfg.specialists - 2, 0))
+        ]
+        users += specialists + clients
+        _insert(session, User.__table__, users)
+        counts["users"] = len(users)
+
+        # ── bookings: hour grid per resource, sampled without overlap ──
+        # Specialists book; clients only appear as the odd legacy row.
+        bookers = specialists * 4 + clients
+        hours = list(range(8, 22))
+        per_day = len(resources) * len(hours)
+        days = max(int(cfg.bookings / (per_day * 0.6)) + 1, 2)
+        future_days = max(int(days * cfg.future_share), 1)
+        slots = rnd.sample(range(days * per_day), min(cfg.bookings, days * per_day))
+        rows = []
+        for slot in slots:
+            day_idx, rest = divmod(slot, per_day)
+            res = resources[rest // len(hours)]
+            hour = hours[rest % len(hours)]
+            user = rnd.choice(bookers)
+            day = today + timedelta(days=day_idx - (days - future_days))
+            duration = 60 if res["location_id"] != "neo_school" else 120
+            is_group = res["location_id"] == "neo_school"
+            rate = res.get("group_rate") if is_group else res["hourly_rate"]
+            price = float(rate) * duration / 60
+            status = "cancelled" if rnd.random() < 0.08 else "confirmed"
+            future = day >= today
+            rows.append({
+                "id": uuid4(), "resource_id": res["id"], "location_id": res["location_id"],
+                "date": day, "start_time": f"{hour:02d}:00", "duration": duration,
+                "status": status, "final_price": price, "base_price": price,
+                "applied_rule": None, "discount_amount": 0.0, "discount_percent": 0,
+                "payment_method": "balance", "payment_source": "deposit",
+                "hours_deducted": None, "format": "group" if is_group else "individual",
+                "extras": [], "is_re_rent_listed": False, "crm_client_id": None,
+                "payment_status": "pending" if future else "paid",
+                "charged_at": None if future else day - timedelta(days=1),
+                "charge_amount": None if future else price,
+                "user_id": user["email"], "user_uuid": user["id"],
+                "created_at": day - timedelta(days=rnd.randint(1, 30)), "updated_at": day,
+                "created_by_id": str(user["id"]), "created_by_name": user["name"],
+            })
+        _insert(session, Booking.__table__, rows)
+        counts["bookings"] = len(rows)
+        log(f"  bookings: {len(rows)} over {days} days ({future_days} ahead)")
+
+        # ── CRM: clients + sessions per specialist ──
+        client_rows, session_rows = [], []
+        for spec in specialists:
+            sid = str(spec["id"])
+            for c in range(cfg.clients_per_specialist):
+                cid = str(uuid4())
+                base_price = float(rnd.choice([60, 80, 100, 120, 150]))
+                client_rows.append({
+                    "id": cid, "specialist_id": sid, "name": f"Клиент {sid[:4]}-{c}",
+                    "phone": None, "email": None, "telegram": None,
+                    "alias_code": f"{sid[:3]}{c:03d}", "base_price": base_price,
+                    "currency": rnd.choice(["GEL", "GEL", "GEL", "USD", "RUB"]),
+                    "default_account": "Cash", "is_active": rnd.random() > 0.1,
+                    "pipeline_status": "ACTIVE", "tags": [], "merged_alias_codes": [],
+                    "notes_text": None, "created_at": today - timedelta(days=200),
+                    "updated_at": today,
+                })
+                for _ in range(cfg.sessions_per_client):
+                    when = today + timedelta(days=rnd.randint(-180, 30), hours=rnd.randint(9, 20))
+                    past = when < today
+                    session_rows.append({
+                        "id": str(uuid4()), "client_id": cid, "specialist_id": sid,
+                        "date": when, "duration_minutes": 60,
+                        "status": rnd.choice(["COMPLETED"] * 8 + ["CANCELLED_CLIENT"]) if past else "PLANNED",
+                        "price": None, "currency": None, "account": None,
+                        "is_paid": past and rnd.random() < 0.85, "is_booked": rnd.random() < 0.5,
+                        "notes": None, "google_event_id": None, "booking_id": None,
+                        "recurring_group_id": None, "created_at": when - timedelta(days=7),
+                        "updated_at": when,
+                    })
+        _insert(session, TherapistClient.__table__, client_rows)
+        _insert(session, TherapySession.__table__, session_rows)
+        counts["crm_clients"] = len(client_rows)
+        counts["crm_sessions"] = len(session_rows)
+
+        # ── cashbox: a handful of movements per branch per day ──
+        admin_id = str(users[1]["id"])
+        cash_rows = []
+        for d in range(cfg.cashbox_days):
+            day = today - timedelta(days=d)
+            for branch in ("unbox_one", "unbox_uni", "neo_school"):
+                for _ in range(rnd.randint(2, 8)):
+                    income = rnd.random() < 0.8
+                    cash_rows.append({
+                        "id": str(uuid4()), "type": "income" if income else "expense",
+                        "amount": round(rnd.uniform(10, 200), 2), "currency": "GEL",
+                        "payment_method": rnd.choice(["cash", "card_tbc", "card_bog"]),
+                        "category_id": None, "description": "bench", "branch": branch,
+                        "date": day + timedelta(hours=rnd.randint(9, 21)),
+                        "client_id": None, "client_name": None,
+                        "admin_id": admin_id, "admin_name": "Bench Admin",
+                        "shift_report_id": None, "created_at": day,
+                        "credited_user_id": None,
+                    })
+        _insert(session, CashboxTransaction.__table__, cash_rows)
+        counts["cashbox_transactions"] = len(cash_rows)
+
+        session.commit()
+
+    log("  " + ", ".join(f"{k}={v}" for k, v in counts.items()))
+    return counts
@@ -28,6 +28,7 @@ def run_migrations():
         ("booking", "crm_client_id", "VARCHAR"),
         ("booking", "gcal_event_id", "VARCHAR"),
         ("booking", "gcal_calendar_id", "VARCHAR"),
+        ("booking", "gcal_sync_failed", "BOOLEAN DEFAULT FALSE"),
         # Owner-аналитика: кто оформил бронь
         ("booking", "created_by_id", "VARCHAR"),
         ("booking", "created_by_name", "VARCHAR"),
@@ -36,8 +36,8 @@ def test_fetch():
         from app.models.user import UserRead
         # 2. Try to access JSON fields to trigger deserialization
         try:
-            print(f"Admin Tasks: {user.admin_tasks}")
-            print(f"Comment History: {user.comment_history}")
+            from app.services import user_history
+            print(f"History: {user_history.latest(session, user.id)}")
             print(f"Subscription: {user.subscription}")
             
             # 3. Validate response model
@@ -10,6 +10,10 @@ subscription_pool.is_active() в движке цен, он и так не даё
 
 Идемпотентно: уже помеченные пропускаются. Остаток часов НЕ обнуляется —
 хранится для истории и для гибкого добора (flexible такой скрипт не трогает).
+
+Кандидатов берём из subscription_pools по индексу (status, expiry_date), а не
+перебором всех пользователей; окончательное решение — всё тот же is_expired()
+по JSON. Стамп в JSON строка пула подхватывает сама (subscription_pool.sync_row).
 """
 from __future__ import annotations
 
@@ -22,6 +26,7 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 from sqlmodel import Session, select  # noqa: E402
 
 from app.db.session import engine  # noqa: E402
+from app.models.subscription_pool import SubscriptionPool  # noqa: E402
 from app.models.user import User  # noqa: E402
 from app.services import subscription_pool  # noqa: E402
 from app.services.timeline import timeline_service  # noqa: E402
@@ -32,7 +37,12 @@ def run(dry_run: bool) -> int:
     completed: list[tuple[str, str]] = []
 
     with Session(engine) as session:
-        users = session.exec(select(User)).all()
+        due = select(SubscriptionPool.user_id).where(
+            SubscriptionPool.status == "active",
+            SubscriptionPool.flexible == False,  # noqa: E712
+            SubscriptionPool.expiry_date < now,  # type: ignore[operator]
+        )
+        users = session.exec(select(User).where(User.id.in_(due))).all()  # type: ignore[union-attr]
         for u in users:
             sub = u.subscription
             if not sub or str(sub) in ("null", "{}"):
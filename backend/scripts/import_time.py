@@ -0,0 +1,116 @@
+"""Сколько стоит `import app.main` — замер через `python -X importtime`.
+
+ТОЛЬКО ЧТЕНИЕ. Запускает чистый интерпретатор, импортирует приложение и
+разбирает отчёт importtime; БД не трогает (DATABASE_URL подменяется на
+временный SQLite, init_db при импорте не вызывается).
+
+  cd /var/www/unbox/backend && venv/bin/python3 scripts/import_time.py
+  venv/bin/python3 scripts/import_time.py --runs 5 --top 15
+  venv/bin/python3 scripts/import_time.py --budget-ms 2500 --json   # для CI/крона
+
+Код возврата: 0 — в бюджете и без запрещённых модулей, 1 — нет.
+
+Зачем. Импорт `app.main` — это каждый рестарт uvicorn при деплое и каждый
+крон-скрипт. Тяжёлые библиотеки (googleapiclient, google.auth, httplib2)
+должны грузиться при первом обращении к Google, а не при старте: кто-то
+добавит `from googleapiclient... import` в шапку модуля — `--forbid` это
+поймает, а медиана по нескольким запускам покажет, во что это обошлось.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# Должны импортироваться лениво — см. services/google_api.
+DEFAULT_FORBID = ("googleapiclient", "google.auth", "google.oauth2", "httplib2", "google_auth_httplib2")
+
+
+def measure(target: str = "app.main") -> list[tuple[str, int, int]]:
+    """Один запуск: [(module, self_us, cumulative_us)] в порядке importtime."""
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'importtime.db')}")
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        cwd=BACKEND, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {target} failed:\n{proc.stderr[-2000:]}")
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cum_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((name.strip(), int(self_us), int(cum_us)))
+    return rows
+
+
+def summarize(runs: list[list[tuple[str, int, int]]], target: str, top: int) -> dict:
+    totals = [next(cum for name, _, cum in rows if name == target) for rows in runs]
+    # Самое тяжёлое по пакетам верхнего уровня (сумма self-времени).
+    by_pkg: dict[str, list[int]] = defaultdict(list)
+    for rows in runs:
+        acc: dict[str, int] = defaultdict(int)
+        for name, self_us, _ in rows:
+            acc[name.split(".")[0]] += self_us
+        for pkg, us in acc.items():
+            by_pkg[pkg].append(us)
+    heaviest = sorted(((statistics.median(v), k) for k, v in by_pkg.items()), reverse=True)[:top]
+    return {
+        "target": target,
+        "runs": len(runs),
+        "median_ms": round(statistics.median(totals) / 1000, 1),
+        "min_ms": round(min(totals) / 1000, 1),
+        "modules": len(runs[0]),
+        "heaviest_packages_ms": {k: round(us / 1000, 1) for us, k in heaviest},
+    }
+
+
+def forbidden(rows: list[tuple[str, int, int]], prefixes=DEFAULT_FORBID) -> list[str]:
+    return sorted({
+        name for name, _, _ in rows
+        if any(name == p or name.startswith(p + ".") for p in prefixes)
+    })
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--target", default="app.main")
+    ap.add_argument("--runs", type=int, default=3)
+    ap.add_argument("--top", type=int, default=10)
+    ap.add_argument("--budget-ms", type=float, default=None,
+                    help="exit 1 if the median import time is above this")
+    ap.add_argument("--forbid", nargs="*", default=list(DEFAULT_FORBID),
+                    help="module prefixes that must not be imported at startup")
+    ap.add_argument("--json", action="store_true")
+    args = ap.parse_args()
+
+    runs = [measure(args.target) for _ in range(max(1, args.runs))]
+    report = summarize(runs, args.target, args.top)
+    report["forbidden_imported"] = forbidden(runs[0], tuple(args.forbid))
+    over = args.budget_ms is not None and report["median_ms"] > args.budget_ms
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print(f"import {args.target}: медиана {report['median_ms']} мс "
+              f"(мин {report['min_ms']} мс, {report['runs']} запуск(а), {report['modules']} модулей)")
+        for pkg, ms in report["heaviest_packages_ms"].items():
+            print(f"  {ms:8.1f} мс  {pkg}")
+        if report["forbidden_imported"]:
+            print("❌ импортируются при старте:", ", ".join(report["forbidden_imported"][:10]))
+        if over:
+            print(f"❌ дольше бюджета {args.budget_ms} мс")
+    return 1 if (over or report["forbidden_imported"]) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
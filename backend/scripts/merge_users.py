@@ -0,0 +1,59 @@
+"""Merge duplicate accounts into one through services/user_merge.
+
+    python scripts/merge_users.py keeper@mail.com dup1@mail.com dup2@mail.com
+    python scripts/merge_users.py keeper@mail.com dup1@mail.com --apply
+
+Accounts by email or UUID. Dry-run by default: prints how many rows of each
+table would move. --apply merges and commits. Replaces the one-off
+merge_olga_malysh.py / merge_tg_placeholder_dups.py for new cases.
+"""
+import argparse
+import sys
+from uuid import UUID
+
+sys.path.insert(0, "/var/www/unbox-beta/backend")
+from sqlmodel import Session, select
+from app.db.session import engine
+from app.models.user import User
+from app.services import user_merge
+
+
+def _find(s: Session, ref: str):
+    try:
+        return s.get(User, UUID(ref))
+    except ValueError:
+        return s.exec(select(User).where(User.email == ref)).first()
+
+
+def main() -> int:
+    p = argparse.ArgumentParser()
+    p.add_argument("keeper")
+    p.add_argument("duplicates", nargs="+")
+    p.add_argument("--apply", action="store_true")
+    args = p.parse_args()
+
+    with Session(engine) as s:
+        keeper = _find(s, args.keeper)
+        dups = [_find(s, r) for r in args.duplicates]
+        missing = [r for r, d in zip([args.keeper] + args.duplicates, [keeper] + dups) if d is None]
+        if missing:
+            print("not found:", ", ".join(missing))
+            return 1
+
+        report = user_merge.merge(s, keeper, dups, dry_run=not args.apply)
+        print(f"keeper: {keeper.email} ({keeper.id})")
+        for d in report["absorbed"]:
+            print(f"  absorb: {d['email']} ({d['id']})")
+        print(f"  balance: {report['balance']:+.2f}")
+        for label, n in sorted(report["rows"].items()):
+            print(f"  {label:<50} {n}")
+        if args.apply:
+            s.commit()
+            print("merged.")
+        else:
+            print("(dry-run — re-run with --apply)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,40 @@
+"""Пересчёт производных таблиц из исходных данных — «лечение».
+
+  cd /var/www/unbox/backend && venv/bin/python3 scripts/rebuild_derived.py [cash_totals] [occupancy] [user_identity]
+
+Без аргументов — все три. При старте init_data их только засевает (seed),
+если таблица пустая; всё, что записано мимо ORM (сырой SQL, ручные правки в
+базе), чинится этим скриптом. Можно запускать на живом сервере: каждый
+rebuild берёт те же блокировки, что и обычный коммит, и пишет upsert'ом,
+а не DELETE всей таблицы.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.db.session import engine  # noqa: E402
+# Через app.models — чтобы ORM-события производных таблиц были подключены.
+import app.models  # noqa: E402,F401
+from app.services import cash_totals, occupancy, user_identity  # noqa: E402
+
+TABLES = {"cash_totals": cash_totals, "occupancy": occupancy, "user_identity": user_identity}
+
+
+def run(names: list[str]) -> int:
+    unknown = [n for n in names if n not in TABLES]
+    if unknown:
+        print(f"неизвестные таблицы: {', '.join(unknown)} (есть: {', '.join(TABLES)})")
+        return 2
+    for name in names or list(TABLES):
+        TABLES[name].rebuild(engine)
+        print(f"{name}: пересчитано")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(run(sys.argv[1:]))
@@ -0,0 +1,56 @@
+"""Shared pytest fixtures.
+
+Test modules stay runnable as plain scripts (`python3 tests/test_x.py`), so
+everything here is optional sugar for pytest runs only.
+"""
+import os
+import sys
+from contextlib import contextmanager
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+class QueryBudget:
+    """Assert an upper bound on SQL statements (see app/core/query_stats).
+
+    In-process code (services, helpers)::
+
+        with max_queries(3):
+            recompute_user_chains_for_day(...)
+
+    HTTP endpoints via TestClient — the request runs on the client's portal
+    thread, so read the count the middleware reports in `X-DB-Queries`::
+
+        max_queries.response(client.get("/api/v1/resources/"), 1)
+    """
+
+    @contextmanager
+    def __call__(self, limit: int):
+        from app.core import query_stats
+
+        with query_stats.track("test") as stats:
+            yield stats
+        assert stats.count <= limit, self._explain(stats.count, limit, stats)
+
+    def response(self, response, limit: int) -> int:
+        assert response.status_code == 200, response.text
+        count = int(response.headers["X-DB-Queries"])
+        assert count <= limit, (
+            f"{response.request.method} {response.request.url.path}: "
+            f"{count} queries, budget {limit}"
+        )
+        return count
+
+    @staticmethod
+    def _explain(count, limit, stats) -> str:
+        top = "\n".join(
+            f"  ×{n}: {' '.join(s.split())[:160]}" for s, n in stats.statements.most_common(5)
+        )
+        return f"{count} queries, budget {limit}\n{top}"
+
+
+@pytest.fixture
+def max_queries() -> QueryBudget:
+    return QueryBudget()
@@ -0,0 +1,75 @@
+"""Async read endpoints (db/session.async_engine) next to the sync ones.
+
+Real JWTs here, no dependency overrides — the point is that
+get_current_user_async authenticates exactly like get_current_user, and that
+rows written through the sync engine are visible to the async routes.
+
+    pytest backend/tests/test_async_routes.py
+"""
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+_TMP_DB = os.path.join(tempfile.mkdtemp(), "async_routes_test.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP_DB}"
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlmodel import Session  # noqa: E402
+
+from app.core.security import create_access_token  # noqa: E402
+from app.db.session import engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models.booking import Booking  # noqa: E402
+from app.models.notification import Notification  # noqa: E402
+from app.models.user import User  # noqa: E402
+
+
+def _auth(user: User) -> dict:
+    return {"Authorization": f"Bearer {create_access_token(str(user.id))}"}
+
+
+def test_async_routes_read_sync_writes_and_authenticate():
+    with TestClient(app) as client:
+        with Session(engine) as s:
+            admin = User(email="async-admin@test.local", name="A", role="admin", hashed_password="x")
+            spec = User(email="async-spec@test.local", name="S", role="specialist", hashed_password="x")
+            s.add(admin)
+            s.add(spec)
+            s.commit()
+            day = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=3)
+            s.add(Booking(
+                resource_id="unbox_one_room_1", location_id="unbox_one", date=day,
+                start_time="12:00", duration=60, final_price=20, payment_method="balance",
+                user_id=spec.email, user_uuid=spec.id,
+            ))
+            s.add(Notification(recipient_id=str(admin.id), type="info", title="t", description="m"))
+            s.commit()
+            s.refresh(admin)
+            s.refresh(spec)
+
+        mine = client.get("/api/v1/bookings/me", headers=_auth(spec))
+        assert mine.status_code == 200, mine.text
+        assert [b["start_time"] for b in mine.json()] == ["12:00"]
+
+        public = client.get("/api/v1/bookings/public")
+        assert public.status_code == 200
+        assert len(public.json()) == 1 and "user_id" not in public.json()[0]
+
+        assert client.get("/api/v1/resources/").json()
+        assert client.get("/api/v1/bookings/me").status_code == 401
+        assert client.get("/api/v1/bookings/me", headers={"Authorization": "Bearer junk"}).status_code == 403
+
+        unread = client.get("/api/v1/notifications/unread-count", headers=_auth(admin))
+        assert unread.json() == {"count": 1}
+        assert client.get("/api/v1/notifications/unread-count", headers=_auth(spec)).status_code == 403
+
+        # A sync route in the same app keeps working alongside.
+        assert client.get("/api/v1/resources/unbox_one_room_1").status_code == 200
+
+
+if __name__ == "__main__":
+    test_async_routes_read_sync_writes_and_authenticate()
+    print("OK")
@@ -0,0 +1,177 @@
+"""Running cashbox balances (services/cash_totals) and the shift close built
+on them: balances follow inserts/edits/deletes (backdated ones included)
+and roll back with the transaction, shift preview/close read them in a
+fixed number of queries, and analytics groups in SQL.
+
+    pytest backend/tests/test_cash_totals.py
+"""
+import os
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+_TMP_DB = os.path.join(tempfile.mkdtemp(), "cash_totals_test.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP_DB}"
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlmodel import Session, func, select  # noqa: E402
+
+from app.api import deps  # noqa: E402
+from app.db.session import engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models.cashbox_transaction import CashboxTransaction  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.services import cash_totals  # noqa: E402
+
+BRANCH = "Тест-филиал"
+
+
+def _naive(session: Session, method: str = "cash", branch=None) -> float:
+    """The old lifetime SUM, as the reference."""
+    def total(kind):
+        q = (select(func.coalesce(func.sum(CashboxTransaction.amount), 0))
+             .where(CashboxTransaction.type == kind, CashboxTransaction.payment_method == method))
+        if branch:
+            q = q.where(CashboxTransaction.branch == branch)
+        return float(session.exec(q).one())
+    return round(total("income") - total("expense"), 2)
+
+
+def _tx(**kw) -> CashboxTransaction:
+    base = dict(type="income", amount=10.0, payment_method="cash", branch=BRANCH,
+                date=datetime.now(), admin_id="t", admin_name="T")
+    base.update(kw)
+    return CashboxTransaction(**base)
+
+
+def _owner() -> User:
+    return User(id="u-cash", email="cash@test", hashed_password="x", name="Касса", role="owner")
+
+
+def test_balances_follow_every_write_and_roll_back():
+    with TestClient(app):
+        with Session(engine) as s:
+            a, b = _tx(amount=120), _tx(type="expense", amount=35.5)
+            old = _tx(amount=40, date=datetime.now() - timedelta(days=90))  # backdated
+            card = _tx(amount=99, payment_method="card_tbc")
+            audit = _tx(type="adjustment", amount=500)  # neutral, like users/admin
+            s.add_all([a, b, old, card, audit])
+            s.commit()
+            assert cash_totals.balance(s, "cash", BRANCH) == _naive(s, "cash", BRANCH) == 124.5
+
+            # Edit amount, move between branches / methods, flip type, delete.
+            a.amount = 150
+            old.branch = None
+            card.payment_method = "cash"
+            b.type = "income"
+            s.add_all([a, old, card, b])
+            s.commit()
+            s.delete(audit)
+            s.commit()
+            for method in ("cash", "card_tbc"):
+                for br in (BRANCH, None):
+                    assert cash_totals.balance(s, method, br) == _naive(s, method, br)
+
+            # Rolled back → balance untouched.
+            before = cash_totals.balance(s, "cash", BRANCH)
+            s.add(_tx(amount=1000))
+            s.flush()
+            assert cash_totals.balance(s, "cash", BRANCH) == before + 1000
+            s.rollback()
+            assert cash_totals.balance(s, "cash", BRANCH) == before
+
+        # A balance written behind the ORM's back: startup's seed leaves a
+        # filled table alone, the explicit rebuild heals it.
+        with engine.begin() as conn:
+            conn.exec_driver_sql("UPDATE cashbox_balances SET total = total + 999")
+        cash_totals.seed(engine)
+        with Session(engine) as s:
+            assert cash_totals.balances(s, BRANCH)["cash"] == _naive(s, "cash", BRANCH) + 999
+        cash_totals.rebuild(engine)
+        with Session(engine) as s:
+            assert cash_totals.balances(s, BRANCH)["cash"] == _naive(s, "cash", BRANCH)
+
+
+def test_shift_preview_and_close_use_fixed_queries(max_queries):
+    with TestClient(app) as client:
+        app.dependency_overrides[deps.get_current_user] = _owner
+        try:
+            with Session(engine) as s:
+                s.add_all([_tx(amount=200), _tx(type="expense", amount=20)])
+                s.commit()
+                expected = _naive(s, "cash", BRANCH)
+
+            r = client.get("/api/v1/cashbox/shifts/preview", params={"branch": BRANCH})
+            max_queries.response(r, 3)  # last close, window, balance
+            assert r.json()["expected"] == expected
+
+            closed = client.post("/api/v1/cashbox/shifts",
+                                 json={"actual_balance": expected - 7, "branch": BRANCH}).json()
+            assert closed["discrepancy"] == -7
+            with Session(engine) as s:
+                assert _naive(s, "cash", BRANCH) == expected - 7
+
+            after = client.get("/api/v1/cashbox/shifts/preview", params={"branch": BRANCH}).json()
+            assert after["expected"] == expected - 7
+            assert after["starting_balance"] == expected - 7 and after["tx_count"] == 0
+
+            bal = client.get("/api/v1/cashbox/balance", params={"branch": BRANCH}).json()
+            assert bal["cash"] == expected - 7
+        finally:
+            app.dependency_overrides.clear()
+
+
+def test_analytics_groups_by_day_and_category():
+    with TestClient(app) as client:
+        app.dependency_overrides[deps.get_current_user] = _owner
+        try:
+            day1 = datetime(2031, 3, 1, 10, 0)
+            day2 = datetime(2031, 3, 2, 18, 30)
+            with Session(engine) as s:
+                s.add_all([
+                    _tx(amount=100, date=day1),
+                    _tx(amount=50, date=day1 + timedelta(hours=5)),
+                    _tx(type="expense", amount=30, date=day1, category_id="cash_reconciliation"),
+                    _tx(type="expense", amount=10, date=day2),
+                    _tx(type="expense", amount=60, date=day2, payment_method="card_bog"),
+                ])
+                s.commit()
+            r = client.get("/api/v1/cashbox/analytics",
+                           params={"date_from": "2031-03-01T00:00:00", "date_to": "2031-03-03T00:00:00"}).json()
+            assert r["daily_data"] == [
+                {"date": "2031-03-01", "income": 150.0, "expense": 30.0},
+                {"date": "2031-03-02", "income": 0.0, "expense": 70.0},
+            ]
+            assert (r["total_income"], r["total_expense"]) == (150.0, 100.0)
+            assert r["category_breakdown"] == [
+                {"category_name": "Без категории", "total": 70.0, "percentage": 70.0},
+                {"category_name": "Расхождение кассы", "total": 30.0, "percentage": 30.0},
+            ]
+        finally:
+            app.dependency_overrides.clear()
+
+
+def test_listeners_register_without_the_service_import():
+    """Cron and scripts only import the model — balances must follow there too."""
+    probe = (
+        "from sqlalchemy import event\n"
+        "from app.models.cashbox_transaction import CashboxTransaction\n"
+        "import sys\n"
+        "cash_totals = sys.modules['app.services.cash_totals']\n"
+        "assert event.contains(CashboxTransaction, 'after_insert', cash_totals._after_insert)\n"
+    )
+    subprocess.run([sys.executable, "-c", probe], check=True,
+                   cwd=os.path.join(os.path.dirname(__file__), ".."))
+
+
+if __name__ == "__main__":
+    from conftest import QueryBudget
+
+    test_balances_follow_every_write_and_roll_back()
+    test_shift_preview_and_close_use_fixed_queries(QueryBudget())
+    test_analytics_groups_by_day_and_category()
+    test_listeners_register_without_the_service_import()
+    print("OK")
@@ -0,0 +1,128 @@
+"""Consecutive-hours recompute (services/consecutive_pricing): one pass over
+several (cabinet, day) pairs gives every chain member the same final_price
+as quoting it on its own, settles the balance once, reads the bookings with
+a single SELECT however many days are touched, and is idempotent.
+
+    pytest backend/tests/test_consecutive_pricing.py
+"""
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+_TMP_DB = os.path.join(tempfile.mkdtemp(), "consecutive_pricing_test.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP_DB}"
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlmodel import Session, select  # noqa: E402
+
+from app.db.session import engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models.booking import Booking  # noqa: E402
+from app.models.resource import Resource  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.services import consecutive_pricing  # noqa: E402
+from app.services.pricing import PricingService  # noqa: E402
+
+DAY = datetime(2031, 3, 4)
+
+
+def _book(s: Session, user: User, res: Resource, day: datetime, start: str, minutes: int = 60) -> Booking:
+    h, m = map(int, start.split(":"))
+    quote = PricingService(s).calculate_price(
+        user=None, resource_id=res.id, start_time=day.replace(hour=h, minute=m), duration_minutes=minutes,
+    )
+    b = Booking(
+        resource_id=res.id, location_id=res.location_id, date=day, start_time=start, duration=minutes,
+        user_uuid=user.id, user_id=user.email, status="confirmed", payment_method="balance",
+        payment_status="paid", base_price=quote.base_price, final_price=quote.final_price,
+        charge_amount=quote.final_price,
+    )
+    s.add(b)
+    return b
+
+
+def _expected(s: Session, user: User, chains: list[list[Booking]]) -> dict:
+    """The old per-booking path: quote each member on its own at its chain's hours."""
+    pricing = PricingService(s)
+    out = {}
+    for chain in chains:
+        hours = sum(b.duration for b in chain) / 60.0
+        for b in chain:
+            h, m = map(int, b.start_time.split(":"))
+            out[b.id] = pricing.calculate_price(
+                user=user, resource_id=b.resource_id, start_time=b.date.replace(hour=h, minute=m),
+                duration_minutes=b.duration, format_type=b.format, consecutive_total_hours=hours,
+            ).final_price
+    return out
+
+
+def test_one_pass_over_several_days_matches_per_booking_quotes(max_queries):
+    with TestClient(app):
+        pass  # schema + seeded cabinets
+    with Session(engine) as s:
+        rooms = [r for r in s.exec(select(Resource).where(Resource.type != "capsule")).all()
+                 if r.location_id != "neo_school" and r.id != "unbox_one_room_2"][:2]
+        user = User(email="chains@test.local", name="Chains", hashed_password="x", balance=500.0)
+        s.add(user)
+        s.flush()
+        day2 = DAY + timedelta(days=1)
+        r1 = [_book(s, user, rooms[0], DAY, t) for t in ("10:00", "11:00", "12:00")]
+        solo = _book(s, user, rooms[0], DAY, "15:00")
+        r2 = [_book(s, user, rooms[1], day2, t, 90) for t in ("10:00", "11:30")]
+        s.commit()
+        ids = [b.id for b in r1 + [solo] + r2]
+        old = {b.id: b.final_price for b in r1 + [solo] + r2}
+        expected = _expected(s, user, [r1, [solo], r2])
+        uid = user.id
+
+    targets = [(rooms[0].id, DAY), (rooms[0].id, DAY.replace(hour=15)), (rooms[1].id, day2)]
+    with Session(engine) as s:
+        user = s.get(User, uid)
+        # 2 reads (bookings, cabinets) + the settle/audit writes, however
+        # many chains and days.
+        with max_queries(8) as stats:
+            summary = consecutive_pricing.recompute_user_chains(s, user, targets, reason="test")
+        booking_reads = [q for q in stats.statements if q.lstrip().upper().startswith("SELECT")
+                         and "FROM booking" in q]
+        assert sum(stats.statements[q] for q in booking_reads) == 1, stats.statements
+        assert summary["chains"] == 3
+
+    with Session(engine) as s:
+        got = {b.id: b.final_price for b in s.exec(select(Booking).where(Booking.id.in_(ids))).all()}
+        assert got == expected
+        assert got[solo.id] == old[solo.id]  # a chain of one keeps its price
+        assert all(got[b.id] < old[b.id] for b in r1 + r2)
+        delta = round(sum(got[i] - old[i] for i in ids), 2)
+        assert summary["total_delta"] == delta
+        assert round(s.get(User, uid).balance, 2) == round(500.0 - delta, 2)
+
+        # Nothing changed since → nothing to do.
+        again = consecutive_pricing.recompute_user_chains(s, s.get(User, uid), targets)
+        assert again["total_delta"] == 0 and not again["details"]
+
+
+def test_single_day_wrapper_still_finds_chains():
+    with TestClient(app):
+        pass
+    with Session(engine) as s:
+        room = s.exec(select(Resource).where(Resource.type != "capsule")).first()
+        user = User(email="chains-day@test.local", name="Day", hashed_password="x")
+        s.add(user)
+        s.flush()
+        day = DAY + timedelta(days=10)
+        pair = [_book(s, user, room, day, t) for t in ("18:00", "19:00")]
+        _book(s, user, room, day + timedelta(days=1), "18:00")  # next day — not part of it
+        s.commit()
+        chains = consecutive_pricing.find_consecutive_chains_for_user_day(s, user.id, room.id, day)
+        assert [[b.id for b in c] for c in chains] == [[b.id for b in pair]]
+
+
+if __name__ == "__main__":
+    from conftest import QueryBudget
+
+    test_one_pass_over_several_days_matches_per_booking_quotes(QueryBudget())
+    test_single_day_wrapper_still_finds_chains()
+    print("OK")
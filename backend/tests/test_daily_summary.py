@@ -0,0 +1,111 @@
+"""Daily Telegram summary (services/daily_summary): same numbers as the old
+row-by-row loop, a fixed number of queries however long the history, and
+a dry run that returns the text without sending.
+
+    pytest backend/tests/test_daily_summary.py
+"""
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+_TMP_DB = os.path.join(tempfile.mkdtemp(), "daily_summary_test.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP_DB}"
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlmodel import Session, select  # noqa: E402
+
+from app.api.v1 import telegram as telegram_api  # noqa: E402
+from app.db.session import engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models.booking import Booking  # noqa: E402
+from app.models.cashbox_transaction import CashboxTransaction  # noqa: E402
+from app.models.resource import Resource  # noqa: E402
+from app.services import daily_summary  # noqa: E402
+
+# 2031-05-10 09:00 Tbilisi → "yesterday" is 2031-05-09 (Tbilisi).
+NOW_UTC = datetime(2031, 5, 10, 5, 0)
+
+
+def _seed(session: Session) -> None:
+    start, end = daily_summary.yesterday_window(NOW_UTC)
+    res = session.exec(select(Resource)).first()
+    for i, (status, price) in enumerate([("confirmed", 40), ("confirmed", 25), ("cancelled", 30)]):
+        session.add(Booking(
+            resource_id=res.id, location_id=res.location_id, date=end + timedelta(days=3),
+            start_time=f"{10 + i}:00", duration=90, final_price=price, payment_method="balance",
+            status=status, user_id="ds@test", created_at=start + timedelta(hours=2 + i),
+        ))
+    # Outside the window — must not count.
+    session.add(Booking(
+        resource_id=res.id, location_id=res.location_id, date=end, start_time="15:00", duration=60,
+        final_price=99, payment_method="balance", user_id="ds@test", created_at=end + timedelta(minutes=5),
+    ))
+
+    def tx(kind, amount, when, method="cash", branch="Unbox One"):
+        session.add(CashboxTransaction(type=kind, amount=amount, payment_method=method, branch=branch,
+                                       date=when, admin_id="t", admin_name="T"))
+    tx("income", 1000, start - timedelta(days=200))            # old history
+    tx("expense", 120, start - timedelta(days=30), "card_tbc")
+    tx("income", 80, start + timedelta(hours=3))                # yesterday
+    tx("income", 50, start + timedelta(hours=4), "card_bog", "Unbox Uni")
+    tx("expense", 15, start + timedelta(hours=5))
+    tx("income", 300, end + timedelta(hours=1))                 # this morning
+    session.commit()
+
+
+def _reference_balances(session: Session, end: datetime) -> dict:
+    """The old all-history loop."""
+    out: dict = {}
+    for t in session.exec(select(CashboxTransaction).where(CashboxTransaction.date < end)).all():
+        sign = 1 if t.type == "income" else -1 if t.type == "expense" else 0
+        out[t.payment_method] = out.get(t.payment_method, 0.0) + sign * float(t.amount)
+    return {k: round(v, 2) for k, v in out.items()}
+
+
+def test_summary_numbers_and_query_count(max_queries):
+    with TestClient(app):
+        with Session(engine) as s:
+            _seed(s)
+            with max_queries(4):
+                summary = daily_summary.build(s, NOW_UTC)
+            assert summary.date_label == "09.05.2031"
+            assert summary.stats == {"bookings": 3, "cancelled": 1, "income": 130.0, "expense": 15.0}
+            assert "Часов брони: <b>3</b> ч" in summary.text
+            assert "наличные: <b>80</b> ₾" in summary.text and "BOG: <b>50</b> ₾" in summary.text
+            assert "Unbox One: <b>80</b> ₾ · Unbox Uni: <b>50</b> ₾" in summary.text
+            _, end = daily_summary.yesterday_window(NOW_UTC)
+            ref = _reference_balances(s, end)
+            got = daily_summary._morning_balances(s, end)
+            # Methods first used after `end` show up as 0 — the old loop omitted them.
+            assert {k: v for k, v in got.items() if k in ref or v} == ref
+            assert set(summary.timings_ms) == {"bookings", "cashbox", "balances", "render"}
+
+
+def test_dry_run_returns_text_and_does_not_send():
+    sent = []
+    orig_send = telegram_api.telegram_service.send_owner_summary
+    telegram_api.telegram_service.send_owner_summary = lambda text, **kw: sent.append(text) or True
+    saved = telegram_api.settings.TELEGRAM_REMINDER_SECRET
+    telegram_api.settings.TELEGRAM_REMINDER_SECRET = "s3cret"
+    try:
+        with TestClient(app) as client:
+            r = client.post("/api/v1/telegram/daily-summary", params={"secret": "s3cret", "dry_run": True}).json()
+            assert r["dry_run"] is True and r["sent"] is False and not sent
+            assert r["text"].startswith("📊 <b>Сводка за") and "render" in r["timings_ms"]
+
+            r = client.post("/api/v1/telegram/daily-summary", params={"secret": "s3cret"}).json()
+            assert r["sent"] is True and sent and "text" not in r
+    finally:
+        telegram_api.telegram_service.send_owner_summary = orig_send
+        telegram_api.settings.TELEGRAM_REMINDER_SECRET = saved
+
+
+if __name__ == "__main__":
+    from conftest import QueryBudget
+
+    test_summary_numbers_and_query_count(QueryBudget())
+    test_dry_run_returns_text_and_does_not_send()
+    print("OK")
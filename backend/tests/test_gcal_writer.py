@@ -0,0 +1,273 @@
+"""Batched Google Calendar writes (services/gcal_writer): ≤50 operations
+per batch request and one chunk per calendar, only throttled/5xx operations
+retried, and the outcome persisted on the booking (`gcal_sync_failed`).
+Google is replaced by an in-memory service speaking the batch interface.
+
+    pytest backend/tests/test_gcal_writer.py
+"""
+import json
+import os
+import sys
+import tempfile
+import threading
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+_TMP_DB = os.path.join(tempfile.mkdtemp(), "gcal_writer_test.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP_DB}"
+
+import httplib2  # noqa: E402
+from googleapiclient.errors import HttpError  # noqa: E402
+from sqlmodel import Session, SQLModel, select  # noqa: E402
+
+import app.models  # noqa: E402,F401 — registers every table on the metadata
+from app.core.config import settings  # noqa: E402
+from app.db.session import engine  # noqa: E402
+from app.models.booking import Booking  # noqa: E402
+from app.services import gcal_writer, outbox_handlers  # noqa: E402
+from app.services.google_calendar import gcal_service  # noqa: E402
+
+SQLModel.metadata.create_all(engine)
+
+
+def _http_error(status: int, reason: str) -> HttpError:
+    body = json.dumps({"error": {"code": status, "errors": [{"reason": reason}]}}).encode()
+    return HttpError(httplib2.Response({"status": status}), body)
+
+
+class _Request:
+    def __init__(self, method, calendar_id, body=None, event_id=None):
+        self.method, self.calendar_id, self.body, self.event_id = method, calendar_id, body, event_id
+
+    @property
+    def key(self):
+        return self.body["start"]["dateTime"] if self.method == "insert" else self.event_id
+
+
+class _Events:
+    def insert(self, calendarId, body):
+        return _Request("insert", calendarId, body=body)
+
+    def update(self, calendarId, eventId, body):
+        return _Request("update", calendarId, body=body, event_id=eventId)
+
+    def delete(self, calendarId, eventId):
+        return _Request("delete", calendarId, event_id=eventId)
+
+
+class _Batch:
+    def __init__(self, service, callback):
+        self.service, self.callback, self.items = service, callback, []
+
+    def add(self, request, request_id=None):
+        self.items.append((request_id, request))
+
+    def execute(self, http=None):
+        svc = self.service
+        with svc.lock:
+            svc.batches.append([(r.calendar_id, r.key) for _, r in self.items])
+            if svc.envelope_failures:
+                svc.envelope_failures -= 1
+                raise _http_error(503, "backendError")
+        for request_id, request in self.items:
+            self.callback(request_id, *svc.answer(request))
+
+
+class FakeCalendar:
+    """Answers like Google: `throttle` keys get one 403 rateLimitExceeded,
+    `reject` keys a permanent 400, deleting a `gone` event a 404. `lost`
+    keys are applied and then answered with a timeout, once. An insert with
+    an id Google already has — live or deleted — is a 409."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.batches: list = []
+        self.answered: list = []
+        self.throttle: set = set()
+        self.reject: set = set()
+        self.gone: set = set()
+        self.deleted: list = []
+        self.lost: set = set()
+        self.events_by_id: dict = {}
+        self.updated: list = []
+        self.envelope_failures = 0
+        self._n = 0
+
+    def events(self):
+        return _Events()
+
+    def new_batch_http_request(self, callback=None):
+        return _Batch(self, callback)
+
+    def answer(self, req):
+        with self.lock:
+            self.answered.append(req.key)
+            if req.key in self.throttle:
+                self.throttle.discard(req.key)
+                return None, _http_error(403, "rateLimitExceeded")
+            if req.key in self.reject:
+                return None, _http_error(400, "badRequest")
+            if req.method == "delete":
+                if req.event_id in self.gone:
+                    return None, _http_error(404, "notFound")
+                self.deleted.append(req.event_id)
+                if req.event_id in self.events_by_id:
+                    self.events_by_id[req.event_id] = dict(self.events_by_id[req.event_id], status="cancelled")
+                return "", None
+            if req.method == "update":
+                self.updated.append(req.event_id)
+                self.events_by_id[req.event_id] = req.body
+                return {"id": req.event_id}, None
+            eid = req.body.get("id")
+            if eid in self.events_by_id:
+                return None, _http_error(409, "duplicate")
+            if eid is None:
+                self._n += 1
+                eid = f"ev-{self._n}"
+            self.events_by_id[eid] = req.body
+            if req.key in self.lost:
+                self.lost.discard(req.key)
+                return None, TimeoutError("The read operation timed out")
+            return {"id": eid}, None
+
+
+class _patched:
+    """Swap in the fake service and a calendar for cabinet 1; no sleeping."""
+
+    def __enter__(self):
+        self.saved = (gcal_service.service, gcal_service.creds, settings.CALENDAR_ID_CABINET_1, gcal_writer._sleep)
+        self.fake = FakeCalendar()
+        self.sleeps: list = []
+        gcal_service.service, gcal_service.creds = self.fake, None
+        settings.CALENDAR_ID_CABINET_1 = "cabinet-1@group.calendar.google.com"
+        gcal_writer._sleep = self.sleeps.append
+        return self
+
+    def __exit__(self, *exc):
+        (gcal_service.service, gcal_service.creds,
+         settings.CALENDAR_ID_CABINET_1, gcal_writer._sleep) = self.saved
+
+
+def _op(calendar_id: str, key: str) -> gcal_writer.Op:
+    return gcal_writer.Op(calendar_id, "insert", body={"start": {"dateTime": key}})
+
+
+def test_chunks_per_calendar_and_retries_only_throttled_ops():
+    with _patched() as p:
+        ops = [_op("cal-a", f"a{i}") for i in range(55)] + [_op("cal-b", f"b{i}") for i in range(5)]
+        p.fake.throttle = {"a3", "a51", "b0"}
+        p.fake.reject = {"a7"}
+        gcal_writer.run(ops)
+
+        # cal-a: 50 + 5, cal-b: 5; then each chunk re-sends only its
+        # throttled operation. Chunks run in parallel — order is free.
+        assert sorted(len(b) for b in p.fake.batches) == [1, 1, 1, 5, 5, 50]
+        assert all(len({cal for cal, _ in b}) == 1 for b in p.fake.batches)
+        assert sorted(b[0][1] for b in p.fake.batches if len(b) == 1) == ["a3", "a51", "b0"]
+        assert len(p.sleeps) == 3
+
+        assert all(op.done and op.event_id for op in ops if op.body["start"]["dateTime"] != "a7")
+        rejected = next(op for op in ops if op.body["start"]["dateTime"] == "a7")
+        assert not rejected.done and gcal_writer._status(rejected.error) == 400
+        assert p.fake.answered.count("a7") == 1  # a 400 is not retried
+
+
+def test_failed_batch_envelope_is_retried_with_backoff():
+    with _patched() as p:
+        p.fake.envelope_failures = 2
+        ops = [_op("cal-a", f"x{i}") for i in range(3)]
+        gcal_writer.run(ops)
+        assert all(op.done for op in ops)
+        assert len(p.fake.batches) == 3 and len(p.sleeps) == 2 and p.sleeps[1] > p.sleeps[0] - 0.5
+
+        p.fake.envelope_failures = gcal_writer._ATTEMPTS
+        ops = [_op("cal-a", "y0")]
+        gcal_writer.run(ops)
+        assert not ops[0].done and gcal_writer._status(ops[0].error) == 503
+
+
+def _bookings(n: int) -> list[str]:
+    with Session(engine) as s:
+        rows = [
+            Booking(resource_id="unbox_one_room_1", date=datetime(2026, 11, 2 + 7 * (i // 3), 0, 0),
+                    start_time=f"{10 + i % 3}:00", duration=60, final_price=30.0,
+                    payment_method="balance", user_id="gcal@test")
+            for i in range(n)
+        ]
+        s.add_all(rows)
+        s.commit()
+        return [str(r.id) for r in rows]
+
+
+def _load(ids: list[str]) -> list[Booking]:
+    from uuid import UUID
+
+    with Session(engine) as s:
+        rows = s.exec(select(Booking).where(Booking.id.in_([UUID(i) for i in ids]))).all()
+        return sorted(rows, key=lambda b: ids.index(str(b.id)))
+
+
+def test_outbox_handlers_persist_sync_status():
+    ids = _bookings(3)
+    with _patched() as p:
+        bad_key = gcal_service.event_body(_load(ids)[1])["start"]["dateTime"]
+        p.fake.reject = {bad_key}
+        try:
+            outbox_handlers.gcal_create_many(ids, "Анна")
+            raise AssertionError("a failed create must ask the outbox for a retry")
+        except RuntimeError:
+            pass
+        rows = _load(ids)
+        assert [bool(b.gcal_event_id) for b in rows] == [True, False, True]
+        assert [b.gcal_sync_failed for b in rows] == [False, True, False]
+        assert len(p.fake.batches) == 1 and len(p.fake.batches[0]) == 3
+
+        # Outbox retry: Google is fine now; only the missing one is sent.
+        p.fake.reject = set()
+        outbox_handlers.gcal_create_many(ids, "Анна")
+        rows = _load(ids)
+        assert all(b.gcal_event_id for b in rows) and not any(b.gcal_sync_failed for b in rows)
+        assert p.fake.batches[-1] == [("cabinet-1@group.calendar.google.com", bad_key)]
+
+        # Series cancel: an event already removed in Google counts as deleted.
+        events = [[b.gcal_event_id, b.resource_id] for b in rows]
+        p.fake.gone = {events[0][0]}
+        outbox_handlers.gcal_delete_many(events)
+        assert sorted(p.fake.deleted) == sorted(e[0] for e in events[1:])
+        assert len(p.fake.batches[-1]) == 3
+
+
+def test_inserts_are_idempotent_after_a_lost_answer():
+    ids = _bookings(2)
+    with _patched() as p:
+        lost_key = gcal_service.event_body(_load(ids)[0])["start"]["dateTime"]
+        p.fake.lost = {lost_key}
+        outbox_handlers.gcal_create_many(ids, "Анна")
+        rows = _load(ids)
+        # The timed-out insert had landed: the retry is a 409, then an update
+        # of the same event — one event per booking, not two.
+        assert [b.gcal_event_id for b in rows] == [gcal_writer.event_id(i) for i in ids]
+        assert sorted(p.fake.events_by_id) == sorted(gcal_writer.event_id(i) for i in ids)
+        assert p.fake.updated == [gcal_writer.event_id(ids[0])]
+
+        # Reschedule: the old event is deleted, the new one reuses the id —
+        # Google refuses the insert and the update brings it back at the new time.
+        with Session(engine) as s:
+            b = s.get(Booking, rows[1].id)
+            old = b.gcal_event_id
+            b.start_time, b.gcal_event_id = "15:00", None
+            s.add(b)
+            s.commit()
+        outbox_handlers.gcal_recreate(ids[1], "Анна", old, "unbox_one_room_1")
+        event = p.fake.events_by_id[gcal_writer.event_id(ids[1])]
+        assert event["status"] == "confirmed" and event["start"]["dateTime"].endswith("T15:00:00")
+        assert _load(ids)[1].gcal_event_id == gcal_writer.event_id(ids[1])
+
+
+if __name__ == "__main__":
+    test_chunks_per_calendar_and_retries_only_throttled_ops()
+    test_failed_batch_envelope_is_retried_with_backoff()
+    test_outbox_handlers_persist_sync_status()
+    test_inserts_are_idempotent_after_a_lost_answer()
+    print("OK")
@@ -0,0 +1,92 @@
+"""Catalogue response cache (core/http_cache): repeat reads skip the DB,
+If-None-Match gets a 304, and any committed write to a declared table —
+ORM flush, bulk UPDATE, or a NOTIFY from another process — invalidates.
+
+    pytest backend/tests/test_http_cache.py
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+_TMP_DB = os.path.join(tempfile.mkdtemp(), "http_cache_test.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP_DB}"
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlmodel import Session, select, update  # noqa: E402
+
+from app.core import http_cache  # noqa: E402
+from app.db.session import engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models.location import Location  # noqa: E402
+from app.models.resource import Resource, ResourceRead  # noqa: E402
+from app.models.team_member import TeamMember  # noqa: E402
+from app.services import realtime  # noqa: E402
+
+
+def _queries(r) -> int:
+    return int(r.headers["X-DB-Queries"])
+
+
+def test_repeat_reads_skip_the_db_and_revalidate_with_304():
+    with TestClient(app) as client:
+        http_cache.clear()
+        first = client.get("/api/v1/resources/")
+        assert first.status_code == 200 and _queries(first) >= 1
+        etag = first.headers["etag"]
+        assert first.headers["cache-control"].startswith("public")
+
+        # Same bytes response_model serialisation would have produced.
+        with Session(engine) as s:
+            rows = s.exec(select(Resource).order_by(Resource.sort_order, Resource.name)).all()
+            assert first.json() == [ResourceRead.model_validate(r).model_dump(mode="json") for r in rows]
+
+        again = client.get("/api/v1/resources/")
+        assert _queries(again) == 0 and again.content == first.content and again.headers["etag"] == etag
+
+        not_modified = client.get("/api/v1/resources/", headers={"If-None-Match": etag})
+        assert not_modified.status_code == 304 and _queries(not_modified) == 0 and not not_modified.content
+
+        # ORM write → rebuilt with the new name, new ETag.
+        with Session(engine) as s:
+            res = s.exec(select(Resource)).first()
+            res.name = "Кабинет после ремонта"
+            s.add(res)
+            s.commit()
+        fresh = client.get("/api/v1/resources/", headers={"If-None-Match": etag})
+        assert fresh.status_code == 200 and _queries(fresh) >= 1
+        assert "Кабинет после ремонта" in fresh.text and fresh.headers["etag"] != etag
+
+
+def test_bulk_update_rollback_and_remote_bump():
+    with TestClient(app) as client:
+        http_cache.clear()
+        with Session(engine) as s:
+            s.add(TeamMember(name="Аня", role="admin", is_active=True))
+            s.commit()
+        assert [m["name"] for m in client.get("/api/v1/team").json()] == ["Аня"]
+
+        # Rolled back — nothing changed, the cache stays warm.
+        with Session(engine) as s:
+            s.exec(update(TeamMember).values(is_active=False))
+            s.rollback()
+        warm = client.get("/api/v1/team")
+        assert _queries(warm) == 0 and len(warm.json()) == 1
+
+        with Session(engine) as s:
+            s.exec(update(TeamMember).values(is_active=False))
+            s.commit()
+        assert client.get("/api/v1/team").json() == []
+
+        client.get("/api/v1/locations/")
+        assert _queries(client.get("/api/v1/locations/")) == 0
+        # What services/realtime does with another worker's NOTIFY.
+        realtime.hub._fanout({"channel": "tables", "data": {"tables": [Location.__tablename__]}})
+        assert _queries(client.get("/api/v1/locations/")) >= 1
+
+
+if __name__ == "__main__":
+    test_repeat_reads_skip_the_db_and_revalidate_with_304()
+    test_bulk_update_rollback_and_remote_bump()
+    print("OK")
@@ -0,0 +1,101 @@
+"""Image upload pipeline (services/images): streamed + hashed upload,
+content-addressed original with WebP variants, dedup of repeat uploads,
+and rejection of non-images / oversize files.
+
+    pytest backend/tests/test_image_upload.py
+"""
+import io
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+_TMP = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMP, 'image_upload_test.db')}"
+
+from fastapi.testclient import TestClient  # noqa: E402
+from PIL import Image  # noqa: E402
+
+from app.api import deps  # noqa: E402
+from app.api.v1 import upload  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.services import images  # noqa: E402
+
+_UPLOADS = os.path.join(_TMP, "uploads")
+
+
+def _png(w: int, h: int) -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", (w, h), (200, 80, 40)).save(buf, "PNG")
+    return buf.getvalue()
+
+
+def _on_disk(url: str) -> str:
+    return os.path.join(_UPLOADS, url.split("?", 1)[0].removeprefix("/uploads/"))
+
+
+def _client() -> TestClient:
+    upload.UPLOAD_DIR = _UPLOADS
+    app.dependency_overrides[deps.get_current_user] = lambda: User(
+        id="u-img", email="img@test", hashed_password="x", name="Img")
+    return TestClient(app)
+
+
+def test_upload_stores_original_and_variants_once():
+    with _client() as client:
+        data = _png(2000, 1000)
+        r = client.post("/api/v1/upload/", files={"file": ("photo.png", data, "image/png")})
+        assert r.status_code == 200, r.text
+        m = r.json()
+        assert m["url"].startswith("/uploads/img/") and m["url"].endswith(".png?w=2000&h=1000")
+        assert (m["width"], m["height"]) == (2000, 1000)
+        with open(_on_disk(m["url"]), "rb") as f:
+            assert f.read() == data
+
+        for name, w in images.VARIANTS.items():
+            with Image.open(_on_disk(m["variants"][name]["webp"])) as v:
+                assert v.format == "WEBP" and max(v.size) == w
+        assert m["srcset"]["webp"].endswith("-1280.webp 1280w")
+        assert "-160.webp 160w" in m["srcset"]["webp"]
+
+        # Same bytes again → same URL, nothing new on disk, no temp leftovers.
+        before = sorted(os.walk(_UPLOADS))
+        again = client.post("/api/v1/upload/", files={"file": ("copy.png", data, "image/png")})
+        assert again.json() == m
+        assert sorted(os.walk(_UPLOADS)) == before
+        assert not [f for f in os.listdir(_UPLOADS) if f.endswith(".upload")]
+
+        # Small image: every width still exists, none upscaled — and the
+        # srcset lists the one distinct variant at its real width.
+        small = client.post("/api/v1/upload/", files={"file": ("s.png", _png(100, 50), "image/png")}).json()
+        with Image.open(_on_disk(small["variants"]["large"]["webp"])) as v:
+            assert v.size == (100, 50)
+        assert small["srcset"]["webp"].endswith("-160.webp 100w") and "," not in small["srcset"]["webp"]
+
+        # Portrait: descriptors are the variants' widths, not their long edges.
+        tall = client.post("/api/v1/upload/", files={"file": ("t.png", _png(900, 1800), "image/png")}).json()
+        assert [part.rsplit(" ", 1)[1] for part in tall["srcset"]["webp"].split(", ")] == ["80w", "320w", "640w"]
+        with Image.open(_on_disk(tall["variants"]["medium"]["webp"])) as v:
+            assert v.size == (320, 640)
+    app.dependency_overrides.clear()
+
+
+def test_non_images_and_oversize_are_rejected():
+    with _client() as client:
+        fake = client.post("/api/v1/upload/", files={"file": ("x.png", b"not really a png", "image/png")})
+        assert fake.status_code == 400
+        wrong_type = client.post("/api/v1/upload/", files={"file": ("x.txt", b"hello", "text/plain")})
+        assert wrong_type.status_code == 400
+        huge = client.post("/api/v1/upload/", files={
+            "file": ("big.png", b"\0" * (upload.IMAGE_MAX_BYTES + 1), "image/png")})
+        assert huge.status_code == 400 and "2 МБ" in huge.json()["detail"]
+        assert not [f for f in os.listdir(_UPLOADS) if f.endswith(".upload")]
+    app.dependency_overrides.clear()
+
+
+if __name__ == "__main__":
+    test_upload_stores_original_and_variants_once()
+    test_non_images_and_oversize_are_rejected()
+    print("OK")
@@ -0,0 +1,56 @@
+"""Startup weight: `import app.main` must not pull in the Google client
+libraries (services/google_api builds clients on first use), and the
+cabinet calendar client is built once however many threads ask at once.
+
+    pytest backend/tests/test_import_time.py
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+_TMP_DB = os.path.join(tempfile.mkdtemp(), "import_time_test.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP_DB}"
+
+import import_time  # noqa: E402
+
+from app.services.google_calendar import GoogleCalendarService  # noqa: E402
+
+
+def test_app_import_skips_google_libraries():
+    rows = import_time.measure("app.main")
+    assert any(name == "app.main" for name, _, _ in rows)
+    assert import_time.forbidden(rows) == []
+    report = import_time.summarize([rows], "app.main", top=5)
+    assert report["median_ms"] > 0 and len(report["heaviest_packages_ms"]) == 5
+
+
+def test_calendar_client_is_built_once_on_first_use():
+    svc = GoogleCalendarService()
+    calls = []
+
+    def slow_auth():
+        calls.append(1)
+        time.sleep(0.05)
+        svc._service = object()
+
+    svc._authenticate = slow_auth
+    assert not calls  # constructing it does nothing
+
+    seen = []
+    threads = [threading.Thread(target=lambda: seen.append(svc.service)) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1 and len(set(map(id, seen))) == 1 and seen[0] is not None
+
+
+if __name__ == "__main__":
+    test_app_import_skips_google_libraries()
+    test_calendar_client_is_built_once_on_first_use()
+    print("OK")
@@ -0,0 +1,107 @@
+"""Admin notification fan-out (services/notification_service): recipients
+come from a cached permission index that follows role/permission changes,
+and the rows go in as a single INSERT that still reaches the SSE stream.
+
+    pytest backend/tests/test_notification_fanout.py
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+_TMP_DB = os.path.join(tempfile.mkdtemp(), "notification_fanout_test.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP_DB}"
+
+from sqlmodel import Session, SQLModel, select  # noqa: E402
+
+from app.core.permissions import has_permission  # noqa: E402
+from app.db.session import engine  # noqa: E402
+from app.models.notification import Notification  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.services import realtime  # noqa: E402
+from app.services.notification_service import notification_service, recipient_index  # noqa: E402
+
+PERM = "admin.accept_requests"
+
+
+def _expected(session: Session, perm: str) -> set[str]:
+    """The old per-event scan, as the reference (the DB may be shared with
+    other test modules' users)."""
+    return {str(u.id) for u in session.exec(select(User)).all()
+            if u.role in ("owner", "senior_admin", "admin") and has_permission(u, perm)}
+
+
+def _seed(session: Session) -> dict:
+    users = {
+        "owner": User(email="fo@test", name="O", hashed_password="x", role="owner"),
+        "senior": User(email="fs@test", name="S", hashed_password="x", role="senior_admin"),
+        "granted": User(email="fg@test", name="G", hashed_password="x", role="admin", permissions=[PERM]),
+        "plain": User(email="fp@test", name="P", hashed_password="x", role="admin"),
+        "client": User(email="fc@test", name="C", hashed_password="x", role="user"),
+    }
+    session.add_all(users.values())
+    session.commit()
+    return {k: str(u.id) for k, u in users.items()}
+
+
+def test_fan_out_is_one_insert_to_the_right_admins(max_queries):
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as s:
+        ids = _seed(s)
+        recipient_index.invalidate()
+
+        with max_queries(2):  # cold: admin list + INSERT
+            first = notification_service.notify_by_permission(s, PERM, "crm_access_request", "Запрос")
+        with max_queries(1):  # warm: the INSERT only
+            notification_service.notify_by_permission(s, PERM, "crm_access_request", "Запрос 2")
+        # Both batches announced for the SSE stream, delivered on commit.
+        pending = s.info[realtime._PENDING]
+        assert {("notification", i) for i in first} <= pending.keys()
+        s.commit()
+
+        got = {n.recipient_id for n in s.exec(select(Notification).where(Notification.title == "Запрос")).all()}
+        assert got == _expected(s, PERM)
+        assert {ids["owner"], ids["senior"], ids["granted"]} <= got
+        assert ids["plain"] not in got and ids["client"] not in got
+
+        owners = notification_service.notify_admins(s, "system", "Только владельцы", min_role="owner")
+        s.commit()
+        assert ids["owner"] in {n.recipient_id for n in s.exec(
+            select(Notification).where(Notification.id.in_(owners))).all()}
+        assert len(owners) == len([u for u in s.exec(select(User)).all() if u.role == "owner"])
+
+
+def test_index_follows_committed_role_and_permission_changes():
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as s:
+        plain = User(email="ip@test", name="IP", hashed_password="x", role="admin")
+        client = User(email="ic@test", name="IC", hashed_password="x", role="user")
+        s.add_all([plain, client])
+        s.commit()
+        assert str(plain.id) not in recipient_index.with_permission(s, PERM)
+
+        # Rolled back grant → index unchanged.
+        plain.permissions = [PERM]
+        s.add(plain)
+        s.flush()
+        s.rollback()
+        assert str(plain.id) not in recipient_index.with_permission(s, PERM)
+
+        plain = s.get(User, plain.id)
+        plain.permissions = [PERM]
+        client = s.get(User, client.id)
+        client.role = "senior_admin"
+        s.add_all([plain, client])
+        s.commit()
+        now = recipient_index.with_permission(s, PERM)
+        assert str(plain.id) in now and str(client.id) in now
+        assert set(now) == _expected(s, PERM)
+
+
+if __name__ == "__main__":
+    from conftest import QueryBudget
+
+    test_fan_out_is_one_insert_to_the_right_admins(QueryBudget())
+    test_index_follows_committed_role_and_permission_changes()
+    print("OK")
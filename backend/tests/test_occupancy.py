@@ -0,0 +1,240 @@
+"""Occupancy bitmaps (services/occupancy): every booking change — insert,
+move, cancel — lands in resource_day_occupancy in the same commit, the
+heatmap respects resource_windows and is a fixed handful of statements for
+any range, and `rebuild` reproduces the same bitmaps from scratch.
+
+    pytest backend/tests/test_occupancy.py
+"""
+import os
+import subprocess
+import sys
+import tempfile
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+_TMP_DB = os.path.join(tempfile.mkdtemp(), "occupancy_test.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP_DB}"
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlmodel import Session, select  # noqa: E402
+
+from app.core import security  # noqa: E402
+from app.db.session import engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models.booking import Booking  # noqa: E402
+from app.models.occupancy import ResourceDayOccupancy  # noqa: E402
+from app.models.outbox import OutboxEvent  # noqa: E402
+from app.models.resource import Resource  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.services import booking as booking_svc, occupancy, series_mutation  # noqa: E402
+
+MONDAY = datetime(2038, 3, 1)
+HALL = "neo_school_room_2"  # open 18–22 on weekdays, 09–21 at weekends
+
+
+def _hall() -> Resource:
+    with Session(engine) as s:
+        r = s.get(Resource, HALL)
+        if r is None:
+            r = Resource(id=HALL, name="Зал 1", type="cabinet", location_id="neo_school",
+                         hourly_rate=40, capacity=20, area=50)
+            s.add(r)
+            s.commit()
+            s.refresh(r)
+        return r
+
+
+def _book(resource_id: str, day: datetime, start: str, duration: int) -> Booking:
+    with Session(engine) as s:
+        b = Booking(resource_id=resource_id, date=day, start_time=start, duration=duration,
+                    final_price=0, payment_method="balance", user_id="occ@test.local")
+        s.add(b)
+        s.commit()
+        s.refresh(b)
+        return b
+
+
+def _mask(resource_id: str, day: datetime) -> int:
+    with Session(engine) as s:
+        row = s.get(ResourceDayOccupancy, (resource_id, day.date()))
+        return row.slots if row else 0
+
+
+def test_bitmaps_follow_booking_changes():
+    with TestClient(app):
+        room = _hall().id
+        b = _book(room, MONDAY, "18:00", 90)
+        assert _mask(room, MONDAY) == occupancy.range_mask(18 * 60, 19 * 60 + 30)
+        # 20:15–21:00 touches two half-hours.
+        _book(room, MONDAY, "20:15", 45)
+        assert _mask(room, MONDAY) == occupancy.range_mask(18 * 60, 19 * 60 + 30) | occupancy.range_mask(20 * 60, 21 * 60)
+
+        # Moving to Tuesday clears Monday's bits and sets Tuesday's.
+        with Session(engine) as s:
+            moved = s.get(Booking, b.id)
+            moved.date = MONDAY + timedelta(days=1)
+            s.add(moved)
+            s.commit()
+        assert _mask(room, MONDAY) == occupancy.range_mask(20 * 60, 21 * 60)
+        assert _mask(room, MONDAY + timedelta(days=1)) == occupancy.range_mask(18 * 60, 19 * 60 + 30)
+
+        # A cancelled booking no longer occupies anything; an empty day has no row.
+        with Session(engine) as s:
+            moved = s.get(Booking, b.id)
+            moved.status = "cancelled"
+            s.add(moved)
+            s.commit()
+            assert s.get(ResourceDayOccupancy, (room, (MONDAY + timedelta(days=1)).date())) is None
+
+
+def test_heatmap_uses_resource_windows(max_queries):
+    with TestClient(app) as client:
+        room = _hall().id
+        saturday = MONDAY + timedelta(days=12)
+        _book(room, saturday, "10:00", 120)
+        week = saturday - timedelta(days=5)  # Mon 2038-03-08
+        with Session(engine) as s:
+            admin = User(email="occ-admin@test.local", name="A", role="admin", hashed_password="x")
+            s.add(admin)
+            s.commit()
+            s.refresh(admin)
+        r = client.get("/api/v1/occupancy/heatmap", headers={
+            "Authorization": f"Bearer {security.create_access_token(admin.id)}",
+        }, params={"date_from": week.strftime("%Y-%m-%d"), "date_to": (week + timedelta(days=6)).strftime("%Y-%m-%d"),
+                   "location_id": "neo_school", "days": True})
+        # Auth + resources + bitmaps, whatever the range.
+        max_queries.response(r, 4)
+        data = r.json()
+        hall = next(x for x in data["resources"] if x["resource_id"] == room)
+        # 5 evenings × 4 h + 2 weekend days × 12 h — not 7 × 13 h.
+        assert hall["available_hours"] == 44
+        assert hall["booked_hours"] == 2 and hall["occupancy_pct"] == round(2 / 44 * 100, 1)
+        assert hall["booked"][20] == 1 and hall["open"][36] == 7 and hall["open"][20] == 2
+        assert data["weekday"]["booked_hours"][5][10] == 1 and data["weekday"]["open_hours"][0][10] == 0
+        assert data["days"] == [{"resource_id": room, "date": saturday.strftime("%Y-%m-%d"),
+                                 "slots": occupancy.range_mask(10 * 60, 12 * 60)}]
+
+    assert occupancy.available_hours("unbox_one_room_1", date(2038, 3, 1), 7) == 7 * 13
+
+
+def test_rebuild_matches_incremental():
+    with TestClient(app):
+        room = _hall().id
+        day = MONDAY + timedelta(days=30)
+        _book(room, day, "18:30", 60)
+        with Session(engine) as s:
+            before = {(r.resource_id, r.day): r.slots for r in s.exec(select(ResourceDayOccupancy)).all()}
+        # Written behind the ORM's back: a wrong mask and a day with no bookings.
+        stray = (day + timedelta(days=2)).date()
+        with engine.begin() as conn:
+            conn.execute(ResourceDayOccupancy.__table__.update().values(slots=1))
+            conn.execute(ResourceDayOccupancy.__table__.insert().values(
+                resource_id=room, day=stray, slots=1, updated_at=datetime.now()))
+        occupancy.seed(engine)  # startup: the table isn't empty, nothing to do
+        with Session(engine) as s:
+            assert s.get(ResourceDayOccupancy, (room, stray)) is not None
+        occupancy.rebuild(engine)
+        with Session(engine) as s:
+            after = {(r.resource_id, r.day): r.slots for r in s.exec(select(ResourceDayOccupancy)).all()}
+        assert after == before and after[(room, day.date())] == occupancy.range_mask(18 * 60 + 30, 19 * 60 + 30)
+
+
+def test_refresh_only_rewrites_noted_days_and_upserts():
+    with TestClient(app):
+        room = _hall().id
+        day = MONDAY + timedelta(days=40)
+        _book(room, day, "18:00", 60)
+        other = (room, (day + timedelta(days=1)).date())
+        with engine.begin() as conn:
+            # A row for a pair outside the noted keys stays as it is, even
+            # though it lies inside the resources × days range.
+            occupancy._write(conn, {other: 1})
+            occupancy.refresh(conn, {(room, day.date())})
+            # A second writer landing on an existing row updates it.
+            occupancy._write(conn, {(room, day.date()): occupancy.range_mask(18 * 60, 19 * 60)})
+        assert _mask(room, day) == occupancy.range_mask(18 * 60, 19 * 60)
+        assert _mask(room, day + timedelta(days=1)) == 1
+
+
+def _spy_locks(calls: list):
+    """Record every slot-lock batch (up front and at commit) as a set of
+    (resource, calendar day)."""
+    real = booking_svc.acquire_slot_locks
+
+    def spy(session, days):
+        days = list(days)
+        calls.append({(rid, occupancy._day(d)) for rid, d in days})
+        return real(session, days)
+    return spy
+
+
+def test_moves_lock_the_commit_keys_up_front():
+    """A move's occupancy refresh locks the old and the new day at commit.
+    Both must already be held from the availability check — a lock first
+    taken at commit is how two opposite moves deadlock."""
+    calls: list = []
+    spy = _spy_locks(calls)
+    real = booking_svc.acquire_slot_locks
+    booking_svc.acquire_slot_locks = occupancy.acquire_slot_locks = spy
+    try:
+        with TestClient(app) as client:
+            room = _hall().id
+            day = MONDAY + timedelta(days=49)  # a Monday
+            b = _book(room, day, "18:00", 60)
+            with Session(engine) as s:
+                admin = User(email="occ-mover@test.local", name="M", role="admin", hashed_password="x")
+                s.add(admin)
+                s.commit()
+                s.refresh(admin)
+            calls.clear()
+            r = client.patch(f"/api/v1/bookings/{b.id}/reschedule", headers={
+                "Authorization": f"Bearer {security.create_access_token(admin.id)}",
+            }, json={"new_date": (day + timedelta(days=1)).strftime("%Y-%m-%d"), "new_start_time": "19:00"})
+            assert r.status_code == 200, r.text
+            up_front, *at_commit = calls
+            assert up_front == {(room, day.date()), (room, (day + timedelta(days=1)).date())}
+            assert at_commit and all(keys <= up_front for keys in at_commit), calls
+
+            # Series propagation: siblings change room, keep their days.
+            siblings = [_book(room, day + timedelta(days=7 * i), "18:00", 60) for i in (1, 2)]
+            calls.clear()
+            with Session(engine) as s:
+                rows = [s.get(Booking, x.id) for x in siblings]
+                plan = series_mutation.plan_reschedule(s, "occ-series", rows, "unbox_one_room_1", "18:30")
+                series_mutation.apply_reschedule(s, plan, rows, s.get(User, admin.id), str(b.id))
+                s.commit()
+                # Not this test's business — and the suite shares one database.
+                for ev in s.exec(select(OutboxEvent).where(OutboxEvent.idempotency_key.contains("occ-series"))):
+                    s.delete(ev)
+                s.commit()
+            up_front, *at_commit = calls
+            assert {(room, x.date.date()) for x in siblings} <= up_front
+            assert at_commit and all(keys <= up_front for keys in at_commit), calls
+    finally:
+        booking_svc.acquire_slot_locks = occupancy.acquire_slot_locks = real
+
+
+def test_listeners_register_without_the_service_import():
+    """Cron and scripts only import the model — bitmaps must follow there too."""
+    probe = (
+        "from sqlalchemy import event\n"
+        "from app.models.booking import Booking\n"
+        "import sys\n"
+        "occupancy = sys.modules['app.services.occupancy']\n"
+        "assert event.contains(Booking, 'after_insert', occupancy._booking_written)\n"
+    )
+    subprocess.run([sys.executable, "-c", probe], check=True,
+                   cwd=os.path.join(os.path.dirname(__file__), ".."))
+
+
+if __name__ == "__main__":
+    from conftest import QueryBudget
+
+    test_bitmaps_follow_booking_changes()
+    test_heatmap_uses_resource_windows(QueryBudget())
+    test_rebuild_matches_incremental()
+    test_refresh_only_rewrites_noted_days_and_upserts()
+    test_moves_lock_the_commit_keys_up_front()
+    test_listeners_register_without_the_service_import()
+    print("OK")
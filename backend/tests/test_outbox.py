@@ -0,0 +1,159 @@
+"""Transactional outbox (services/outbox).
+
+The outbox row must share the fate of the transaction that wrote it, a key
+must run once however many times it's enqueued, and a failing handler must
+back off and finally park as `failed`. The last test checks the real cancel
+route: its side effects land as rows, not as inline calls.
+
+    pytest backend/tests/test_outbox.py
+"""
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+_TMP_DB = os.path.join(tempfile.mkdtemp(), "outbox_test.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP_DB}"
+
+from fastapi import Depends  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlmodel import Session, SQLModel, select  # noqa: E402
+
+import app.models  # noqa: E402,F401 — registers every table on the metadata
+from app.api import deps  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.db.session import engine  # noqa: E402
+from app.models.booking import Booking  # noqa: E402
+from app.models.outbox import OutboxEvent  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.services import outbox  # noqa: E402
+
+SQLModel.metadata.create_all(engine)
+
+_CALLS: list = []
+
+
+@outbox.handler("test.record")
+def _record(p: dict) -> None:
+    _CALLS.append(p)
+
+
+@outbox.handler("test.explode")
+def _explode(p: dict) -> None:
+    raise RuntimeError("boom")
+
+
+def _rows(kind: str) -> list[OutboxEvent]:
+    with Session(engine) as s:
+        return s.exec(select(OutboxEvent).where(OutboxEvent.kind == kind)).all()
+
+
+def test_enqueue_rolls_back_with_the_transaction():
+    with Session(engine) as s:
+        outbox.enqueue(s, "test.record", {"n": 1}, key="rb-1")
+        s.rollback()
+    assert not [r for r in _rows("test.record") if r.idempotency_key == "rb-1"]
+
+
+def test_idempotency_key_dedupes_and_payload_round_trips():
+    when = datetime(2026, 5, 1, 10, 30)
+    with Session(engine) as s:
+        outbox.enqueue(s, "test.record", {"at": when}, key="dup-1")
+        outbox.enqueue(s, "test.record", {"at": when}, key="dup-1")
+        s.commit()
+    with Session(engine) as s:
+        outbox.enqueue(s, "test.record", {"at": when}, key="dup-1")
+        s.commit()
+    assert len([r for r in _rows("test.record") if r.idempotency_key == "dup-1"]) == 1
+
+    _CALLS.clear()
+    outbox.dispatch_pending(engine)
+    assert {"at": when} in _CALLS
+    row = [r for r in _rows("test.record") if r.idempotency_key == "dup-1"][0]
+    assert row.status == "done" and row.attempts == 1 and row.processed_at
+
+
+def test_failing_handler_backs_off_then_fails():
+    with Session(engine) as s:
+        outbox.enqueue(s, "test.explode", key="explode-1")
+        s.commit()
+    outbox.dispatch_pending(engine)
+    row = _rows("test.explode")[0]
+    assert row.status == "pending" and row.attempts == 1
+    assert "boom" in row.last_error
+    assert row.next_attempt_at > datetime.now()
+
+    # Not due yet — nothing is claimed.
+    outbox.dispatch_pending(engine)
+    assert _rows("test.explode")[0].attempts == 1
+
+    with Session(engine) as s:
+        r = s.get(OutboxEvent, row.id)
+        r.attempts = r.max_attempts - 1
+        r.next_attempt_at = datetime.now() - timedelta(seconds=1)
+        s.add(r)
+        s.commit()
+    outbox.dispatch_pending(engine)
+    row = _rows("test.explode")[0]
+    assert row.status == "failed" and row.attempts == row.max_attempts
+
+
+def test_enqueue_unknown_kind_raises():
+    with Session(engine) as s:
+        try:
+            outbox.enqueue(s, "test.nope")
+        except KeyError:
+            return
+    raise AssertionError("unknown kind must be refused at enqueue time")
+
+
+def test_cancel_booking_records_side_effects_in_outbox():
+    from app.main import app
+
+    with Session(engine) as s:
+        owner = User(email="outbox-owner@test.local", name="Owner", role="owner",
+                     hashed_password="x", telegram_id="12345")
+        s.add(owner)
+        s.commit()
+        s.refresh(owner)
+        bk = Booking(
+            resource_id="unbox_one_room_1", location_id="unbox_one",
+            date=datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=5),
+            start_time="12:00", duration=60, final_price=20, payment_method="balance",
+            user_id=owner.email, user_uuid=owner.id, gcal_event_id="ev-1",
+        )
+        s.add(bk)
+        s.commit()
+        s.refresh(bk)
+        owner_id, booking_id = owner.id, bk.id
+
+    def _fake_current_user(session: Session = Depends(deps.get_session)):
+        return session.get(User, owner_id)
+
+    # Rows are asserted as written — keep the worker from racing us to them.
+    enabled, settings.OUTBOX_WORKER_ENABLED = settings.OUTBOX_WORKER_ENABLED, False
+    app.dependency_overrides[deps.get_current_user] = _fake_current_user
+    try:
+        with TestClient(app) as client:
+            res = client.delete(f"/api/v1/bookings/{booking_id}")
+            assert res.status_code == 200, res.text
+    finally:
+        app.dependency_overrides.clear()
+        settings.OUTBOX_WORKER_ENABLED = enabled
+
+    with Session(engine) as s:
+        rows = s.exec(select(OutboxEvent).where(OutboxEvent.idempotency_key.contains(str(booking_id)))).all()
+        kinds = {r.kind for r in rows}
+        assert {"waitlist.freed_slot", "telegram.send_booking_cancelled"} <= kinds, kinds
+        assert s.exec(select(OutboxEvent).where(OutboxEvent.idempotency_key == "gcal-delete:ev-1")).first()
+
+
+if __name__ == "__main__":
+    test_enqueue_rolls_back_with_the_transaction()
+    test_idempotency_key_dedupes_and_payload_round_trips()
+    test_failing_handler_backs_off_then_fails()
+    test_enqueue_unknown_kind_raises()
+    test_cancel_booking_records_side_effects_in_outbox()
+    print("OK")
@@ -0,0 +1,117 @@
+"""Auth principal (core/principal): admin gates answered from the cache with
+no DB work, evicted by a committed role change or a bulk update, archived
+accounts refused; `get_current_user` leaves the JSON blobs unloaded until a
+handler touches them.
+
+    pytest backend/tests/test_principal.py
+"""
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+_TMP_DB = os.path.join(tempfile.mkdtemp(), "principal_test.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP_DB}"
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import inspect  # noqa: E402
+from sqlmodel import Session, update  # noqa: E402
+
+from app.api import deps  # noqa: E402
+from app.core import security  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.core.principal import principals  # noqa: E402
+from app.db.session import engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models.user import User  # noqa: E402
+
+
+def _user(email: str, role: str) -> User:
+    with Session(engine) as s:
+        u = User(email=email, name="Principal", role=role, hashed_password="x",
+                 crm_data={"notes": ["x" * 2000] * 20})
+        s.add(u)
+        s.commit()
+        s.refresh(u)
+        return u
+
+
+def _auth(user: User) -> dict:
+    return {"Authorization": f"Bearer {security.create_access_token(user.id)}"}
+
+
+def _queries(r) -> int:
+    return int(r.headers["X-DB-Queries"])
+
+
+def test_admin_gate_is_served_from_cache_until_the_user_changes():
+    with TestClient(app) as client:
+        admin = _user("principal-admin@test.local", "admin")
+        url, auth = "/api/v1/notifications/", _auth(admin)
+
+        first = client.get(url, headers=auth)
+        assert first.status_code == 200
+        warm = client.get(url, headers=auth)
+        # Only the notifications query — the caller came from the cache.
+        assert warm.status_code == 200 and _queries(warm) == _queries(first) - 1
+
+        # ORM role change → evicted on commit → the next request sees it.
+        with Session(engine) as s:
+            u = s.get(User, admin.id)
+            u.role = "user"
+            s.add(u)
+            s.commit()
+        assert client.get(url, headers=auth).status_code == 403
+
+        # A bulk UPDATE clears the whole cache.
+        client.get(url, headers=auth)
+        with Session(engine) as s:
+            s.exec(update(User).where(User.id == admin.id).values(role="admin"))
+            s.commit()
+        assert client.get(url, headers=auth).status_code == 200
+
+        # Archived: refused by both the principal and the full-user path.
+        with Session(engine) as s:
+            u = s.get(User, admin.id)
+            u.archived_at = datetime.now()
+            s.add(u)
+            s.commit()
+        assert client.get(url, headers=auth).status_code == 403
+        assert client.get("/api/v1/bookings/me", headers=auth).status_code == 403
+
+
+def test_changes_from_elsewhere_are_picked_up_after_the_ttl():
+    admin = _user("principal-ttl@test.local", "admin")
+    with Session(engine) as s:
+        assert principals.load(s, admin.id).role == "admin"
+    # Another process demotes them: no eviction here, only the TTL.
+    with engine.begin() as conn:
+        conn.exec_driver_sql('UPDATE "user" SET role = ? WHERE id = ?', ("user", admin.id.hex))
+    assert principals.get(admin.id).role == "admin"
+    saved = settings.AUTH_PRINCIPAL_TTL_SECONDS
+    settings.AUTH_PRINCIPAL_TTL_SECONDS = 0
+    try:
+        assert principals.get(admin.id) is None
+        with Session(engine) as s:
+            assert principals.load(s, admin.id).role == "user"
+    finally:
+        settings.AUTH_PRINCIPAL_TTL_SECONDS = saved
+
+
+def test_current_user_defers_json_blobs():
+    user = _user("principal-full@test.local", "specialist")
+    with Session(engine) as s:
+        u = deps.get_current_user(s, security.create_access_token(user.id))
+        assert {"crm_data", "subscription", "additional_contacts"} <= inspect(u).unloaded
+        assert "role" not in inspect(u).unloaded
+        # Loaded on first access, in the same session.
+        assert len(u.crm_data["notes"]) == 20
+
+
+if __name__ == "__main__":
+    test_admin_gate_is_served_from_cache_until_the_user_changes()
+    test_changes_from_elsewhere_are_picked_up_after_the_ttl()
+    test_current_user_defers_json_blobs()
+    print("OK")
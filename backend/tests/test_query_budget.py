@@ -0,0 +1,158 @@
+"""Query budgets for the hot read endpoints + the N+1 detector itself.
+
+Every endpoint here is hit on each page load of the SPA; a per-row lookup
+sneaking into one of them turns a 1-query response into a 30-query one. The
+budgets are deliberately tight — the seed has enough rows that any loop over
+them blows straight through.
+
+    pytest backend/tests/test_query_budget.py
+"""
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+_TMP_DB = os.path.join(tempfile.mkdtemp(), "query_budget_test.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP_DB}"
+
+from fastapi import APIRouter, Depends, FastAPI, Request  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlmodel import Session, SQLModel, create_engine, select  # noqa: E402
+
+from app.api import deps  # noqa: E402
+from app.core import query_stats, security  # noqa: E402
+from app.db.session import engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models.booking import Booking  # noqa: E402
+from app.models.resource import Resource  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.models.user_identity import UserIdentity  # noqa: E402
+
+_ACTOR: dict = {}
+
+
+def _fake_current_user(session: Session = Depends(deps.get_session)):
+    return session.get(User, _ACTOR["id"])
+
+
+async def _fake_current_user_async(session=Depends(deps.get_async_session)):
+    return await session.get(User, _ACTOR["id"])
+
+
+def _seed(session: Session) -> User:
+    owner = User(email="budget@test.local", name="Budget", role="owner", hashed_password="x")
+    session.add(owner)
+    session.commit()
+    session.refresh(owner)
+    resources = session.exec(select(Resource)).all()
+    day = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=2)
+    for i in range(30):
+        res = resources[i % len(resources)]
+        session.add(Booking(
+            resource_id=res.id, location_id=res.location_id,
+            date=day + timedelta(days=i % 5), start_time=f"{10 + i % 8:02d}:00",
+            duration=60, final_price=20, payment_method="balance",
+            user_id=owner.email, user_uuid=owner.id,
+        ))
+    session.commit()
+    return owner
+
+
+def test_hot_endpoints_stay_within_budget(max_queries):
+    with TestClient(app) as client:
+        with Session(engine) as session:
+            _ACTOR["id"] = _seed(session).id
+        app.dependency_overrides[deps.get_current_user] = _fake_current_user
+        app.dependency_overrides[deps.get_current_user_async] = _fake_current_user_async
+        try:
+            max_queries.response(client.get("/api/v1/bookings/public"), 1)
+            max_queries.response(client.get("/api/v1/resources/"), 1)
+            max_queries.response(client.get("/api/v1/locations/"), 1)
+            # auth (user row) + prior emails (an index range on user_history)
+            # + the query itself
+            max_queries.response(client.get("/api/v1/bookings/me"), 3)
+            # Real token: the admin gate is a principal (core/principal) — one
+            # narrow SELECT on a miss, then served from the cache.
+            auth = {"Authorization": f"Bearer {security.create_access_token(_ACTOR['id'])}"}
+            max_queries.response(client.get("/api/v1/notifications/unread-count", headers=auth), 2)
+            max_queries.response(client.get("/api/v1/notifications/unread-count", headers=auth), 1)
+        finally:
+            app.dependency_overrides.clear()
+
+
+def test_repeated_statement_is_flagged_as_n_plus_one():
+    eng = create_engine("sqlite://")
+    # user_identity: user commits keep it current (services/user_identity).
+    SQLModel.metadata.create_all(eng, tables=[User.__table__, UserIdentity.__table__])
+    query_stats.install(eng)
+    with Session(eng) as s:
+        users = [User(email=f"u{i}@t", name=f"u{i}", hashed_password="x") for i in range(12)]
+        s.add_all(users)
+        s.commit()
+        ids = [u.id for u in users]
+
+    with Session(eng) as s, query_stats.track("loop") as stats:
+        for uid in ids:
+            s.get(User, uid)
+    assert stats.count == 12
+    flagged = stats.repeated(10)
+    assert len(flagged) == 1 and flagged[0][1:] == (12, 12), flagged
+
+    # Re-reading the same row is not N+1 — one distinct parameter set.
+    with Session(eng) as s, query_stats.track("same") as stats:
+        for _ in range(12):
+            s.exec(select(User).where(User.id == ids[0])).first()
+    assert stats.count == 12
+    assert stats.repeated(10) == []
+
+
+def test_untracked_statements_are_not_counted():
+    eng = create_engine("sqlite://")
+    query_stats.install(eng)
+    query_stats.install(eng)  # idempotent
+    with eng.connect() as conn:
+        conn.exec_driver_sql("SELECT 1")
+    assert query_stats.current() is None
+
+
+def test_route_label_uses_the_route_template():
+    labels = []
+    inner = APIRouter()
+
+    @inner.get("/{item_id}/items")
+    def _item(item_id: str):
+        return {}
+
+    @inner.get("/files/{rest:path}")
+    def _file(rest: str):
+        return {}
+
+    outer = APIRouter()
+    outer.include_router(inner, prefix="/items")
+    probe = FastAPI()
+    probe.include_router(outer, prefix="/api")
+
+    @probe.middleware("http")
+    async def _label(request: Request, call_next):
+        response = await call_next(request)
+        labels.append(query_stats.route_label(request))
+        return response
+
+    with TestClient(probe) as client:
+        # The value is also a literal segment — a text replace would hit that one.
+        client.get("/api/items/items/items")
+        client.get("/api/items/files/a/b")
+        client.get("/api/nowhere/42")
+    assert labels == ["GET /api/items/{item_id}/items", "GET /api/items/files/{rest}", "GET /api/nowhere/42"]
+
+
+if __name__ == "__main__":
+    from conftest import QueryBudget
+
+    test_hot_endpoints_stay_within_budget(QueryBudget())
+    test_repeated_statement_is_flagged_as_n_plus_one()
+    test_untracked_statements_are_not_counted()
+    test_route_label_uses_the_route_template()
+    print("OK")
@@ -0,0 +1,172 @@
+"""Live push (services/realtime): committed booking/notification changes
+reach hub subscribers, rolled-back ones don't, and each connection only sees
+its own notifications. SQLite path — the Postgres LISTEN/NOTIFY transport
+feeds the same `_fanout`.
+
+    pytest backend/tests/test_realtime.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+_TMP_DB = os.path.join(tempfile.mkdtemp(), "realtime_test.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP_DB}"
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlmodel import Session, SQLModel  # noqa: E402
+
+import app.models  # noqa: E402,F401 — registers every table on the metadata
+from app.db.session import engine  # noqa: E402
+from app.models.booking import Booking  # noqa: E402
+from app.models.notification import Notification  # noqa: E402
+from app.services import realtime  # noqa: E402
+from app.services.notification_service import NotificationService  # noqa: E402
+
+SQLModel.metadata.create_all(engine)
+
+_DAY = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=4)
+
+
+def _booking(**kw) -> Booking:
+    return Booking(**{
+        "resource_id": "unbox_one_room_1", "location_id": "unbox_one", "date": _DAY,
+        "start_time": "10:00", "duration": 60, "final_price": 20, "payment_method": "balance",
+        "user_id": "rt@test.local", **kw,
+    })
+
+
+async def _drain(sub, n: int, timeout: float = 2.0) -> list[dict]:
+    out = []
+    for _ in range(n):
+        out.append(await asyncio.wait_for(sub.queue.get(), timeout))
+    return out
+
+
+def _write(fn) -> None:
+    with Session(engine) as s:
+        fn(s)
+
+
+def test_booking_lifecycle_and_notifications_are_pushed():
+    async def scenario():
+        hub = realtime.hub
+        await hub.start()
+        try:
+            everyone = hub.subscribe(realtime.accepts("admin-1"))
+            other_loc = hub.subscribe(realtime.accepts("admin-2", location_id="neo_school"))
+
+            def create(s):
+                b = _booking()
+                s.add(b)
+                NotificationService.create(s, "admin-1", "info", "Новая бронь")
+                s.commit()
+                s.refresh(b)
+                create.booking_id = b.id
+
+            await asyncio.to_thread(_write, create)
+            got = await _drain(everyone, 2)
+            by_channel = {e["channel"]: e["data"] for e in got}
+            assert by_channel["booking"]["action"] == "created"
+            assert by_channel["booking"]["date"] == _DAY.date().isoformat()
+            assert by_channel["notification"]["title"] == "Новая бронь"
+
+            def move(s):
+                b = s.get(Booking, create.booking_id)
+                b.start_time = "14:00"
+                s.add(b)
+                s.commit()
+
+            await asyncio.to_thread(_write, move)
+            (e,) = await _drain(everyone, 1)
+            assert e["data"]["action"] == "rescheduled"
+            assert e["data"]["old"] == {"start_time": "10:00"}
+
+            def cancel_then_roll_back(s):
+                b = s.get(Booking, create.booking_id)
+                b.status = "cancelled"
+                s.add(b)
+                s.flush()
+                s.rollback()
+                s.add(Notification(recipient_id="admin-2", type="info", title="t"))
+                s.commit()
+
+            await asyncio.to_thread(_write, cancel_then_roll_back)
+            # Rolled-back cancel: nothing. admin-2's notification: not ours.
+            assert everyone.queue.empty()
+            (e,) = await _drain(other_loc, 1)
+            assert e["channel"] == "notification" and e["data"]["recipient_id"] == "admin-2"
+
+            def cancel(s):
+                b = s.get(Booking, create.booking_id)
+                b.status = "cancelled"
+                s.add(b)
+                s.commit()
+
+            await asyncio.to_thread(_write, cancel)
+            (e,) = await _drain(everyone, 1)
+            assert e["data"]["action"] == "cancelled"
+            # neo_school subscriber never saw the unbox_one booking.
+            assert other_loc.queue.empty()
+
+            def request(s):
+                b = _booking(start_time="18:00", status="pending_approval")
+                s.add(b)
+                s.commit()
+                request.booking_id = b.id
+
+            def approve(s):
+                b = s.get(Booking, request.booking_id)
+                b.status = "confirmed"
+                s.add(b)
+                s.commit()
+
+            await asyncio.to_thread(_write, request)
+            (e,) = await _drain(everyone, 1)
+            assert e["data"]["action"] == "created" and e["data"]["status"] == "pending_approval"
+            await asyncio.to_thread(_write, approve)
+            (e,) = await _drain(everyone, 1)
+            assert e["data"]["action"] == "approved"
+            hub.unsubscribe(everyone)
+            hub.unsubscribe(other_loc)
+        finally:
+            await hub.stop()
+
+    asyncio.run(scenario())
+
+
+def test_slow_consumer_gets_resync_instead_of_unbounded_queue():
+    async def scenario():
+        hub = realtime.hub
+        await hub.start()
+        try:
+            sub = hub.subscribe(realtime.accepts("x"))
+            for i in range(realtime._QUEUE_SIZE + 5):
+                hub._fanout({"channel": "booking", "data": {"id": str(i)}})
+            first = sub.queue.get_nowait()
+            assert first["channel"] == "resync"
+            assert sub.queue.qsize() < realtime._QUEUE_SIZE
+            assert realtime.format_sse(first) == "event: resync\ndata: {}\n\n"
+            hub.unsubscribe(sub)
+        finally:
+            await hub.stop()
+
+    asyncio.run(scenario())
+
+
+def test_stream_requires_a_valid_token():
+    from app.main import app
+
+    with TestClient(app) as client:
+        assert client.get("/api/v1/events/stream").status_code == 401
+        assert client.get("/api/v1/events/stream", params={"token": "junk"}).status_code == 403
+
+
+if __name__ == "__main__":
+    test_booking_lifecycle_and_notifications_are_pushed()
+    test_slow_consumer_gets_resync_instead_of_unbounded_queue()
+    test_stream_requires_a_valid_token()
+    print("OK")
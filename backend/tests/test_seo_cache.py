@@ -0,0 +1,107 @@
+"""Cached per-post SEO pages (app/seo): meta injected from the parsed
+template, the cache keyed on the post's updated_at and index.html's mtime,
+and conditional requests answered with 304.
+
+    pytest backend/tests/test_seo_cache.py
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+_TMP = tempfile.mkdtemp()
+_TMP_DB = os.path.join(_TMP, "seo_cache_test.db")
+_INDEX = os.path.join(_TMP, "index.html")
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP_DB}"
+os.environ["UNBOX_DIST_INDEX"] = _INDEX
+
+_HTML = """<!doctype html><html><head>
+<title>Unbox</title>
+<meta name="description" content="site" />
+<meta property="og:type" content="website" />
+<meta property="og:title" content="Unbox" />
+<meta property="og:description" content="site" />
+<meta property="og:image" content="https://unbox.com.ge/og-cover.jpg" />
+<meta property="og:url" content="https://unbox.com.ge" />
+<meta name="twitter:title" content="Unbox" />
+<meta name="twitter:description" content="site" />
+<meta name="twitter:image" content="https://unbox.com.ge/og-cover.jpg" />
+</head><body><div id="root"></div><script src="/assets/{bundle}.js"></script></body></html>"""
+
+with open(_INDEX, "w", encoding="utf-8") as f:
+    f.write(_HTML.replace("{bundle}", "a1"))
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlmodel import Session  # noqa: E402
+
+from app import seo  # noqa: E402
+from app.db.session import engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models.post import Post  # noqa: E402
+
+# Another test module may have imported app.seo before our env var was set.
+seo.DIST_INDEX = _INDEX
+
+
+def _add_post() -> Post:
+    with Session(engine) as s:
+        post = Post(type="news", title='Открытие "Uni"', slug="otkrytie-uni",
+                    excerpt="Новый центр", cover_image_url="/uploads/cover.jpg",
+                    is_published=True, updated_at=datetime.utcnow() - timedelta(hours=1))
+        s.add(post)
+        s.commit()
+        s.refresh(post)
+        return post
+
+
+def test_seo_page_is_rendered_cached_and_revalidated():
+    with TestClient(app) as client:
+        post = _add_post()
+
+        r = client.get("/news/otkrytie-uni")
+        assert r.status_code == 200
+        assert "<title>Открытие &quot;Uni&quot; — Unbox</title>" in r.text
+        assert '<meta property="og:image" content="https://unbox.com.ge/uploads/cover.jpg" />' in r.text
+        assert '<meta property="og:url" content="https://unbox.com.ge/news/otkrytie-uni" />' in r.text
+        assert '<meta property="og:type" content="article" />' in r.text
+        assert '<meta name="twitter:description" content="Новый центр" />' in r.text
+        assert "/assets/a1.js" in r.text
+        etag, last_modified = r.headers["etag"], r.headers["last-modified"]
+
+        assert client.get("/news/otkrytie-uni", headers={"If-None-Match": etag}).status_code == 304
+        assert client.get("/news/otkrytie-uni", headers={"If-Modified-Since": last_modified}).status_code == 304
+        assert client.get("/news/otkrytie-uni", headers={"If-None-Match": '"stale"'}).status_code == 200
+
+        # Edit — from "another process": no invalidate(), updated_at moves.
+        with Session(engine) as s:
+            p = s.get(Post, post.id)
+            p.title = "Открытие Uni"
+            p.updated_at = datetime.utcnow()
+            s.add(p)
+            s.commit()
+        r2 = client.get("/news/otkrytie-uni", headers={"If-None-Match": etag})
+        assert r2.status_code == 200 and "<title>Открытие Uni — Unbox</title>" in r2.text
+        assert r2.headers["etag"] != etag
+
+        # New frontend build: same post, new bundle in the page.
+        time.sleep(0.01)
+        with open(_INDEX, "w", encoding="utf-8") as f:
+            f.write(_HTML.replace("{bundle}", "b2"))
+        os.utime(_INDEX, (time.time() + 5, time.time() + 5))
+        r3 = client.get("/news/otkrytie-uni")
+        assert "/assets/b2.js" in r3.text and "Открытие Uni" in r3.text
+
+        # Unpublished / unknown — plain index.html for the SPA to 404.
+        r4 = client.get("/articles/nope")
+        assert r4.status_code == 200 and "<title>Unbox</title>" in r4.text
+
+        seo.invalidate("otkrytie-uni")
+        assert not [k for k in seo._pages if k[1] == "otkrytie-uni"]
+
+
+if __name__ == "__main__":
+    test_seo_page_is_rendered_cached_and_revalidated()
+    print("OK")
@@ -0,0 +1,145 @@
+"""Series creation (services/series_booking): a year of weekly slots is
+checked, priced and inserted in a handful of statements, conflicts still
+come back as the same 409, a multi-slot batch can't overlap itself, and a
+CRM-linked series re-uses the client's existing session instead of adding a
+second one.
+
+    pytest backend/tests/test_series_booking.py
+"""
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+_TMP_DB = os.path.join(tempfile.mkdtemp(), "series_booking_test.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP_DB}"
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlmodel import Session, select  # noqa: E402
+
+from app.core import security  # noqa: E402
+from app.db.session import engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models.booking import Booking  # noqa: E402
+from app.models.outbox import OutboxEvent  # noqa: E402
+from app.models.resource import Resource  # noqa: E402
+from app.models.therapist_client import TherapistClient  # noqa: E402
+from app.models.therapy_session import TherapySession  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.services.crm_calendar import tbilisi_naive_to_utc_naive  # noqa: E402
+from app.services.pricing import PricingService  # noqa: E402
+
+FIRST = datetime(2036, 1, 8)  # a Tuesday, far enough ahead to defer every charge
+
+
+def _user(email: str, **extra) -> User:
+    with Session(engine) as s:
+        u = User(email=email, name=email.split("@")[0], role="specialist", hashed_password="x",
+                 balance=1000.0, **extra)
+        s.add(u)
+        s.commit()
+        s.refresh(u)
+        return u
+
+
+def _auth(user: User) -> dict:
+    return {"Authorization": f"Bearer {security.create_access_token(user.id)}"}
+
+
+def _room() -> Resource:
+    with Session(engine) as s:
+        return next(r for r in s.exec(select(Resource).where(Resource.type != "capsule")).all()
+                    if r.location_id != "neo_school")
+
+
+def test_year_long_series_is_a_few_statements(max_queries):
+    with TestClient(app) as client:
+        user, room = _user("series-52@test.local"), _room()
+        body = {"resource_id": room.id, "location_id": room.location_id, "start_time": "10:00",
+                "duration": 60, "first_date": FIRST.strftime("%Y-%m-%d"), "occurrences": 52}
+        r = client.post("/api/v1/bookings/recurring", json=body, headers=_auth(user))
+        # Auth + anchor lookup + occupancy + cabinet + one INSERT + outbox +
+        # the overload check — not 52 × (lock, day read, chain read, flush).
+        max_queries.response(r, 15)
+        assert r.json()["created"] == 52
+
+        with Session(engine) as s:
+            rows = s.exec(select(Booking).where(Booking.user_uuid == user.id)).all()
+            assert len(rows) == 52 and {b.payment_status for b in rows} == {"pending"}
+            quote = PricingService(s).calculate_price(
+                user=s.get(User, user.id), resource_id=room.id,
+                start_time=FIRST.replace(hour=10), duration_minutes=60,
+            )
+            assert {b.final_price for b in rows} == {quote.final_price}
+
+        # The same series again: every date clashes, nothing is created.
+        r = client.post("/api/v1/bookings/recurring", json={**body, "first_date": "2036-01-15", "occurrences": 3},
+                        headers=_auth(_user("series-other@test.local")))
+        assert r.status_code == 409
+        assert [c["date"] for c in r.json()["detail"]["conflicts"]] == ["2036-01-15", "2036-01-22", "2036-01-29"]
+        assert r.json()["detail"]["conflicts"][0]["reason"].startswith("Слот занят")
+
+
+def test_multi_slot_batch_cannot_overlap_itself():
+    with TestClient(app) as client:
+        user, room = _user("series-multi@test.local"), _room()
+        day = (FIRST + timedelta(days=200)).strftime("%Y-%m-%d")
+        slot = {"resource_id": room.id, "location_id": room.location_id, "date": day, "duration": 60}
+        r = client.post("/api/v1/bookings/multi-slot", headers=_auth(user), json={"slots": [
+            {**slot, "start_time": "12:00"}, {**slot, "start_time": "12:30"},
+        ]})
+        assert r.status_code == 409
+        assert [c["start_time"] for c in r.json()["detail"]["conflicts"]] == ["12:30"]
+
+        # Adjacent slots go through and are priced as one chain.
+        r = client.post("/api/v1/bookings/multi-slot", headers=_auth(user), json={"slots": [
+            {**slot, "start_time": "12:00"}, {**slot, "start_time": "13:00"},
+        ]})
+        assert r.status_code == 200, r.text
+        first, second = r.json()["bookings"]
+        assert second["final_price"] <= first["final_price"]
+        with Session(engine) as s:
+            event = s.exec(select(OutboxEvent).where(OutboxEvent.kind == "gcal.create_many")
+                           .where(OutboxEvent.idempotency_key == f"gcal-create-batch:{r.json()['group_id']}")).first()
+            assert event is not None
+
+
+def test_crm_series_reuses_the_existing_session():
+    with TestClient(app) as client:
+        user, room = _user("series-crm@test.local", crm_data={"calendar_id": "cal@test"}), _room()
+        first = FIRST + timedelta(days=300)
+        with Session(engine) as s:
+            cl = TherapistClient(name="Client", specialist_id=str(user.id), base_price=80)
+            s.add(cl)
+            s.flush()
+            synced = TherapySession(client_id=cl.id, specialist_id=str(user.id), duration_minutes=60,
+                                    date=tbilisi_naive_to_utc_naive(first.replace(hour=9) + timedelta(weeks=1)))
+            s.add(synced)
+            s.commit()
+            client_id, synced_id = cl.id, synced.id
+
+        r = client.post("/api/v1/bookings/recurring", headers=_auth(user), json={
+            "resource_id": room.id, "location_id": room.location_id, "start_time": "09:00", "duration": 60,
+            "first_date": first.strftime("%Y-%m-%d"), "occurrences": 4, "crm_client_id": client_id,
+        })
+        assert r.status_code == 200, r.text
+
+        with Session(engine) as s:
+            sessions = s.exec(select(TherapySession).where(TherapySession.client_id == client_id)).all()
+            assert len(sessions) == 4
+            assert {ts.booking_id for ts in sessions} == set(r.json()["booking_ids"])
+            reused = s.get(TherapySession, synced_id)
+            assert reused.is_booked and reused.price == 80
+            queued = s.exec(select(OutboxEvent).where(OutboxEvent.kind == "crm.gcal_create_sessions")).all()
+            assert len(queued) == 1
+
+
+if __name__ == "__main__":
+    from conftest import QueryBudget
+
+    test_year_long_series_is_a_few_statements(QueryBudget())
+    test_multi_slot_batch_cannot_overlap_itself()
+    test_crm_series_reuses_the_existing_session()
+    print("OK")
@@ -0,0 +1,170 @@
+"""Series edits (services/series_mutation): cancel, extend and "this and
+following" reschedule are planned in memory — `?dry_run=true` shows the
+plan and writes nothing — and applied in one transaction whose statement
+count doesn't grow with the series, with one outbox event per side effect.
+
+    pytest backend/tests/test_series_mutation.py
+"""
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from uuid import UUID
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+_TMP_DB = os.path.join(tempfile.mkdtemp(), "series_mutation_test.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP_DB}"
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlmodel import Session, select  # noqa: E402
+
+from app.core import security  # noqa: E402
+from app.db.session import engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models.booking import Booking  # noqa: E402
+from app.models.outbox import OutboxEvent  # noqa: E402
+from app.models.resource import Resource  # noqa: E402
+from app.models.user import User  # noqa: E402
+
+FIRST = datetime(2037, 2, 3)
+
+
+def _user(email: str) -> User:
+    with Session(engine) as s:
+        u = User(email=email, name=email.split("@")[0], role="specialist", hashed_password="x", balance=500.0)
+        s.add(u)
+        s.commit()
+        s.refresh(u)
+        return u
+
+
+def _auth(user: User) -> dict:
+    return {"Authorization": f"Bearer {security.create_access_token(user.id)}"}
+
+
+def _rooms() -> list[Resource]:
+    with Session(engine) as s:
+        return [r for r in s.exec(select(Resource).where(Resource.type != "capsule")).all()
+                if r.location_id != "neo_school"][:2]
+
+
+def _series(client, user: User, room: Resource, first: datetime, n: int, start: str = "10:00") -> dict:
+    r = client.post("/api/v1/bookings/recurring", headers=_auth(user), json={
+        "resource_id": room.id, "location_id": room.location_id, "start_time": start, "duration": 60,
+        "first_date": first.strftime("%Y-%m-%d"), "occurrences": n,
+    })
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def _events(kind: str) -> list[OutboxEvent]:
+    with Session(engine) as s:
+        return s.exec(select(OutboxEvent).where(OutboxEvent.kind == kind)).all()
+
+
+def test_cancel_preview_then_apply(max_queries):
+    with TestClient(app) as client:
+        user, room = _user("mut-cancel@test.local"), _rooms()[0]
+        group = _series(client, user, room, FIRST, 20)["recurring_group_id"]
+        # Three occurrences were already charged: they come back as money.
+        with Session(engine) as s:
+            paid = s.exec(select(Booking).where(Booking.recurring_group_id == group)
+                          .order_by(Booking.date).limit(3)).all()
+            for b in paid:
+                b.payment_status, b.gcal_event_id = "paid", f"ev-{b.id.hex[:8]}"
+                s.add(b)
+            s.commit()
+            expected = round(sum(b.final_price for b in paid), 2)
+
+        url = f"/api/v1/bookings/recurring/{group}"
+        preview = client.delete(url, params={"dry_run": True}, headers=_auth(user)).json()["plan"]
+        assert preview["counts"] == {"cancel": 20} and preview["refund_amount"] == expected
+        with Session(engine) as s:
+            assert s.get(User, user.id).balance == 500.0
+            assert {b.status for b in s.exec(select(Booking).where(Booking.recurring_group_id == group))} == {"confirmed"}
+
+        r = client.delete(url, headers=_auth(user))
+        count = max_queries.response(r, 30)
+        assert r.json()["cancelled"] == 20
+
+        with Session(engine) as s:
+            assert round(s.get(User, user.id).balance, 2) == round(500.0 + expected, 2)
+            assert {b.status for b in s.exec(select(Booking).where(Booking.recurring_group_id == group))} == {"cancelled"}
+        assert len(_events("gcal.delete_many")) == 1
+        assert len(_events("gcal.delete_many")[0].payload["events"]) == 3
+        assert len(_events("waitlist.freed_slots")[0].payload["slots"]) == 20
+
+        # Twice the occurrences, same statements.
+        group = _series(client, user, room, FIRST + timedelta(days=1), 40)["recurring_group_id"]
+        max_queries.response(client.delete(f"/api/v1/bookings/recurring/{group}", headers=_auth(user)), count)
+
+
+def test_extend_dry_run_reports_conflicts():
+    with TestClient(app) as client:
+        user, other, room = _user("mut-extend@test.local"), _user("mut-extend-other@test.local"), _rooms()[0]
+        first = FIRST + timedelta(days=2)
+        group = _series(client, user, room, first, 2)["recurring_group_id"]
+        _series(client, other, room, first + timedelta(weeks=3), 1)  # takes the 2nd new week
+
+        url = f"/api/v1/bookings/recurring/{group}/extend"
+        r = client.post(url, params={"dry_run": True}, json={"add_occurrences": 3}, headers=_auth(user))
+        plan = r.json()["plan"]
+        assert [s["action"] for s in plan["steps"]] == ["create", "conflict", "create"]
+        assert plan["steps"][1]["reason"].startswith("Слот занят")
+
+        r = client.post(url, json={"add_occurrences": 3}, headers=_auth(user))
+        assert r.status_code == 409 and len(r.json()["detail"]["conflicts"]) == 1
+
+        r = client.post(url, json={"add_occurrences": 1}, headers=_auth(user))
+        assert r.status_code == 200 and r.json()["created"] == 1
+        with Session(engine) as s:
+            assert len(s.exec(select(Booking).where(Booking.recurring_group_id == group)).all()) == 3
+
+
+def test_reschedule_series_moves_siblings_best_effort():
+    with TestClient(app) as client:
+        user, other = _user("mut-move@test.local"), _user("mut-move-other@test.local")
+        room, room2 = _rooms()
+        first = FIRST + timedelta(days=4)
+        created = _series(client, user, room, first, 4)
+        ids = created["booking_ids"]
+        # Week 3 at 15:00 is taken by somebody else.
+        _series(client, other, room, first + timedelta(weeks=2), 1, start="15:00")
+        with Session(engine) as s:
+            b = s.get(Booking, UUID(ids[1]))
+            b.gcal_event_id = "ev-second"
+            s.add(b)
+            s.commit()
+
+        body = {"new_date": first.strftime("%Y-%m-%d"), "new_start_time": "15:00"}
+        url = f"/api/v1/bookings/{ids[0]}/reschedule-series"
+        plan = client.patch(url, params={"dry_run": True}, json=body, headers=_auth(user)).json()["plan"]
+        assert [s["action"] for s in plan["steps"]] == ["move", "move", "skip", "move"]
+        with Session(engine) as s:
+            assert s.get(Booking, UUID(ids[0])).start_time == "10:00"
+
+        r = client.patch(url, json=body, headers=_auth(user))
+        assert r.status_code == 200, r.text
+        assert r.json()["propagated"] == 2 and [x["id"] for x in r.json()["skipped"]] == [ids[2]]
+        with Session(engine) as s:
+            times = [s.get(Booking, UUID(i)).start_time for i in ids]
+            assert times == ["15:00", "15:00", "10:00", "15:00"]
+        recreate = _events("gcal.recreate_many")
+        assert len(recreate) == 1 and recreate[0].payload["old_events"] == [["ev-second", room.id]]
+
+        # Into the other room, same times.
+        body = {"new_date": first.strftime("%Y-%m-%d"), "new_start_time": "15:00", "new_resource_id": room2.id}
+        r = client.patch(url, json=body, headers=_auth(user))
+        assert r.status_code == 200, r.text
+        with Session(engine) as s:
+            assert s.get(Booking, UUID(ids[3])).resource_id == room2.id
+
+
+if __name__ == "__main__":
+    from conftest import QueryBudget
+
+    test_cancel_preview_then_apply(QueryBudget())
+    test_extend_dry_run_reports_conflicts()
+    test_reschedule_series_moves_siblings_best_effort()
+    print("OK")
@@ -0,0 +1,211 @@
+"""Subscription pool rows (models/subscription_pool): a strict deduction can't
+spend hours another transaction already took, every movement lands in the
+hours ledger, direct JSON writes follow into the row, legacy JSON-only pools
+are backfilled once, and the expiry cron picks candidates from the table.
+
+    pytest backend/tests/test_subscription_pool_rows.py
+"""
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+_TMP_DB = os.path.join(tempfile.mkdtemp(), "subscription_pool_rows_test.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP_DB}"
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlmodel import Session, select  # noqa: E402
+
+from app.core import security  # noqa: E402
+from app.db.init_data import migrate_subscription_pools  # noqa: E402
+from app.db.session import engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models.resource import Resource  # noqa: E402
+from app.models.subscription_pool import SubscriptionHoursLedger, SubscriptionPool  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.services import subscription_pool as sp  # noqa: E402
+
+
+def _user(email: str, role: str = "user", **extra) -> User:
+    with Session(engine) as s:
+        u = User(email=email, name=email.split("@")[0], role=role, hashed_password="x", **extra)
+        s.add(u)
+        s.commit()
+        s.refresh(u)
+        return u
+
+
+def _auth(user: User) -> dict:
+    return {"Authorization": f"Bearer {security.create_access_token(user.id)}"}
+
+
+def _ledger(user: User) -> list[tuple[float, str]]:
+    with Session(engine) as s:
+        rows = s.exec(
+            select(SubscriptionHoursLedger)
+            .where(SubscriptionHoursLedger.user_id == str(user.id))
+            .order_by(SubscriptionHoursLedger.created_at)
+        ).all()
+        return [(r.delta, r.reason) for r in rows]
+
+
+def test_strict_deduct_cannot_spend_the_same_hours_twice():
+    with TestClient(app):
+        pass  # schema
+    u = _user("pool-race@test.local", subscription={"remainingHours": 3.0, "totalHours": 10.0})
+
+    # Two requests loaded the client while 3h were left; both want 2h.
+    with Session(engine) as a, Session(engine) as b:
+        ua, ub = a.get(User, u.id), b.get(User, u.id)
+        assert sp.get_float(ua.subscription, "remaining_hours") == 3.0
+        assert sp.get_float(ub.subscription, "remaining_hours") == 3.0
+        assert sp.deduct(a, ua, 2, "booking_charge", strict=True) == 1.0
+        a.commit()
+        assert sp.deduct(b, ub, 2, "booking_charge", strict=True) is None
+        b.commit()
+
+    with Session(engine) as s:
+        row = s.get(SubscriptionPool, u.id)
+        assert (row.remaining_hours, row.used_hours) == (1.0, 2.0)
+        # The JSON mirror says the same in both dialects.
+        sub = s.get(User, u.id).subscription
+        assert sub["remainingHours"] == sub["remaining_hours"] == 1.0
+        # Non-strict (approve, format change) floors at zero, refund gives back.
+        uu = s.get(User, u.id)
+        assert sp.deduct(s, uu, 1.5, "booking_charge") == 0.0
+        assert sp.refund(s, uu, 0.5, "booking_refund") == 0.5
+        s.commit()
+    assert _ledger(u) == [(3.0, "sync"), (-2.0, "booking_charge"), (-1.5, "booking_charge"),
+                          (0.5, "booking_refund")]
+
+
+def test_json_writes_follow_into_the_row():
+    with TestClient(app) as client:
+        admin = _user("pool-admin@test.local", "owner")
+        u = _user("pool-client@test.local", subscription={
+            "planId": "regular", "remainingHours": 4.0, "totalHours": 4.0,
+            "expiryDate": (datetime.utcnow() + timedelta(days=30)).isoformat(),
+        })
+        base = f"/api/v1/users/{u.id}/subscription"
+
+        r = client.post(f"{base}/topup", json={"hours": 6, "amount": 100}, headers=_auth(admin))
+        assert r.status_code == 200
+        assert r.json()["subscription"]["remainingHours"] == 10.0
+        assert client.post(f"{base}/freeze", headers=_auth(admin)).status_code == 200
+
+        with Session(engine) as s:
+            row = s.get(SubscriptionPool, u.id)
+            assert (row.remaining_hours, row.total_hours) == (10.0, 10.0)
+            assert row.is_frozen and row.status == "frozen" and row.plan_id == "regular"
+            s.delete(s.get(User, u.id))
+            s.commit()
+            assert s.get(SubscriptionPool, u.id) is None
+        assert _ledger(u)[-1] == (6.0, "topup")
+
+
+def test_stale_json_write_keeps_a_concurrent_deduction():
+    with TestClient(app):
+        pass
+    u = _user("pool-stale@test.local", subscription={
+        "id": "plan-1", "planId": "regular", "remainingHours": 10.0, "totalHours": 10.0, "usedHours": 0.0,
+    })
+    # A freeze read the client at 10h; a booking takes 2h and commits first.
+    with Session(engine) as a, Session(engine) as b:
+        ua = a.get(User, u.id)
+        assert sp.get_float(ua.subscription, "remaining_hours") == 10.0
+        assert sp.deduct(b, b.get(User, u.id), 2, "booking_charge", strict=True) == 8.0
+        b.commit()
+        ua.subscription = sp.update(ua.subscription, is_frozen=True)
+        a.commit()
+    with Session(engine) as s:
+        row = s.get(SubscriptionPool, u.id)
+        assert (row.remaining_hours, row.used_hours, row.is_frozen) == (8.0, 2.0, True)
+        sub = s.get(User, u.id).subscription
+        assert sub["remainingHours"] == sub["remaining_hours"] == 8.0 and sub["isFrozen"] is True
+
+    # An admin edit on top of the stale blob moves the row by its difference…
+    with Session(engine) as a, Session(engine) as b:
+        ua = a.get(User, u.id)
+        assert sp.deduct(b, b.get(User, u.id), 1, "booking_charge", strict=True) == 7.0
+        b.commit()
+        ua.subscription = sp.update(ua.subscription, remaining_hours=11.0, total_hours=13.0)
+        a.commit()
+        assert sp.get_float(ua.subscription, "remaining_hours") == 10.0
+    # …while a new plan replaces the pool outright.
+    with Session(engine) as s:
+        uu = s.get(User, u.id)
+        assert (s.get(SubscriptionPool, u.id).remaining_hours, s.get(SubscriptionPool, u.id).total_hours) == (10.0, 13.0)
+        uu.subscription = {"id": "plan-2", "planId": "regular", "remainingHours": 4.0, "totalHours": 4.0}
+        s.commit()
+        assert s.get(SubscriptionPool, u.id).remaining_hours == 4.0
+    assert _ledger(u) == [(10.0, "sync"), (-2.0, "booking_charge"), (-1.0, "booking_charge"),
+                          (3.0, "sync"), (-6.0, "sync")]
+
+
+def test_backfill_and_expiry_query():
+    with TestClient(app):
+        pass
+    expired = _user("pool-expired@test.local")
+    current = _user("pool-current@test.local")
+    flexible = _user("pool-flexible@test.local")
+    past = (datetime.utcnow() - timedelta(days=1)).isoformat()
+    future = (datetime.utcnow() + timedelta(days=1)).isoformat()
+    # Written behind the ORM's back, like pools from before the table existed.
+    with engine.begin() as conn:
+        for u, sub in (
+            (expired, {"remainingHours": 2.0, "expiryDate": past}),
+            (current, {"remaining_hours": 5.0, "expiry_date": future}),
+            (flexible, {"remainingHours": 1.0, "expiryDate": past, "flexible": True}),
+        ):
+            conn.exec_driver_sql("UPDATE user SET subscription = ? WHERE id = ?", (json.dumps(sub), u.id.hex))
+
+    assert migrate_subscription_pools(batch=1) >= 3
+    assert migrate_subscription_pools() == 0
+
+    from scripts import expire_subscriptions
+    expire_subscriptions.run(dry_run=False)
+
+    with Session(engine) as s:
+        status = {u.email: s.get(SubscriptionPool, u.id).status for u in (expired, current, flexible)}
+        assert status == {
+            "pool-expired@test.local": "completed",
+            "pool-current@test.local": "active",
+            "pool-flexible@test.local": "active",
+        }
+        assert sp.get(s.get(User, expired.id).subscription, "status") == "completed"
+        # Hours are kept — completion is a stamp, not a write-off.
+        assert s.get(SubscriptionPool, expired.id).remaining_hours == 2.0
+
+
+def test_booking_charge_points_at_the_booking():
+    with TestClient(app) as client:
+        with Session(engine) as s:
+            res = s.exec(select(Resource)).first()
+            resource_id, location_id = res.id, res.location_id
+        # An admin isn't sent to approval, so the charge stays.
+        u = _user("pool-ref@test.local", role="senior_admin",
+                  subscription={"remainingHours": 4.0, "totalHours": 4.0, "includedFormats": ["individual"]})
+        start = datetime.utcnow() + timedelta(hours=4 + 6)  # Tbilisi time, inside the charge-now window
+        r = client.post("/api/v1/bookings/", headers=_auth(u), json={
+            "resource_id": resource_id, "location_id": location_id,
+            "date": start.strftime("%Y-%m-%dT00:00:00"), "start_time": start.strftime("%H:00"),
+            "duration": 60, "payment_method": "subscription", "format": "individual",
+        })
+        assert r.status_code == 200, r.text
+        with Session(engine) as s:
+            charge = s.exec(select(SubscriptionHoursLedger).where(
+                SubscriptionHoursLedger.user_id == str(u.id),
+                SubscriptionHoursLedger.reason == "booking_charge")).one()
+        assert (charge.delta, charge.ref_type, charge.ref_id) == (-1.0, "booking", r.json()["id"])
+
+
+if __name__ == "__main__":
+    test_strict_deduct_cannot_spend_the_same_hours_twice()
+    test_json_writes_follow_into_the_row()
+    test_stale_json_write_keeps_a_concurrent_deduction()
+    test_backfill_and_expiry_query()
+    test_booking_charge_points_at_the_booking()
+    print("OK")
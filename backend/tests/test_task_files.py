@@ -0,0 +1,131 @@
+"""Task attachments (services/task_files): streamed upload stored once per
+SHA-256, per-task reference counts kept in step with AdminTask
+create/update/delete, and the orphan sweep.
+
+    pytest backend/tests/test_task_files.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+_TMP = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMP, 'task_files_test.db')}"
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlmodel import Session  # noqa: E402
+
+from app.api import deps  # noqa: E402
+from app.api.v1 import upload  # noqa: E402
+from app.db.session import engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models.specialist import Specialist  # noqa: E402
+from app.models.task_file import TaskFile  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.services import task_files  # noqa: E402
+
+_UPLOADS = os.path.join(_TMP, "uploads")
+
+
+def _client() -> TestClient:
+    upload.UPLOAD_DIR = _UPLOADS
+    admin = User(id="u-admin", email="tf@test", hashed_password="x", name="Админ", role="owner")
+    app.dependency_overrides[deps.get_current_user] = lambda: admin
+    return TestClient(app)
+
+
+def _put(client, name: str, data: bytes) -> dict:
+    r = client.post("/api/v1/upload/task-file", files={"file": (name, data, "application/octet-stream")})
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def _refs(digest: str) -> int:
+    with Session(engine) as s:
+        row = s.get(TaskFile, digest)
+        return row.ref_count if row else 0
+
+
+def _disk(url: str) -> str:
+    return os.path.join(_UPLOADS, url.removeprefix("/uploads/"))
+
+
+def _age(url: str, hours: float) -> None:
+    t = time.time() - hours * 3600
+    os.utime(_disk(url), (t, t))
+
+
+def test_dedup_and_refcounts_follow_task_lifecycle():
+    with _client() as client:
+        pdf = b"%PDF-1.4 " + os.urandom(300_000)
+        a = _put(client, "contract.pdf", pdf)
+        b = _put(client, "contract (1).pdf", pdf)
+        assert a["url"] == b["url"] and a["size"] == str(len(pdf))
+        assert a["url"] == f"/uploads/tasks/{a['sha256'][:2]}/{a['sha256']}.pdf"
+        with open(_disk(a["url"]), "rb") as f:
+            assert f.read() == pdf
+        assert not [f for f in os.listdir(_UPLOADS) if f.endswith(task_files.TMP_SUFFIX)]
+
+        att = {"id": "1", "type": "file", "name": "contract.pdf", "url": a["url"], "size": a["size"]}
+        t1 = client.post("/api/v1/admin/tasks/", json={"title": "Договор", "attachments": [att, att]}).json()
+        t2 = client.post("/api/v1/admin/tasks/", json={"title": "Копия", "attachments": [att]}).json()
+        assert _refs(a["sha256"]) == 2  # attached twice to t1 still counts once
+
+        # Unrelated edits leave the count alone; dropping the file releases it.
+        client.patch(f"/api/v1/admin/tasks/{t1['id']}", json={"title": "Договор v2"})
+        assert _refs(a["sha256"]) == 2
+        client.patch(f"/api/v1/admin/tasks/{t1['id']}", json={"attachments": []})
+        assert _refs(a["sha256"]) == 1
+        client.delete(f"/api/v1/admin/tasks/{t2['id']}")
+        assert _refs(a["sha256"]) == 0
+    app.dependency_overrides.clear()
+
+
+def test_sweep_removes_only_old_unreferenced_files():
+    with _client() as client:
+        kept = _put(client, "kept.txt", b"attached to a task")
+        pinned = _put(client, "diploma.pdf", b"%PDF specialist diploma")
+        orphan = _put(client, "never-attached.csv", b"a,b\n1,2\n")
+        fresh = _put(client, "just-uploaded.txt", b"form still open")
+        client.post("/api/v1/admin/tasks/", json={"title": "T", "attachments": [{"url": kept["url"]}]})
+        with Session(engine) as s:
+            s.add(Specialist(first_name="Ира", last_name="К", documents=["https://unbox.com.ge" + pinned["url"]]))
+            s.commit()
+        for f in (kept, pinned, orphan):
+            _age(f["url"], 48)
+        stale_tmp = os.path.join(_UPLOADS, "dead" + task_files.TMP_SUFFIX)
+        open(stale_tmp, "wb").close()
+        os.utime(stale_tmp, (time.time() - 48 * 3600,) * 2)
+
+        saved = upload.settings.TELEGRAM_REMINDER_SECRET
+        upload.settings.TELEGRAM_REMINDER_SECRET = "s3cret"
+        try:
+            assert client.post("/api/v1/upload/task-files/cleanup?secret=nope").status_code == 401
+            r = client.post("/api/v1/upload/task-files/cleanup?secret=s3cret").json()
+        finally:
+            upload.settings.TELEGRAM_REMINDER_SECRET = saved
+        assert r["deleted"] == 1 and r["stale_tmp"] == 1
+        assert not os.path.exists(_disk(orphan["url"])) and not os.path.exists(stale_tmp)
+        for f in (kept, pinned, fresh):
+            assert os.path.exists(_disk(f["url"]))
+    app.dependency_overrides.clear()
+
+
+def test_disallowed_and_oversize_task_files_are_rejected():
+    with _client() as client:
+        assert client.post("/api/v1/upload/task-file",
+                           files={"file": ("x.html", b"<script>", "text/html")}).status_code == 400
+        big = client.post("/api/v1/upload/task-file", files={
+            "file": ("big.pdf", b"\0" * (upload.MAX_FILE_SIZE + 1), "application/pdf")})
+        assert big.status_code == 400
+        assert not [f for f in os.listdir(_UPLOADS) if f.endswith(task_files.TMP_SUFFIX)]
+    app.dependency_overrides.clear()
+
+
+if __name__ == "__main__":
+    test_dedup_and_refcounts_follow_task_lifecycle()
+    test_sweep_removes_only_old_unreferenced_files()
+    test_disallowed_and_oversize_task_files_are_rejected()
+    print("OK")
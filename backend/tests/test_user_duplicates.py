@@ -0,0 +1,146 @@
+"""Duplicate-user detection (services/user_identity): identity keys are
+normalized, kept current by user writes in the same commit, and candidate
+pairs come from one blocking self-join with a confidence and a ready
+/users/merge payload.
+
+    pytest backend/tests/test_user_duplicates.py
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+_TMP_DB = os.path.join(tempfile.mkdtemp(), "user_duplicates_test.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP_DB}"
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlmodel import Session, select  # noqa: E402
+
+from app.core import security  # noqa: E402
+from app.db.session import engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.models.user_identity import UserIdentity  # noqa: E402
+from app.services import user_identity, user_merge  # noqa: E402
+
+
+def _user(email: str, name: str = "", **extra) -> User:
+    with Session(engine) as s:
+        u = User(email=email, name=name, hashed_password="x", **extra)
+        s.add(u)
+        s.commit()
+        s.refresh(u)
+        return u
+
+
+def _keys(user: User) -> set:
+    with Session(engine) as s:
+        rows = s.exec(select(UserIdentity).where(UserIdentity.user_id == user.id)).all()
+        return {(r.kind, r.value) for r in rows}
+
+
+def _pairs(user: User) -> list:
+    with Session(engine) as s:
+        return user_identity.candidates(s, min_score=0, user_id=user.id)
+
+
+def test_normalization():
+    assert user_identity.normalize_email(" Ivan.Petrov+unbox@GoogleMail.com ") == "ivanpetrov@gmail.com"
+    assert user_identity.normalize_email("a.b@mail.ru") == "a.b@mail.ru"
+    assert user_identity.normalize_phone("12-34-56") is None  # too short for anything
+    assert user_identity.normalize_phone("555 123 456") == "+995555123456"
+    assert user_identity.normalize_phone("+995 (555) 123-456") == "+995555123456"
+    assert user_identity.normalize_phone("0099555123456") == "+99555123456"
+    assert user_identity.normalize_phone("8 916 123-45-67") == "+79161234567"
+    keys = user_identity.identity_keys("777@telegram.unbox", name="Ольга  Малыш",
+                                       additional_contacts=[{"type": "Phone", "value": "555123456"}])
+    assert keys == {("telegram", "777"), ("phone", "+995555123456"), ("name", "малыш ольга")}
+    assert user_identity.identity_keys("merged-into-x-y@deleted.unbox", telegram_id="1") == set()
+
+
+def test_keys_follow_user_writes():
+    with TestClient(app):
+        u = _user("Dup.Keys@gmail.com", "Анна Ким", phone="+995 599 000 111")
+        assert _keys(u) == {("email", "dupkeys@gmail.com"), ("phone", "+995599000111"), ("name", "анна ким")}
+        with Session(engine) as s:
+            row = s.get(User, u.id)
+            row.phone = None
+            row.telegram_id = "31337"
+            s.add(row)
+            s.commit()
+        assert _keys(u) == {("email", "dupkeys@gmail.com"), ("telegram", "31337"), ("name", "анна ким")}
+        with Session(engine) as s:
+            s.delete(s.get(User, u.id))
+            s.commit()
+        assert _keys(u) == set()
+
+
+def test_refresh_keeps_current_keys():
+    with TestClient(app):
+        u = _user("dup-stable@test.local", "Нино Беридзе", phone="599 000 222")
+        with Session(engine) as s:
+            before = {r.kind: r.updated_at for r in s.exec(select(UserIdentity).where(UserIdentity.user_id == u.id))}
+            row = s.get(User, u.id)
+            row.phone = "599 000 333"
+            s.add(row)
+            s.commit()
+        with Session(engine) as s:
+            after = {(r.kind, r.value): r.updated_at
+                     for r in s.exec(select(UserIdentity).where(UserIdentity.user_id == u.id))}
+        assert set(after) == {("email", "dup-stable@test.local"), ("phone", "+995599000333"), ("name", "беридзе нино")}
+        # Untouched keys are not rewritten, only the phone is.
+        assert after[("email", "dup-stable@test.local")] == before["email"]
+        assert after[("name", "беридзе нино")] == before["name"]
+        # A second refresh over rows that are already there (what a concurrent
+        # commit of the same user looks like) is a no-op, not a PK violation.
+        with engine.begin() as conn:
+            user_identity.refresh(conn, [u.id])
+        assert set(_keys(u)) == set(after)
+
+
+def test_candidates_feed_the_merge(max_queries):
+    with TestClient(app) as client:
+        admin = _user("dup-admin@test.local", "Admin", role="admin")
+        real = _user("olga.malysh@gmail.com", "Ольга Малыш", phone="599111222", google_id="g-olga")
+        placeholder = _user("424242@telegram.unbox", "Ольга")
+        twin = _user("olgamalysh+2@gmail.com", "Малыш Ольга")
+        with Session(engine) as s:
+            row = s.get(User, real.id)
+            row.telegram_id = "424242"
+            s.add(row)
+            s.commit()
+
+        r = client.get("/api/v1/users/duplicates", params={"user_id": real.email},
+                       headers={"Authorization": f"Bearer {security.create_access_token(admin.id)}"})
+        # Auth + user_id lookup + the self-join + the users it found.
+        max_queries.response(r, 4)
+        pairs = {tuple(p["matched"]): p for p in r.json()}
+        tg = pairs[("telegram",)]
+        # Telegram match plus half the name: the real account is the keeper.
+        assert tg["score"] == round(1 - 0.05 * (1 - 0.3 * 0.5), 3)
+        assert tg["merge"] == {"target": str(real.id), "sources": [str(placeholder.id)]}
+        same = pairs[("email", "name")]
+        assert same["score"] == round(1 - 0.1 * 0.7, 3) and same["duplicate"]["id"] == str(twin.id)
+
+        # A name on its own stays under the default threshold.
+        _user("dup-namesake@test.local", "Ольга Малыш")
+        r = client.get("/api/v1/users/duplicates", params={"user_id": str(real.id), "min_score": 0.5},
+                       headers={"Authorization": f"Bearer {security.create_access_token(admin.id)}"})
+        assert {tuple(p["matched"]) for p in r.json()} == {("telegram",), ("email", "name")}
+
+        # Feeding the merge: the pair disappears once it's done.
+        with Session(engine) as s:
+            user_merge.merge(s, s.get(User, real.id), [s.get(User, placeholder.id), s.get(User, twin.id)])
+            s.commit()
+        assert [p["matched"] for p in _pairs(real)] == [["name"]]
+
+
+if __name__ == "__main__":
+    from conftest import QueryBudget
+
+    test_normalization()
+    test_keys_follow_user_writes()
+    test_refresh_keeps_current_keys()
+    test_candidates_feed_the_merge(QueryBudget())
+    print("OK")
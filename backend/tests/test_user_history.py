@@ -0,0 +1,174 @@
+"""User history (services/user_history): the legacy JSON arrays move into
+rows exactly once, the user list ships no history, the client card and the
+paged endpoint read it back in the old order, and the legacy whole-array
+PATCH only touches the entries that changed inside the card's window;
+single tasks and comments change by id.
+
+    pytest backend/tests/test_user_history.py
+"""
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+_TMP_DB = os.path.join(tempfile.mkdtemp(), "user_history_test.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP_DB}"
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlmodel import Session, select  # noqa: E402
+
+from app.core import security  # noqa: E402
+from app.db.init_data import migrate_user_history  # noqa: E402
+from app.db.session import engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.models.user_history import SeriesReminderMark, UserHistoryEntry  # noqa: E402
+from app.services import user_history  # noqa: E402
+
+
+def _user(email: str, role: str = "user", **extra) -> User:
+    with Session(engine) as s:
+        u = User(email=email, name=email.split("@")[0], role=role, hashed_password="x", **extra)
+        s.add(u)
+        s.commit()
+        s.refresh(u)
+        return u
+
+
+def _auth(user: User) -> dict:
+    return {"Authorization": f"Bearer {security.create_access_token(user.id)}"}
+
+
+def test_legacy_blobs_are_moved_once():
+    with TestClient(app):
+        pass  # schema + startup migrations
+    with engine.begin() as conn:
+        for col in ("comment_history", "admin_tasks", "discount_history"):
+            try:
+                conn.exec_driver_sql(f"ALTER TABLE user ADD COLUMN {col} JSON")
+            except Exception:
+                pass  # already there from an earlier run in this process
+
+    u = _user("legacy-history@test.local", crm_data={"series_reminders": {"grp-1": 2}, "keep": 1})
+    comments = [{"id": f"c{i}", "text": f"note {i}", "date": f"2026-01-0{i + 1}T10:00:00"} for i in range(3)]
+    comments.append({"type": "email_change", "old_email": "Old@Test.local", "created_at": "2026-02-01T00:00:00"})
+    discounts = [{"id": "d2", "newValue": 20}, {"id": "d1", "newValue": 10}]  # newest first
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "UPDATE user SET comment_history = ?, discount_history = ?, admin_tasks = ? WHERE id = ?",
+            (json.dumps(comments), json.dumps(discounts), json.dumps([{"id": "t1"}]), u.id.hex),
+        )
+
+    assert migrate_user_history(batch=1) >= 7
+    assert migrate_user_history() == 0  # nothing left to move
+
+    with Session(engine) as s:
+        card = user_history.latest(s, u.id)
+        assert [c.get("id") for c in card["comment_history"]] == ["c0", "c1", "c2", None]
+        assert [d["id"] for d in card["discount_history"]] == ["d2", "d1"]
+        assert card["admin_tasks"] == [{"id": "t1"}]
+        assert user_history.prior_emails(s, u.id) == {"old@test.local"}
+        assert s.get(SeriesReminderMark, (u.id, "grp-1")).threshold == 2
+        assert s.get(User, u.id).crm_data == {"keep": 1}
+    with engine.connect() as conn:
+        row = conn.exec_driver_sql(
+            "SELECT comment_history, discount_history, admin_tasks FROM user WHERE id = ?", (u.id.hex,)
+        ).one()
+        assert tuple(row) == (None, None, None)
+
+
+def test_list_detail_paging_and_patch():
+    with TestClient(app) as client:
+        admin = _user("history-admin@test.local", "owner")
+        client_user = _user("history-client@test.local")
+        auth, base = _auth(admin), f"/api/v1/users/{client_user.id}"
+
+        for i in range(5):
+            r = client.post(f"{base}/comments", json={"text": f"hello {i}"}, headers=auth)
+            assert r.status_code == 200
+        assert [c["text"] for c in r.json()["comment_history"]] == [f"hello {i}" for i in range(5)]
+
+        listed = client.get("/api/v1/users/", headers=auth).json()
+        row = next(u for u in listed if u["id"] == str(client_user.id))
+        assert not {"comment_history", "discount_history", "admin_tasks"} & set(row)
+
+        first = client.get(f"{base}/history", params={"limit": 3}, headers=auth).json()
+        assert [c["text"] for c in first["items"]] == ["hello 4", "hello 3", "hello 2"]
+        rest = client.get(f"{base}/history", params={"limit": 3, "before": first["next_before"]},
+                          headers=auth).json()
+        assert [c["text"] for c in rest["items"]] == ["hello 1", "hello 0"] and rest["next_before"] is None
+
+        # One task per call: add, toggle, delete — nothing else is touched.
+        for tid in ("t1", "t2"):
+            r = client.post(f"{base}/tasks", json={"id": tid, "isCompleted": False}, headers=auth)
+            assert r.status_code == 200, r.text
+        assert client.post(f"{base}/tasks", json={"id": "t1"}, headers=auth).status_code == 409
+        r = client.patch(f"{base}/tasks/t1", json={"isCompleted": True}, headers=auth)
+        assert [t["isCompleted"] for t in r.json()["admin_tasks"]] == [True, False]
+        r = client.delete(f"{base}/tasks/t2", headers=auth)
+        assert [t["id"] for t in r.json()["admin_tasks"]] == ["t1"]
+        assert client.delete(f"{base}/tasks/t2", headers=auth).status_code == 404
+
+        r = client.patch(f"{base}/comments/{first['items'][0]['id']}", json={"text": "edited"}, headers=auth)
+        assert r.json()["comment_history"][-1]["text"] == "edited"
+
+        # Legacy whole-array PATCH: refused without the card's cursor (a client
+        # that never loaded the history would wipe it)…
+        r = client.patch(base, json={"admin_tasks": [{"id": "new"}]}, headers=auth)
+        assert r.status_code == 409
+        card = client.get(base, headers=auth).json()
+        with Session(engine) as s:
+            seq_t1 = s.exec(select(UserHistoryEntry.seq).where(
+                UserHistoryEntry.user_id == client_user.id, UserHistoryEntry.kind == "admin_task",
+            )).one()
+        # …and with it, rows written after the card was read are left alone.
+        client.post(f"{base}/tasks", json={"id": "t3"}, headers=auth)
+        r = client.patch(base, json={"admin_tasks": [{"id": "t1", "isCompleted": False}, {"id": "t4"}],
+                                     "history_cursor": card["history_cursor"]}, headers=auth)
+        assert r.status_code == 200, r.text
+        assert [t["id"] for t in r.json()["admin_tasks"]] == ["t1", "t3", "t4"]
+        r = client.patch(base, json={"admin_tasks": [], "history_cursor": card["history_cursor"]}, headers=auth)
+        with Session(engine) as s:
+            rows = s.exec(select(UserHistoryEntry).where(
+                UserHistoryEntry.user_id == client_user.id, UserHistoryEntry.kind == "admin_task",
+            )).all()
+            # t1 was in the card's window → deleted; t3/t4 are newer → kept.
+            assert seq_t1 not in [r.seq for r in rows]
+            assert sorted(r.data["id"] for r in rows) == ["t3", "t4"]
+
+        r = client.post(f"{base}/discount", json={"percent": 15, "reason": "loyal"}, headers=auth)
+        assert r.json()["discount_history"][0]["newValue"] == 15
+
+        # Rename → the old address shows up in /users/me for "my bookings".
+        r = client.post(f"{base}/change-email", json={"new_email": "history-renamed@test.local"}, headers=auth)
+        assert r.status_code == 200
+        me = client.get("/api/v1/users/me", headers=_auth(client_user)).json()
+        assert me["previous_emails"] == ["history-client@test.local"]
+
+
+def test_merge_moves_history_to_the_keeper():
+    src, tgt = _user("merge-history-src@test.local"), _user("merge-history-tgt@test.local")
+    with Session(engine) as s:
+        user_history.append(s, tgt.id, user_history.COMMENT, {"id": "on-tgt", "text": "x"})
+        user_history.append(s, src.id, user_history.COMMENT, {"id": "from-src", "text": "y"})
+        user_history.set_series_mark(s, src.id, "grp-src", 3)
+        user_history.set_series_mark(s, src.id, "grp-both", 3)
+        user_history.set_series_mark(s, tgt.id, "grp-both", 1)
+        s.commit()
+    with Session(engine) as s:
+        assert user_history.reparent(s, src.id, tgt.id) == 1
+        s.commit()
+    with Session(engine) as s:
+        assert [c["id"] for c in user_history.latest(s, tgt.id)["comment_history"]] == ["on-tgt", "from-src"]
+        assert user_history.series_mark(s, tgt.id, "grp-src") == 3
+        assert user_history.series_mark(s, tgt.id, "grp-both") == 1  # the keeper's mark wins
+        assert s.exec(select(SeriesReminderMark).where(SeriesReminderMark.user_id == src.id)).first() is None
+
+
+if __name__ == "__main__":
+    test_legacy_blobs_are_moved_once()
+    test_list_detail_paging_and_patch()
+    test_merge_moves_history_to_the_keeper()
+    print("OK")
@@ -0,0 +1,129 @@
+"""User merge (services/user_merge): several duplicates fold into one keeper
+in one call, every reference found through the model metadata moves, a dry
+run only counts, and the statement count doesn't grow with the rows moved.
+
+    pytest backend/tests/test_user_merge.py
+"""
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+_TMP_DB = os.path.join(tempfile.mkdtemp(), "user_merge_test.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP_DB}"
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlmodel import Session, select  # noqa: E402
+
+from app.core import query_stats, security  # noqa: E402
+from app.db.session import engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models.booking import Booking  # noqa: E402
+from app.models.notification import Notification  # noqa: E402
+from app.models.specialist import Specialist  # noqa: E402
+from app.models.therapist_client import TherapistClient  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.models.user_history import UserHistoryEntry  # noqa: E402
+from app.services import user_merge  # noqa: E402
+
+DAY = datetime(2041, 2, 3)
+
+
+def _user(email: str, **extra) -> User:
+    with Session(engine) as s:
+        u = User(email=email, name=extra.pop("name", ""), hashed_password="x", **extra)
+        s.add(u)
+        s.commit()
+        s.refresh(u)
+        return u
+
+
+def _bookings(user: User, n: int, start: datetime) -> None:
+    with Session(engine) as s:
+        s.add_all([
+            Booking(resource_id="unbox_one_room_1", date=start + timedelta(days=i), start_time="09:00",
+                    duration=60, final_price=0, payment_method="balance", user_id=user.email, user_uuid=user.id)
+            for i in range(n)
+        ])
+        s.commit()
+
+
+def _auth(user: User) -> dict:
+    return {"Authorization": f"Bearer {security.create_access_token(user.id)}"}
+
+
+def test_merges_duplicates_through_the_api():
+    with TestClient(app) as client:
+        owner = _user("merge-owner@test.local", name="Owner", role="owner")
+        keeper = _user("merge-keep@test.local", balance=5.0, tags=["vip"])
+        first = _user("merge-dup1@test.local", name="Ольга", phone="+995", balance=30.0,
+                      tags=["crm"], personal_discount_percent=10)
+        second = _user("merge-dup2@test.local", balance=-10.0, telegram_id="4242")
+        _bookings(first, 3, DAY)
+        _bookings(second, 2, DAY + timedelta(days=10))
+        with Session(engine) as s:
+            s.add(TherapistClient(name="Клиент", specialist_id=str(first.id)))
+            s.add(Notification(type="x", title="t", recipient_id=str(second.id)))
+            s.add(Specialist(first_name="O", last_name="M", user_id=first.id))
+            s.add(Specialist(first_name="D", last_name="2", user_id=second.id))
+            s.commit()
+
+        payload = {"sources": [first.email, str(second.id)], "target": keeper.email}
+        r = client.post("/api/v1/users/merge/preview", headers=_auth(owner), json=payload)
+        assert r.status_code == 200, r.text
+        preview = r.json()
+        assert preview["dry_run"] and preview["balance"] == 20.0
+        assert preview["rows"]["booking.user_uuid"] == 5 and preview["rows"]["booking.user_id"] == 5
+        assert preview["rows"]["therapist_clients.specialist_id"] == 1
+        assert preview["rows"]["notifications.recipient_id"] == 1
+        with Session(engine) as s:
+            assert s.get(User, first.id) is not None  # nothing written
+
+        r = client.post("/api/v1/users/merge", headers=_auth(owner), json=payload)
+        assert r.status_code == 200, r.text
+        body = r.json()
+        assert body["balance"] == 25.0 and body["name"] == "Ольга" and body["phone"] == "+995"
+        assert body["telegram_id"] == "4242" and body["personal_discount_percent"] == 10
+        assert body["tags"] == ["crm", "vip"]
+
+        with Session(engine) as s:
+            assert s.get(User, first.id) is None and s.get(User, second.id) is None
+            moved = s.exec(select(Booking).where(Booking.user_uuid == keeper.id)).all()
+            assert len(moved) == 5 and {b.user_id for b in moved} == {keeper.email}
+            assert s.exec(select(TherapistClient).where(TherapistClient.specialist_id == str(keeper.id))).one()
+            assert s.exec(select(Notification).where(Notification.recipient_id == str(keeper.id))).one()
+            # One specialist profile per user: the keeper takes the first, the other is unlinked.
+            profiles = s.exec(select(Specialist).where(Specialist.last_name.in_(["M", "2"]))).all()
+            assert {p.last_name: p.user_id for p in profiles} == {"M": keeper.id, "2": None}
+            audit = [e for e in s.exec(select(UserHistoryEntry).where(UserHistoryEntry.user_id == keeper.id)).all()
+                     if (e.data or {}).get("type") == "user_merge"]
+            assert len(audit) == 1 and len(audit[0].data["absorbed"]) == 2
+
+        r = client.post("/api/v1/users/merge", headers=_auth(owner),
+                        json={"source": keeper.email, "target": keeper.email})
+        assert r.status_code == 400
+
+
+def test_statement_count_does_not_grow_with_rows():
+    with TestClient(app):
+        counts = []
+        for tag, n in (("small", 2), ("big", 40)):
+            keeper = _user(f"merge-{tag}-keep@test.local")
+            dup = _user(f"merge-{tag}-dup@test.local")
+            _bookings(dup, n, DAY + timedelta(days=100 if tag == "small" else 200))
+            with Session(engine) as s:
+                keeper, dup = s.get(User, keeper.id), s.get(User, dup.id)
+                with query_stats.track("merge") as stats:
+                    report = user_merge.merge(s, keeper, [dup])
+                s.commit()
+            assert report["rows"]["booking.user_uuid"] == n
+            counts.append(stats.count)
+        assert counts[0] == counts[1], counts
+
+
+if __name__ == "__main__":
+    test_merges_duplicates_through_the_api()
+    test_statement_count_does_not_grow_with_rows()
+    print("OK")
@@ -0,0 +1,181 @@
+"""Waitlist matching (services/waitlist_index + waitlist_notify): freed
+slots are matched against an interval index kept current by waitlist
+writes, a whole batch of freed slots is a fixed handful of statements,
+every waiting user is notified once, and Telegram goes out through the
+outbox.
+
+    pytest backend/tests/test_waitlist_matching.py
+"""
+import os
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from uuid import UUID, uuid4
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+_TMP_DB = os.path.join(tempfile.mkdtemp(), "waitlist_matching_test.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP_DB}"
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlmodel import Session, select  # noqa: E402
+
+from app.core import security  # noqa: E402
+from app.db.session import engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models.booking import Booking  # noqa: E402
+from app.models.notification import Notification  # noqa: E402
+from app.models.outbox import OutboxEvent  # noqa: E402
+from app.models.resource import Resource  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.models.waitlist import Waitlist  # noqa: E402
+from app.services.waitlist_index import DayIndex, Entry  # noqa: E402
+from app.services.waitlist_notify import notify_freed_slots  # noqa: E402
+
+DAY = datetime(2039, 5, 10)
+
+
+def _hhmm(m: int) -> str:
+    return f"{m // 60:02d}:{m % 60:02d}"
+
+
+def _user(email: str, **extra) -> User:
+    with Session(engine) as s:
+        u = User(email=email, name=email.split("@")[0], role="specialist", hashed_password="x", **extra)
+        s.add(u)
+        s.commit()
+        s.refresh(u)
+        return u
+
+
+def _auth(user: User) -> dict:
+    return {"Authorization": f"Bearer {security.create_access_token(user.id)}"}
+
+
+def _branch_rooms() -> list[Resource]:
+    with Session(engine) as s:
+        rooms = s.exec(select(Resource).where(Resource.location_id == "unbox_one")).all()
+        return rooms[:2]
+
+
+def _freed(room: Resource, day: datetime, start: str, duration: int) -> Booking:
+    return Booking(id=uuid4(), resource_id=room.id, location_id=room.location_id, date=day,
+                   start_time=start, duration=duration)
+
+
+def _status(entry_id) -> str:
+    with Session(engine) as s:
+        return s.get(Waitlist, UUID(str(entry_id))).status
+
+
+def test_day_index_matches_brute_force():
+    rnd = random.Random(7)
+    entries = []
+    for _ in range(300):
+        s = rnd.randrange(0, 23 * 60, 15)
+        entries.append(Entry(uuid4(), "r", DAY, _hhmm(s), _hhmm(s + rnd.randrange(15, 240, 15)), "u", None))
+    idx = DayIndex(entries)
+    for _ in range(200):
+        start = rnd.randrange(0, 23 * 60, 15)
+        end = start + rnd.randrange(15, 180, 15)
+        expected = {e.id for e in entries
+                    if int(e.start_time[:2]) * 60 + int(e.start_time[3:]) < end
+                    and int(e.end_time[:2]) * 60 + int(e.end_time[3:]) > start}
+        assert {e.id for e in idx.overlapping(start, end)} == expected
+
+
+def test_freed_slot_notifies_branch_once():
+    with TestClient(app) as client:
+        room, sibling = _branch_rooms()
+        with_tg = _user("wl-tg@test.local", telegram_id="555")
+        without_tg = _user("wl-notg@test.local")
+
+        def subscribe(user, resource, start, end):
+            r = client.post("/api/v1/waitlist/", headers=_auth(user), json={
+                "resource_id": resource.id, "date": DAY.isoformat(), "start_time": start, "end_time": end,
+            })
+            assert r.status_code == 200, r.text
+            return r.json()["id"]
+
+        on_room = subscribe(with_tg, room, "10:00", "12:00")
+        # Nothing frees up at 15:00 — but the day is now in the index.
+        assert notify_freed_slots(Session(engine), [_freed(room, DAY, "15:00", 60)]) == 0
+        # Subscriptions made after the day was loaded are patched in.
+        on_sibling = subscribe(without_tg, sibling, "11:00", "13:00")
+        later = subscribe(with_tg, room, "16:00", "17:00")
+
+        with Session(engine) as s:
+            # Both slots of a cancelled pair overlap the first entry: one ping.
+            n = notify_freed_slots(s, [_freed(room, DAY, "11:00", 60), _freed(room, DAY, "11:30", 60)])
+        assert n == 2
+        assert (_status(on_room), _status(on_sibling), _status(later)) == ("fulfilled", "fulfilled", "active")
+
+        with Session(engine) as s:
+            notifs = s.exec(select(Notification).where(Notification.type == "slot_freed")).all()
+            assert sorted(x.recipient_id for x in notifs) == sorted([str(with_tg.id), str(without_tg.id)])
+            event = s.exec(select(OutboxEvent).where(OutboxEvent.kind == "waitlist.notify")).one()
+            assert [x["chat_id"] for x in event.payload["slots"]] == ["555"]
+            assert len(event.payload["admin_alerts"]) == 1  # the one without Telegram
+
+        # A fulfilled entry is not matched again.
+        assert notify_freed_slots(Session(engine), [_freed(room, DAY, "10:00", 120)]) == 0
+
+        # Deleting an entry takes it out of the index.
+        r = client.delete(f"/api/v1/waitlist/{later}", headers=_auth(with_tg))
+        assert r.status_code == 200
+        assert notify_freed_slots(Session(engine), [_freed(room, DAY, "16:00", 60)]) == 0
+
+
+def test_series_batch_is_a_fixed_number_of_statements(max_queries):
+    with TestClient(app):
+        room, _ = _branch_rooms()
+        user = _user("wl-series@test.local", telegram_id="777")
+        first = DAY + timedelta(days=30)
+        weeks = [first + timedelta(weeks=i) for i in range(20)]
+        with Session(engine) as s:
+            entries = [Waitlist(resource_id=room.id, date=d, start_time="09:00", end_time="10:00",
+                                user_id=user.email, user_uuid=user.id) for d in weeks]
+            # Orphan: nobody to tell, cancelled instead.
+            orphan = Waitlist(resource_id=room.id, date=weeks[0], start_time="09:00", end_time="10:00",
+                              user_id="gone@test.local")
+            s.add_all(entries + [orphan])
+            s.commit()
+            ids = [e.id for e in entries]
+            orphan_id = orphan.id
+
+        with Session(engine) as s, max_queries(12):
+            n = notify_freed_slots(s, [_freed(room, d, "09:00", 60) for d in weeks])
+        assert n == 20
+        assert {_status(i) for i in ids} == {"fulfilled"} and _status(orphan_id) == "cancelled"
+        with Session(engine) as s:
+            events = s.exec(select(OutboxEvent).where(OutboxEvent.kind == "waitlist.notify")).all()
+            assert any(len(e.payload["slots"]) == 20 for e in events)
+
+
+def test_re_rent_listing_goes_through_the_outbox():
+    with TestClient(app) as client:
+        room, _ = _branch_rooms()
+        owner = _user("wl-rerent@test.local", balance=500.0)
+        r = client.post("/api/v1/bookings/", headers=_auth(owner), json={
+            "resource_id": room.id, "location_id": room.location_id, "date": (DAY + timedelta(days=90)).isoformat(),
+            "start_time": "18:00", "duration": 60,
+        })
+        assert r.status_code == 200, r.text
+        booking_id = r.json()["id"]
+        r = client.patch(f"/api/v1/bookings/{booking_id}/re-rent", headers=_auth(owner))
+        assert r.status_code == 200, r.text
+        with Session(engine) as s:
+            queued = s.exec(select(OutboxEvent).where(OutboxEvent.kind == "waitlist.freed_slot")
+                            .where(OutboxEvent.idempotency_key.contains(booking_id))).all()
+            assert len(queued) == 1
+
+
+if __name__ == "__main__":
+    from conftest import QueryBudget
+
+    test_day_index_matches_brute_force()
+    test_freed_slot_notifies_branch_once()
+    test_series_batch_is_a_fixed_number_of_statements(QueryBudget())
+    test_re_rent_listing_goes_through_the_outbox()
+    print("OK")
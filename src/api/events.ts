@@ -0,0 +1,86 @@
+import { API_URL } from './client';
+import { toCamelCase } from '../utils/transformers';
+
+/**
+ * Live server events (GET /events/stream, Server-Sent Events).
+ *
+ * One EventSource per tab, shared by every subscriber: the bell, the
+ * chessboard and the mobile bell all listen on the same connection. It opens
+ * on the first subscribe and closes when the last one leaves. EventSource
+ * reconnects by itself; after a reconnect (or a `resync` from the server)
+ * subscribers get a `resync` event and should re-fetch what they show —
+ * anything sent while the connection was down is lost.
+ *
+ * EventSource can't send headers, so the JWT travels as ?token=.
+ */
+
+export type ServerEventType = 'notification' | 'booking' | 'resync';
+
+export interface BookingEvent {
+    id: string;
+    action: 'created' | 'cancelled' | 'approved' | 'rescheduled' | 'updated';
+    locationId: string;
+    resourceId: string;
+    date: string;
+    startTime: string;
+    duration: number;
+    status: string;
+    old?: { resourceId?: string; locationId?: string; date?: string; startTime?: string };
+}
+
+export interface NotificationEvent {
+    id: string;
+    recipientId: string;
+    type: string;
+    title: string;
+    link?: string | null;
+}
+
+type Listener = (type: ServerEventType, data: any) => void;
+
+const TYPES: ServerEventType[] = ['notification', 'booking', 'resync'];
+const listeners = new Set<Listener>();
+let source: EventSource | null = null;
+let everOpened = false;
+
+function emit(type: ServerEventType, data: any) {
+    listeners.forEach((l) => {
+        try { l(type, data); } catch { /* one bad listener mustn't kill the rest */ }
+    });
+}
+
+function open() {
+    const token = localStorage.getItem('token');
+    if (!token || typeof EventSource === 'undefined') return;
+    source = new EventSource(`${API_URL}/events/stream?token=${encodeURIComponent(token)}`);
+    everOpened = false;
+    source.onopen = () => {
+        // Reconnect after a drop: events in between are gone.
+        if (everOpened) emit('resync', {});
+        everOpened = true;
+    };
+    TYPES.forEach((type) => {
+        source!.addEventListener(type, (e) => {
+            let data = {};
+            try { data = toCamelCase(JSON.parse((e as MessageEvent).data)); } catch { /* ignore */ }
+            emit(type, data);
+        });
+    });
+}
+
+export function subscribeServerEvents(listener: Listener): () => void {
+    listeners.add(listener);
+    if (!source) open();
+    return () => {
+        listeners.delete(listener);
+        if (listeners.size === 0 && source) {
+            source.close();
+            source = null;
+        }
+    };
+}
+
+/** True while a stream is open — pollers can back off to a slow safety net. */
+export function serverEventsConnected(): boolean {
+    return !!source && source.readyState === 1;
+}
@@ -16,6 +16,55 @@ export const usersApi = {
         return response.data;
     },
 
+    /** One client with their comment/discount/task history — the list
+     *  above no longer carries it. */
+    getUser: async (id: string) => {
+        const response = await api.get<User>(`/users/${encodeURIComponent(id)}`);
+        return response.data;
+    },
+
+    /** Append an admin note; returns the user with fresh history. */
+    addComment: async (id: string, text: string) => {
+        const response = await api.post<User>(`/users/${encodeURIComponent(id)}/comments`, { text });
+        return response.data;
+    },
+
+    /** Edit / remove one admin note by id; both return the refreshed user. */
+    updateComment: async (id: string, commentId: string, text: string) => {
+        const response = await api.patch<User>(
+            `/users/${encodeURIComponent(id)}/comments/${encodeURIComponent(commentId)}`, { text },
+        );
+        return response.data;
+    },
+
+    removeComment: async (id: string, commentId: string) => {
+        const response = await api.delete<User>(
+            `/users/${encodeURIComponent(id)}/comments/${encodeURIComponent(commentId)}`,
+        );
+        return response.data;
+    },
+
+    /** Admin tasks one at a time — never the whole array (a card that hasn't
+     *  loaded the history would overwrite every other task). */
+    addTask: async (id: string, task: Record<string, unknown>) => {
+        const response = await api.post<User>(`/users/${encodeURIComponent(id)}/tasks`, task);
+        return response.data;
+    },
+
+    updateTask: async (id: string, taskId: string, changes: Record<string, unknown>) => {
+        const response = await api.patch<User>(
+            `/users/${encodeURIComponent(id)}/tasks/${encodeURIComponent(taskId)}`, changes,
+        );
+        return response.data;
+    },
+
+    removeTask: async (id: string, taskId: string) => {
+        const response = await api.delete<User>(
+            `/users/${encodeURIComponent(id)}/tasks/${encodeURIComponent(taskId)}`,
+        );
+        return response.data;
+    },
+
     /** Soft-delete a user (Excel #11). Preserves all history; prevents login. */
     archiveUser: async (id: string, reason?: string) => {
         const response = await api.post<User>(
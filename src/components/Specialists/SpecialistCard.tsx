@@ -2,6 +2,7 @@ import { Link } from 'react-router-dom';
 import { User, Video, MapPin, Tent, ArrowRight } from 'lucide-react';
 import { GH, GH_SANS, GH_MONO } from '../../hooks/useDesignFlag';
 import { getBadge } from '../../utils/specialistBadges';
+import { imageSrcSet } from '../../utils/imageVariants';
 import {
     hasOnlineFormat, hasOfflineFormat,
     hasOfflineRoom as hasOfflineRoomFmt,
@@ -54,6 +55,7 @@ function GHCard({ specialist, hasOnline, hasOffline, hasOfflineRoom, hasOfflineC
                 <div style={{ position: 'relative', aspectRatio: '3/4', overflow: 'hidden', background: GH.ink5 }}>
                     {specialist.photoUrl ? (
                         <img src={specialist.photoUrl} alt={`${specialist.firstName} ${specialist.lastName}`}
+                            srcSet={imageSrcSet(specialist.photoUrl)} sizes="(max-width: 640px) 100vw, 320px" loading="lazy"
                             style={{ width: '100%', height: '100%', objectFit: 'cover', display: 'block' }} />
                     ) : (
                         <div style={{ width: '100%', height: '100%', display: 'flex', alignItems: 'center', justifyContent: 'center', color: GH.ink10 }}>
@@ -6,6 +6,7 @@ import {
 } from 'lucide-react';
 import clsx from 'clsx';
 import { notificationsApi, type AppNotification } from '../../api/notifications';
+import { subscribeServerEvents, serverEventsConnected } from '../../api/events';
 import { useAdminTaskStore } from '../../store/adminTaskStore';
 
 // Icon mapping
@@ -44,7 +45,8 @@ export function NotificationBell({ variant = 'dark' }: NotificationBellProps = {
     const [markingAll, setMarkingAll] = useState(false);
     const ref = useRef<HTMLDivElement>(null);
 
-    // Poll unread count every 30s
+    // Unread count: pushed over /events/stream; the poll is only a safety net
+    // (every 30s while the stream is down, every 5 min while it's up).
     const fetchCount = useCallback(async () => {
         try {
             const count = await notificationsApi.getUnreadCount();
@@ -56,8 +58,17 @@ export function NotificationBell({ variant = 'dark' }: NotificationBellProps = {
 
     useEffect(() => {
         fetchCount();
-        const interval = setInterval(fetchCount, 30000);
-        return () => clearInterval(interval);
+        let lastPoll = Date.now();
+        const interval = setInterval(() => {
+            if (serverEventsConnected() && Date.now() - lastPoll < 300000) return;
+            lastPoll = Date.now();
+            fetchCount();
+        }, 30000);
+        const unsubscribe = subscribeServerEvents((type) => {
+            if (type === 'notification') setUnreadCount((c) => c + 1);
+            else if (type === 'resync') fetchCount();
+        });
+        return () => { clearInterval(interval); unsubscribe(); };
     }, [fetchCount]);
 
     // Close on outside click
@@ -10,7 +10,7 @@ interface UserCommentsProps {
 }
 
 export function UserComments({ email }: UserCommentsProps) {
-    const { users, addUserComment, currentUser } = useUserStore();
+    const { users, addUserComment } = useUserStore();
     const user = users.find(u => u.email === email);
     const [newComment, setNewComment] = useState('');
 
@@ -18,7 +18,7 @@ export function UserComments({ email }: UserCommentsProps) {
 
     const handleAddComment = () => {
         if (!newComment.trim()) return;
-        addUserComment(email, newComment.trim(), currentUser?.name || 'Admin');
+        addUserComment(email, newComment.trim());
         setNewComment('');
     };
 
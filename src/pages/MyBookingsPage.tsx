@@ -2260,19 +2260,14 @@ export function MyBookingsPage() {
     // who want to see everything. Match by:
     //   • userUuid (every modern booking has it; unambiguous)
     //   • current email (legacy rows + manual entries)
-    //   • any prior email recorded in this user's `commentHistory`
-    //     (email_change events) — Anna's case: she had bookings under a
+    //   • any prior email this account had (`previousEmails` from /users/me,
+    //     i.e. email_change events) — Anna's case: she had bookings under a
     //     synthetic/old email and the strict equality used to drop them
     //     even though the backend `/me` endpoint already returned them.
     const knownEmails = (() => {
         const set = new Set<string>();
         if (currentUser?.email) set.add(currentUser.email.toLowerCase());
-        const ch: any[] = (currentUser as any)?.commentHistory || [];
-        ch.forEach(e => {
-            if (e?.type === 'email_change' && typeof e.old_email === 'string') {
-                set.add(String(e.old_email).toLowerCase());
-            }
-        });
+        (currentUser?.previousEmails || []).forEach(e => set.add(e.toLowerCase()));
         return set;
     })();
     const userBookings = bookings.filter(b => {
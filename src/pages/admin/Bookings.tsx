@@ -7,6 +7,7 @@ import { Search, LayoutGrid, List, Check, X, Loader2 } from 'lucide-react';
 import clsx from 'clsx';
 import { AdminChessboardView } from '../../components/admin/AdminChessboardView';
 import { bookingsApi } from '../../api/bookings';
+import { subscribeServerEvents } from '../../api/events';
 import { toast } from 'sonner';
 import { GH, GH_SANS, GH_MONO } from '../../hooks/useDesignFlag';
 import type { BookingHistoryItem } from '../../store/types';
@@ -119,6 +120,19 @@ export function AdminBookings() {
         };
     }, [fetchUsers]);
 
+    // Live updates (api/events): a booking created/cancelled/moved anywhere —
+    // another admin, a client on the site, the cron — re-fetches the list.
+    // Debounced: a series create arrives as dozens of events in one burst.
+    useEffect(() => {
+        let timer: ReturnType<typeof setTimeout> | null = null;
+        const unsubscribe = subscribeServerEvents((type) => {
+            if (type !== 'booking' && type !== 'resync') return;
+            if (timer) clearTimeout(timer);
+            timer = setTimeout(() => useUserStore.getState().fetchAllBookings(), 500);
+        });
+        return () => { if (timer) clearTimeout(timer); unsubscribe(); };
+    }, []);
+
     const getUserName = (email: string) => {
         const u = users.find(u => u.email === email || u.id === email);
         if (u?.name) return u.name;
@@ -135,6 +135,13 @@ export function AdminUserDetails() {
         if (users.length === 0) fetchUsers();
     }, [users.length, fetchUsers]);
 
+    // Comment / discount / task history isn't in the users list — the card
+    // loads it for this one client.
+    const fetchUserDetail = useUserStore(s => s.fetchUserDetail);
+    useEffect(() => {
+        if (user?.id) fetchUserDetail(user.id);
+    }, [user?.id, fetchUserDetail]);
+
     // Брони ЭТОГО клиента — с сервера, а не фильтром общего списка.
     // Общий список обрезан потолком в 5000, а броней уже 6115: хвост молча
     // отбрасывался, и в карточке показывалось «0 часов / 0 бронирований»
@@ -314,6 +321,7 @@ export function AdminUserDetails() {
                 ...(topupForm.note ? { note: topupForm.note } : {}),
             });
             await useUserStore.getState().fetchUsers();
+            await fetchUserDetail(user.id);
             toast.success(`Абонемент пополнен на ${topupForm.hours} ч`);
             setIsTopupOpen(false);
             setTopupForm({ hours: '', amount: '', payment_method: 'cash', note: '' });
@@ -815,6 +823,7 @@ export function AdminUserDetails() {
                                                 // "Клиент не найден" until a manual reload, exactly
                                                 // the bug admins reported when changing email.
                                                 await fetchUsers();
+                                                await fetchUserDetail(user.id);
                                                 toast.success(`Email изменён на ${trimmed}`);
                                                 navigate(`/admin/users/${encodeURIComponent(trimmed)}`, { replace: true });
                                             } catch (err: any) {
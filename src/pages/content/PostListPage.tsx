@@ -5,6 +5,7 @@ import { format as fmtDate, parseISO } from 'date-fns';
 import { ru } from 'date-fns/locale';
 import { GH, GH_SANS, GH_MONO } from '../../hooks/useDesignFlag';
 import { postsApi, type Post, type PostType } from '../../api/posts';
+import { imageSrcSet } from '../../utils/imageVariants';
 
 /**
  * PostListPage — публичная лента новостей или статей (один компонент,
@@ -96,7 +97,7 @@ export function PostListPage({ type }: { type: PostType }) {
                             >
                                 {p.coverImageUrl ? (
                                     <div style={{ aspectRatio: '16/10', overflow: 'hidden', background: GH.cellDead }}>
-                                        <img src={p.coverImageUrl} alt={p.title} style={{ width: '100%', height: '100%', objectFit: 'cover', display: 'block' }} />
+                                        <img src={p.coverImageUrl} alt={p.title} srcSet={imageSrcSet(p.coverImageUrl)} sizes="(max-width: 700px) 100vw, 400px" loading="lazy" style={{ width: '100%', height: '100%', objectFit: 'cover', display: 'block' }} />
                                     </div>
                                 ) : (
                                     <div style={{ aspectRatio: '16/10', background: GH.cellDead, display: 'grid', placeItems: 'center', color: GH.ink30, ...ghMono }}>
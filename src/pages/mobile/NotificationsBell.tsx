@@ -1,18 +1,15 @@
 import { useEffect, useState } from 'react';
 import { Bell, X } from 'lucide-react';
 import { notificationsApi, type AppNotification } from '../../api/notifications';
+import { subscribeServerEvents, serverEventsConnected } from '../../api/events';
 
 /**
  * Notifications bell for the mobile cabinet.
  *
- * Polls unread count every 60 seconds (cheap one-shot endpoint). Tap opens
- * a bottom-sheet with the latest 20 items. Tapping an item with a `link`
- * marks it read and hard-navigates — same UX as the desktop bell.
- *
- * Why polling and not websockets: the existing notifications service is
- * synchronous, no broadcast channel yet. Sixty-second cadence is fine for
- * "you have a hot-booking approval pending" / "your slot was approved" — by
- * the time a user opens their phone the count is fresh enough.
+ * Unread count arrives over /events/stream (api/events); the 60-second poll
+ * only runs while the stream is down. Tap opens a bottom-sheet with the
+ * latest 20 items. Tapping an item with a `link` marks it read and
+ * hard-navigates — same UX as the desktop bell.
  */
 export function NotificationsBell({ color = '#0E0E0E' }: { color?: string } = {}) {
     const [unread, setUnread] = useState(0);
@@ -29,8 +26,14 @@ export function NotificationsBell({ color = '#0E0E0E' }: { color?: string } = {}
             } catch { /* ignore */ }
         };
         tick();
-        const id = window.setInterval(tick, 60_000);
-        return () => { cancelled = true; window.clearInterval(id); };
+        const id = window.setInterval(() => {
+            if (!serverEventsConnected()) tick();
+        }, 60_000);
+        const unsubscribe = subscribeServerEvents((type) => {
+            if (type === 'notification') setUnread(c => c + 1);
+            else if (type === 'resync') tick();
+        });
+        return () => { cancelled = true; window.clearInterval(id); unsubscribe(); };
     }, []);
 
     const openSheet = async () => {
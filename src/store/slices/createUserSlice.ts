@@ -1,27 +1,71 @@
 import type { StateCreator } from 'zustand';
-import type { UserStore, UserSlice } from '../types';
+import type { UserStore, UserSlice, User } from '../types';
 import { usersApi } from '../../api/users';
 import { startOfWeek, endOfWeek } from 'date-fns';
 
+// The user list carries no history — commentHistory / discountHistory /
+// adminTasks come from GET /users/{id} (fetchUserDetail). When a list row or
+// a response without them replaces a user, keep what the card already loaded.
+const HISTORY_KEYS = ['commentHistory', 'discountHistory', 'adminTasks'] as const;
+const keepHistory = (prev: User | undefined, next: User): User => {
+    if (!prev) return next;
+    const merged: User = { ...next };
+    HISTORY_KEYS.forEach(k => {
+        if (merged[k] === undefined && prev[k] !== undefined) (merged as any)[k] = prev[k];
+    });
+    return merged;
+};
+
+// Per-entry history calls (tasks, comments) answer with the refreshed
+// user detail; fold it into the list row.
+const applyDetail = async (
+    set: Parameters<StateCreator<UserStore, [], [], UserSlice>>[0],
+    call: () => Promise<User>,
+    failure: string,
+) => {
+    try {
+        const updatedUser = await call();
+        set((state) => ({
+            users: state.users.map(u => u.id === updatedUser.id ? { ...u, ...updatedUser } : u)
+        }));
+    } catch (error) {
+        console.error(failure, error);
+    }
+};
+
 export const createUserSlice: StateCreator<UserStore, [], [], UserSlice> = (set, get) => ({
     users: [],
 
     fetchUsers: async () => {
         try {
             const users = await usersApi.getUsers();
-            set({ users });
+            set((state) => {
+                const prev = new Map(state.users.map(u => [u.id, u]));
+                return { users: users.map(u => keepHistory(prev.get(u.id), u)) };
+            });
         } catch (error) {
             console.error("Failed to fetch users", error);
         }
     },
 
+    fetchUserDetail: async (userId) => {
+        try {
+            const detail = await usersApi.getUser(userId);
+            set((state) => ({
+                users: state.users.map(u => u.id === detail.id ? { ...u, ...detail } : u)
+            }));
+        } catch (error) {
+            console.error("Failed to fetch user", error);
+        }
+    },
+
     updateUser: async (updates) => {
         try {
             // Assume this updates "currentUser". Backend has updateMe.
             const updatedUser = await usersApi.updateMe(updates);
             set((state) => ({
                 currentUser: updatedUser,
-                users: state.users.map(u => u.email === updatedUser.email ? updatedUser : u)
+                users: state.users.map(u => u.email === updatedUser.email ? keepHistory(u, updatedUser) : u)
             }));
         } catch (error) {
             console.error("Failed to update profile", error);
@@ -32,7 +76,7 @@ export const createUserSlice: StateCreator<UserStore, [], [], UserSlice> = (set,
         try {
             const updatedUser = await usersApi.updateUser(userId, updates);
             set((state) => ({
-                users: state.users.map(u => u.email === updatedUser.email ? updatedUser : u),
+                users: state.users.map(u => u.email === updatedUser.email ? keepHistory(u, updatedUser) : u),
                 currentUser: state.currentUser?.email === updatedUser.email ? updatedUser : state.currentUser
             }));
         } catch (error) {
@@ -44,7 +88,7 @@ export const createUserSlice: StateCreator<UserStore, [], [], UserSlice> = (set,
         try {
             const updatedUser = await usersApi.toggleSubscriptionFreeze(userId);
             set((state) => ({
-                users: state.users.map(u => u.email === updatedUser.email ? updatedUser : u),
+                users: state.users.map(u => u.email === updatedUser.email ? keepHistory(u, updatedUser) : u),
                 currentUser: state.currentUser?.email === updatedUser.email ? updatedUser : state.currentUser
             }));
         } catch (error) {
@@ -56,7 +100,7 @@ export const createUserSlice: StateCreator<UserStore, [], [], UserSlice> = (set,
         try {
             const updatedUser = await usersApi.updatePersonalDiscount(userId, percent, reason);
             set((state) => ({
-                users: state.users.map(u => u.email === updatedUser.email ? updatedUser : u),
+                users: state.users.map(u => u.email === updatedUser.email ? keepHistory(u, updatedUser) : u),
                 currentUser: state.currentUser?.email === updatedUser.email ? updatedUser : state.currentUser
             }));
         } catch (error) {
@@ -149,8 +193,7 @@ export const createUserSlice: StateCreator<UserStore, [], [], UserSlice> = (set,
     },
 
     addUserTask: async (email, taskData) => {
-        const state = get();
-        const user = state.users.find(u => u.email === email);
+        const user = get().users.find(u => u.email === email);
         if (!user) return;
 
         const newTask = {
@@ -158,42 +201,34 @@ export const createUserSlice: StateCreator<UserStore, [], [], UserSlice> = (set,
             ...taskData,
             createdAt: new Date().toISOString()
         };
-        const newTasks = [...(user.adminTasks || []), newTask];
-        await get().updateUserById(email, { adminTasks: newTasks } as any); // adminTasks field match
+        await applyDetail(set, () => usersApi.addTask(user.id, newTask), "Failed to add task");
     },
 
     toggleUserTask: async (email, taskId) => {
-        const state = get();
-        const user = state.users.find(u => u.email === email);
-        if (!user || !user.adminTasks) return;
-
-        const updatedTasks = user.adminTasks.map(t =>
-            t.id === taskId ? { ...t, isCompleted: !t.isCompleted } : t
+        const user = get().users.find(u => u.email === email);
+        const task = user?.adminTasks?.find(t => t.id === taskId);
+        if (!user || !task) return;
+
+        await applyDetail(
+            set,
+            () => usersApi.updateTask(user.id, taskId, { isCompleted: !task.isCompleted }),
+            "Failed to update task",
         );
-        await get().updateUserById(email, { adminTasks: updatedTasks } as any);
     },
 
     removeUserTask: async (email, taskId) => {
-        const state = get();
-        const user = state.users.find(u => u.email === email);
-        if (!user || !user.adminTasks) return;
+        const user = get().users.find(u => u.email === email);
+        if (!user) return;
 
-        const updatedTasks = user.adminTasks.filter(t => t.id !== taskId);
-        await get().updateUserById(email, { adminTasks: updatedTasks } as any);
+        await applyDetail(set, () => usersApi.removeTask(user.id, taskId), "Failed to remove task");
     },
 
-    addUserComment: async (email, text, adminName) => {
-        const state = get();
-        const user = state.users.find(u => u.email === email);
+    addUserComment: async (email, text) => {
+        const user = get().users.find(u => u.email === email);
         if (!user) return;
 
-        const newNote = {
-            id: `note-${Date.now()}-${Math.random().toString(36).substr(2, 9)}`,
-            text,
-            date: new Date().toISOString(),
-            adminName
-        };
-        const newHistory = [newNote, ...(user.commentHistory || [])];
-        await get().updateUserById(email, { commentHistory: newHistory } as any);
+        // Appended server-side (author = the logged-in admin); the response
+        // carries the refreshed history.
+        await applyDetail(set, () => usersApi.addComment(user.id, text), "Failed to add comment");
     }
 });
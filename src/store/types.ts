@@ -69,11 +69,12 @@ export interface User {
     role?: 'owner' | 'senior_admin' | 'admin' | 'specialist' | 'user'; // Specific access role
     permissions?: string[]; // Granular permission overrides
     notes?: string; // Legacy simple note
-    commentHistory?: UserNote[]; // New structured comments
+    commentHistory?: UserNote[]; // New structured comments (detail endpoint only)
     registrationDate?: string; // ISO string
     telegramId?: string; // Telegram User ID
     tags?: string[]; // Tag names or IDs
     adminTasks?: Task[];
+    previousEmails?: string[]; // /users/me: emails this account had before a rename
     additionalContacts?: { type: string; value: string }[];
     manualStatus?: 'new' | 'active' | 'sleeping' | 'vip' | 'partner' | 'bad_client';
     responsibleAdminId?: string | null;
@@ -199,6 +200,7 @@ export interface BookingSlice {
 export interface UserSlice {
     users: User[];
     fetchUsers: () => Promise<void>;
+    fetchUserDetail: (userId: string) => Promise<void>;
     updateUser: (updates: Partial<User>) => Promise<void>;
     updateUserById: (userId: string, updates: Partial<User>) => Promise<void>;
     toggleSubscriptionFreeze: (userId: string) => Promise<void>;
@@ -211,7 +213,7 @@ export interface UserSlice {
     addUserTask: (email: string, task: Omit<Task, 'id' | 'createdAt'>) => void;
     toggleUserTask: (email: string, taskId: string) => void;
     removeUserTask: (email: string, taskId: string) => void;
-    addUserComment: (email: string, text: string, adminName: string) => void;
+    addUserComment: (email: string, text: string) => void;
 }
 
 export interface WaitlistSlice {
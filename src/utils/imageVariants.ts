@@ -0,0 +1,32 @@
+/**
+ * srcset для фото, загруженных через /upload (backend/app/services/images).
+ *
+ * Бэкенд кладёт оригинал в /uploads/img/<xx>/<sha256>.<ext> и рядом всегда
+ * пишет WebP-варианты <sha256>-160/640/1280.webp (длинная сторона ≤ N, без
+ * апскейла). URL оригинала несёт его размер (?w=1200&h=800), поэтому srcset
+ * строится по одному URL — без похода за манифестом — и с настоящими
+ * ширинами: у портретного фото вариант 640 в ширину меньше 640 px, а крупнее
+ * оригинала — его копии, из них в srcset попадает только первый (так же
+ * считает images.srcset_widths). Старые загрузки (/uploads/<uuid>.jpg),
+ * хешированные без размера в URL и внешние URL → undefined, и <img> просто
+ * берёт src как раньше. Префикс с origin (`${baseUrl}${url}` при абсолютном
+ * API_URL) сохраняется.
+ */
+
+const VARIANT_WIDTHS = [160, 640, 1280] as const;
+const HASHED_UPLOAD = /^((?:https?:\/\/[^/]+)?\/uploads\/img\/[0-9a-f]{2}\/[0-9a-f]{64})\.[a-z]+\?w=(\d+)&h=(\d+)$/;
+
+export function imageSrcSet(url?: string | null): string | undefined {
+    const m = url ? HASHED_UPLOAD.exec(url) : null;
+    if (!m) return undefined;
+    const width = Number(m[2]);
+    const longEdge = Math.max(width, Number(m[3]));
+    if (!width || !longEdge) return undefined;
+    const parts: string[] = [];
+    for (const w of VARIANT_WIDTHS) {
+        const real = longEdge <= w ? width : Math.round(width * w / longEdge);
+        parts.push(`${m[1]}-${w}.webp ${real}w`);
+        if (longEdge <= w) break;
+    }
+    return parts.join(', ');
+}